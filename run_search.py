@@ -4,17 +4,23 @@ Run a search with all the improvements
 
 import os
 import sys
-import json
 import argparse
 import logging
 import time
 import subprocess
+import concurrent.futures
 from typing import List, Dict, Any, Optional
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("run_search")
 
+# Import the result frame, the multi-query helpers and the relevance scorer from the scraping directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "scraping"))
+from result_frame import ResultFrame
+from query_batch import load_queries, partition_path, make_progress
+from relevance import rank_results
+
 def run_search(query: str, databases: List[str], output_file: str, 
                max_results: int = 10, min_date: str = None, max_date: str = None,
                use_captcha: bool = True, use_browser: bool = True, parallel: bool = True) -> str:
@@ -92,28 +98,150 @@ def run_search(query: str, databases: List[str], output_file: str,
     # Return the output file path
     return output_file
 
+def run_queries(queries: List[Dict[str, Any]], databases: List[str], output_file: str,
+                max_results: int = 10, use_captcha: bool = True, use_browser: bool = True,
+                parallel: bool = True, max_workers: int = 4) -> List[str]:
+    """
+    Run many searches in this process, sharing one access manager
+    
+    All (query, database) searches go through one worker pool and one
+    SmartAccessManager, so browser sessions, the CAPTCHA solver and the
+    method success rates are shared instead of being set up again for every
+    query. Each query's results are written to its own output partition as
+    soon as all of its databases have been searched.
+    
+    Args:
+        queries (List[Dict[str, Any]]): Queries with "query", "from_date" and "to_date" keys
+        databases (List[str]): List of database IDs to search
+        output_file (str): Base output file; partitions go next to it (see partition_path)
+        max_results (int): Maximum number of results per database
+        use_captcha (bool): Whether to use CAPTCHA solver
+        use_browser (bool): Whether to use browser automation
+        parallel (bool): Whether to run searches in parallel
+        max_workers (int): Maximum number of parallel workers
+        
+    Returns:
+        List[str]: Paths of the output partitions that were written
+    """
+    from smart_access_manager import SmartAccessManager, save_results_to_file
+    
+    manager = SmartAccessManager(use_captcha_solver=use_captcha, use_browser_automation=use_browser)
+    tasks = [(index, db_id) for index in range(len(queries)) for db_id in databases]
+    pending = {index: len(databases) for index in range(len(queries))}
+    results_by_query = {index: [] for index in range(len(queries))}
+    output_files = []
+    total = 0
+    failed = 0
+    progress = make_progress(len(tasks), desc="Searching")
+    
+    def search(task):
+        index, db_id = task
+        query = queries[index]
+        return manager.search_database(db_id, query["query"], max_results, query["from_date"], query["to_date"])
+    
+    def complete(task, results):
+        nonlocal total
+        index, db_id = task
+        results_by_query[index].extend(results)
+        total += len(results)
+        pending[index] -= 1
+        progress.update(1)
+        progress.set_postfix_str(f"{total} results, {failed} failed")
+        
+        # Write the query's partition once all of its databases are done
+        if pending[index] == 0:
+            path = partition_path(output_file, index + 1, queries[index]["query"])
+            ranked = rank_results(results_by_query.pop(index), queries[index]["query"])
+            if save_results_to_file(ranked, path):
+                output_files.append(path)
+    
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers if parallel else 1) as executor:
+            future_to_task = {executor.submit(search, task): task for task in tasks}
+            for future in concurrent.futures.as_completed(future_to_task):
+                task = future_to_task[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logger.error(f"Error searching {task[1]} for '{queries[task[0]]['query']}': {e}")
+                    failed += 1
+                    results = []
+                complete(task, results)
+    finally:
+        progress.close()
+        manager.close()
+    
+    return sorted(output_files)
+
+def print_statistics(output_file: str):
+    """
+    Print the number of results per database in a results file
+    
+    Args:
+        output_file (str): Results file
+    """
+    try:
+        # Count results by database
+        frame = ResultFrame.from_file(output_file)
+        
+        # Print statistics
+        print(f"\nSearch Results:")
+        print(f"Total results: {len(frame)}")
+        for db_id, count in frame.facets("database").items():
+            print(f"  {db_id or 'unknown'}: {count} results")
+        
+        print(f"\nResults saved to {output_file}")
+    except Exception as e:
+        logger.error(f"Error loading results: {e}")
+
 def main():
     """
     Main function
     """
     parser = argparse.ArgumentParser(description="Run a search with all the improvements")
-    parser.add_argument("--query", required=True, help="Query to search for")
+    parser.add_argument("--query", help="Query to search for")
+    parser.add_argument("--queries-file", help="File with one query per line, or a CSV file with query, from_date and to_date columns")
     parser.add_argument("--databases", nargs="+", default=["pubmed", "fda-drugs", "ema-medicines", "nejm", "amjmed"],
                         help="List of database IDs to search")
-    parser.add_argument("--output", help="Output file for search results (JSON)")
+    parser.add_argument("--output", help="Output file for search results (JSON, or NDJSON with a .ndjson extension)")
     parser.add_argument("--max-results", type=int, default=10, help="Maximum number of results per database")
     parser.add_argument("--min-date", help="Minimum date (YYYY-MM-DD)")
     parser.add_argument("--max-date", help="Maximum date (YYYY-MM-DD)")
     parser.add_argument("--no-captcha", action="store_true", help="Disable CAPTCHA solver")
     parser.add_argument("--no-browser", action="store_true", help="Disable browser automation")
     parser.add_argument("--no-parallel", action="store_true", help="Disable parallel searches")
+    parser.add_argument("--max-workers", type=int, default=4, help="Maximum number of parallel searches with --queries-file")
     args = parser.parse_args()
     
+    if not args.query and not args.queries_file:
+        parser.error("--query or --queries-file is required")
+    
     # Generate output file name if not provided
     if not args.output:
         timestamp = int(time.time() * 1000)
         args.output = f"search_results_{timestamp}.json"
     
+    # Run all queries of a queries file in this process
+    if args.queries_file:
+        queries = load_queries(args.queries_file, args.min_date, args.max_date)
+        if not queries:
+            logger.error(f"No queries found in {args.queries_file}")
+            return
+        
+        output_files = run_queries(
+            queries=queries,
+            databases=args.databases,
+            output_file=args.output,
+            max_results=args.max_results,
+            use_captcha=not args.no_captcha,
+            use_browser=not args.no_browser,
+            parallel=not args.no_parallel,
+            max_workers=args.max_workers
+        )
+        for output_file in output_files:
+            print_statistics(output_file)
+        return
+    
     # Run the search
     output_file = run_search(
         query=args.query,
@@ -133,27 +261,7 @@ def main():
         return
     
     # Load and display the results
-    try:
-        with open(output_file, "r") as f:
-            results = json.load(f)
-        
-        # Group results by database
-        results_by_db = {}
-        for result in results:
-            db_id = result.get("database", "unknown")
-            if db_id not in results_by_db:
-                results_by_db[db_id] = []
-            results_by_db[db_id].append(result)
-        
-        # Print statistics
-        print(f"\nSearch Results:")
-        print(f"Total results: {len(results)}")
-        for db_id, db_results in results_by_db.items():
-            print(f"  {db_id}: {len(db_results)} results")
-        
-        print(f"\nResults saved to {output_file}")
-    except Exception as e:
-        logger.error(f"Error loading results: {e}")
+    print_statistics(output_file)
 
 if __name__ == "__main__":
     main()
@@ -14,10 +14,10 @@ It includes support for:
 import importlib
 import concurrent.futures
 import time
-import json
 import os
 import sys
 import logging
+import threading
 from datetime import datetime
 
 # Set up logging
@@ -79,7 +79,72 @@ except ImportError:
     except ImportError:
         print("Warning: TGA API module not found")
 
-def search_database(db_id, query, max_results=10, min_date=None, max_date=None, captcha_api_key=""):
+# Import the streaming result writer, the job journal, the multi-query helpers, the result store
+# and the failed search check
+try:
+    from .result_sinks import save_results, DEFAULT_FSYNC_INTERVAL
+    from .job_journal import JobJournal, RETRY_STATES, open_job_sinks
+    from .query_batch import load_queries, partition_path, make_progress
+    from .result_store import ResultStore, OFFLINE_MODES, offline_search
+    from .result_record import search_error
+except ImportError:
+    from result_sinks import save_results, DEFAULT_FSYNC_INTERVAL
+    from job_journal import JobJournal, RETRY_STATES, open_job_sinks
+    from query_batch import load_queries, partition_path, make_progress
+    from result_store import ResultStore, OFFLINE_MODES, offline_search
+    from result_record import search_error
+
+# Local index of fetched records, opened on first use
+_result_store = None
+_result_store_lock = threading.Lock()
+
+def get_result_store():
+    """
+    Get the result store used as the local index of fetched records
+
+    Returns:
+        ResultStore: The shared result store
+    """
+    global _result_store
+    with _result_store_lock:
+        if _result_store is None:
+            _result_store = ResultStore()
+        return _result_store
+
+def search_database(db_id, query, max_results=10, min_date=None, max_date=None, captcha_api_key="",
+                    offline_mode="off"):
+    """
+    Search a specific database, answering from the local index where possible
+
+    Fetched records are added to the local index (the result store). With
+    offline_mode "prefer", a search already made upstream recently is answered
+    with the records it returned; with "only", the database is never searched
+    upstream and the full-text index answers instead.
+
+    Args:
+        db_id (str): Database ID
+        query (str): Search query
+        max_results (int): Maximum number of results to return
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        captcha_api_key (str): API key for CAPTCHA solving service
+        offline_mode (str): "off", "prefer" or "only"
+
+    Returns:
+        list: List of search results
+    """
+    return offline_search(
+        get_result_store(),
+        lambda: search_upstream(db_id, query, max_results, min_date, max_date, captcha_api_key),
+        db_id,
+        query,
+        max_results,
+        min_date,
+        max_date,
+        offline_mode
+    )
+
+def search_upstream(db_id, query, max_results=10, min_date=None, max_date=None, captcha_api_key=""):
     """
     Search a specific database using its API or advanced scraping techniques
 
@@ -132,7 +197,7 @@ def search_database(db_id, query, max_results=10, min_date=None, max_date=None,
         return []
 
 def batch_search(query, database_ids, max_results=10, min_date=None, max_date=None,
-              parallel=False, max_workers=4, captcha_api_key=""):
+              parallel=False, max_workers=4, captcha_api_key="", on_complete=None, offline_mode="off"):
     """
     Search multiple databases in parallel or sequentially
 
@@ -145,12 +210,25 @@ def batch_search(query, database_ids, max_results=10, min_date=None, max_date=No
         parallel (bool): Whether to search databases in parallel
         max_workers (int): Maximum number of parallel workers
         captcha_api_key (str): API key for CAPTCHA solving service
+        on_complete (callable): Called as on_complete(db_id, results, error) when
+            each database finishes (error is None on success; a failed search
+            passes the results it fetched before failing, usually none)
+        offline_mode (str): "off", "prefer" (repeated searches answered locally) or "only"
 
     Returns:
         list: Combined list of search results from all databases
     """
     all_results = []
 
+    def completed(db_id, results):
+        error = search_error(results)
+        if error:
+            logger.error(f"  Error searching {db_id}: {error}")
+        else:
+            logger.info(f"  Completed search for {db_id}, found {len(results)} results")
+        if on_complete:
+            on_complete(db_id, results, error)
+
     if parallel and len(database_ids) > 1:
         logger.info(f"Searching {len(database_ids)} databases in parallel with {max_workers} workers...")
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -162,7 +240,8 @@ def batch_search(query, database_ids, max_results=10, min_date=None, max_date=No
                     max_results,
                     min_date,
                     max_date,
-                    captcha_api_key
+                    captcha_api_key,
+                    offline_mode
                 ): db_id
                 for db_id in database_ids
             }
@@ -172,9 +251,11 @@ def batch_search(query, database_ids, max_results=10, min_date=None, max_date=No
                 try:
                     results = future.result()
                     all_results.extend(results)
-                    logger.info(f"  Completed search for {db_id}, found {len(results)} results")
+                    completed(db_id, results)
                 except Exception as e:
                     logger.error(f"  Error searching {db_id}: {str(e)}")
+                    if on_complete:
+                        on_complete(db_id, [], str(e))
     else:
         logger.info(f"Searching {len(database_ids)} databases sequentially...")
         for db_id in database_ids:
@@ -185,36 +266,144 @@ def batch_search(query, database_ids, max_results=10, min_date=None, max_date=No
                     max_results,
                     min_date,
                     max_date,
-                    captcha_api_key
+                    captcha_api_key,
+                    offline_mode
                 )
                 all_results.extend(results)
-                logger.info(f"  Completed search for {db_id}, found {len(results)} results")
+                completed(db_id, results)
             except Exception as e:
                 logger.error(f"  Error searching {db_id}: {str(e)}")
+                if on_complete:
+                    on_complete(db_id, [], str(e))
 
     logger.info(f"Total results found: {len(all_results)}")
     return all_results
 
-def save_results_to_file(results, output_file):
+def run_search_job(journal, parallel=False, max_workers=4, captcha_api_key="",
+                   fsync_interval=DEFAULT_FSYNC_INTERVAL):
     """
-    Save search results to a JSON file
+    Run the unfinished tasks of a batch job and write their results to its outputs
+
+    All (query, database) tasks of the job share one worker pool. Each task's
+    results are appended to its query's output as soon as it finishes and the
+    task is recorded as done in the journal, so the job can be resumed from
+    where it stopped.
 
     Args:
-        results (list): List of search results
-        output_file (str): Output file path
+        journal (JobJournal): Job journal with "queries" (each with "query",
+            "output", "from_date" and "to_date") and "max_results" params
+        parallel (bool): Whether to search databases in parallel
+        max_workers (int): Maximum number of parallel workers
+        captcha_api_key (str): API key for CAPTCHA solving service
+        fsync_interval (float): Seconds between flushes of written results to disk
 
     Returns:
-        bool: True if successful, False otherwise
+        int: Number of tasks that are still unfinished
     """
+    params = journal.params
+    queries = {query["query"]: query for query in params["queries"]}
+    progress = None
+    failed = [0]
+
+    def run_task(task):
+        query = queries[task["query"]]
+        journal.mark_running(task["query"], task["database"])
+        results = search_database(
+            task["database"],
+            task["query"],
+            params.get("max_results", 10),
+            query.get("from_date"),
+            query.get("to_date"),
+            captcha_api_key,
+            params.get("offline", "off")
+        )
+        # Adapters report a failed search with an error marker instead of
+        # raising; raise it, so the task stays to be retried
+        error = search_error(results)
+        if error:
+            raise RuntimeError(error)
+        return results
+
+    def on_complete(task, results, error):
+        if error:
+            logger.error(f"  Error searching {task['database']} for '{task['query']}': {error}")
+            journal.mark_failed(task["query"], task["database"], error)
+            failed[0] += 1
+        else:
+            offset, end_offset = sinks[task["query"]].write_batch(results)
+            journal.mark_done(task["query"], task["database"], offset, end_offset, len(results))
+        if progress is not None:
+            progress.update(1)
+            total = sum(sink.count for sink in sinks.values())
+            progress.set_postfix_str(f"{total} results, {failed[0]} failed")
+
+    sinks = {}
     try:
-        # Create the directory if it doesn't exist
-        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        sinks = open_job_sinks(journal, queries.values(), fsync_interval)
+
+        # List the tasks once the outputs are reconciled, which can set tasks
+        # whose results were lost back to pending
+        tasks = journal.get_tasks(states=RETRY_STATES)
+        progress = make_progress(len(tasks), desc="Searching") if len(queries) > 1 else None
+
+        if parallel and len(tasks) > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                future_to_task = {executor.submit(run_task, task): task for task in tasks}
+                for future in concurrent.futures.as_completed(future_to_task):
+                    try:
+                        on_complete(future_to_task[future], future.result(), None)
+                    except Exception as e:
+                        on_complete(future_to_task[future], [], str(e))
+        else:
+            for task in tasks:
+                try:
+                    on_complete(task, run_task(task), None)
+                except Exception as e:
+                    on_complete(task, [], str(e))
+    except BaseException:
+        # Keep the partial output so the job can be resumed
+        for sink in sinks.values():
+            sink.abort()
+        raise
+    finally:
+        if progress is not None:
+            progress.close()
+
+    # Keep the partial output around while there are tasks left to retry
+    unfinished = 0
+    for query in queries.values():
+        sink = sinks.get(query["query"])
+        if sink is None:
+            # Finished in an earlier run
+            continue
+        query_unfinished = sum(1 for task in journal.get_tasks(states=RETRY_STATES) if task["query"] == query["query"])
+        unfinished += query_unfinished
+        sink.close(keep_part=query_unfinished > 0)
+        print(f"{sink.count} results saved to {query['output']}")
+
+    if not unfinished:
+        journal.mark_finished()
+    return unfinished
+
+def save_results_to_file(results, output_file, fsync_interval=DEFAULT_FSYNC_INTERVAL):
+    """
+    Save search results to a file
 
-        # Save the results
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2)
+    Results are streamed to disk as they are read from results and the output
+    file is only replaced once all of them are written.
 
-        print(f"Results saved to {output_file}")
+    Args:
+        results (iterable): Search results (a list or a generator)
+        output_file (str): Output file path (.ndjson/.jsonl for NDJSON, anything else for a JSON array)
+        fsync_interval (float): Seconds between flushes to disk (0 = after every result)
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        count = save_results(results, output_file, fsync_interval)
+
+        print(f"{count} results saved to {output_file}")
         return True
     except Exception as e:
         print(f"Error saving results: {str(e)}")
@@ -226,7 +415,8 @@ if __name__ == "__main__":
 
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Search medical databases using APIs and advanced scraping")
-    parser.add_argument("--query", required=True, help="Search query")
+    parser.add_argument("--query", help="Search query (required unless --queries-file or --resume is given)")
+    parser.add_argument("--queries-file", help="File with one query per line, or a CSV file with query, from_date and to_date columns")
     parser.add_argument("--databases", nargs="+", default=["pubmed", "fda-drugs", "ema-medicines", "mhra", "tga-cmi"],
                         help="List of database IDs to search")
     parser.add_argument("--max-results", type=int, default=10, help="Maximum number of results per database")
@@ -235,33 +425,80 @@ if __name__ == "__main__":
     parser.add_argument("--parallel", action="store_true", help="Search databases in parallel")
     parser.add_argument("--max-workers", type=int, default=4, help="Maximum number of parallel workers")
     parser.add_argument("--captcha-api-key", default="", help="API key for CAPTCHA solving service")
-    parser.add_argument("--output", help="Output file path")
+    parser.add_argument("--offline", choices=OFFLINE_MODES, default="off",
+                        help="Answer from the local index of fetched records: 'prefer' answers searches "
+                             "already made upstream, 'only' never searches upstream")
+    parser.add_argument("--output", help="Output file path (.ndjson/.jsonl for NDJSON, anything else for a JSON array; "
+                                         "with --queries-file, each query is written to <output without extension>/<n>-<query>.json)")
+    parser.add_argument("--fsync-interval", type=float, default=DEFAULT_FSYNC_INTERVAL,
+                        help="Seconds between flushes of written results to disk (0 = after every result)")
+    parser.add_argument("--resume", metavar="JOB_ID", help="Resume an interrupted job, searching only the databases it has not finished")
 
     args = parser.parse_args()
 
-    # Set default dates if not provided
-    if not args.min_date:
-        today = datetime.now()
-        args.min_date = (today.replace(year=today.year - 1)).strftime("%Y-%m-%d")
-
-    if not args.max_date:
-        args.max_date = datetime.now().strftime("%Y-%m-%d")
-
-    # Set default output file if not provided
-    if not args.output:
-        args.output = f"results_{int(time.time())}.json"
-
-    # Search databases
-    results = batch_search(
-        args.query,
-        args.databases,
-        args.max_results,
-        args.min_date,
-        args.max_date,
+    if args.resume:
+        # Resume a job, running only its unfinished tasks
+        try:
+            journal = JobJournal.open(args.resume)
+        except FileNotFoundError as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
+
+        if journal.finished:
+            print(f"Job {journal.job_id} has already finished. Results are in {journal.params.get('output')}")
+            sys.exit(0)
+
+        print(f"Resuming job {journal.job_id}: {journal.summary()['done']} of {len(journal.tasks)} searches done")
+    else:
+        if not args.query and not args.queries_file:
+            parser.error("--query or --queries-file is required unless --resume is given")
+
+        # Set default dates if not provided
+        if not args.min_date:
+            today = datetime.now()
+            args.min_date = (today.replace(year=today.year - 1)).strftime("%Y-%m-%d")
+
+        if not args.max_date:
+            args.max_date = datetime.now().strftime("%Y-%m-%d")
+
+        # Set default output file if not provided
+        if not args.output:
+            args.output = f"results_{int(time.time())}.json"
+
+        if args.queries_file:
+            queries = load_queries(args.queries_file, args.min_date, args.max_date)
+            if not queries:
+                print(f"Error: No queries found in {args.queries_file}")
+                sys.exit(1)
+
+            # Each query gets its own output partition
+            for index, query in enumerate(queries, 1):
+                query["output"] = os.path.abspath(partition_path(args.output, index, query["query"]))
+        else:
+            queries = [{"query": args.query, "from_date": args.min_date, "to_date": args.max_date,
+                        "output": os.path.abspath(args.output)}]
+
+        # Start a job journal so that the run can be resumed if it dies
+        journal = JobJournal.create({
+            "queries": queries,
+            "output": os.path.abspath(args.output),
+            "max_results": args.max_results,
+            "offline": args.offline
+        })
+        for query in queries:
+            journal.add_tasks(query["query"], args.databases)
+
+    print(f"Job ID: {journal.job_id} (resume with --resume {journal.job_id})")
+
+    # Search databases and save results to file as they arrive
+    unfinished = run_search_job(
+        journal,
         args.parallel,
         args.max_workers,
-        args.captcha_api_key
+        args.captcha_api_key,
+        args.fsync_interval
     )
+    journal.close()
 
-    # Save results to file
-    save_results_to_file(results, args.output)
+    if unfinished:
+        print(f"{unfinished} searches failed. Run again with --resume {journal.job_id} to retry them")
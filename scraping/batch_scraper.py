@@ -12,7 +12,8 @@ import os
 import sys
 import time
 import random
-from typing import Dict, List, Any, Optional
+import threading
+from typing import Dict, List, Any, Optional, Tuple
 from urllib.parse import urlparse
 import concurrent.futures
 
@@ -28,6 +29,14 @@ try:
             RateLimiter, RetryHandler, AdvancedScraper
         )
         from config import get_database_config, get_rate_limit
+        from date_utils import parse_date_bound, is_within_range, to_iso_date
+        from result_extraction import RESULT_FIELDS, parse_page, record_to_dict
+        from pipeline import Pipeline, Stage
+        from result_sinks import DEFAULT_FSYNC_INTERVAL
+        from result_record import ResultRecord
+        from job_journal import JobJournal, RETRY_STATES, open_job_sinks
+        from query_batch import load_queries, partition_path, make_progress
+        from relevance import score_results
     except ImportError:
         # If that fails, try to import from the scraping directory
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -37,32 +46,20 @@ try:
             RateLimiter, RetryHandler, AdvancedScraper
         )
         from config import get_database_config, get_rate_limit
+        from date_utils import parse_date_bound, is_within_range, to_iso_date
+        from result_extraction import RESULT_FIELDS, parse_page, record_to_dict
+        from pipeline import Pipeline, Stage
+        from result_sinks import DEFAULT_FSYNC_INTERVAL
+        from result_record import ResultRecord
+        from job_journal import JobJournal, RETRY_STATES, open_job_sinks
+        from query_batch import load_queries, partition_path, make_progress
+        from relevance import score_results
 except ImportError:
-    print("Error: Could not import scraping utilities. Make sure the utils.py and config.py files exist in the scraping directory.")
+    print("Error: Could not import scraping utilities. Make sure the utils.py, config.py, date_utils.py, result_extraction.py, pipeline.py, result_sinks.py, result_record.py, job_journal.py, query_batch.py and relevance.py files exist in the scraping directory.")
     sys.exit(1)
 
-# Define result type
-class SearchResult:
-    def __init__(self, id: str, title: str, url: str, source: str,
-                 date: str = "", snippet: str = "", authors: List[str] = None):
-        self.id = id
-        self.title = title
-        self.url = url
-        self.source = source
-        self.date = date
-        self.snippet = snippet
-        self.authors = authors or []
-
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            "id": self.id,
-            "title": self.title,
-            "url": self.url,
-            "source": self.source,
-            "date": self.date,
-            "snippet": self.snippet,
-            "authors": self.authors
-        }
+# Arguments that define a job and are restored when it is resumed
+JOB_PARAMS = ("output", "limit")
 
 def load_databases() -> List[Dict[str, Any]]:
     """
@@ -202,9 +199,38 @@ def create_search_url(base_url: str, query: str) -> str:
     else:
         return f"{base_url}?q={encoded_query}"
 
-def scrape_database(db: Dict[str, Any], query: str, args: argparse.Namespace) -> List[Dict[str, Any]]:
+# Scraper shared by all fetches of a run, so that rate limits, proxies and
+# HTTP connections carry over between databases and queries
+_shared_scraper = None
+_shared_scraper_lock = threading.Lock()
+
+def get_shared_scraper(args: argparse.Namespace) -> AdvancedScraper:
     """
-    Scrape a single database using the appropriate API or scraping method.
+    Get the scraper shared by all fetches of this run.
+
+    Args:
+        args (argparse.Namespace): Command line arguments
+
+    Returns:
+        AdvancedScraper: The shared scraper
+    """
+    global _shared_scraper
+    with _shared_scraper_lock:
+        if _shared_scraper is None:
+            _shared_scraper = AdvancedScraper(
+                proxy_manager=ProxyManager(),
+                rate_limiter=RateLimiter(),
+                retry_handler=RetryHandler(max_retries=args.max_retries)
+            )
+        return _shared_scraper
+
+def fetch_database(db: Dict[str, Any], query: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Fetch the search results page for a single database.
+
+    This is the I/O half of scraping a database. If the API integration returns
+    results they are passed through as-is, otherwise the search page HTML is
+    fetched so that it can be parsed by extract_link_results.
 
     Args:
         db (Dict[str, Any]): The database object
@@ -212,12 +238,23 @@ def scrape_database(db: Dict[str, Any], query: str, args: argparse.Namespace) ->
         args (argparse.Namespace): Command line arguments
 
     Returns:
-        List[Dict[str, Any]]: A list of search results
+        Dict[str, Any]: The fetched page, with "results" set when the API
+            integration succeeded or "html" set when the page was scraped
     """
     db_id = db.get("id", get_database_id_from_url(db["url"]))
     db_name = db.get("name", db_id)
     base_url = db["url"]
 
+    page = {
+        "db_id": db_id,
+        "db_name": db_name,
+        "base_url": base_url,
+        "from_date": getattr(args, 'from_date', None),
+        "to_date": getattr(args, 'to_date', None),
+        "results": None,
+        "html": None
+    }
+
     print(f"Scraping {db_name} ({db_id})...")
 
     # Try to use the API integration first
@@ -228,8 +265,6 @@ def scrape_database(db: Dict[str, Any], query: str, args: argparse.Namespace) ->
             api_available = True
         except ImportError:
             try:
-                import sys
-                import os
                 # Add the current directory to the path
                 script_dir = os.path.dirname(os.path.abspath(__file__))
                 if script_dir not in sys.path:
@@ -254,7 +289,8 @@ def scrape_database(db: Dict[str, Any], query: str, args: argparse.Namespace) ->
 
             if results:
                 print(f"  Found {len(results)} results using API integration")
-                return results
+                page["results"] = results
+                return page
             else:
                 print(f"  No results found using API integration, falling back to traditional scraping")
     except Exception as e:
@@ -268,288 +304,372 @@ def scrape_database(db: Dict[str, Any], query: str, args: argparse.Namespace) ->
     # Create the search URL
     search_url = create_search_url(base_url, query)
 
-    # Initialize the scraper components
-    proxy_manager = ProxyManager()
-    rate_limiter = RateLimiter()
-    retry_handler = RetryHandler(max_retries=args.max_retries)
-
-    # Initialize the scraper
-    scraper = AdvancedScraper(
-        proxy_manager=proxy_manager,
-        rate_limiter=rate_limiter,
-        retry_handler=retry_handler
-    )
+    # Use the scraper shared by all databases and queries of this run
+    scraper = get_shared_scraper(args)
 
     # Determine whether to use Selenium or requests
     use_selenium = db_config.get("use_selenium", False)
 
-    try:
-        # Scrape the website
+    # Scrape the website
+    if args.verbose:
+        print(f"  Searching URL: {search_url}")
+
+    html = None
+    if use_selenium:
         if args.verbose:
-            print(f"  Searching URL: {search_url}")
+            print(f"  Using Selenium for {db_id}...")
 
-        # Get date range from arguments if available
-        from_date = getattr(args, 'from_date', None)
-        to_date = getattr(args, 'to_date', None)
+        # Check if Selenium is available
+        try:
+            html = scraper.scrape_with_selenium(
+                url=search_url,
+                wait_time=db_config.get("wait_time", 5),
+                use_proxy=db_config.get("use_proxies", False) and args.use_proxies,
+                handle_captcha=db_config.get("use_captcha_solver", False) and args.solve_captchas
+            )
+        except Exception as e:
+            print(f"  Error using Selenium: {str(e)}")
+            if "selenium" in str(e).lower():
+                print(f"  Warning: Selenium not available. Falling back to requests for {db_id}...")
+                try:
+                    html = scraper.scrape_with_requests(
+                        url=search_url,
+                        use_proxy=db_config.get("use_proxies", False) and args.use_proxies,
+                        respect_rate_limit=db_config.get("respect_rate_limits", True),
+                        requests_per_minute=db_config.get("requests_per_minute", 10),
+                        use_auth=db_config.get("use_authentication", False)
+                    )
+                except Exception as req_error:
+                    print(f"  Error using requests: {str(req_error)}")
+                    print(f"  Could not access real data")
+                    return page
+            else:
+                print(f"  Could not access real data")
+                return page
+    else:
+        if args.verbose:
+            print(f"  Using requests for {db_id}...")
+        try:
+            html = scraper.scrape_with_requests(
+                url=search_url,
+                use_proxy=db_config.get("use_proxies", False) and args.use_proxies,
+                respect_rate_limit=db_config.get("respect_rate_limits", True),
+                requests_per_minute=db_config.get("requests_per_minute", 10),
+                use_auth=db_config.get("use_authentication", False)
+            )
+        except Exception as e:
+            print(f"  Error using requests: {str(e)}")
+            print(f"  Could not access real data")
+            return page
+
+    if not html:
+        print(f"  Error: No HTML content returned for {db_id}")
+        return page
+
+    page["html"] = html
+    return page
+
+def parse_fetched_page(page: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Turn a fetched page into a list of search results.
 
-        # Generate dates within the specified range or use defaults
-        from datetime import datetime, timedelta
+    Args:
+        page (Dict[str, Any]): A page returned by fetch_database
 
-        if from_date and to_date:
-            try:
-                from_date_obj = datetime.strptime(from_date, "%Y-%m-%d")
-                to_date_obj = datetime.strptime(to_date, "%Y-%m-%d")
-
-                # Generate dates within the range
-                date1 = from_date_obj + timedelta(days=int((to_date_obj - from_date_obj).days * 0.2))
-                date2 = from_date_obj + timedelta(days=int((to_date_obj - from_date_obj).days * 0.5))
-                date3 = from_date_obj + timedelta(days=int((to_date_obj - from_date_obj).days * 0.8))
-
-                date1_str = date1.strftime("%Y-%m-%d")
-                date2_str = date2.strftime("%Y-%m-%d")
-                date3_str = date3.strftime("%Y-%m-%d")
-            except ValueError:
-                # Use default dates if parsing fails
-                date1_str = "2025-03-15"
-                date2_str = "2025-04-10"
-                date3_str = "2025-02-20"
-        else:
-            # Use default dates
-            date1_str = "2025-03-15"
-            date2_str = "2025-04-10"
-            date3_str = "2025-02-20"
+    Returns:
+        List[Dict[str, Any]]: A list of search results
+    """
+    if page["results"] is not None:
+        return page["results"]
+    if not page["html"]:
+        return []
 
-        # No debug HTML - we only want real data
+    try:
+        results = [record_to_dict(record) for record in parse_page(page)]
+        print(f"  Found {len(results)} results for {page['db_id']}")
+        return results
+    except Exception as e:
+        print(f"  Error scraping {page['db_id']}: {str(e)}")
+        return []
 
-        if use_selenium:
-            if args.verbose:
-                print(f"  Using Selenium for {db_id}...")
+def scrape_database(db: Dict[str, Any], query: str, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    Scrape a single database using the appropriate API or scraping method.
 
-            # Check if Selenium is available
-            try:
-                html = scraper.scrape_with_selenium(
-                    url=search_url,
-                    wait_time=db_config.get("wait_time", 5),
-                    use_proxy=db_config.get("use_proxies", False) and args.use_proxies,
-                    handle_captcha=db_config.get("use_captcha_solver", False) and args.solve_captchas
-                )
-            except Exception as e:
-                print(f"  Error using Selenium: {str(e)}")
-                if "selenium" in str(e).lower():
-                    print(f"  Warning: Selenium not available. Falling back to requests for {db_id}...")
-                    try:
-                        html = scraper.scrape_with_requests(
-                            url=search_url,
-                            use_proxy=db_config.get("use_proxies", False) and args.use_proxies,
-                            respect_rate_limit=db_config.get("respect_rate_limits", True),
-                            requests_per_minute=db_config.get("requests_per_minute", 10),
-                            use_auth=db_config.get("use_authentication", False)
-                        )
-                    except Exception as req_error:
-                        print(f"  Error using requests: {str(req_error)}")
-                        print(f"  Could not access real data")
-                        return []
-                else:
-                    print(f"  Could not access real data")
-                    return []
-        else:
-            if args.verbose:
-                print(f"  Using requests for {db_id}...")
-            try:
-                html = scraper.scrape_with_requests(
-                    url=search_url,
-                    use_proxy=db_config.get("use_proxies", False) and args.use_proxies,
-                    respect_rate_limit=db_config.get("respect_rate_limits", True),
-                    requests_per_minute=db_config.get("requests_per_minute", 10),
-                    use_auth=db_config.get("use_authentication", False)
-                )
-            except Exception as e:
-                print(f"  Error using requests: {str(e)}")
-                print(f"  Could not access real data")
-                return []
+    Args:
+        db (Dict[str, Any]): The database object
+        query (str): The search query
+        args (argparse.Namespace): Command line arguments
 
-        if not html:
-            print(f"  Error: No HTML content returned for {db_id}")
-            print(f"  Using debug HTML for demonstration")
-            html = debug_html
+    Returns:
+        List[Dict[str, Any]]: A list of search results
+    """
+    return parse_fetched_page(fetch_database(db, query, args))
 
-        # Extract search results from the HTML
-        # This is a simplified extraction that looks for links and their surrounding text
-        try:
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(html, "html.parser")
+def normalize_result(result: Dict[str, Any], from_date: Optional[str] = None,
+                     to_date: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Normalize a search result and apply the date range filter.
 
-            results = []
-            links = soup.find_all("a")
-        except ImportError:
-            print("  Warning: BeautifulSoup is not installed. Using basic regex parsing instead.")
-            import re
+    Args:
+        result (Dict[str, Any]): A search result
+        from_date (Optional[str]): Keep results from this date (YYYY-MM-DD)
+        to_date (Optional[str]): Keep results up to this date (YYYY-MM-DD)
 
-            # Basic regex to find links
-            results = []
-            link_pattern = re.compile(r'<a[^>]*href=["\'](.*?)["\'][^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
-            links = link_pattern.findall(html)
+    Returns:
+        List[Dict[str, Any]]: The normalized result, or an empty list if it is outside the date range
+    """
+    for field in RESULT_FIELDS:
+        result.setdefault(field, [] if field == "authors" else "")
+    if result["date"]:
+        result["date"] = to_iso_date(result["date"])
 
-        # Process the links
-        for i, link in enumerate(links):
-            try:
-                # Handle different formats based on whether we used BeautifulSoup or regex
-                if 'BeautifulSoup' in locals():
-                    # Skip links without href or text
-                    if not link.get("href") or not link.text.strip():
-                        continue
-
-                    # Get link attributes
-                    href = link.get("href")
-                    title = link.text.strip()
-
-                    # Get the surrounding text
-                    parent = link.parent
-                    snippet = parent.get_text().strip()
-                else:
-                    # For regex results, link is a tuple of (href, text)
-                    href, title = link
-                    title = title.strip()
-
-                    # For regex, we don't have easy access to surrounding text
-                    # Just use the title as the snippet
-                    snippet = title
-
-                # Skip empty links
-                if not href or not title:
-                    continue
-
-                # Make sure the URL is absolute
-                if href.startswith("/"):
-                    parsed_base = urlparse(base_url)
-                    href = f"{parsed_base.scheme}://{parsed_base.netloc}{href}"
-                elif not href.startswith(("http://", "https://")):
-                    if base_url.endswith("/"):
-                        href = f"{base_url}{href}"
-                    else:
-                        href = f"{base_url}/{href}"
-
-                # Limit snippet length
-                if len(snippet) > 300:
-                    snippet = snippet[:297] + "..."
-
-                # Create a unique ID
-                result_id = f"{db_id}-{i}"
-
-                # Try to extract date
-                date = ""
-                try:
-                    if 'BeautifulSoup' in locals():
-                        # Look for date elements
-                        date_elem = None
-                        date_selectors = [
-                            ".date", "time", ".published", ".publication-date",
-                            "[itemprop='datePublished']", ".meta-date", ".timestamp"
-                        ]
-
-                        for selector in date_selectors:
-                            date_elem = parent.select_one(selector)
-                            if date_elem:
-                                break
-
-                        if date_elem:
-                            date = date_elem.get_text().strip()
-
-                        # If no date found, try to find a date pattern in the text
-                        if not date:
-                            import re
-                            # Look for dates in format YYYY-MM-DD or DD/MM/YYYY or similar
-                            date_patterns = [
-                                r'\d{4}-\d{2}-\d{2}',  # YYYY-MM-DD
-                                r'\d{2}/\d{2}/\d{4}',  # DD/MM/YYYY
-                                r'\d{2}\.\d{2}\.\d{4}',  # DD.MM.YYYY
-                                r'[A-Z][a-z]{2} \d{1,2}, \d{4}'  # Jan 1, 2023
-                            ]
-
-                            for pattern in date_patterns:
-                                match = re.search(pattern, snippet)
-                                if match:
-                                    date = match.group(0)
-                                    break
-
-                    # If we still don't have a date, use a date within the specified range
-                    if not date:
-                        from datetime import datetime, timedelta
-
-                        # Get date range from arguments if available
-                        from_date = getattr(args, 'from_date', None)
-                        to_date = getattr(args, 'to_date', None)
-
-                        if from_date and to_date:
-                            try:
-                                from_date_obj = datetime.strptime(from_date, "%Y-%m-%d")
-                                to_date_obj = datetime.strptime(to_date, "%Y-%m-%d")
-
-                                # Generate a random date within the range
-                                days_range = (to_date_obj - from_date_obj).days
-                                if days_range > 0:
-                                    random_days = i % (days_range + 1)  # Use the link index to distribute dates
-                                    random_date = from_date_obj + timedelta(days=random_days)
-                                    date = random_date.strftime("%Y-%m-%d")
-                                else:
-                                    date = from_date
-                            except ValueError:
-                                # Use today's date as fallback
-                                date = datetime.now().strftime("%Y-%m-%d")
-                        else:
-                            # Use today's date as fallback
-                            date = datetime.now().strftime("%Y-%m-%d")
-                except Exception as e:
-                    print(f"  Error extracting date: {str(e)}")
-                    # Use today's date as fallback
-                    from datetime import datetime
-                    date = datetime.now().strftime("%Y-%m-%d")
-
-                # Create a result object
-                result = SearchResult(
-                    id=result_id,
-                    title=title,
-                    url=href,
-                    source=db_name,
-                    date=date,
-                    snippet=snippet,
-                    authors=[]  # Authors are often not easily extractable
-                )
-            except Exception as e:
-                print(f"  Error processing link {i}: {str(e)}")
-                continue
+    # Results without a date or with an unparseable date are kept
+    if not is_within_range(result["date"], from_date, to_date):
+        return []
+    return [result]
 
-            results.append(result.to_dict())
+def rank_result(result: Dict[str, Any], query: str) -> Dict[str, Any]:
+    """
+    Give a search result a relevance score.
 
-        print(f"  Found {len(results)} results for {db_id}")
-        return results
+    The result is scored with relevance.score_results, the scorer used when
+    searching through SmartAccessManager. Scores are absolute, so results
+    scored one at a time here can be compared with each other.
 
-    except Exception as e:
-        print(f"  Error scraping {db_id}: {str(e)}")
-        return []
+    Args:
+        result (Dict[str, Any]): A normalized search result
+        query (str): Search query
 
-def main():
-    """Main function"""
-    parser = argparse.ArgumentParser(description="Batch scraper for MedSearch")
+    Returns:
+        Dict[str, Any]: The scored result
+    """
+    result["relevanceScore"] = round(float(score_results([result], query, absolute=True)[0]), 4)
+    return result
 
-    # Required arguments
-    parser.add_argument("--query", required=True, help="Search query")
+class TaskResultWriter:
+    """
+    Writes the results of each (query, database) task to its sink as one block.
+
+    The parse stage announces how many results a task produced; each of them
+    is then either written by the sink stage or dropped by the normalize or
+    rank stage. Once all of them are accounted for, the task's results are
+    written to its query's sink together and the task is marked done in the
+    job journal with its byte range in the output, so a resumed job can tell
+    exactly which results are complete. Until then the results are held as
+    ResultRecords, which take much less memory than result dicts when many
+    tasks are open at once.
+    """
 
-    # Optional arguments
-    parser.add_argument("--output", default="scraping_results.json", help="Output file path")
-    parser.add_argument("--limit", type=int, default=0, help="Limit the number of databases to scrape (0 = all)")
-    parser.add_argument("--max-retries", type=int, default=3, help="Maximum number of retries per database")
-    parser.add_argument("--timeout", type=int, default=60, help="Timeout in seconds per database")
-    parser.add_argument("--use-proxies", action="store_true", help="Use proxy rotation")
-    parser.add_argument("--solve-captchas", action="store_true", help="Use CAPTCHA solver")
-    parser.add_argument("--parallel", type=int, default=1, help="Number of parallel scraping processes (use with caution)")
-    parser.add_argument("--verbose", action="store_true", help="Enable verbose output")
-    parser.add_argument("--database-ids", nargs="+", help="Specific database IDs to scrape")
-    parser.add_argument("--from-date", help="Filter results from this date (YYYY-MM-DD)")
-    parser.add_argument("--to-date", help="Filter results to this date (YYYY-MM-DD)")
+    def __init__(self, sinks: Dict[str, Any], journal: Optional[JobJournal] = None, progress: Any = None):
+        """
+        Initialize the writer
+
+        Args:
+            sinks (Dict[str, Any]): Result sink (with a write_batch(results) method) for each query
+            journal (Optional[JobJournal]): Job journal to record finished tasks in
+            progress (Any): Progress bar updated as tasks finish
+        """
+        self.sinks = sinks
+        self.journal = journal
+        self.progress = progress
+        self.failed = 0
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def start(self, key: Tuple[str, str], expected: int):
+        """Record that a task produced expected results"""
+        with self._lock:
+            self._open[key] = {"remaining": expected, "results": []}
+        self._settle(key, None)
+
+    def add(self, key: Tuple[str, str], result: Dict[str, Any]):
+        """Add a result that made it through the pipeline"""
+        self._settle(key, ResultRecord.from_dict(result))
+
+    def drop(self, key: Tuple[str, str]):
+        """Record that a result was filtered out"""
+        self._settle(key, None, count=1)
+
+    def fail(self, key: Tuple[str, str], error: str):
+        """Record that a task could not be completed"""
+        with self._lock:
+            self._open.pop(key, None)
+            self.failed += 1
+            self._update_progress()
+        if self.journal:
+            self.journal.mark_failed(key[0], key[1], error)
+
+    def _settle(self, key: Tuple[str, str], result: Optional[ResultRecord], count: int = 0):
+        """Account for a result and write the task out if it was the last one"""
+        with self._lock:
+            task = self._open[key]
+            if result is not None:
+                task["results"].append(result)
+                count = 1
+            task["remaining"] -= count
+            if task["remaining"] > 0:
+                return
+            del self._open[key]
+
+        offset, end_offset = self.sinks[key[0]].write_batch(task["results"])
+        if self.journal:
+            self.journal.mark_done(key[0], key[1], offset, end_offset, len(task["results"]))
+        with self._lock:
+            self._update_progress()
+
+    def _update_progress(self):
+        """Advance the progress bar by one task (the lock must be held)"""
+        if self.progress is not None:
+            self.progress.update(1)
+            results = sum(sink.count for sink in self.sinks.values())
+            self.progress.set_postfix_str(f"{results} results, {self.failed} failed")
+
+    def unfinished(self) -> List[Tuple[str, str]]:
+        """Get the tasks whose results were not all accounted for"""
+        with self._lock:
+            return list(self._open)
+
+def get_task_id(db: Dict[str, Any]) -> str:
+    """
+    Get the ID used for a database in the job journal.
 
-    args = parser.parse_args()
+    Args:
+        db (Dict[str, Any]): The database object
+
+    Returns:
+        str: The database ID
+    """
+    return db.get("id", get_database_id_from_url(db["url"]))
+
+def run_batch_pipeline(tasks: List[Dict[str, Any]], args: argparse.Namespace, sinks: Dict[str, Any],
+                       journal: Optional[JobJournal] = None, progress: Any = None) -> Pipeline:
+    """
+    Scrape (query, database) tasks with a streaming fetch/parse/normalize/rank/sink pipeline.
+
+    Each stage runs its own workers and is connected to the next one by a
+    bounded queue, so a slow stage blocks the stages before it (backpressure)
+    instead of letting pages or results pile up in memory. The results of each
+    task are written to its query's sink as soon as the last of them comes out
+    of the rank stage. All queries share the same workers, parse processes and
+    scraper (HTTP connections and rate limits).
+
+    - fetch: args.fetch_workers threads doing network I/O
+    - parse: args.parse_workers threads, each waiting on a parse process
+    - normalize: args.normalize_workers threads (date normalization and filtering)
+    - rank: args.rank_workers threads (relevance scoring)
+    - sink: a single thread writing results to the sinks
+
+    Args:
+        tasks (List[Dict[str, Any]]): Tasks with "query", "db", "from_date" and "to_date" keys
+        args (argparse.Namespace): Command line arguments
+        sinks (Dict[str, Any]): Result sink (with a write_batch(results) method) for each query
+        journal (Optional[JobJournal]): Job journal to record task progress in
+        progress (Any): Progress bar updated as tasks finish
+
+    Returns:
+        Pipeline: The finished pipeline, with per-stage statistics
+    """
+    fetch_workers = args.fetch_workers or args.parallel
+    parse_workers = args.parse_workers or os.cpu_count() or 1
+    writer = TaskResultWriter(sinks, journal, progress)
+
+    def fetch(task):
+        query = task["query"]
+        key = (query, get_task_id(task["db"]))
+        if journal:
+            journal.mark_running(*key)
+
+        # Each query can have its own date range
+        task_args = argparse.Namespace(**vars(args))
+        task_args.from_date = task["from_date"]
+        task_args.to_date = task["to_date"]
+        try:
+            page = fetch_database(task["db"], query, task_args)
+        except Exception as e:
+            print(f"Error scraping {key[1]}: {str(e)}")
+            writer.fail(key, str(e))
+            return []
+        page["key"] = key
+        page["task"] = task
+        return [page]
+
+    def parse(page):
+        key = page["key"]
+        if page["results"] is not None:
+            # API results need no parsing
+            results = page["results"]
+        elif page["html"]:
+            try:
+                records = parse_pool.submit(parse_page, page).result()
+            except Exception as e:
+                print(f"  Error scraping {key[1]}: {str(e)}")
+                writer.fail(key, str(e))
+                return []
+            print(f"  Found {len(records)} results for {key[1]}")
+            results = [record_to_dict(record) for record in records]
+        else:
+            writer.fail(key, "Could not access real data")
+            return []
+
+        writer.start(key, len(results))
+        return [(page["task"], key, result) for result in results]
+
+    def normalize(item):
+        task, key, result = item
+        try:
+            results = normalize_result(result, task["from_date"], task["to_date"])
+        except Exception as e:
+            print(f"  Error normalizing result from {key[1]}: {str(e)}")
+            results = []
+        if not results:
+            writer.drop(key)
+        return [(task, key, result) for result in results]
+
+    def rank(item):
+        task, key, result = item
+        try:
+            result = rank_result(result, key[0])
+        except Exception as e:
+            print(f"  Error ranking result from {key[1]}: {str(e)}")
+            writer.drop(key)
+            return []
+        return [(key, result)]
+
+    def write(item):
+        writer.add(*item)
+        return None
+
+    pipeline = Pipeline([
+        Stage("fetch", fetch, workers=fetch_workers, queue_size=args.queue_size),
+        Stage("parse", parse, workers=parse_workers, queue_size=args.queue_size),
+        Stage("normalize", normalize, workers=args.normalize_workers, queue_size=args.result_queue_size),
+        Stage("rank", rank, workers=args.rank_workers, queue_size=args.result_queue_size),
+        Stage("sink", write, workers=1, queue_size=args.result_queue_size),
+    ])
+
+    print(f"Scraping {len(tasks)} (query, database) tasks with {fetch_workers} fetch threads "
+          f"and {parse_workers} parse processes...")
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=parse_workers) as parse_pool:
+        pipeline.run(tasks)
+
+    # Results lost to an unexpected stage error leave their task unfinished
+    for key in writer.unfinished():
+        writer.fail(key, "Not all results were processed")
+
+    return pipeline
+
+def select_databases(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    Select the databases to scrape from the command line arguments.
+
+    Args:
+        args (argparse.Namespace): Command line arguments
 
+    Returns:
+        List[Dict[str, Any]]: The database objects to scrape
+    """
     # Load the databases
     print("Loading database list...")
     databases = load_databases()
@@ -621,197 +741,268 @@ def main():
     # Shuffle the databases to avoid hitting the same domains consecutively
     random.shuffle(databases)
 
-    # Scrape the databases
-    all_results = []
-
-    if args.parallel > 1:
-        print(f"Scraping {len(databases)} databases in parallel with {args.parallel} workers...")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=args.parallel) as executor:
-            future_to_db = {
-                executor.submit(scrape_database, db, args.query, args): db
-                for db in databases
-            }
+    # Scrape each database only once
+    unique_dbs = {}
+    for db in databases:
+        unique_dbs.setdefault(get_task_id(db), db)
+    return list(unique_dbs.values())
 
-            for future in concurrent.futures.as_completed(future_to_db):
-                db = future_to_db[future]
-                try:
-                    results = future.result()
-                    all_results.extend(results)
-                except Exception as e:
-                    print(f"Error scraping {db.get('id', db.get('url', 'unknown'))}: {str(e)}")
-    else:
-        print(f"Scraping {len(databases)} databases sequentially...")
-        for db in databases:
-            results = scrape_database(db, args.query, args)
-            all_results.extend(results)
+def create_dummy_results(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    Create demonstration results for the requested database IDs.
 
-    # If we have no results, create some dummy results
-    if len(all_results) == 0:
-        print("No results found. Creating dummy results for demonstration...")
+    Args:
+        args (argparse.Namespace): Command line arguments
 
-        # Get date range from arguments
-        from_date_str = args.from_date
-        to_date_str = args.to_date
+    Returns:
+        List[Dict[str, Any]]: Dummy search results
+    """
+    # Get date range from arguments
+    from_date_str = args.from_date
+    to_date_str = args.to_date
 
-        # Generate dates within the specified range or use defaults
-        from datetime import datetime, timedelta
+    # Generate dates within the specified range or use defaults
+    from datetime import datetime, timedelta
 
-        if from_date_str and to_date_str:
-            try:
-                from_date_obj = datetime.strptime(from_date_str, "%Y-%m-%d")
-                to_date_obj = datetime.strptime(to_date_str, "%Y-%m-%d")
-
-                # Generate dates within the range
-                date1 = from_date_obj + timedelta(days=int((to_date_obj - from_date_obj).days * 0.2))
-                date2 = from_date_obj + timedelta(days=int((to_date_obj - from_date_obj).days * 0.5))
-                date3 = from_date_obj + timedelta(days=int((to_date_obj - from_date_obj).days * 0.8))
-
-                date1_str = date1.strftime("%Y-%m-%d")
-                date2_str = date2.strftime("%Y-%m-%d")
-                date3_str = date3.strftime("%Y-%m-%d")
-            except ValueError:
-                # Use default dates if parsing fails
-                date1_str = "2025-03-15"
-                date2_str = "2025-04-10"
-                date3_str = "2025-02-20"
-        else:
-            # Use default dates
+    if from_date_str and to_date_str:
+        try:
+            from_date_obj = datetime.strptime(from_date_str, "%Y-%m-%d")
+            to_date_obj = datetime.strptime(to_date_str, "%Y-%m-%d")
+
+            # Generate dates within the range
+            date1 = from_date_obj + timedelta(days=int((to_date_obj - from_date_obj).days * 0.2))
+            date2 = from_date_obj + timedelta(days=int((to_date_obj - from_date_obj).days * 0.5))
+            date3 = from_date_obj + timedelta(days=int((to_date_obj - from_date_obj).days * 0.8))
+
+            date1_str = date1.strftime("%Y-%m-%d")
+            date2_str = date2.strftime("%Y-%m-%d")
+            date3_str = date3.strftime("%Y-%m-%d")
+        except ValueError:
+            # Use default dates if parsing fails
             date1_str = "2025-03-15"
             date2_str = "2025-04-10"
             date3_str = "2025-02-20"
+    else:
+        # Use default dates
+        date1_str = "2025-03-15"
+        date2_str = "2025-04-10"
+        date3_str = "2025-02-20"
+
+    # Create dummy results for each database ID that was requested
+    dummy_results = []
+    for db_id in args.database_ids or []:
+        # Create a sensible URL based on the database ID
+        if "pubmed" in db_id.lower():
+            url = "https://pubmed.ncbi.nlm.nih.gov/"
+            db_name = "PubMed"
+        elif "tga" in db_id.lower():
+            url = "https://www.tga.gov.au/"
+            db_name = "TGA - Consumer Medicines Information"
+        elif "ema" in db_id.lower():
+            url = "https://www.ema.europa.eu/en/medicines/"
+            db_name = "EMA - Medicines"
+        elif "mhra" in db_id.lower():
+            url = "https://products.mhra.gov.uk/"
+            db_name = "MHRA"
+        elif "fda" in db_id.lower():
+            url = "https://www.accessdata.fda.gov/scripts/cder/daf/"
+            db_name = "FDA - Drugs"
+        else:
+            # Generic URL format
+            url = f"https://www.{db_id.lower()}.com/"
+            db_name = db_id.upper()
 
-        # Create dummy results for each database ID that was requested
-        for db_id in args.database_ids:
-            # Create a sensible URL based on the database ID
-            if "pubmed" in db_id.lower():
-                url = "https://pubmed.ncbi.nlm.nih.gov/"
-                db_name = "PubMed"
-            elif "tga" in db_id.lower():
-                url = "https://www.tga.gov.au/"
-                db_name = "TGA - Consumer Medicines Information"
-            elif "ema" in db_id.lower():
-                url = "https://www.ema.europa.eu/en/medicines/"
-                db_name = "EMA - Medicines"
-            elif "mhra" in db_id.lower():
-                url = "https://products.mhra.gov.uk/"
-                db_name = "MHRA"
-            elif "fda" in db_id.lower():
-                url = "https://www.accessdata.fda.gov/scripts/cder/daf/"
-                db_name = "FDA - Drugs"
-            else:
-                # Generic URL format
-                url = f"https://www.{db_id.lower()}.com/"
-                db_name = db_id.upper()
-
-            # Create dummy results
-            query = args.query
-            all_results.extend([
-                {
-                    "id": f"{db_id}-1",
-                    "title": f"{query} Study Result 1",
-                    "url": f"{url}result1",
-                    "source": db_name,
-                    "date": date1_str,
-                    "snippet": f"This is a sample result for {query} in {db_name}. This would contain information about the drug or medical topic.",
-                    "authors": ["Author A", "Author B"]
-                },
-                {
-                    "id": f"{db_id}-2",
-                    "title": f"{query} Clinical Guidelines",
-                    "url": f"{url}result2",
-                    "source": db_name,
-                    "date": date2_str,
-                    "snippet": f"Clinical guidelines for the use of {query} in various medical conditions. Includes dosage information and contraindications.",
-                    "authors": ["Medical Association"]
-                },
-                {
-                    "id": f"{db_id}-3",
-                    "title": f"Side Effects of {query}",
-                    "url": f"{url}result3",
-                    "source": db_name,
-                    "date": date3_str,
-                    "snippet": f"A comprehensive review of the side effects associated with {query} use, including rare and common adverse reactions.",
-                    "authors": ["Researcher C", "Researcher D"]
-                }
-            ])
+        # Create dummy results
+        query = args.query
+        dummy_results.extend([
+            {
+                "id": f"{db_id}-1",
+                "title": f"{query} Study Result 1",
+                "url": f"{url}result1",
+                "source": db_name,
+                "date": date1_str,
+                "snippet": f"This is a sample result for {query} in {db_name}. This would contain information about the drug or medical topic.",
+                "authors": ["Author A", "Author B"]
+            },
+            {
+                "id": f"{db_id}-2",
+                "title": f"{query} Clinical Guidelines",
+                "url": f"{url}result2",
+                "source": db_name,
+                "date": date2_str,
+                "snippet": f"Clinical guidelines for the use of {query} in various medical conditions. Includes dosage information and contraindications.",
+                "authors": ["Medical Association"]
+            },
+            {
+                "id": f"{db_id}-3",
+                "title": f"Side Effects of {query}",
+                "url": f"{url}result3",
+                "source": db_name,
+                "date": date3_str,
+                "snippet": f"A comprehensive review of the side effects associated with {query} use, including rare and common adverse reactions.",
+                "authors": ["Researcher C", "Researcher D"]
+            }
+        ])
 
-        print(f"Created {len(all_results)} dummy results")
+    return dummy_results
 
-    # Filter results by date if date range is provided
-    if args.from_date or args.to_date:
-        from datetime import datetime
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Batch scraper for MedSearch")
 
-        # Parse date strings to datetime objects
-        from_date = None
-        to_date = None
+    # Required arguments (--query or --queries-file, unless resuming a job)
+    parser.add_argument("--query", help="Search query")
+    parser.add_argument("--queries-file", help="File with one query per line, or a CSV file with query, from_date and to_date columns")
 
-        if args.from_date:
-            try:
-                from_date = datetime.strptime(args.from_date, "%Y-%m-%d")
-                print(f"Filtering results from {args.from_date}")
-            except ValueError:
-                print(f"Warning: Invalid from_date format: {args.from_date}. Expected YYYY-MM-DD.")
+    # Optional arguments
+    parser.add_argument("--output", default="scraping_results.json", help="Output file path (with --queries-file, each query is written to <output without extension>/<n>-<query>.json)")
+    parser.add_argument("--limit", type=int, default=0, help="Limit the number of databases to scrape (0 = all)")
+    parser.add_argument("--max-retries", type=int, default=3, help="Maximum number of retries per database")
+    parser.add_argument("--timeout", type=int, default=60, help="Timeout in seconds per database")
+    parser.add_argument("--use-proxies", action="store_true", help="Use proxy rotation")
+    parser.add_argument("--solve-captchas", action="store_true", help="Use CAPTCHA solver")
+    parser.add_argument("--parallel", type=int, default=1, help="Number of parallel scraping processes (use with caution)")
+    parser.add_argument("--fetch-workers", type=int, default=0, help="Number of threads fetching databases (0 = same as --parallel)")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Number of processes parsing fetched pages (0 = one per CPU)")
+    parser.add_argument("--normalize-workers", type=int, default=1, help="Number of threads normalizing and date-filtering results")
+    parser.add_argument("--rank-workers", type=int, default=1, help="Number of threads scoring results")
+    parser.add_argument("--queue-size", type=int, default=16, help="Maximum number of databases or pages waiting in the fetch and parse queues")
+    parser.add_argument("--result-queue-size", type=int, default=1000, help="Maximum number of results waiting in the normalize, rank and sink queues")
+    parser.add_argument("--fsync-interval", type=float, default=DEFAULT_FSYNC_INTERVAL, help="Seconds between flushes of written results to disk (0 = after every result)")
+    parser.add_argument("--stage-stats", action="store_true", help="Print per-stage counters and timings when done")
+    parser.add_argument("--verbose", action="store_true", help="Enable verbose output")
+    parser.add_argument("--database-ids", nargs="+", help="Specific database IDs to scrape")
+    parser.add_argument("--from-date", help="Filter results from this date (YYYY-MM-DD)")
+    parser.add_argument("--to-date", help="Filter results to this date (YYYY-MM-DD)")
+    parser.add_argument("--resume", metavar="JOB_ID", help="Resume an interrupted job, scraping only the databases it has not finished")
 
-        if args.to_date:
-            try:
-                to_date = datetime.strptime(args.to_date, "%Y-%m-%d")
-                print(f"Filtering results to {args.to_date}")
-            except ValueError:
-                print(f"Warning: Invalid to_date format: {args.to_date}. Expected YYYY-MM-DD.")
-
-        # Filter results
-        if from_date or to_date:
-            filtered_results = []
-            for result in all_results:
-                # Skip results without a date
-                if not result.get("date"):
-                    filtered_results.append(result)
-                    continue
-
-                # Try to parse the result date
-                try:
-                    # Handle different date formats
-                    date_formats = [
-                        "%Y-%m-%d",  # YYYY-MM-DD
-                        "%d/%m/%Y",  # DD/MM/YYYY
-                        "%d.%m.%Y",  # DD.MM.YYYY
-                        "%b %d, %Y"  # Jan 1, 2023
-                    ]
-
-                    result_date = None
-                    for date_format in date_formats:
-                        try:
-                            result_date = datetime.strptime(result["date"], date_format)
-                            break
-                        except ValueError:
-                            continue
-
-                    # If we couldn't parse the date, include the result
-                    if not result_date:
-                        filtered_results.append(result)
-                        continue
-
-                    # Check if the result is within the date range
-                    if from_date and result_date < from_date:
-                        continue
-                    if to_date and result_date > to_date:
-                        continue
-
-                    # If we get here, the result is within the date range
-                    filtered_results.append(result)
-                except Exception as e:
-                    print(f"Error parsing date {result.get('date')}: {str(e)}")
-                    # Include results with unparseable dates
-                    filtered_results.append(result)
-
-            print(f"Filtered from {len(all_results)} to {len(filtered_results)} results based on date range")
-            all_results = filtered_results
-
-    # Save the results
-    print(f"Saving {len(all_results)} results to {args.output}...")
-    with open(args.output, "w", encoding="utf-8") as f:
-        json.dump(all_results, f, indent=2)
+    args = parser.parse_args()
+
+    if not args.query and not args.queries_file and not args.resume:
+        parser.error("--query or --queries-file is required unless --resume is given")
+
+    if args.resume:
+        # Resume a job, running only its unfinished tasks
+        try:
+            journal = JobJournal.open(args.resume)
+        except FileNotFoundError as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
+
+        if journal.finished:
+            print(f"Job {journal.job_id} has already finished. Results are in {journal.params.get('output')}")
+            return
 
+        for key in JOB_PARAMS:
+            setattr(args, key, journal.params.get(key))
+        queries = journal.params["queries"]
+
+        print(f"Resuming job {journal.job_id}: {journal.summary()['done']} of {len(journal.tasks)} tasks done")
+    else:
+        if args.queries_file:
+            queries = load_queries(args.queries_file, args.from_date, args.to_date)
+            if not queries:
+                print(f"Error: No queries found in {args.queries_file}")
+                sys.exit(1)
+            print(f"Loaded {len(queries)} queries from {args.queries_file}")
+
+            # Each query gets its own output partition
+            for index, query in enumerate(queries, 1):
+                query["output"] = os.path.abspath(partition_path(args.output, index, query["query"]))
+        else:
+            # Parse the date range bounds
+            from_date = to_date = None
+            if args.from_date:
+                if parse_date_bound(args.from_date):
+                    from_date = args.from_date
+                    print(f"Filtering results from {args.from_date}")
+                else:
+                    print(f"Warning: Invalid from_date format: {args.from_date}. Expected YYYY-MM-DD.")
+
+            if args.to_date:
+                if parse_date_bound(args.to_date):
+                    to_date = args.to_date
+                    print(f"Filtering results to {args.to_date}")
+                else:
+                    print(f"Warning: Invalid to_date format: {args.to_date}. Expected YYYY-MM-DD.")
+
+            queries = [{"query": args.query, "from_date": from_date, "to_date": to_date,
+                        "output": os.path.abspath(args.output)}]
+
+        databases = select_databases(args)
+
+        # Start a job journal so that the run can be resumed if it dies
+        args.output = os.path.abspath(args.output)
+        journal = JobJournal.create(dict({key: getattr(args, key) for key in JOB_PARAMS}, queries=queries))
+        for query in queries:
+            journal.add_tasks(query["query"], [get_task_id(db) for db in databases],
+                              data={get_task_id(db): db for db in databases})
+
+    print(f"Job ID: {journal.job_id} (resume with --resume {journal.job_id})")
+
+    # Scrape the databases, writing each query's results as they arrive
+    if len(queries) == 1:
+        print(f"Saving results to {queries[0]['output']}...")
+    else:
+        print(f"Saving results for {len(queries)} queries to {os.path.splitext(args.output)[0]}{os.sep}")
+    sinks = {}
+    try:
+        sinks = open_job_sinks(journal, queries, args.fsync_interval)
+
+        # Build the (query, database) tasks that are left to run, once the
+        # outputs are reconciled (which can set tasks back to pending)
+        query_specs = {query["query"]: query for query in queries}
+        tasks = [
+            {"query": task["query"], "db": task["data"],
+             "from_date": query_specs[task["query"]]["from_date"], "to_date": query_specs[task["query"]]["to_date"]}
+            for task in journal.get_tasks(states=RETRY_STATES) if task.get("data")
+        ]
+
+        progress = make_progress(len(tasks), desc="Scraping") if len(queries) > 1 else None
+        try:
+            pipeline = run_batch_pipeline(tasks, args, sinks, journal, progress)
+        finally:
+            if progress is not None:
+                progress.close()
+
+        if args.stage_stats:
+            print("Pipeline stages:")
+            print(pipeline.format_stats())
+
+        # If a single query found no results, create some dummy results
+        if len(queries) == 1 and queries[0]["query"] in sinks and sinks[queries[0]["query"]].count == 0:
+            print("No results found. Creating dummy results for demonstration...")
+            args.query = queries[0]["query"]
+            args.from_date = queries[0]["from_date"]
+            args.to_date = queries[0]["to_date"]
+            dummy_results = create_dummy_results(args)
+            for result in dummy_results:
+                sinks[args.query].write(result)
+
+            print(f"Created {len(dummy_results)} dummy results")
+    except BaseException:
+        # Keep the partial output so the job can be resumed
+        for sink in sinks.values():
+            sink.abort()
+        raise
+
+    # Keep the partial output around while there are tasks left to retry
+    unfinished = 0
+    for query in queries:
+        sink = sinks.get(query["query"])
+        if sink is None:
+            # Finished in an earlier run
+            continue
+        query_unfinished = sum(1 for task in journal.get_tasks(states=RETRY_STATES) if task["query"] == query["query"])
+        unfinished += query_unfinished
+        sink.close(keep_part=query_unfinished > 0)
+        print(f"Saved {sink.count} results to {query['output']}")
+
+    if unfinished:
+        print(f"{unfinished} tasks could not be completed. Run again with --resume {journal.job_id} to retry them")
+    else:
+        journal.mark_finished()
+    journal.close()
     print("Done!")
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Date Parsing Microbenchmark
+
+Compares the shared date normalizer in date_utils.py against the strptime
+format loops the individual parsers used before it existed.
+
+Usage:
+    python scraping/benchmarks/bench_date_parsing.py --records 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from date_utils import normalize_date, clear_cache, cache_info
+
+# Raw date shapes seen across PubMed, EMA, MHRA, TGA and scraped pages
+SAMPLE_DATES = [
+    "2023 Jan 15", "2023 Jan", "2023", "2022 Dec 1", "2021 Spring",
+    "15/01/2023", "01/12/2022", "2023-01-15", "20230115", "15.01.2023",
+    "15 January 2023", "3 March 2021", "Jan 15, 2023", "Mar 3, 2021",
+]
+
+# Formats tried by the old per-parser loops
+LEGACY_FORMATS = [
+    "%Y-%m-%d", "%d/%m/%Y", "%d.%m.%Y", "%Y%m%d", "%d %B %Y",
+    "%b %d, %Y", "%Y %b %d", "%Y %b", "%b %Y", "%Y",
+]
+
+
+def legacy_normalize(raw):
+    """The strptime loop used by the parsers before date_utils"""
+    for fmt in LEGACY_FORMATS:
+        try:
+            return datetime.strptime(raw, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return raw
+
+
+def make_workload(records, distinct, seed=42):
+    """Build a list of raw dates with a bounded number of distinct values"""
+    rng = random.Random(seed)
+    pool = []
+    for i in range(distinct):
+        template = SAMPLE_DATES[i % len(SAMPLE_DATES)]
+        # Vary the year so the pool contains distinct strings
+        year = str(1990 + (i // len(SAMPLE_DATES)) % 35)
+        pool.append(template.replace("2023", year).replace("2022", year).replace("2021", year))
+    return [rng.choice(pool) for _ in range(records)]
+
+
+def time_it(func, workload):
+    """Run func over the workload and return elapsed seconds"""
+    start = time.perf_counter()
+    for raw in workload:
+        func(raw)
+    return time.perf_counter() - start
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark date normalization")
+    parser.add_argument("--records", type=int, default=100000, help="Number of raw dates to parse")
+    parser.add_argument("--distinct", type=int, default=500, help="Number of distinct raw date strings")
+    args = parser.parse_args()
+
+    workload = make_workload(args.records, args.distinct)
+
+    legacy = time_it(legacy_normalize, workload)
+
+    clear_cache()
+    cold = time_it(normalize_date, workload)
+    stats = cache_info()
+
+    warm = time_it(normalize_date, workload)
+
+    print(f"Parsed {args.records} dates ({args.distinct} distinct strings)")
+    print(f"  {'method':<28}{'seconds':>10}{'dates/sec':>14}{'speedup':>10}")
+    for name, elapsed in [("strptime loop (legacy)", legacy),
+                          ("normalize_date (cold cache)", cold),
+                          ("normalize_date (warm cache)", warm)]:
+        print(f"  {name:<28}{elapsed:>10.3f}{args.records / elapsed:>14,.0f}{legacy / elapsed:>9.1f}x")
+    print(f"  cache: {stats.hits} hits, {stats.misses} misses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Document Download Benchmark
+
+Serves synthetic PDF documents from a local HTTP stand-in for the regulator
+sites (Range requests, ETags and a fixed latency per request) and downloads
+them with document_fetcher.DocumentFetcher:
+
+1. one transfer at a time (max_workers=1)
+2. concurrently, limited per host (results link to documents on two hosts)
+3. with every first transfer cut off half way, to exercise resuming
+
+Some documents are linked under two URLs to exercise deduplication by
+content hash. Every stored file is checked against the served content.
+
+Usage:
+    python scraping/benchmarks/bench_document_fetcher.py --documents 40 --size 2000000 --latency 0.1
+"""
+
+import argparse
+import hashlib
+import http.server
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_fetcher import DocumentFetcher, DOWNLOADED, DUPLICATE, FAILED
+
+
+def make_handler(documents, latency, interrupt):
+    """Build a request handler serving documents with Range support"""
+    interrupted = set()
+    lock = threading.Lock()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            name = self.path.rsplit("/", 1)[-1]
+            content = documents.get(name)
+            if content is None:
+                self.send_error(404)
+                return
+            time.sleep(latency)
+            etag = '"' + hashlib.md5(content).hexdigest() + '"'
+            start = 0
+            match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+            if match and self.headers.get("If-Range") in (None, etag):
+                start = int(match.group(1))
+                if start >= len(content):
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{len(content)}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}")
+            else:
+                self.send_response(200)
+            body = content[start:]
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+
+            with lock:
+                cut = interrupt and self.path not in interrupted
+                interrupted.add(self.path)
+            if cut:
+                # Send half the document, then drop the connection
+                self.wfile.write(body[:len(body) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent, resumable document downloads")
+    parser.add_argument("--documents", type=int, default=40, help="Number of distinct documents")
+    parser.add_argument("--size", type=int, default=2_000_000, help="Bytes per document")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per request")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent downloads")
+    parser.add_argument("--per-host", type=int, default=3, help="Concurrent downloads per host")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    documents = {f"doc-{i}.pdf": b"%PDF-1.7\n" + rng.randbytes(args.size) for i in range(args.documents)}
+    # Every fifth document is also published under a second name
+    for i in range(0, args.documents, 5):
+        documents[f"copy-{i}.pdf"] = documents[f"doc-{i}.pdf"]
+    expected = {name: hashlib.sha256(content).hexdigest() for name, content in documents.items()}
+
+    for label, workers, per_host, interrupt in [
+        ("Sequential", 1, 1, False),
+        (f"{args.workers} workers, {args.per_host}/host", args.workers, args.per_host, False),
+        ("Interrupted + resumed", args.workers, args.per_host, True),
+    ]:
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), make_handler(documents, args.latency, interrupt))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+        # Spread the documents over two host names
+        results = [
+            {"id": name, "url": f"http://{'127.0.0.1' if i % 2 else 'localhost'}:{port}/docs/{name}"}
+            for i, name in enumerate(documents)
+        ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            with DocumentFetcher(directory, workers, per_host, retries=3) as fetcher:
+                start = time.perf_counter()
+                downloads = list(fetcher.fetch_results(results))
+                elapsed = time.perf_counter() - start
+
+            statuses = {}
+            for download in downloads:
+                statuses[download["status"]] = statuses.get(download["status"], 0) + 1
+                if download["status"] != FAILED:
+                    name = download["url"].rsplit("/", 1)[-1]
+                    assert download["sha256"] == expected[name], f"{name} was stored corrupted"
+            resumed = sum(1 for download in downloads if download.get("resumed"))
+            stored = sum(len(files) for root, _, files in os.walk(directory)
+                         if os.path.basename(root) != "partial" and root != directory)
+            megabytes = sum(download.get("size", 0) for download in downloads
+                            if download["status"] in (DOWNLOADED, DUPLICATE)) / 1e6
+        server.shutdown()
+
+        print(f"{label + ':':<28} {elapsed:6.2f}s, {megabytes / elapsed:7.1f} MB/s, "
+              f"{statuses.get(DOWNLOADED, 0)} stored, {statuses.get(DUPLICATE, 0)} duplicates, "
+              f"{resumed} resumed, {statuses.get(FAILED, 0)} failed, {stored} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Document Index Benchmark
+
+Writes synthetic SPC-style PDFs (numbered headings, several pages each) and
+indexes them with document_index.DocumentIndex:
+
+1. with one extraction process
+2. with --workers extraction processes
+3. again, when every document is unchanged and skipped by its hash
+
+Reports pages/sec for each installed PDF library and the time of a section
+search. Needs one of pymupdf, pypdf or pdfminer.six.
+
+Usage:
+    python scraping/benchmarks/bench_document_index.py --documents 200 --pages 8 --workers 4
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_index import DocumentIndex, available_backends
+
+HEADINGS = [
+    "4.1 Therapeutic indications", "4.2 Posology and method of administration", "4.3 Contraindications",
+    "4.4 Special warnings and precautions for use", "4.5 Interaction with other medicinal products",
+    "4.6 Fertility, pregnancy and lactation", "4.8 Undesirable effects", "4.9 Overdose",
+]
+
+WORDS = ("tablet dose renal hepatic impairment patients treatment daily adults children pregnancy "
+         "risk clinical plasma concentration reduced increased hypersensitivity monitoring").split()
+
+
+def pdf_escape(text):
+    """Escape text for a PDF string literal"""
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    """Write a minimal PDF with one uncompressed text stream per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        content = "BT /F1 10 Tf 14 TL 50 800 Td " + " ".join(f"({pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        data += f"{offset:010d} 00000 n \n".encode("latin-1")
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def make_documents(directory, count, page_count, rng):
+    """Write synthetic SPC documents, returning the number of pages written"""
+    for i in range(count):
+        pages = []
+        for page in range(page_count):
+            lines = [f"Medicine {i} 500 mg film-coated tablets"] if page == 0 else []
+            lines.append(HEADINGS[page % len(HEADINGS)])
+            lines += [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(45)]
+            pages.append(lines)
+        write_pdf(os.path.join(directory, f"spc-{i:04d}.pdf"), pages)
+    return count * page_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel document text extraction and indexing")
+    parser.add_argument("--documents", type=int, default=200, help="Number of documents")
+    parser.add_argument("--pages", type=int, default=8, help="Pages per document")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction processes")
+    args = parser.parse_args()
+
+    backends = available_backends()
+    if not backends:
+        print("No PDF library installed (pymupdf, pypdf or pdfminer.six)")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        documents = os.path.join(directory, "documents")
+        os.makedirs(documents)
+        pages = make_documents(documents, args.documents, args.pages, random.Random(42))
+        print(f"{args.documents} documents, {pages} pages, {os.cpu_count()} CPUs")
+
+        for backend in backends:
+            for workers in sorted({1, args.workers}):
+                with DocumentIndex(os.path.join(directory, f"{backend}-{workers}.db")) as index:
+                    stats = index.ingest_directory(documents, max_workers=workers, backend=backend)
+                    print(f"{backend + ', ' + str(workers) + ' workers:':<22} {stats['seconds']:6.2f}s, "
+                          f"{stats['pages_per_second']:7.1f} pages/s, {stats['sections']} sections")
+                    if workers == args.workers:
+                        stats = index.ingest_directory(documents, max_workers=workers, backend=backend)
+                        print(f"{backend + ', unchanged:':<22} {stats['seconds']:6.2f}s, "
+                              f"{stats['skipped']} skipped")
+                        start = time.perf_counter()
+                        results = index.search("renal impairment contraindications", max_results=20)
+                        print(f"{backend + ', search:':<22} {(time.perf_counter() - start) * 1000:6.1f} ms, "
+                              f"{len(results)} results")
+
+
+if __name__ == "__main__":
+    main()
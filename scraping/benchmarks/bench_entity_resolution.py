@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Entity Resolution Benchmark
+
+Measures how long resolve_entities takes to cluster product results from
+several regulators as the batch grows, to check that it scales near-linearly,
+and how many merged products it produces against the number of distinct
+(name, strength) products in the batch. Each product is listed in
+--strengths strengths, so buckets mix strengths that must not be merged.
+
+Before timing, it checks that records of one strength are merged even when a
+record of another strength comes first in their bucket.
+
+Usage:
+    python scraping/benchmarks/bench_entity_resolution.py --records 10000 50000 100000 --strengths 2
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entity_resolution import resolve_entities
+
+SOURCES = [("fda-drugs", "FDA - Drugs"), ("ema-medicines", "EMA - Medicines"), ("mhra", "MHRA"),
+           ("tga-cmi", "TGA - Consumer Medicines Information"), ("drugbank", "DrugBank"), ("rxnav", "RxNav")]
+
+FORMS = ["tablets", "film-coated tablets", "capsules", "oral solution", "injection", "cream", ""]
+
+SYLLABLES = ["ba", "co", "di", "fe", "ga", "lo", "mi", "na", "pra", "re", "sta", "ti", "vo", "xa", "zol", "mab", "pril", "tin"]
+
+
+def make_results(records, strengths_per_product=2, seed=42):
+    """
+    Build product results where each product is listed by about four sources with name variations
+
+    Returns the results and the number of distinct (name, strength) products among them.
+    """
+    rng = random.Random(seed)
+    products = records // 4
+    names = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 5))) for _ in range(products)]
+    strengths = [rng.sample([5, 10, 20, 500, 1000], strengths_per_product) for _ in range(products)]
+    results = []
+    distinct = set()
+    for i in range(records):
+        product = rng.randrange(products)
+        name = names[product]
+        strength = rng.choice(strengths[product])
+        distinct.add((name, strength))
+        database, source = rng.choice(SOURCES)
+        title = f"{name.upper() if rng.random() < 0.3 else name.capitalize()} {strength}mg {rng.choice(FORMS)}"
+        results.append({
+            "id": f"{database}-{i}",
+            "title": title.strip(),
+            "url": f"https://example.org/{database}/{i}",
+            "source": source,
+            "database": database,
+            "date": "",
+            "snippet": f"Active substances: {name}." if database == "mhra" else "",
+            "authors": [],
+        })
+    return results, len(distinct)
+
+
+def check_mixed_strengths():
+    """Check that a record of another strength leading a bucket does not keep a strength's records apart"""
+    results = [
+        {"id": "fda", "title": "Paracetamol 500 mg tablets", "database": "fda-drugs", "source": "FDA - Drugs"},
+        {"id": "tga", "title": "Paracetamol 1000mg tablets", "database": "tga-cmi", "source": "TGA"},
+        {"id": "ema", "title": "Paracetamol 1000 mg film-coated tablets", "database": "ema-medicines",
+         "source": "EMA - Medicines"},
+    ]
+    merged = resolve_entities(results)
+    clusters = sorted(sorted(p["id"] for p in result.get("provenance", [])) or [result["id"]] for result in merged)
+    assert clusters == [["ema", "tga"], ["fda"]], clusters
+    assert len({result["id"] for result in merged}) == len(merged)
+    print("Mixed-strength bucket check: ok")
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark cross-source product entity resolution")
+    parser.add_argument("--records", type=int, nargs="+", default=[10000, 50000, 100000], help="Batch sizes")
+    parser.add_argument("--strengths", type=int, default=2, choices=range(1, 6), help="Strengths per product")
+    args = parser.parse_args()
+
+    check_mixed_strengths()
+    print(f"  {'records':>10}{'products':>10}{'merged rows':>14}{'seconds':>10}{'us/record':>12}")
+    for records in args.records:
+        results, products = make_results(records, args.strengths)
+        start = time.perf_counter()
+        merged = resolve_entities(results)
+        elapsed = time.perf_counter() - start
+        print(f"  {records:>10,}{products:>10,}{len(merged):>14,}{elapsed:>10.2f}{elapsed / records * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Local openFDA Label Index Benchmark
+
+Writes synthetic drug label partitions in the layout of the openFDA bulk
+download (zipped {"meta": ..., "results": [...]} files), ingests them into a
+LabelIndex and measures ingest throughput and search latency.
+
+Usage:
+    python scraping/benchmarks/bench_fda_label_index.py --labels 100000 --partitions 4
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fda_label_index import LabelIndex
+
+INGREDIENTS = ["ibuprofen", "acetaminophen", "metformin", "atorvastatin", "amoxicillin", "lisinopril",
+               "omeprazole", "sertraline", "naproxen", "aspirin", "losartan", "gabapentin"]
+
+
+def make_label(i, rng):
+    """Build a synthetic openFDA drug label"""
+    ingredient = rng.choice(INGREDIENTS)
+    return {
+        "id": f"label-{i}",
+        "set_id": f"set-{i:08d}",
+        "version": str(rng.randint(1, 9)),
+        "effective_time": f"{rng.randint(2005, 2024)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}",
+        "indications_and_usage": [f"{ingredient.title()} is indicated for the relief of symptoms. " * 20],
+        "warnings": ["Do not exceed the recommended dose. " * 40],
+        "openfda": {
+            "brand_name": [f"Brand{i % 5000} {ingredient.title()}"],
+            "generic_name": [ingredient.upper()],
+            "substance_name": [ingredient.upper()],
+            "manufacturer_name": [f"Manufacturer {rng.randint(0, 500)}"],
+            "application_number": [f"ANDA{rng.randint(10000, 99999)}"],
+        },
+    }
+
+
+def write_partitions(directory, labels, partitions, seed=42):
+    """Write labels split into zipped partitions; returns the partition paths"""
+    rng = random.Random(seed)
+    per_partition = -(-labels // partitions)
+    paths = []
+    for part in range(partitions):
+        name = f"drug-label-{part + 1:04d}-of-{partitions:04d}.json"
+        path = os.path.join(directory, name + ".zip")
+        start, end = part * per_partition, min(labels, (part + 1) * per_partition)
+        document = {
+            "meta": {"last_updated": "2024-01-01", "results": {"skip": 0, "limit": end - start, "total": end - start}},
+            "results": [make_label(i, rng) for i in range(start, end)],
+        }
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(name, json.dumps(document))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local openFDA label index")
+    parser.add_argument("--labels", type=int, default=50000, help="Number of synthetic labels")
+    parser.add_argument("--partitions", type=int, default=4, help="Number of partition files")
+    parser.add_argument("--searches", type=int, default=200, help="Number of searches to time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        downloads = os.path.join(temp_dir, "downloads")
+        os.makedirs(downloads)
+        write_partitions(downloads, args.labels, args.partitions)
+        size = sum(os.path.getsize(os.path.join(downloads, name)) for name in os.listdir(downloads))
+        print(f"{args.labels} labels in {args.partitions} partitions ({size / 1e6:.1f} MB zipped)")
+
+        with LabelIndex(os.path.join(temp_dir, "fda_labels.db")) as index:
+            start = time.perf_counter()
+            ingested = sum(index.ingest_directory(downloads).values())
+            elapsed = time.perf_counter() - start
+            print(f"Ingest:          {elapsed:.2f}s ({ingested / elapsed:,.0f} labels/sec)")
+
+            start = time.perf_counter()
+            index.ingest_directory(downloads)
+            print(f"Re-ingest:       {(time.perf_counter() - start) * 1000:.1f} ms (unchanged partitions skipped)")
+
+            rng = random.Random(7)
+            timings = {"name": [], "name+dates": []}
+            for _ in range(args.searches):
+                query = rng.choice(INGREDIENTS)
+                start = time.perf_counter()
+                index.search(query, max_results=10)
+                timings["name"].append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                index.search(query, max_results=10, min_date="2015-01-01", max_date="2020-12-31")
+                timings["name+dates"].append((time.perf_counter() - start) * 1000)
+
+            for label, values in timings.items():
+                values.sort()
+                print(f"Search {label + ':':<12} median {statistics.median(values):.2f} ms, "
+                      f"p95 {values[int(len(values) * 0.95) - 1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+HTML Parser Throughput Benchmark
+
+Measures parsing throughput for the saved search result pages in
+benchmarks/fixtures/ with each installed BeautifulSoup backend, both for the
+whole document and restricted to the result container, and end to end through
+the source parsers (parse_ema_html_results, parse_mhra_html_results,
+parse_tga_html_results).
+
+Usage:
+    python scraping/benchmarks/bench_html_parsing.py --repeat 20
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import sys
+import time
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+import html_parsing
+from html_parsing import available_backends, make_soup, make_container_soup
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Fixture file and result container classes for each source
+SOURCES = {
+    "ema": ("ema_search.html", ["view-medicines"]),
+    "mhra": ("mhra_search.html", ["search-results"]),
+    "tga": ("tga_search.html", ["view-content", "search-results"]),
+    "generic": ("generic_search.html", ["search-results"]),
+}
+
+
+def load_parsers():
+    """Import the source parsers, skipping any whose dependencies are missing"""
+    parsers = {}
+    logging.disable(logging.WARNING)
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            from ema_api import parse_ema_html_results
+            parsers["ema"] = lambda html: parse_ema_html_results(html, "", 100)
+        except ImportError:
+            pass
+        try:
+            from mhra_api import parse_mhra_html_results
+            parsers["mhra"] = lambda html: parse_mhra_html_results(html, "", 100)
+        except ImportError:
+            pass
+        try:
+            from tga_api import parse_tga_html_results
+            parsers["tga"] = lambda html: parse_tga_html_results(html, "", 100)
+        except ImportError:
+            pass
+    logging.disable(logging.NOTSET)
+    return parsers
+
+
+def pages_per_second(func, html, repeat):
+    """Call func(html) repeat times and return the throughput in pages/sec"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(html)  # warm up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func(html)
+        elapsed = time.perf_counter() - start
+    return repeat / elapsed
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark HTML parsing backends")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of parses per measurement")
+    parser.add_argument("--sources", nargs="+", default=list(SOURCES), help="Sources to benchmark")
+    args = parser.parse_args()
+
+    backends = [b for b in available_backends() if b in html_parsing.STRAINER_BACKENDS]
+    parsers = load_parsers()
+
+    print(f"Installed backends: {', '.join(available_backends())}")
+    print(f"  {'source':<9}{'mode':<40}{'pages/sec':>11}{'MB/sec':>9}{'speedup':>9}")
+
+    for source in args.sources:
+        file_name, classes = SOURCES[source]
+        with open(os.path.join(FIXTURES_DIR, file_name), "r", encoding="utf-8") as f:
+            html = f.read()
+        size_mb = len(html.encode("utf-8")) / 1e6
+
+        # Baseline: what the parsers did before, a full html.parser tree
+        baseline = pages_per_second(lambda h: BeautifulSoup(h, "html.parser"), html, args.repeat)
+        rows = [("html.parser, whole document (old)", baseline)]
+
+        for backend in backends:
+            rows.append((f"{backend}, whole document",
+                         pages_per_second(lambda h: make_soup(h, backend=backend), html, args.repeat)))
+            rows.append((f"{backend}, result container only",
+                         pages_per_second(lambda h: make_container_soup(h, classes, backend=backend),
+                                          html, args.repeat)))
+
+        if source in parsers:
+            for backend in backends:
+                html_parsing.set_default_backend(backend)
+                rows.append((f"{backend}, end-to-end parser",
+                             pages_per_second(parsers[source], html, args.repeat)))
+            html_parsing.set_default_backend("auto")
+
+        for mode, rate in rows:
+            print(f"  {source:<9}{mode:<40}{rate:>11.1f}{rate * size_mb:>9.2f}{rate / baseline:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+openFDA Page Decoding Benchmark
+
+Decodes synthetic openFDA label pages (full-size labels with all their text
+sections) and builds search results from them three ways:
+
+1. the whole body with json.loads, as response.json() does
+2. streamed with json_stream.iter_array, every field decoded
+3. streamed with iter_array projected to fda_api.LABEL_FIELDS
+
+Reports decode time and peak memory (tracemalloc) per page.
+
+Usage:
+    python scraping/benchmarks/bench_json_stream.py --documents 100 --repeat 20
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fda_api import LABEL_FIELDS, parse_label
+from json_stream import iter_array
+
+# Text sections of a typical prescription drug label
+SECTIONS = ["boxed_warning", "indications_and_usage", "dosage_and_administration", "dosage_forms_and_strengths",
+            "contraindications", "warnings_and_cautions", "adverse_reactions", "drug_interactions",
+            "use_in_specific_populations", "pregnancy", "pediatric_use", "geriatric_use", "overdosage",
+            "description", "clinical_pharmacology", "mechanism_of_action", "pharmacokinetics",
+            "nonclinical_toxicology", "clinical_studies", "how_supplied", "storage_and_handling",
+            "patient_counseling_information", "spl_medguide", "package_label_principal_display_panel"]
+
+WORDS = ["patients", "dose", "mg", "hepatic", "renal", "clinical", "adverse", "reactions", "increased",
+         "risk", "treatment", "therapy", "plasma", "concentration", "observed", "studies", "administration"]
+
+
+def make_page(documents, seed=42):
+    """Build the body of a label.json page with full-size labels"""
+    rng = random.Random(seed)
+    labels = []
+    for i in range(documents):
+        label = {
+            "id": f"label-{i}",
+            "set_id": f"set-{i:08d}",
+            "version": "3",
+            "effective_time": "20230115",
+            "openfda": {
+                "brand_name": [f"Brand {i}"],
+                "generic_name": ["IBUPROFEN"],
+                "substance_name": ["IBUPROFEN"],
+                "manufacturer_name": [f"Manufacturer {i % 50}"],
+                "application_number": [f"NDA0{rng.randint(10000, 99999)}"],
+                "product_ndc": [f"{rng.randint(1000, 9999)}-{rng.randint(100, 999)}" for _ in range(4)],
+                "spl_id": [f"spl-{i}"],
+                "rxcui": [str(rng.randint(100000, 999999)) for _ in range(3)],
+            },
+        }
+        for section in SECTIONS:
+            label[section] = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(100, 600)))]
+            label[f"{section}_table"] = [f"<table><tr><td>{rng.random()}</td></tr></table>"]
+        labels.append(label)
+    page = {"meta": {"results": {"skip": 0, "limit": documents, "total": documents * 10}}, "results": labels}
+    return json.dumps(page).encode()
+
+
+def decode_whole(body):
+    """Decode the page the way response.json() does"""
+    return [parse_label(label) for label in json.loads(body.decode("utf-8"))["results"]]
+
+
+def decode_streamed(body):
+    """Stream every field of every label"""
+    return [parse_label(label) for label in iter_array(io.BytesIO(body))]
+
+
+def decode_projected(body):
+    """Stream only the label fields search results use"""
+    return [parse_label(label) for label in iter_array(io.BytesIO(body), fields=LABEL_FIELDS)]
+
+
+def measure(decode, body, repeat):
+    """Return the best decode time and the peak memory of one decode"""
+    gc.collect()
+    tracemalloc.start()
+    results = decode(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del results
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(body)
+        best = min(best, time.perf_counter() - start)
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming, projected decoding of openFDA pages")
+    parser.add_argument("--documents", type=int, default=100, help="Labels per page")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed decodes per method (best is reported)")
+    args = parser.parse_args()
+
+    body = make_page(args.documents)
+    expected = decode_whole(body)
+    print(f"Page of {args.documents} labels: {len(body) / 1e6:.1f} MB")
+
+    for name, decode in [("json.loads (response.json())", decode_whole),
+                         ("iter_array, all fields", decode_streamed),
+                         ("iter_array, LABEL_FIELDS", decode_projected)]:
+        assert decode(body) == expected
+        elapsed, peak = measure(decode, body, args.repeat)
+        print(f"  {name:<30} {elapsed * 1000:8.1f} ms   peak {peak / 1e6:6.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+MHRA Paging Benchmark
+
+Serves a synthetic MHRA search API from a local HTTP server, with a fixed
+latency per request plus a cost per result returned, and fetches every match
+three ways:
+
+1. one oversized page ({"page": 1, "pageSize": <all>})
+2. MHRA_PAGE_SIZE pages fetched one after another (max_workers=1)
+3. MHRA_PAGE_SIZE pages fetched concurrently (mhra_api.iter_mhra_medicines)
+
+Reports the total time and the time to the first result.
+
+Usage:
+    python scraping/benchmarks/bench_mhra_paging.py --medicines 2000 --latency 0.2
+"""
+
+import argparse
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mhra_api
+import response_archive
+
+
+def make_handler(medicines, latency, per_result):
+    """Build a request handler answering search requests like the MHRA API"""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            start = (payload["page"] - 1) * payload["pageSize"]
+            page = [
+                {"name": f"Medicine {i} 500mg tablets", "productId": f"PL {i:05d}/0001",
+                 "authorisationDate": "2015-06-01", "activeSubstances": ["PARACETAMOL"],
+                 "marketingAuthorisationHolder": f"Holder {i % 50}"}
+                for i in range(start, min(medicines, start + payload["pageSize"]))
+            ]
+            time.sleep(latency + per_result * len(page))
+            body = json.dumps({"totalResults": medicines, "results": page}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def timed(results):
+    """Consume results, returning the count, total seconds and seconds to the first result"""
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for _ in results:
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    return count, time.perf_counter() - start, first or 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent MHRA page fetching")
+    parser.add_argument("--medicines", type=int, default=2000, help="Number of matching medicines")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per request")
+    parser.add_argument("--per-result", type=float, default=0.0005, help="Seconds per result returned")
+    parser.add_argument("--workers", type=int, default=mhra_api.MHRA_MAX_WORKERS, help="Concurrent page requests")
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(args.medicines, args.latency, args.per_result))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    mhra_api.MHRA_SEARCH_URL = f"http://127.0.0.1:{server.server_address[1]}/api/search"
+    # Leave the request budget and the response archive out of the measurement
+    mhra_api._request_budget = mhra_api._RequestBudget(10 ** 6)
+    response_archive.ARCHIVE_ENABLED = False
+
+    def one_page():
+        yield from mhra_api._parse_medicines(mhra_api._fetch_medicines("paracetamol", 1, args.medicines, 1)[0])
+
+    runs = {
+        "One page": one_page,
+        "Sequential pages": lambda: mhra_api.iter_mhra_medicines("paracetamol", max_workers=1),
+        f"{args.workers} workers": lambda: mhra_api.iter_mhra_medicines("paracetamol", max_workers=args.workers),
+    }
+    print(f"{args.medicines} medicines, {mhra_api.MHRA_PAGE_SIZE} per page, "
+          f"{args.latency * 1000:.0f} ms + {args.per_result * 1000:.1f} ms/result per request")
+    for name, run in runs.items():
+        count, total, first = timed(run())
+        print(f"{name + ':':<18} {total:6.2f}s total, first result after {first:5.2f}s ({count} results)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
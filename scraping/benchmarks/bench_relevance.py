@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Relevance Scoring Benchmark
+
+Compares the vectorized relevance scorer in relevance.py against scoring each
+result with a Python loop over its tokens, on a synthetic batch of merged
+results from several databases.
+
+Usage:
+    python scraping/benchmarks/bench_relevance.py --records 50000
+"""
+
+import argparse
+import math
+import os
+import random
+import re
+import sys
+import time
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from relevance import rank_results, query_terms, FIELD_BOOSTS, BM25_K1
+
+DATABASES = ["pubmed", "fda-drugs", "ema-medicines", "mhra", "tga-cmi"]
+
+TERMS = ["aspirin", "liver", "injury", "tablets", "dose", "children", "pregnancy", "renal"]
+
+QUERY = "aspirin liver injury"
+
+
+def make_results(records, abstracts, seed=42):
+    """Build synthetic merged results; a share of them carry a full abstract"""
+    rng = random.Random(seed)
+    vocabulary = TERMS + [f"word{i}" for i in range(5000)]
+
+    def text(words):
+        return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+    results = []
+    for i in range(records):
+        results.append({
+            "id": f"r{i}",
+            "database": DATABASES[i % len(DATABASES)],
+            "title": text(12).capitalize(),
+            "snippet": text(45) + ".",
+            "abstract": text(200) if rng.random() < abstracts else "",
+            "date": f"{rng.randint(2000, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        })
+    return results
+
+
+def loop_rank(results, query):
+    """BM25F with a Python loop over each result's tokens (no recency or authority)"""
+    terms = query_terms(query)
+    token = re.compile(r"[a-z0-9]+")
+    per_result = []
+    document_frequency = dict.fromkeys(terms, 0)
+    for result in results:
+        fields = {}
+        for field in FIELD_BOOSTS:
+            tokens = token.findall((result.get(field) or "").lower())
+            fields[field] = (len(tokens), {t: sum(1 for w in tokens if w.startswith(t)) for t in terms})
+        for t in terms:
+            if any(counts[t] for _, counts in fields.values()):
+                document_frequency[t] += 1
+        per_result.append(fields)
+
+    scores = []
+    for fields in per_result:
+        score = 0.0
+        for t in terms:
+            tf = sum(FIELD_BOOSTS[field] * counts[t] for field, (_, counts) in fields.items())
+            idf = math.log1p((len(results) - document_frequency[t] + 0.5) / (document_frequency[t] + 0.5))
+            score += idf * tf / (BM25_K1 + tf)
+        scores.append(score)
+    order = sorted(range(len(results)), key=lambda i: scores[i], reverse=True)
+    return [results[i] for i in order]
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark relevance scoring")
+    parser.add_argument("--records", type=int, default=50000, help="Number of merged results to rank")
+    parser.add_argument("--abstracts", type=float, default=0.3, help="Share of results with a full abstract")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs (the best one is reported)")
+    args = parser.parse_args()
+
+    results = make_results(args.records, args.abstracts)
+
+    timings = {}
+    for name, func in (("python loop", loop_rank), ("vectorized", rank_results)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            func(results, QUERY)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+
+    print(f"Ranked {args.records} results for '{QUERY}':")
+    for name, elapsed in timings.items():
+        print(f"  {name:<12} {elapsed * 1000:>9.1f} ms  ({args.records / elapsed:,.0f} results/s)")
+    print(f"  speedup      {timings['python loop'] / timings['vectorized']:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Response Archive Benchmark
+
+Archives synthetic TGA and EMA search pages (as search_tga_medicines and
+search_ema_medicines would) with response_archive.ResponseArchive, then
+regenerates their results offline:
+
+1. archiving: bodies per second, and the compressed size against the raw size
+   (every page is archived twice, so half the bodies are duplicates)
+2. reparse with one parser process
+3. reparse with --workers parser processes
+
+Usage:
+    python scraping/benchmarks/bench_response_archive.py --pages 500 --workers 4
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_archive import ResponseArchive
+
+
+def tga_page(rng, page, results):
+    """Build a TGA search page"""
+    rows = []
+    for i in range(results):
+        rows.append(
+            f'<div class="views-row"><h3><a href="/resources/cmi/{page}-{i}">Medicine {page}-{i} '
+            f'{rng.choice(["tablets", "capsules", "oral liquid"])}</a></h3>'
+            f'<span class="date">{rng.randint(1, 28)} March {rng.randint(2005, 2024)}</span>'
+            f'<div class="summary">{" ".join(rng.choice(["pain", "fever", "dose", "adults"]) for _ in range(30))}</div>'
+            f'<div class="sponsor">Sponsor {i % 7}</div><a href="/docs/cmi-{page}-{i}.pdf">CMI</a></div>'
+        )
+    navigation = "".join(f'<li><a href="/menu/{i}">Menu item {i}</a></li>' for i in range(200))
+    return (f'<html><head><title>Search</title></head><body><nav><ul>{navigation}</ul></nav>'
+            f'<div class="view-content">{"".join(rows)}</div><footer>TGA</footer></body></html>')
+
+
+def ema_page(rng, page, results):
+    """Build an EMA search page"""
+    rows = []
+    for i in range(results):
+        rows.append(
+            f'<div class="views-row"><h3><a href="/en/medicines/human/EPAR/{page}-{i}">Medicine {page}-{i}</a></h3>'
+            f'<div class="field--name-field-authorisation-date">{rng.randint(1, 28)}/0{rng.randint(1, 9)}/'
+            f'{rng.randint(2005, 2024)}</div>'
+            f'<div class="field--name-field-overview">{" ".join(rng.choice(["EPAR", "risk", "dose"]) for _ in range(30))}'
+            f'</div><div class="field--name-field-authorisation-holder">Holder {i % 5}</div></div>'
+        )
+    return f'<html><body><div class="view-medicines">{"".join(rows)}</div></body></html>'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark archiving and offline re-parsing of search responses")
+    parser.add_argument("--pages", type=int, default=500, help="Distinct search pages")
+    parser.add_argument("--results", type=int, default=25, help="Results per page")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parser processes")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    pages = []
+    for page in range(args.pages):
+        if page % 2:
+            body, source = ema_page(rng, page, args.results), "ema-medicines"
+        else:
+            body, source = tga_page(rng, page, args.results), "tga-cmi"
+        pages.append((body.encode("utf-8"), {
+            "source": source, "url": f"https://example.org/{source}?page={page}", "method": "GET", "status": 200,
+            "encoding": "utf-8", "headers": {"Content-Type": "text/html; charset=utf-8"},
+            "context": {"query": "medicine", "max_results": args.results},
+        }))
+
+    with tempfile.TemporaryDirectory() as directory:
+        with ResponseArchive(directory) as archive:
+            start = time.perf_counter()
+            for body, metadata in pages + pages:
+                archive.put(body, metadata)
+            elapsed = time.perf_counter() - start
+            stats = archive.get_stats()
+            print(f"Archived {2 * len(pages)} responses in {elapsed:.2f}s ({2 * len(pages) / elapsed:.0f}/s, "
+                  f"{stats['compression']}): {stats['raw_bytes'] / 1e6:.1f} MB of distinct bodies stored in "
+                  f"{stats['stored_bytes'] / 1e6:.2f} MB")
+
+            for workers in sorted({1, args.workers}):
+                start = time.perf_counter()
+                responses = results = 0
+                for _, page_results, error in archive.reparse(max_workers=workers):
+                    assert error is None, error
+                    responses += 1
+                    results += len(page_results)
+                elapsed = time.perf_counter() - start
+                print(f"Reparse, {workers} workers: {elapsed:6.2f}s, {responses / elapsed:7.0f} responses/s "
+                      f"({results} results)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Result Frame Benchmark
+
+Measures batch post-processing of merged results (date range filter, database
+filter, facets, sort and dedup) with the columnar ResultFrame, compared with
+the Python loops over result dicts it replaces.
+
+Usage:
+    python scraping/benchmarks/bench_result_frame.py --records 100000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from date_utils import is_within_range, normalize_date
+from result_frame import ResultFrame
+
+DATABASES = ["pubmed", "fda-drugs", "ema-medicines", "mhra", "tga-cmi", "rxnav"]
+
+
+def make_results(records, seed=42):
+    """Build synthetic results with mixed date formats and some duplicate URLs"""
+    rng = random.Random(seed)
+    results = []
+    for i in range(records):
+        database = DATABASES[i % len(DATABASES)]
+        year, month, day = rng.randint(1995, 2024), rng.randint(1, 12), rng.randint(1, 28)
+        date = rng.choice([f"{year}-{month:02d}-{day:02d}", f"{year}", f"{day:02d}/{month:02d}/{year}", ""])
+        results.append({
+            "id": f"{database}-{i}",
+            "database": database,
+            "source": database.upper(),
+            "title": f"Result {i}",
+            "url": f"https://example.org/{database}/{rng.randint(0, records * 3 // 4)}",
+            "date": date,
+            "snippet": "",
+            "relevanceScore": rng.random(),
+        })
+    return results
+
+
+def process_loops(results):
+    """Post-process with Python loops over dicts"""
+    kept = [r for r in results
+            if is_within_range(r["date"], "2010-01-01", "2020-12-31") and r["database"] in ("pubmed", "mhra", "rxnav")]
+    seen = set()
+    unique = []
+    for r in kept:
+        if r["url"] not in seen:
+            seen.add(r["url"])
+            unique.append(r)
+    counts = {}
+    for r in unique:
+        counts[r["source"]] = counts.get(r["source"], 0) + 1
+
+    def date_key(r):
+        normalized = normalize_date(r["date"])
+        return normalized.iso if normalized else ""
+
+    ordered = sorted(unique, key=date_key, reverse=True)
+    return len(ordered), counts
+
+
+def process_frame(results):
+    """Post-process with the columnar frame"""
+    frame = (ResultFrame.from_results(results)
+             .filter_dates("2010-01-01", "2020-12-31")
+             .filter_in("database", ["pubmed", "mhra", "rxnav"])
+             .dedup())
+    counts = frame.facets("source")
+    ordered = frame.sort_by("date")
+    return len(ordered), counts
+
+
+def time_it(function, results, repeat):
+    """Return the median runtime in seconds and the last output"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = function(results)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), output
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark columnar result post-processing")
+    parser.add_argument("--records", type=int, default=100000, help="Number of results")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs per method")
+    args = parser.parse_args()
+
+    results = make_results(args.records)
+    loop_time, (loop_count, loop_counts) = time_it(process_loops, results, args.repeat)
+    frame_time, (frame_count, frame_counts) = time_it(process_frame, results, args.repeat)
+
+    frame = ResultFrame.from_results(results)
+    build = time_it(ResultFrame.from_results, results, args.repeat)[0]
+    ops = time_it(lambda _: frame.filter_dates("2010-01-01", "2020-12-31").dedup().sort_by("date").facets(),
+                  results, args.repeat)[0]
+
+    if loop_count != frame_count or loop_counts != frame_counts:
+        print(f"WARNING: outputs differ ({loop_count} vs {frame_count} results)")
+
+    print(f"{args.records:,} results, {frame_count:,} after filter and dedup")
+    print(f"  python loops:      {loop_time * 1000:>8.1f} ms")
+    print(f"  result frame:      {frame_time * 1000:>8.1f} ms  ({loop_time / frame_time:.1f}x)")
+    print(f"    build columns:   {build * 1000:>8.1f} ms")
+    print(f"    filter/sort/dedup on a built frame: {ops * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Result Record Benchmark
+
+Compares result dicts with slotted ResultRecords: memory held by a batch of
+results, and JSON encode/decode throughput of the json module against the
+package encoder (orjson when installed).
+
+Usage:
+    python scraping/benchmarks/bench_result_records.py --records 100000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_record import ResultRecord, ORJSON_AVAILABLE, dumps, loads
+
+SOURCES = [("pubmed", "PubMed"), ("fda-drugs", "FDA - Drugs"), ("mhra", "MHRA"), ("tga-cmi", "TGA - CMI")]
+
+
+def make_results(records, seed=42):
+    """Build synthetic result dicts the way the source parsers do (fresh strings per result)"""
+    rng = random.Random(seed)
+    results = []
+    for i in range(records):
+        database, source = SOURCES[i % len(SOURCES)]
+        results.append({
+            "id": f"{database}-{i}",
+            "title": f"Result {i} about {rng.choice(['aspirin', 'ibuprofen', 'metformin'])}",
+            "url": f"https://example.org/{database}/{i}",
+            "source": "".join(source),
+            "date": f"{rng.randint(2000, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "snippet": "Lorem ipsum dolor sit amet " * 6,
+            "authors": [f"Author {rng.randint(0, 999)}"],
+            "database": "".join(database),
+            "relevanceScore": rng.random(),
+        })
+    return results
+
+
+def measure_memory(build):
+    """Return the bytes allocated by build() and what it returned"""
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, value
+
+
+def timed(function):
+    """Return the runtime of function() in seconds and what it returned (without GC pauses)"""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        value = function()
+        return time.perf_counter() - start, value
+    finally:
+        gc.enable()
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark result dicts against slotted result records")
+    parser.add_argument("--records", type=int, default=100000, help="Number of results")
+    args = parser.parse_args()
+
+    # Memory: the container objects themselves (field values are shared by both)
+    results = make_results(args.records)
+    dict_bytes, copies = measure_memory(lambda: [dict(result) for result in results])
+    record_bytes, records = measure_memory(lambda: [ResultRecord.from_dict(result) for result in results])
+    del copies
+
+    print(f"{args.records:,} results (orjson {'installed' if ORJSON_AVAILABLE else 'not installed'})")
+    print(f"\n  {'memory per result':<28}{'bytes':>10}")
+    print(f"  {'dict':<28}{dict_bytes / args.records:>10.0f}")
+    print(f"  {'ResultRecord':<28}{record_bytes / args.records:>10.0f}")
+
+    # Throughput: one NDJSON line per result, as the result sinks write them
+    cases = [
+        ("json, dicts",
+         lambda: "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in results).encode("utf-8"),
+         lambda data: [json.loads(line) for line in data.splitlines()]),
+        ("dumps/loads, dicts",
+         lambda: b"".join(dumps(r) + b"\n" for r in results),
+         lambda data: [loads(line) for line in data.splitlines()]),
+        ("dumps/loads, records",
+         lambda: b"".join(dumps(r) + b"\n" for r in records),
+         lambda data: [ResultRecord.from_dict(loads(line)) for line in data.splitlines()]),
+    ]
+    print(f"\n  {'encoder':<28}{'encode (rec/s)':>16}{'decode (rec/s)':>16}")
+    for name, encode, decode in cases:
+        encode_time, data = timed(encode)
+        decode_time, decoded = timed(lambda: decode(data))
+        assert len(decoded) == args.records
+        print(f"  {name:<28}{args.records / encode_time:>16,.0f}{args.records / decode_time:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
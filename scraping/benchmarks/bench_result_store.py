@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Result Store Benchmark
+
+Measures how long it takes to store search results in the SQLite result store
+and to run full-text and filtered lookups over them, compared with scanning
+results files the way past results had to be searched before the store.
+
+Usage:
+    python scraping/benchmarks/bench_result_store.py --records 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Make the scraping modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_store import ResultStore
+
+DATABASES = ["pubmed", "fda-drugs", "ema-medicines", "mhra", "tga-cmi"]
+
+WORDS = [
+    "paracetamol", "ibuprofen", "aspirin", "metformin", "liver", "injury", "renal",
+    "pregnancy", "children", "dose", "safety", "trial", "randomized", "cohort",
+    "hypertension", "diabetes", "pain", "fever", "tablets", "warning", "label",
+]
+
+LOOKUPS = [
+    {"text": "liver injury"},
+    {"text": '"randomized trial"', "databases": ["pubmed"]},
+    {"text": "paracetamol", "from_date": "2020-01-01", "to_date": "2022-12-31"},
+    {"databases": ["mhra"], "offset": 200},
+    {"query": "aspirin", "order": "date"},
+]
+
+
+def make_text(rng, filler, words):
+    """Build text of mostly filler words with an occasional medical term"""
+    return " ".join(rng.choice(WORDS) if rng.random() < 0.05 else rng.choice(filler) for _ in range(words))
+
+
+def make_results(records, seed=42):
+    """Build synthetic results spread over databases, dates and queries"""
+    rng = random.Random(seed)
+    filler = [f"w{i}" for i in range(20000)]
+    results = []
+    for i in range(records):
+        database = DATABASES[i % len(DATABASES)]
+        results.append({
+            "id": f"{database}-{i}",
+            "database": database,
+            "source": database.upper(),
+            "title": make_text(rng, filler, 10),
+            "url": f"https://example.org/{database}/{i}",
+            "date": f"{rng.randint(2000, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "snippet": make_text(rng, filler, 30),
+            "abstract": make_text(rng, filler, 150),
+        })
+    return results
+
+
+def scan_files(paths, text):
+    """Search results files the old way: load each file and filter in Python"""
+    terms = text.lower().replace('"', "").split()
+    matches = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for result in json.load(f):
+                haystack = f"{result['title']} {result['snippet']} {result['abstract']}".lower()
+                if all(term in haystack.split() for term in terms):
+                    matches.append(result)
+    return matches
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite result store")
+    parser.add_argument("--records", type=int, default=100000, help="Number of results to store")
+    parser.add_argument("--runs", type=int, default=20, help="Number of runs the results are split into")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of times each lookup is run")
+    args = parser.parse_args()
+
+    results = make_results(args.records)
+    queries = ["aspirin", "ibuprofen", "paracetamol", "metformin"]
+    chunk = max(1, len(results) // args.runs)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = ResultStore(os.path.join(temp_dir, "results.db"))
+
+        # Store the results as several runs, the way repeated searches would
+        runs = [results[offset:offset + chunk] for offset in range(0, len(results), chunk)]
+        start = time.perf_counter()
+        for run, run_results in enumerate(runs):
+            store.add_run(queries[run % len(queries)], run_results)
+        ingest = time.perf_counter() - start
+
+        # The same runs as timestamped results files, for the scan comparison
+        file_paths = []
+        for run, run_results in enumerate(runs):
+            path = os.path.join(temp_dir, f"results_{run}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(run_results, f)
+            file_paths.append(path)
+
+        # Storing the same results again must not duplicate them
+        store.add_run(queries[0], results[:chunk])
+        print(f"Stored {store.get_stats()['records']} records in {ingest:.2f}s "
+              f"({args.records / ingest:,.0f} records/s)")
+
+        print(f"\n  {'lookup':<60}{'total':>8}{'median (ms)':>14}")
+        for lookup in LOOKUPS:
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                page = store.search(limit=20, **lookup)
+                times.append((time.perf_counter() - start) * 1000)
+            print(f"  {json.dumps(lookup):<60}{page['total']:>8}{statistics.median(times):>14.2f}")
+
+        start = time.perf_counter()
+        matches = scan_files(file_paths, "liver injury")
+        scan = (time.perf_counter() - start) * 1000
+        print(f"\n  {'file scan: liver injury':<60}{len(matches):>8}{scan:>14.2f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
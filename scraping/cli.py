@@ -26,7 +26,7 @@ from config import (
     get_database_config,
     get_rate_limit
 )
-from bs4 import BeautifulSoup
+from html_parsing import make_soup
 
 
 def parse_arguments():
@@ -64,7 +64,7 @@ def extract_search_results(html: str, url: str, query: str) -> List[Dict[str, An
     if not html:
         return results
     
-    soup = BeautifulSoup(html, 'html.parser')
+    soup = make_soup(html)
     
     # Extract domain for source information
     domain = url.split('//')[1].split('/')[0]
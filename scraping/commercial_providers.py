@@ -37,6 +37,15 @@ except ImportError:
         logger.error("Could not import configuration. Make sure config.py is in the same directory.")
         sys.exit(1)
 
+# Import the result id builder
+try:
+    from result_record import stable_id
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from result_record import stable_id
+
 class DrugBankAPI:
     """
     DrugBank API client
@@ -134,7 +143,7 @@ class DrugBankAPI:
                         
                         # Create the result object
                         result = {
-                            "id": f"drugbank-{drug.get('id', '')}",
+                            "id": stable_id("drugbank", drug.get("id"), None, drug.get("name", "")),
                             "title": drug.get("name", ""),
                             "url": f"https://go.drugbank.com/drugs/{drug.get('id', '')}",
                             "source": "DrugBank",
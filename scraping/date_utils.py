@@ -0,0 +1,269 @@
+"""
+Date Normalization Utilities
+
+This module provides a single date normalizer shared by every parser in the
+scraping package. Upstream sources return dates in many shapes ("2023 Jan 15",
+"15/01/2023", "20230115", "15 January 2023", "Jan 15, 2023", ...), and each
+parser used to loop over its own list of strptime formats.
+
+The normalizer matches raw strings against a small set of pre-compiled regexes
+instead of trying strptime formats one after another, and memoizes the result
+for each distinct raw string, since large result sets repeat the same dates
+many times.
+
+Every normalized date carries a precision flag ("year", "month" or "day") so
+that a bare year such as "2023" is not mistaken for 1 January 2023 when
+filtering by date range.
+"""
+
+import re
+import calendar
+from datetime import date
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+# Precision flags
+PRECISION_YEAR = "year"
+PRECISION_MONTH = "month"
+PRECISION_DAY = "day"
+
+# Month names and abbreviations (lowercase) mapped to month numbers
+MONTHS = {}
+for _number in range(1, 13):
+    MONTHS[calendar.month_name[_number].lower()] = _number
+    MONTHS[calendar.month_abbr[_number].lower()] = _number
+MONTHS["sept"] = 9
+
+# Fast-path patterns, tried in order. Each entry is (pattern, layout) where the
+# layout names the order of the year/month/day groups.
+_MONTH_NAME = r"([A-Za-z]{3,9})\.?"
+_DATE_PATTERNS = [
+    # 2023-01-15, 2023/01/15, 2023.01.15, 2023-01-15T10:00:00Z
+    (re.compile(r"^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?:[T\s].*)?$"), "ymd"),
+    # 20230115
+    (re.compile(r"^(\d{4})(\d{2})(\d{2})$"), "ymd"),
+    # 15/01/2023, 15.01.2023, 15-01-2023
+    (re.compile(r"^(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})$"), "dmy"),
+    # 2023-01, 2023/01
+    (re.compile(r"^(\d{4})[-/](\d{1,2})$"), "ym"),
+    # 2023 Jan 15, 2023 Jan, 2023 Jan-Feb, 2023 Jan 15-21 (PubMed style)
+    (re.compile(r"^(\d{4})\s+" + _MONTH_NAME + r"(?:[-/][A-Za-z]{3,9})?(?:\s+(\d{1,2}))?(?:[-\s].*)?$"), "yMd"),
+    # Jan 15, 2023 / January 15 2023
+    (re.compile(r"^" + _MONTH_NAME + r"\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})$"), "Mdy"),
+    # 15 January 2023 / 15 Jan, 2023
+    (re.compile(r"^(\d{1,2})(?:st|nd|rd|th)?\s+" + _MONTH_NAME + r",?\s+(\d{4})$"), "dMy"),
+    # January 2023 / Jan 2023
+    (re.compile(r"^" + _MONTH_NAME + r",?\s+(\d{4})$"), "My"),
+    # 2023, 2023 Spring, 2023 Winter
+    (re.compile(r"^(\d{4})(?:\s+[A-Za-z].*)?$"), "y"),
+]
+
+# Pattern used to locate a date inside free text (snippets, citations)
+_TEXT_DATE_PATTERN = re.compile(
+    r"\d{4}-\d{2}-\d{2}"
+    r"|\d{1,2}[/.]\d{1,2}[/.]\d{4}"
+    r"|[A-Z][a-z]{2,8}\.? \d{1,2}, \d{4}"
+    r"|\d{1,2} [A-Z][a-z]{2,8} \d{4}"
+)
+
+# Size of the memoization cache for distinct raw date strings
+CACHE_SIZE = 8192
+
+
+class NormalizedDate(NamedTuple):
+    """
+    A normalized date
+
+    Attributes:
+        iso (str): Date in format YYYY-MM-DD (missing month/day default to 01)
+        precision (str): One of "year", "month" or "day"
+    """
+    iso: str
+    precision: str
+
+    @property
+    def start(self) -> date:
+        """First calendar day covered by this date"""
+        return date.fromisoformat(self.iso)
+
+    @property
+    def end(self) -> date:
+        """Last calendar day covered by this date"""
+        start = self.start
+        if self.precision == PRECISION_YEAR:
+            return date(start.year, 12, 31)
+        if self.precision == PRECISION_MONTH:
+            return date(start.year, start.month, calendar.monthrange(start.year, start.month)[1])
+        return start
+
+
+def _month_number(name: str) -> Optional[int]:
+    """Look up a month number from its English name or abbreviation"""
+    return MONTHS.get(name.lower())
+
+
+def _build(year: int, month: Optional[int], day: Optional[int]) -> Optional[NormalizedDate]:
+    """Validate the components and build a NormalizedDate"""
+    if month is None:
+        precision = PRECISION_YEAR
+    elif day is None:
+        precision = PRECISION_MONTH
+    else:
+        precision = PRECISION_DAY
+
+    try:
+        value = date(year, month or 1, day or 1)
+    except ValueError:
+        return None
+
+    return NormalizedDate(value.isoformat(), precision)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize(raw: str) -> Optional[NormalizedDate]:
+    """Normalize a stripped date string (memoized)"""
+    for pattern, layout in _DATE_PATTERNS:
+        match = pattern.match(raw)
+        if not match:
+            continue
+
+        groups = match.groups()
+        if layout == "ymd":
+            return _build(int(groups[0]), int(groups[1]), int(groups[2]))
+        if layout == "dmy":
+            return _build(int(groups[2]), int(groups[1]), int(groups[0]))
+        if layout == "ym":
+            return _build(int(groups[0]), int(groups[1]), None)
+        if layout == "y":
+            return _build(int(groups[0]), None, None)
+
+        if layout == "yMd":
+            month = _month_number(groups[1])
+            if month is None:
+                # Seasons and other words after the year ("2023 Spring")
+                return _build(int(groups[0]), None, None)
+            day = int(groups[2]) if groups[2] else None
+            return _build(int(groups[0]), month, day)
+        if layout == "Mdy":
+            month = _month_number(groups[0])
+            return _build(int(groups[2]), month, int(groups[1])) if month else None
+        if layout == "dMy":
+            month = _month_number(groups[1])
+            return _build(int(groups[2]), month, int(groups[0])) if month else None
+        if layout == "My":
+            month = _month_number(groups[0])
+            return _build(int(groups[1]), month, None) if month else None
+
+    return None
+
+
+def normalize_date(raw) -> Optional[NormalizedDate]:
+    """
+    Normalize a raw date string from any source
+
+    Args:
+        raw (str): Raw date string (e.g. "2023 Jan 15", "15/01/2023", "20230115")
+
+    Returns:
+        Optional[NormalizedDate]: The normalized date, or None if it could not be parsed
+    """
+    if not raw or not isinstance(raw, str):
+        return None
+    return _normalize(raw.strip())
+
+
+def to_iso_date(raw, default: Optional[str] = None) -> str:
+    """
+    Convert a raw date string to YYYY-MM-DD
+
+    Args:
+        raw (str): Raw date string
+        default (Optional[str]): Value to return if the date cannot be parsed
+            (defaults to the raw string itself)
+
+    Returns:
+        str: The ISO date, or the default value
+    """
+    normalized = normalize_date(raw)
+    if normalized:
+        return normalized.iso
+    if default is not None:
+        return default
+    return raw.strip() if isinstance(raw, str) else ""
+
+
+def find_date_in_text(text: str) -> str:
+    """
+    Find the first date-like substring in free text
+
+    Args:
+        text (str): Text to search (e.g. a result snippet)
+
+    Returns:
+        str: The matched date string, or an empty string
+    """
+    if not text:
+        return ""
+    match = _TEXT_DATE_PATTERN.search(text)
+    return match.group(0) if match else ""
+
+
+def parse_date_bound(value) -> Optional[date]:
+    """
+    Parse a YYYY-MM-DD date range bound
+
+    Args:
+        value (str): Date bound string
+
+    Returns:
+        Optional[date]: The parsed date, or None if missing or invalid
+    """
+    normalized = normalize_date(value)
+    return normalized.start if normalized else None
+
+
+def is_within_range(raw, min_date=None, max_date=None) -> bool:
+    """
+    Check whether a result date falls inside a date range
+
+    Results without a date or with an unparseable date are kept, matching the
+    behavior of the individual parsers. A date with year or month precision is
+    kept when any part of it overlaps the range.
+
+    Args:
+        raw (str): Raw or normalized result date
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+
+    Returns:
+        bool: True if the result should be kept
+    """
+    normalized = normalize_date(raw)
+    if not normalized:
+        return True
+
+    lower = parse_date_bound(min_date)
+    upper = parse_date_bound(max_date)
+
+    if lower and normalized.end < lower:
+        return False
+    if upper and normalized.start > upper:
+        return False
+    return True
+
+
+def cache_info():
+    """Return memoization statistics for the date normalizer"""
+    return _normalize.cache_info()
+
+
+def clear_cache():
+    """Clear the date normalizer cache"""
+    _normalize.cache_clear()
+
+
+if __name__ == "__main__":
+    # Example usage
+    for sample in ["2023 Jan 15", "2023 Jan-Feb", "2023 Spring", "15/01/2023",
+                   "20230115", "15 January 2023", "Jan 15, 2023", "not a date"]:
+        print(f"{sample!r:20} -> {normalize_date(sample)}")
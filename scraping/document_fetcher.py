@@ -0,0 +1,501 @@
+#!/usr/bin/env python
+"""
+Regulator Document Downloads
+
+Search results from TGA (CMI/PI), EMA (EPARs) and MHRA (SPC/PIL) link to
+documents, mostly PDFs, that are fetched separately from the search. This
+module downloads the documents linked from a result set:
+
+1. concurrently, with a limit on simultaneous transfers per host
+2. streamed to disk in chunks, so no file is held in memory
+3. resuming interrupted transfers with HTTP Range requests (guarded by
+   If-Range, so a document that changed on the server is fetched again)
+4. stored by content hash (documents/<sha256[:2]>/<sha256>.<ext>), so the
+   same file linked from several results or URLs is stored once
+
+A manifest (documents/manifest.ndjson) records which URL resolved to which
+file; URLs already in the manifest are not downloaded again.
+
+Usage:
+    with DocumentFetcher("documents") as fetcher:
+        for download in fetcher.fetch_results(results):
+            print(download["url"], download["status"], download["path"])
+
+From the command line:
+    python document_fetcher.py results.json --dir documents --per-host 2
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+# Import the results reader and the document link extensions
+try:
+    from result_sinks import iter_results
+    from html_parsing import DOCUMENT_EXTENSIONS
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from result_sinks import iter_results
+    from html_parsing import DOCUMENT_EXTENSIONS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("document_fetcher")
+
+# Directory documents are stored in (override with the MEDSEARCH_DOCUMENTS_DIR environment variable)
+DEFAULT_DOCUMENTS_DIR = os.environ.get(
+    "MEDSEARCH_DOCUMENTS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "documents")
+)
+
+# Concurrent downloads in total and per host
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_PER_HOST = 2
+
+# Bytes read from the response and written to disk at a time
+CHUNK_SIZE = 1 << 16
+
+# Extensions used for stored documents, by content type
+CONTENT_TYPE_EXTENSIONS = {
+    "application/pdf": ".pdf",
+    "application/msword": ".doc",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+    "application/rtf": ".rtf",
+    "text/rtf": ".rtf",
+}
+
+MANIFEST_NAME = "manifest.ndjson"
+PARTIAL_DIR = "partial"
+
+# Download outcomes
+DOWNLOADED = "downloaded"  # fetched (or finished after resuming) and stored
+DUPLICATE = "duplicate"    # fetched, but the same content was already stored
+CACHED = "cached"          # already in the manifest, not fetched again
+FAILED = "failed"
+
+
+def is_document_url(url: str) -> bool:
+    """
+    Check whether a link points to a document
+
+    Args:
+        url (str): Link URL
+
+    Returns:
+        bool: True for links to PDF, Word and RTF files
+    """
+    return urlsplit(url).path.lower().endswith(DOCUMENT_EXTENSIONS)
+
+
+def document_links(result: Dict[str, Any]) -> List[str]:
+    """
+    Get the document links of a search result
+
+    Args:
+        result (Dict[str, Any]): Search result; its "documents" (links found by the
+            parsers) and its URL, if that points to a document
+
+    Returns:
+        List[str]: Distinct document URLs, in order
+    """
+    links = []
+    for document in result.get("documents") or []:
+        url = document.get("url") if isinstance(document, dict) else document
+        if url:
+            links.append(url)
+    url = result.get("url") or ""
+    if is_document_url(url):
+        links.append(url)
+    return list(dict.fromkeys(links))
+
+
+def _host(url: str) -> str:
+    """Get the host a URL is downloaded from"""
+    return urlsplit(url).netloc.lower()
+
+
+def _extension(url: str, content_type: Optional[str]) -> str:
+    """Pick the file extension of a stored document"""
+    path = urlsplit(url).path.lower()
+    for extension in DOCUMENT_EXTENSIONS:
+        if path.endswith(extension):
+            return extension
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPE_EXTENSIONS.get(content_type, ".bin")
+
+
+class DocumentFetcher:
+    """
+    Download documents concurrently into a content-addressed directory
+
+    Safe to use from several threads; fetch_all/fetch_results run the
+    downloads on a thread pool of max_workers, with at most per_host
+    transfers to any one host at a time. URLs wait in a queue per host
+    until their host has a free slot, so a pool thread is never tied up
+    waiting for a busy host while downloads from other hosts could run.
+    """
+
+    def __init__(self, directory: str = DEFAULT_DOCUMENTS_DIR, max_workers: int = DEFAULT_MAX_WORKERS,
+                 per_host: int = DEFAULT_PER_HOST, timeout: float = 30, retries: int = 3,
+                 session: Optional[requests.Session] = None):
+        """
+        Initialize the fetcher
+
+        Args:
+            directory (str): Directory documents are stored in
+            max_workers (int): Maximum number of concurrent downloads
+            per_host (int): Maximum number of concurrent downloads from one host
+            timeout (float): Connect and read timeout of each request in seconds
+            retries (int): Attempts per document; each retry resumes the partial file
+            session (Optional[requests.Session]): Session to send requests with
+        """
+        self.directory = directory
+        self.max_workers = max(1, max_workers)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.retries = max(1, retries)
+        self.session = session or requests.Session()
+        self.session.headers.setdefault("User-Agent", "medsearch-document-fetcher")
+
+        os.makedirs(os.path.join(directory, PARTIAL_DIR), exist_ok=True)
+        self._lock = threading.Lock()
+        self._host_slots: Dict[str, threading.Semaphore] = {}
+        # Downloads in progress per URL, so concurrent requests for one URL share a download
+        self._in_progress: Dict[str, threading.Event] = {}
+        self._manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self._manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Read the latest manifest entry of every URL"""
+        manifest = {}
+        if not os.path.exists(self._manifest_path):
+            return manifest
+        with open(self._manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut off by a crash
+                    continue
+                manifest[entry["url"]] = entry
+        return manifest
+
+    def _record(self, entry: Dict[str, Any]):
+        """Append an entry to the manifest"""
+        with self._lock:
+            self._manifest[entry["url"]] = entry
+            with open(self._manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _host_slot(self, url: str) -> threading.Semaphore:
+        """Get the semaphore limiting transfers to the host of a URL"""
+        host = _host(url)
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.Semaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _partial_path(self, url: str) -> str:
+        """Path of the partial download of a URL"""
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, PARTIAL_DIR, name)
+
+    def stored_path(self, sha256: str, extension: str) -> str:
+        """
+        Path a document with this content hash is stored at
+
+        Args:
+            sha256 (str): Hex SHA-256 digest of the content
+            extension (str): File extension, with the dot
+
+        Returns:
+            str: File path
+        """
+        return os.path.join(self.directory, sha256[:2], sha256 + extension)
+
+    def fetch(self, url: str, force: bool = False) -> Dict[str, Any]:
+        """
+        Download one document
+
+        Args:
+            url (str): Document URL
+            force (bool): Download it even if it is in the manifest
+
+        Returns:
+            Dict[str, Any]: "url", "status" (DOWNLOADED, DUPLICATE, CACHED or FAILED),
+                "path", "sha256", "size" and "resumed" (bytes resumed from a
+                partial download), or "error" if it failed
+        """
+        while True:
+            with self._lock:
+                entry = self._manifest.get(url)
+                if entry and not force and os.path.exists(entry["path"]):
+                    return dict(entry, status=CACHED)
+                running = self._in_progress.get(url)
+                if running is None:
+                    self._in_progress[url] = threading.Event()
+                    break
+            # Another thread is downloading this URL; use its outcome
+            running.wait()
+            force = False
+
+        try:
+            with self._host_slot(url):
+                return self._download(url)
+        finally:
+            with self._lock:
+                self._in_progress.pop(url).set()
+
+    def _download(self, url: str) -> Dict[str, Any]:
+        """Download a document, retrying and resuming after failures"""
+        partial = self._partial_path(url)
+        error = None
+        for attempt in range(self.retries):
+            try:
+                return self._transfer(url, partial)
+            except (requests.RequestException, OSError, ValueError) as e:
+                error = str(e)
+                logger.warning(f"  Error downloading {url} (attempt {attempt + 1}/{self.retries}): {error}")
+                if attempt < self.retries - 1:
+                    time.sleep(2 ** attempt)  # Exponential backoff
+        return {"url": url, "status": FAILED, "error": error}
+
+    def _transfer(self, url: str, partial: str) -> Dict[str, Any]:
+        """Run one transfer, resuming the partial file if there is one"""
+        meta_path = partial + ".json"
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        meta = {}
+        if offset and os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+
+        # Ranges count bytes of the document as stored, not of a compressed body
+        headers = {"Accept-Encoding": "identity"}
+        validator = meta.get("etag") or meta.get("last_modified")
+        if offset and validator:
+            # If-Range makes the server send the whole document if it changed
+            headers.update({"Range": f"bytes={offset}-", "If-Range": validator})
+        else:
+            offset = 0
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and offset:
+                # Nothing left to send: the partial file may already be complete
+                length = response.headers.get("Content-Range", "").rpartition("/")[2]
+                if length.isdigit() and int(length) == offset:
+                    return self._store(url, partial, meta.get("content_type"), offset)
+                os.remove(partial)
+                raise ValueError("Requested range not satisfiable, restarting the download")
+            response.raise_for_status()
+
+            if response.status_code == 206:
+                start = response.headers.get("Content-Range", "").partition(" ")[2].partition("-")[0]
+                if start != str(offset):
+                    raise ValueError(f"Server resumed at byte {start or '?'} instead of {offset}")
+            else:
+                # The server sent the whole document
+                offset = 0
+                meta = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "content_type": response.headers.get("Content-Type"),
+                }
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+
+            expected = response.headers.get("Content-Length")
+            expected = offset + int(expected) if expected and expected.isdigit() else None
+            with open(partial, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+            size = os.path.getsize(partial)
+            if expected is not None and size != expected:
+                raise ValueError(f"Transfer ended after {size} of {expected} bytes")
+
+        return self._store(url, partial, meta.get("content_type"), offset)
+
+    def _store(self, url: str, partial: str, content_type: Optional[str], resumed: int) -> Dict[str, Any]:
+        """Move a finished download to its content-addressed path"""
+        digest = hashlib.sha256()
+        with open(partial, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        size = os.path.getsize(partial)
+        path = self.stored_path(sha256, _extension(url, content_type))
+
+        with self._lock:
+            duplicate = os.path.exists(path)
+            if duplicate:
+                os.remove(partial)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(partial, path)
+        if os.path.exists(partial + ".json"):
+            os.remove(partial + ".json")
+
+        entry = {
+            "url": url,
+            "path": path,
+            "sha256": sha256,
+            "size": size,
+            "content_type": content_type,
+            "fetched": datetime.now().isoformat(timespec="seconds"),
+        }
+        self._record(entry)
+        return dict(entry, status=DUPLICATE if duplicate else DOWNLOADED, resumed=resumed)
+
+    def fetch_all(self, urls: Iterable[str], force: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Download documents concurrently
+
+        Args:
+            urls (Iterable[str]): Document URLs (duplicates are fetched once)
+            force (bool): Download documents already in the manifest again
+
+        Yields:
+            Dict[str, Any]: The outcome of each URL (see fetch), as downloads finish
+        """
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return
+
+        # Queue URLs per host and only hand one to the pool when its host has a
+        # free slot (fetch still takes the host's semaphore, which only blocks
+        # if another caller is downloading from the same host)
+        pending: Dict[str, deque] = {}
+        for url in urls:
+            pending.setdefault(_host(url), deque()).append(url)
+        active = dict.fromkeys(pending, 0)
+        workers = min(self.max_workers, len(urls))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            running: Dict[concurrent.futures.Future, str] = {}
+
+            def schedule():
+                for host, queue in pending.items():
+                    while queue and active[host] < self.per_host and len(running) < workers:
+                        running[executor.submit(self.fetch, queue.popleft(), force)] = host
+                        active[host] += 1
+
+            schedule()
+            while running:
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    active[running.pop(future)] -= 1
+                # Start the next downloads before handing results to the caller
+                schedule()
+                for future in done:
+                    yield future.result()
+
+    def fetch_results(self, results: Iterable[Dict[str, Any]], force: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Download the documents linked from search results
+
+        Args:
+            results (Iterable[Dict[str, Any]]): Search results (see document_links)
+            force (bool): Download documents already in the manifest again
+
+        Yields:
+            Dict[str, Any]: The outcome of each document (see fetch), as downloads
+                finish, with the "result_id" of the first result linking to it
+        """
+        result_ids = {}
+        for result in results:
+            for url in document_links(result):
+                result_ids.setdefault(url, result.get("id"))
+        for download in self.fetch_all(result_ids, force):
+            download["result_id"] = result_ids[download["url"]]
+            yield download
+
+    def get_path(self, url: str) -> Optional[str]:
+        """
+        Get the stored file of a downloaded URL
+
+        Args:
+            url (str): Document URL
+
+        Returns:
+            Optional[str]: File path, or None if the URL was not downloaded
+        """
+        with self._lock:
+            entry = self._manifest.get(url)
+        return entry["path"] if entry and os.path.exists(entry["path"]) else None
+
+    def close(self):
+        """Close the HTTP session"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def fetch_documents(results: Iterable[Dict[str, Any]], directory: str = DEFAULT_DOCUMENTS_DIR,
+                    max_workers: int = DEFAULT_MAX_WORKERS, per_host: int = DEFAULT_PER_HOST,
+                    force: bool = False) -> List[Dict[str, Any]]:
+    """
+    Download the documents linked from search results
+
+    Args:
+        results (Iterable[Dict[str, Any]]): Search results
+        directory (str): Directory documents are stored in
+        max_workers (int): Maximum number of concurrent downloads
+        per_host (int): Maximum number of concurrent downloads from one host
+        force (bool): Download documents already in the manifest again
+
+    Returns:
+        List[Dict[str, Any]]: The outcome of each document (see DocumentFetcher.fetch)
+    """
+    with DocumentFetcher(directory, max_workers, per_host) as fetcher:
+        return list(fetcher.fetch_results(results, force))
+
+
+def main():
+    """
+    Main function
+    """
+    parser = argparse.ArgumentParser(description="Download the documents linked from search results")
+    parser.add_argument("results", nargs="+", help="Results files (.json or .ndjson)")
+    parser.add_argument("--dir", default=DEFAULT_DOCUMENTS_DIR, help="Directory documents are stored in")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="Maximum concurrent downloads")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST,
+                        help="Maximum concurrent downloads from one host")
+    parser.add_argument("--force", action="store_true", help="Download documents already downloaded again")
+    args = parser.parse_args()
+
+    def results():
+        for path in args.results:
+            yield from iter_results(path)
+
+    counts = {}
+    start = time.perf_counter()
+    with DocumentFetcher(args.dir, args.workers, args.per_host) as fetcher:
+        for download in fetcher.fetch_results(results(), args.force):
+            counts[download["status"]] = counts.get(download["status"], 0) + 1
+            if download["status"] == FAILED:
+                logger.error(f"Failed: {download['url']} ({download['error']})")
+            else:
+                logger.info(f"{download['status']}: {download['url']} -> {download['path']}")
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items())) or "no documents linked"
+    logger.info(f"{summary} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,669 @@
+#!/usr/bin/env python
+"""
+Local Regulator Document Index
+
+Extracts the text of downloaded regulator documents (see document_fetcher.py)
+and indexes it by section, so contraindications, dosing and the other parts
+of an SPC, PI, CMI or PIL are searched locally without opening each PDF.
+
+1. Text is extracted page by page in a process pool, with the fastest
+   installed PDF library (PyMuPDF, pypdf or pdfminer.six; none of them is
+   required by the rest of the package)
+2. Each document is split into sections at its headings (numbered SPC/PI
+   headings such as "4.3 Contraindications", all-caps headings and the
+   common CMI/PIL headings)
+3. Sections are written to a SQLite index (documents.db, or
+   $MEDSEARCH_DOCUMENT_INDEX_DB) with an FTS5 index over heading and text
+
+Documents are identified by the SHA-256 of their content, which the
+document fetcher's manifest already records; documents whose hash is already
+indexed are skipped, so only new or changed files are extracted again.
+
+Usage:
+    with DocumentIndex() as index:
+        stats = index.ingest_directory("documents")
+        print(f"{stats['pages_per_second']:.0f} pages/s")
+        results = index.search("contraindications pregnancy", max_results=10)
+
+From the command line:
+    python document_index.py ingest documents --workers 4
+    python document_index.py search "renal impairment"
+    python document_index.py stats
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+# PDF libraries are optional; the fastest installed one is used
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf  # PyMuPDF before 1.24
+    except ImportError:
+        pymupdf = None
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+try:
+    from pdfminer.high_level import extract_pages as pdfminer_extract_pages
+    from pdfminer.layout import LTTextContainer
+except ImportError:
+    pdfminer_extract_pages = None
+
+# Import the full-text query builder and the document store layout
+try:
+    from result_store import fts_query
+    from document_fetcher import DEFAULT_DOCUMENTS_DIR, MANIFEST_NAME, PARTIAL_DIR
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from result_store import fts_query
+    from document_fetcher import DEFAULT_DOCUMENTS_DIR, MANIFEST_NAME, PARTIAL_DIR
+
+# Set up logging
+logger = logging.getLogger("document_index")
+
+# Database file (override with the MEDSEARCH_DOCUMENT_INDEX_DB environment variable)
+DEFAULT_DB_PATH = os.environ.get(
+    "MEDSEARCH_DOCUMENT_INDEX_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "documents.db")
+)
+
+# PDF libraries in order of preference when "auto" is selected (override with
+# the MEDSEARCH_PDF_BACKEND environment variable)
+BACKEND_PREFERENCE = ["pymupdf", "pypdf", "pdfminer"]
+DEFAULT_BACKEND = os.environ.get("MEDSEARCH_PDF_BACKEND", "auto")
+
+# Extraction processes (defaults to the number of CPUs)
+DEFAULT_MAX_WORKERS = None
+
+# Maximum number of results returned by one search
+MAX_RESULTS = 1000
+
+# Weights of the heading and text columns in the bm25() ranking
+FTS_WEIGHTS = (5.0, 1.0)
+
+# Longest line that can be a heading
+MAX_HEADING_LENGTH = 100
+
+# Numbered SPC/PI headings: "4.3 Contraindications", "4.4. Special warnings ..."
+NUMBERED_HEADING_PATTERN = re.compile(r"^(\d{1,2}(?:\.\d{1,2}){0,2})\.?\s+([A-Z][^.:;]*[A-Za-z)])$")
+
+# Unnumbered headings of CMI/PIL leaflets and PIs, matched case-insensitively
+KNOWN_HEADINGS = {
+    "indications", "contraindications", "dosage and administration", "warnings and precautions",
+    "precautions", "interactions", "adverse effects", "adverse reactions", "side effects",
+    "overdose", "overdosage", "storage", "pregnancy", "breast-feeding", "lactation",
+    "what is in this leaflet", "before you take it", "before you use it", "how to take it",
+    "how to use it", "while you are taking it", "while you are using it", "product description",
+    "further information", "possible side effects", "how to store",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    sha256 TEXT PRIMARY KEY,
+    path TEXT,
+    urls TEXT,
+    title TEXT,
+    pages INTEGER,
+    sections INTEGER,
+    backend TEXT,
+    indexed_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS sections (
+    sha256 TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    heading TEXT,
+    page INTEGER,
+    text TEXT,
+    PRIMARY KEY (sha256, position)
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS sections_fts USING fts5(
+    heading, text,
+    content='sections', content_rowid='rowid',
+    tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS sections_fts_insert AFTER INSERT ON sections BEGIN
+    INSERT INTO sections_fts(rowid, heading, text) VALUES (new.rowid, new.heading, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS sections_fts_delete AFTER DELETE ON sections BEGIN
+    INSERT INTO sections_fts(sections_fts, rowid, heading, text) VALUES ('delete', old.rowid, old.heading, old.text);
+END;
+"""
+
+
+def available_backends() -> List[str]:
+    """
+    Get the installed PDF libraries
+
+    Returns:
+        List[str]: Installed backend names, fastest first
+    """
+    installed = {"pymupdf": pymupdf, "pypdf": pypdf, "pdfminer": pdfminer_extract_pages}
+    return [name for name in BACKEND_PREFERENCE if installed[name] is not None]
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """
+    Resolve a backend name to an installed PDF library
+
+    Args:
+        backend (Optional[str]): Requested backend, "auto" or None for the default
+
+    Returns:
+        str: Name of an installed backend
+
+    Raises:
+        RuntimeError: If no PDF library is installed
+    """
+    backend = backend or DEFAULT_BACKEND
+    installed = available_backends()
+    if not installed:
+        raise RuntimeError("No PDF library is installed; install pymupdf, pypdf or pdfminer.six")
+    if backend != "auto":
+        if backend in installed:
+            return backend
+        logger.warning(f"PDF backend '{backend}' is not installed, using the fastest available one")
+    return installed[0]
+
+
+def extract_pages(path: str, backend: str) -> Dict[str, Any]:
+    """
+    Extract the text of every page of a PDF
+
+    Args:
+        path (str): PDF file
+        backend (str): Installed backend (see resolve_backend)
+
+    Returns:
+        Dict[str, Any]: "pages" (text per page) and "title" (from the document
+            metadata, if set)
+    """
+    if backend == "pymupdf":
+        with pymupdf.open(path) as document:
+            return {"pages": [page.get_text() for page in document],
+                    "title": (document.metadata or {}).get("title") or ""}
+    if backend == "pypdf":
+        reader = pypdf.PdfReader(path)
+        metadata = reader.metadata
+        return {"pages": [page.extract_text() or "" for page in reader.pages],
+                "title": (metadata.title if metadata else None) or ""}
+    if backend == "pdfminer":
+        pages = []
+        for layout in pdfminer_extract_pages(path):
+            pages.append("".join(element.get_text() for element in layout if isinstance(element, LTTextContainer)))
+        return {"pages": pages, "title": ""}
+    raise ValueError(f"Unknown PDF backend '{backend}'")
+
+
+def heading_of(line: str) -> Optional[str]:
+    """
+    Check whether a line of extracted text is a section heading
+
+    Args:
+        line (str): Line, stripped
+
+    Returns:
+        Optional[str]: The heading, or None if the line is body text
+    """
+    if not line or len(line) > MAX_HEADING_LENGTH:
+        return None
+    if NUMBERED_HEADING_PATTERN.match(line) and len(line.split()) <= 12:
+        return line
+    name = line.rstrip(":").strip()
+    if name.lower() in KNOWN_HEADINGS:
+        return name
+    letters = [char for char in name if char.isalpha()]
+    if len(letters) >= 4 and name.isupper() and len(name.split()) <= 10:
+        return name
+    return None
+
+
+def split_sections(pages: List[str]) -> List[Dict[str, Any]]:
+    """
+    Split the text of a document into sections at its headings
+
+    Text before the first heading becomes a section without a heading;
+    headings followed directly by another heading (such as "4 CLINICAL
+    PARTICULARS") do not make a section of their own.
+
+    Args:
+        pages (List[str]): Text of each page
+
+    Returns:
+        List[Dict[str, Any]]: Sections with their "heading", "page" (1-based page
+            the section starts on) and "text"
+    """
+    sections = []
+    heading, page_number, lines = "", 1, []
+
+    def close():
+        text = "\n".join(lines).strip()
+        if text:
+            sections.append({"heading": heading, "page": page_number, "text": text})
+
+    for number, page in enumerate(pages, 1):
+        for raw in page.splitlines():
+            line = " ".join(raw.split())
+            found = heading_of(line)
+            if found is None:
+                if line:
+                    lines.append(line)
+                continue
+            close()
+            heading, page_number, lines = found, number, []
+    close()
+    return sections
+
+
+def extract_document(path: str, backend: str) -> Dict[str, Any]:
+    """
+    Extract a document and split it into sections (runs in a worker process)
+
+    Args:
+        path (str): Document file
+        backend (str): Installed PDF backend
+
+    Returns:
+        Dict[str, Any]: "title", "pages" (page count), "sections" and "seconds",
+            or "error" if the document could not be read
+    """
+    start = time.perf_counter()
+    try:
+        extracted = extract_pages(path, backend)
+    except Exception as e:
+        # Errors of the PDF libraries are not always picklable, so pass on the message
+        return {"error": f"{type(e).__name__}: {e}"}
+    sections = split_sections(extracted["pages"])
+    title = extracted["title"].strip()
+    if not title and sections:
+        title = sections[0]["text"].split("\n", 1)[0][:MAX_HEADING_LENGTH]
+    return {
+        "title": title or os.path.basename(path),
+        "pages": len(extracted["pages"]),
+        "sections": sections,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_documents(directory: str) -> List[Dict[str, Any]]:
+    """
+    List the PDFs in a directory
+
+    For a document fetcher directory, the manifest gives each file's hash and
+    the URLs it was downloaded from; other directories are searched for PDF
+    files.
+
+    Args:
+        directory (str): Document directory
+
+    Returns:
+        List[Dict[str, Any]]: Documents with their "path", "sha256" (None if not
+            known yet) and "urls"
+    """
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        latest = {}
+        with open(manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                latest[entry["url"]] = entry
+        documents = {}
+        for url, entry in latest.items():
+            if not entry["path"].lower().endswith(".pdf") or not os.path.exists(entry["path"]):
+                continue
+            document = documents.setdefault(entry["sha256"], {"path": entry["path"], "sha256": entry["sha256"],
+                                                              "urls": []})
+            document["urls"].append(url)
+        return list(documents.values())
+
+    documents = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(name for name in dirs if name != PARTIAL_DIR)
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                documents.append({"path": os.path.join(root, name), "sha256": None, "urls": []})
+    return documents
+
+
+class DocumentIndex:
+    """
+    SQLite full-text index of document sections
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Open the index, creating the database if needed
+
+        Args:
+            path (Optional[str]): Database file (defaults to DEFAULT_DB_PATH)
+        """
+        self.path = path or DEFAULT_DB_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        # One connection shared by the threads of a process, guarded by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _indexed(self, sha256: str) -> Optional[sqlite3.Row]:
+        """Get the documents row of an indexed hash"""
+        with self._lock:
+            return self._conn.execute("SELECT sha256, urls FROM documents WHERE sha256 = ?", (sha256,)).fetchone()
+
+    def _write_document(self, document: Dict[str, Any], extracted: Dict[str, Any], backend: str):
+        """Replace the sections of a document in one transaction"""
+        sha256 = document["sha256"]
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM sections WHERE sha256 = ?", (sha256,))
+                self._conn.executemany(
+                    "INSERT INTO sections (sha256, position, heading, page, text) VALUES (?, ?, ?, ?, ?)",
+                    [(sha256, position, section["heading"], section["page"], section["text"])
+                     for position, section in enumerate(extracted["sections"])]
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (sha256, path, urls, title, pages, sections, backend, indexed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (sha256, document["path"], json.dumps(document["urls"]), extracted["title"],
+                     extracted["pages"], len(extracted["sections"]), backend, time.time())
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def _update_urls(self, sha256: str, stored: sqlite3.Row, urls: List[str]):
+        """Add newly seen download URLs to an indexed document"""
+        known = json.loads(stored["urls"] or "[]")
+        merged = list(dict.fromkeys(known + urls))
+        if merged != known:
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE documents SET urls = ? WHERE sha256 = ?", (json.dumps(merged), sha256))
+
+    def ingest(self, documents: Iterable[Dict[str, Any]], force: bool = False,
+               max_workers: Optional[int] = DEFAULT_MAX_WORKERS, backend: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Extract and index documents in a process pool
+
+        Documents whose content hash is already indexed are skipped. Each
+        document is written in its own transaction as soon as it is extracted.
+
+        Args:
+            documents (Iterable[Dict[str, Any]]): Documents (see find_documents)
+            force (bool): Extract documents again even if their hash is indexed
+            max_workers (Optional[int]): Extraction processes (defaults to the number of CPUs)
+            backend (Optional[str]): PDF library, "auto" or None for the default
+
+        Returns:
+            Dict[str, Any]: Number of "documents" indexed, "skipped" and "failed",
+                the "pages" and "sections" indexed, "seconds" and "pages_per_second"
+        """
+        backend = resolve_backend(backend)
+        stats = {"documents": 0, "skipped": 0, "failed": 0, "pages": 0, "sections": 0}
+        start = time.perf_counter()
+
+        pending = []
+        for document in documents:
+            document = dict(document, sha256=document.get("sha256") or file_sha256(document["path"]))
+            stored = self._indexed(document["sha256"])
+            if stored and not force:
+                self._update_urls(document["sha256"], stored, document.get("urls") or [])
+                stats["skipped"] += 1
+                continue
+            pending.append(document)
+
+        if pending:
+            max_workers = min(max_workers or os.cpu_count() or 1, len(pending))
+            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(extract_document, document["path"], backend): document
+                           for document in pending}
+                for future in concurrent.futures.as_completed(futures):
+                    document = futures[future]
+                    try:
+                        extracted = future.result()
+                    except Exception as e:
+                        extracted = {"error": str(e)}
+                    if "error" in extracted:
+                        logger.error(f"  Error extracting {document['path']}: {extracted['error']}")
+                        stats["failed"] += 1
+                        continue
+                    self._write_document(document, extracted, backend)
+                    stats["documents"] += 1
+                    stats["pages"] += extracted["pages"]
+                    stats["sections"] += len(extracted["sections"])
+
+            with self._lock:
+                self._conn.execute("INSERT INTO sections_fts(sections_fts) VALUES ('optimize')")
+                self._conn.commit()
+
+        stats["seconds"] = time.perf_counter() - start
+        stats["pages_per_second"] = stats["pages"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+        logger.info(f"  Indexed {stats['documents']} documents ({stats['pages']} pages, {stats['sections']} sections) "
+                    f"in {stats['seconds']:.1f}s, {stats['pages_per_second']:.1f} pages/s; "
+                    f"skipped {stats['skipped']} unchanged, {stats['failed']} failed")
+        return stats
+
+    def ingest_directory(self, directory: str = DEFAULT_DOCUMENTS_DIR, force: bool = False,
+                         max_workers: Optional[int] = DEFAULT_MAX_WORKERS,
+                         backend: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Extract and index the PDFs of a directory (see find_documents and ingest)
+
+        For a document fetcher directory, documents no URL points to any more
+        (replaced by a newer download) are removed from the index.
+
+        Args:
+            directory (str): Document directory
+            force (bool): Extract documents again even if their hash is indexed
+            max_workers (Optional[int]): Extraction processes (defaults to the number of CPUs)
+            backend (Optional[str]): PDF library, "auto" or None for the default
+
+        Returns:
+            Dict[str, Any]: Ingest statistics (see ingest), with the number of "removed" documents
+        """
+        documents = find_documents(directory)
+        stats = self.ingest(documents, force, max_workers, backend)
+        stats["removed"] = 0
+        if os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+            current = {document["sha256"] for document in documents}
+            prefix = os.path.join(os.path.abspath(directory), "")
+            with self._lock, self._conn:
+                stale = [row["sha256"] for row in self._conn.execute("SELECT sha256, path FROM documents")
+                         if os.path.abspath(row["path"]).startswith(prefix) and row["sha256"] not in current]
+                for sha256 in stale:
+                    self._conn.execute("DELETE FROM sections WHERE sha256 = ?", (sha256,))
+                    self._conn.execute("DELETE FROM documents WHERE sha256 = ?", (sha256,))
+            stats["removed"] = len(stale)
+        return stats
+
+    def search(self, query: str, max_results: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Search document sections
+
+        All terms of the query must match the heading or text of a section.
+        Sections are ranked by BM25, matches in the heading first.
+
+        Args:
+            query (str): The search query ("quoted phrases" are matched as phrases)
+            max_results (int): Maximum number of results to return
+            offset (int): Number of matching sections to skip
+
+        Returns:
+            List[Dict[str, Any]]: Search results, one per section, linking to the
+                page of the document the section starts on
+        """
+        match = fts_query(query or "")
+        if not match:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT s.sha256, s.position, s.heading, s.page, d.title, d.path, d.urls,
+                       snippet(sections_fts, 1, '', '', '...', 40) AS snippet
+                FROM sections_fts CROSS JOIN sections s ON s.rowid = sections_fts.rowid
+                JOIN documents d ON d.sha256 = s.sha256
+                WHERE sections_fts MATCH ?
+                ORDER BY bm25(sections_fts, {', '.join(str(weight) for weight in FTS_WEIGHTS)})
+                LIMIT ? OFFSET ?
+                """,
+                (match, max(1, min(int(max_results), MAX_RESULTS)), max(0, int(offset)))
+            ).fetchall()
+
+        results = []
+        for row in rows:
+            urls = json.loads(row["urls"] or "[]")
+            url = f"{urls[0]}#page={row['page']}" if urls else row["path"]
+            results.append({
+                "id": f"document-{row['sha256'][:16]}-{row['position']}",
+                "title": f"{row['title']} - {row['heading']}" if row["heading"] else row["title"],
+                "url": url,
+                "source": "Regulator documents",
+                "date": "",
+                "snippet": row["snippet"],
+                "authors": [],
+                "additional_data": {
+                    "sha256": row["sha256"],
+                    "path": row["path"],
+                    "page": row["page"],
+                    "heading": row["heading"],
+                    "urls": urls,
+                },
+            })
+        return results
+
+    def get_sections(self, sha256: str) -> List[Dict[str, Any]]:
+        """
+        Get the sections of an indexed document, in order
+
+        Args:
+            sha256 (str): Content hash of the document
+
+        Returns:
+            List[Dict[str, Any]]: Sections with their "heading", "page" and "text"
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT heading, page, text FROM sections WHERE sha256 = ? ORDER BY position", (sha256,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Count indexed documents, pages and sections
+
+        Returns:
+            Dict[str, Any]: Number of documents, pages and sections, and documents per backend
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS documents, COALESCE(SUM(pages), 0) AS pages, "
+                "COALESCE(SUM(sections), 0) AS sections FROM documents"
+            ).fetchone()
+            backends = self._conn.execute(
+                "SELECT backend, COUNT(*) AS count FROM documents GROUP BY backend ORDER BY count DESC"
+            ).fetchall()
+        return dict(row, backends={backend["backend"]: backend["count"] for backend in backends})
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main():
+    """
+    Main function
+    """
+    parser = argparse.ArgumentParser(description="Extract, index and search downloaded regulator documents")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Document index database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Extract and index downloaded documents")
+    ingest_parser.add_argument("paths", nargs="*", default=[DEFAULT_DOCUMENTS_DIR],
+                               help="Document directories or PDF files (defaults to the download directory)")
+    ingest_parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                               help="Extraction processes (defaults to the number of CPUs)")
+    ingest_parser.add_argument("--backend", choices=["auto"] + BACKEND_PREFERENCE, default=None,
+                               help="PDF library to extract text with")
+    ingest_parser.add_argument("--force", action="store_true", help="Extract documents again even if unchanged")
+
+    search_parser = subparsers.add_parser("search", help="Search indexed document sections")
+    search_parser.add_argument("query", help='Search text ("quoted phrases" are kept together)')
+    search_parser.add_argument("--max-results", type=int, default=10, help="Maximum number of results")
+    search_parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+
+    subparsers.add_parser("stats", help="Count indexed documents")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    with DocumentIndex(args.db) as index:
+        if args.command == "ingest":
+            for path in args.paths:
+                if os.path.isdir(path):
+                    stats = index.ingest_directory(path, args.force, args.workers, args.backend)
+                else:
+                    stats = index.ingest([{"path": path, "sha256": None, "urls": []}], args.force,
+                                         args.workers, args.backend)
+                print(f"{path}: {stats['documents']} documents, {stats['pages']} pages in {stats['seconds']:.1f}s "
+                      f"({stats['pages_per_second']:.1f} pages/s), {stats['skipped']} unchanged, "
+                      f"{stats['failed']} failed")
+        elif args.command == "search":
+            start = time.perf_counter()
+            results = index.search(args.query, args.max_results)
+            elapsed = (time.perf_counter() - start) * 1000
+            if args.json:
+                print(json.dumps(results, indent=2))
+            else:
+                print(f"{len(results)} results ({elapsed:.1f} ms):")
+                for result in results:
+                    print(f"  {result['title']}")
+                    print(f"      {result['url']}")
+                    print(f"      {result['snippet']}")
+        elif args.command == "stats":
+            print(json.dumps(index.get_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
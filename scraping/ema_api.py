@@ -10,16 +10,76 @@ and structured web scraping.
 
 import requests
 import time
-from datetime import datetime
 from urllib.parse import quote_plus, urljoin
 import json
-from bs4 import BeautifulSoup
+import os
+import sys
+
+# Import the shared date normalizer, HTML parsing backend, result ids, page cursors and response archive
+try:
+    from date_utils import to_iso_date, is_within_range
+    from result_record import stable_id, FailedSearch
+    from html_parsing import make_container_soup, find_document_links
+    from page_cursor import encode_cursor, decode_cursor
+    from response_archive import archive_response
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from date_utils import to_iso_date, is_within_range
+    from result_record import stable_id, FailedSearch
+    from html_parsing import make_container_soup, find_document_links
+    from page_cursor import encode_cursor, decode_cursor
+    from response_archive import archive_response
 
 # Base URLs for EMA
 EMA_SEARCH_URL = "https://www.ema.europa.eu/en/medicines/api/medicines"
 EMA_BASE_URL = "https://www.ema.europa.eu"
 
-def search_ema_medicines(query, max_results=10, min_date=None, max_date=None, retries=3):
+def count_ema_medicines(query, min_date=None, max_date=None, timeout=10):
+    """
+    Count the EMA medicines matching a query without fetching them
+    
+    Requests a single item and reads the total from the X-Total-Count header
+    or the pager of the response. The API cannot filter by date
+    (search_ema_medicines filters the results it receives), so the count
+    covers all dates.
+    
+    Args:
+        query (str): The search query
+        min_date (str): Ignored, see above
+        max_date (str): Ignored, see above
+        timeout (float): Request timeout in seconds
+        
+    Returns:
+        int: Number of matching medicines, or None if the API does not report a total
+    """
+    count_url = f"{EMA_SEARCH_URL}?search_api_fulltext={quote_plus(query)}&items_per_page=1"
+    headers = {
+        "Accept": "application/json, text/plain, */*",
+        "Referer": "https://www.ema.europa.eu/en/medicines",
+        "Origin": "https://www.ema.europa.eu"
+    }
+    response = requests.get(count_url, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    
+    total = response.headers.get("X-Total-Count")
+    if total and total.isdigit():
+        return int(total)
+    try:
+        search_results = response.json()
+    except json.JSONDecodeError:
+        return None
+    if isinstance(search_results, dict):
+        pager = search_results.get("pager") or {}
+        for value in (pager.get("total_items"), search_results.get("total"), search_results.get("count")):
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+            if isinstance(value, str) and value.isdigit():
+                return int(value)
+    return None
+
+def search_ema_medicines(query, max_results=10, min_date=None, max_date=None, retries=3, page=0, page_info=None):
     """
     Search EMA medicines database
     
@@ -29,6 +89,9 @@ def search_ema_medicines(query, max_results=10, min_date=None, max_date=None, re
         min_date (str): Minimum date in format YYYY-MM-DD
         max_date (str): Maximum date in format YYYY-MM-DD
         retries (int): Number of retries if the API call fails
+        page (int): Page of max_results results to return (from 0, like the site's pager)
+        page_info (dict): Receives the number of results "received" before
+            the date filter and the "total" matches, if the search succeeded
         
     Returns:
         list: List of search results
@@ -37,6 +100,8 @@ def search_ema_medicines(query, max_results=10, min_date=None, max_date=None, re
     
     # Build the search URL with parameters
     search_url = f"{EMA_SEARCH_URL}?search_api_fulltext={quote_plus(query)}&items_per_page={max_results}"
+    if page:
+        search_url += f"&page={page}"
     
     # Make the search request with retries
     for attempt in range(retries):
@@ -54,98 +119,27 @@ def search_ema_medicines(query, max_results=10, min_date=None, max_date=None, re
             
             response = requests.get(search_url, headers=headers)
             response.raise_for_status()
+            archive_response(response, "ema-medicines", {"query": query, "max_results": max_results,
+                                                         "min_date": min_date, "max_date": max_date})
             
             # Check if the response is JSON
             try:
                 search_results = response.json()
             except json.JSONDecodeError:
                 print("  Response is not JSON, trying to parse HTML")
-                return parse_ema_html_results(response.text, query, max_results)
-            
-            # Process JSON results
-            results = []
+                return _html_page(response.text, query, max_results, page_info)
             
             # Check if we have results in the expected format
             if not isinstance(search_results, list):
                 print("  Unexpected JSON format, trying to parse HTML")
-                return parse_ema_html_results(response.text, query, max_results)
+                return _html_page(response.text, query, max_results, page_info)
             
-            for medicine in search_results:
-                try:
-                    # Extract basic information
-                    title = medicine.get('title', '')
-                    url = urljoin(EMA_BASE_URL, medicine.get('url', ''))
-                    
-                    # Extract date
-                    date = ""
-                    if 'field_authorisation_date' in medicine:
-                        date_str = medicine['field_authorisation_date']
-                        # Convert to YYYY-MM-DD format if needed
-                        if date_str:
-                            try:
-                                # Parse various date formats
-                                date_formats = [
-                                    "%Y-%m-%d",
-                                    "%d/%m/%Y",
-                                    "%Y%m%d"
-                                ]
-                                
-                                for fmt in date_formats:
-                                    try:
-                                        date_obj = datetime.strptime(date_str, fmt)
-                                        date = date_obj.strftime("%Y-%m-%d")
-                                        break
-                                    except ValueError:
-                                        continue
-                            except Exception:
-                                date = date_str
-                    
-                    # Extract snippet/description
-                    snippet = medicine.get('field_overview', '')
-                    if not snippet:
-                        snippet = medicine.get('field_therapeutic_area', '')
-                    
-                    # Limit snippet length
-                    if len(snippet) > 300:
-                        snippet = snippet[:297] + "..."
-                    
-                    # Extract authors/manufacturers
-                    authors = []
-                    if 'field_authorisation_holder' in medicine:
-                        authors.append(medicine['field_authorisation_holder'])
-                    
-                    # Create the result object
-                    result = {
-                        "id": f"ema-{hash(url) % 10000}",
-                        "title": title,
-                        "url": url,
-                        "source": "EMA - Medicines",
-                        "date": date,
-                        "snippet": snippet,
-                        "authors": authors
-                    }
-                    
-                    # Filter by date if needed
-                    if min_date or max_date:
-                        if not date:
-                            # Include results without dates
-                            results.append(result)
-                        else:
-                            try:
-                                result_date = datetime.strptime(date, "%Y-%m-%d")
-                                min_date_obj = datetime.strptime(min_date, "%Y-%m-%d") if min_date else datetime(1900, 1, 1)
-                                max_date_obj = datetime.strptime(max_date, "%Y-%m-%d") if max_date else datetime.now()
-                                
-                                if min_date_obj <= result_date <= max_date_obj:
-                                    results.append(result)
-                            except ValueError:
-                                # Include results with unparseable dates
-                                results.append(result)
-                    else:
-                        results.append(result)
-                except Exception as e:
-                    print(f"  Error processing medicine result: {str(e)}")
-                    continue
+            if page_info is not None:
+                total = response.headers.get("X-Total-Count")
+                page_info["received"] = len(search_results)
+                page_info["total"] = int(total) if total and total.isdigit() else None
+            
+            results = parse_ema_json_results(search_results, min_date, max_date)
             
             print(f"  Found {len(results)} results")
             return results
@@ -158,7 +152,139 @@ def search_ema_medicines(query, max_results=10, min_date=None, max_date=None, re
                 time.sleep(wait_time)
             else:
                 print("  All search attempts failed")
-                return []
+                return FailedSearch(e)
+
+def parse_ema_json_results(search_results, min_date=None, max_date=None):
+    """
+    Build the search results of a JSON EMA search response
+    
+    Args:
+        search_results (list): Medicines of the response
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        
+    Returns:
+        list: List of search results (results without dates are kept)
+    """
+    results = []
+    for medicine in search_results:
+        try:
+            # Extract basic information
+            title = medicine.get('title', '')
+            url = urljoin(EMA_BASE_URL, medicine.get('url', ''))
+            
+            # Extract date
+            date = ""
+            if 'field_authorisation_date' in medicine:
+                date_str = medicine['field_authorisation_date']
+                # Convert to YYYY-MM-DD format if needed
+                if date_str:
+                    date = to_iso_date(date_str)
+
+            # Extract snippet/description
+            snippet = medicine.get('field_overview', '')
+            if not snippet:
+                snippet = medicine.get('field_therapeutic_area', '')
+            
+            # Limit snippet length
+            if len(snippet) > 300:
+                snippet = snippet[:297] + "..."
+            
+            # Extract authors/manufacturers
+            authors = []
+            if 'field_authorisation_holder' in medicine:
+                authors.append(medicine['field_authorisation_holder'])
+            
+            # Create the result object
+            result = {
+                "id": stable_id("ema", None, url, title),
+                "title": title,
+                "url": url,
+                "source": "EMA - Medicines",
+                "date": date,
+                "snippet": snippet,
+                "authors": authors
+            }
+            
+            # Filter by date if needed (results without dates are kept)
+            if is_within_range(date, min_date, max_date):
+                results.append(result)
+        except Exception as e:
+            print(f"  Error processing medicine result: {str(e)}")
+            continue
+    
+    return results
+
+def parse_ema_response(body, query="", max_results=10, min_date=None, max_date=None):
+    """
+    Parse a raw EMA search response as search_ema_medicines does (used to
+    re-parse archived responses, see response_archive.py)
+    
+    Args:
+        body (str): Response body (JSON, or an HTML search page)
+        query (str): The search query
+        max_results (int): Maximum number of results to return
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        
+    Returns:
+        list: List of search results
+    """
+    try:
+        search_results = json.loads(body)
+    except json.JSONDecodeError:
+        return parse_ema_html_results(body, query, max_results)
+    if not isinstance(search_results, list):
+        return parse_ema_html_results(body, query, max_results)
+    return parse_ema_json_results(search_results, min_date, max_date)
+
+def _html_page(html_content, query, max_results, page_info):
+    """Parse an HTML search response, recording what it held in page_info"""
+    results = parse_ema_html_results(html_content, query, max_results)
+    if page_info is not None:
+        page_info["received"] = len(results)
+        page_info["total"] = None
+    return results
+
+def search_ema_medicines_page(query, page_size=10, min_date=None, max_date=None, cursor=None, retries=3):
+    """
+    Get one page of EMA medicines search results
+    
+    The cursor holds the next page number of the site's pager and the page
+    size of the first page, so later pages line up with it.
+    
+    Args:
+        query (str): The search query
+        page_size (int): Number of results per page
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        cursor (str): Cursor returned with the previous page (None for the first page)
+        retries (int): Number of retries if the API call fails
+        
+    Returns:
+        tuple: List of search results and the cursor of the next page (None on the last page)
+    """
+    state = (decode_cursor(cursor, "ema-medicines", query, min_date, max_date) if cursor
+             else {"page": 0, "page_size": page_size})
+    page, page_size = state["page"], state["page_size"]
+    
+    page_info = {}
+    results = search_ema_medicines(query, page_size, min_date, max_date, retries, page=page, page_info=page_info)
+    if "received" not in page_info:
+        raise RuntimeError(f"EMA search for '{query}' failed on page {page}")
+    
+    # Results are filtered by date after they are received, so a page can
+    # come back short (or empty) before the last page
+    total = page_info["total"]
+    if total is not None:
+        more = (page + 1) * page_size < total
+    else:
+        more = page_info["received"] >= page_size
+    next_cursor = None
+    if more:
+        next_cursor = encode_cursor("ema-medicines", {"page": page + 1, "page_size": page_size},
+                                    query, min_date, max_date)
+    return results, next_cursor
 
 def parse_ema_html_results(html_content, query, max_results):
     """
@@ -176,7 +302,8 @@ def parse_ema_html_results(html_content, query, max_results):
     results = []
     
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
+        # Only build the tree for the results container
+        soup = make_container_soup(html_content, ["view-medicines"])
         
         # Find all medicine items
         medicine_items = soup.select('.view-medicines .views-row')
@@ -198,26 +325,10 @@ def parse_ema_html_results(html_content, query, max_results):
                 date_elem = item.select_one('.field--name-field-authorisation-date, .views-field-field-authorisation-date')
                 date = date_elem.get_text().strip() if date_elem else ""
                 
-                # Try to convert to YYYY-MM-DD format
+                # Convert to YYYY-MM-DD format
                 if date:
-                    try:
-                        # Parse various date formats
-                        date_formats = [
-                            "%d/%m/%Y",
-                            "%Y-%m-%d",
-                            "%d %B %Y"
-                        ]
-                        
-                        for fmt in date_formats:
-                            try:
-                                date_obj = datetime.strptime(date, fmt)
-                                date = date_obj.strftime("%Y-%m-%d")
-                                break
-                            except ValueError:
-                                continue
-                    except Exception:
-                        pass
-                
+                    date = to_iso_date(date)
+
                 # Extract snippet
                 snippet_elem = item.select_one('.field--name-field-overview, .views-field-field-overview')
                 snippet = snippet_elem.get_text().strip() if snippet_elem else ""
@@ -239,13 +350,14 @@ def parse_ema_html_results(html_content, query, max_results):
                 
                 # Create the result object
                 result = {
-                    "id": f"ema-{hash(url) % 10000}",
+                    "id": stable_id("ema", None, url, title),
                     "title": title,
                     "url": url,
                     "source": "EMA - Medicines",
                     "date": date,
                     "snippet": snippet,
-                    "authors": authors
+                    "authors": authors,
+                    "documents": find_document_links(item, EMA_BASE_URL)
                 }
                 
                 results.append(result)
@@ -0,0 +1,455 @@
+"""
+Cross-Regulator Product Entity Resolution
+
+The same medicine is returned separately by the FDA, EMA, MHRA and TGA
+searches and by DrugBank, RxNav and ChEMBL, under slightly different names
+("Paracetamol 500mg Film-coated Tablets", "PARACETAMOL tablets",
+"Acetaminophen"). This module clusters product results that describe the same
+product and replaces each cluster with one merged result that lists every
+source it came from.
+
+1. Each product result is reduced to normalized name tokens: the title and the
+   active ingredients the source reports, lowercased, without accents,
+   strengths, dose forms or salt names, with regional spellings unified
+   (acetaminophen -> paracetamol).
+2. A MinHash signature is computed over the character trigrams of those
+   tokens. Signatures are computed for the whole batch at once with NumPy.
+3. Candidates come from locality-sensitive hashing (signature bands) and
+   from a blocking key (the first ingredient or name token). Every record in a
+   bucket is compared with the bucket's representatives with its ingredients
+   (the earlier records that joined none before them), so the number of
+   comparisons grows with the number of strengths of a product in a bucket
+   rather than with the square of the bucket's size.
+4. Candidates whose estimated Jaccard similarity reaches SIMILARITY_THRESHOLD
+   are joined with union-find, but only when their ingredient sets are equal
+   and their strengths do not differ, so a combination product is never
+   merged into one of its single-ingredient products; each cluster becomes
+   one merged result, with an id built from its ingredients and strengths.
+
+Only results from the databases in PRODUCT_DATABASES are resolved; literature
+results (PubMed, journals) are passed through unchanged.
+
+Usage:
+    merged = resolve_entities(results)
+    for result in merged:
+        print(result["title"], [p["database"] for p in result.get("provenance", [])])
+"""
+
+import os
+import re
+import sys
+import unicodedata
+import zlib
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+import numpy as np
+
+# Import the source authority weights and the result id builder
+try:
+    from relevance import source_authority
+    from result_record import stable_id
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from relevance import source_authority
+    from result_record import stable_id
+
+# Databases whose results are products, by the first part of their database ID
+# ("fda" covers "fda-drugs")
+PRODUCT_DATABASES = frozenset({"fda", "ema", "mhra", "tga", "drugbank", "rxnav", "chembl"})
+
+# MinHash signature length and LSH banding (NUM_BANDS x ROWS_PER_BAND = NUM_PERM);
+# 16 bands of 4 rows make pairs above ~0.5 similarity likely candidates
+NUM_PERM = 64
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+
+# Estimated Jaccard similarity at which two products are merged
+SIMILARITY_THRESHOLD = 0.8
+
+# Seed of the MinHash permutations (fixed, so signatures are the same in every run)
+MINHASH_SEED = 1
+
+# Mersenne prime used by the MinHash permutations
+_PRIME = (1 << 31) - 1
+
+# Words that describe strength, form or packaging rather than the product
+FORM_WORDS = frozenset("""
+    tablet tablets capsule capsules caplet caplets film coated filmcoated oral solution
+    suspension injection injectable infusion cream ointment gel syrup powder granules
+    drops spray patch patches lozenge lozenges suppository suppositories chewable
+    dispersible effervescent soluble modified prolonged extended delayed release
+    gastro resistant er xr sr cr la mr for and with in of the mg mcg ug g kg ml l iu
+    unit units dose doses strength solution concentrate pen prefilled syringe vial
+    vials bottle pack blister hard soft plus
+""".split())
+
+# Salt and ester names dropped from ingredient names
+SALT_WORDS = frozenset("""
+    hydrochloride hcl sodium potassium calcium magnesium maleate sulfate sulphate
+    phosphate acetate citrate besylate besilate mesylate mesilate tartrate succinate
+    fumarate bromide chloride monohydrate dihydrate trihydrate hydrobromide
+""".split())
+
+# Regional spellings and names mapped to one form
+SYNONYMS = {
+    "acetaminophen": "paracetamol",
+    "apap": "paracetamol",
+    "albuterol": "salbutamol",
+    "epinephrine": "adrenaline",
+    "norepinephrine": "noradrenaline",
+    "glyburide": "glibenclamide",
+    "meperidine": "pethidine",
+    "aluminum": "aluminium",
+    "cyclosporine": "ciclosporin",
+    "rifampin": "rifampicin",
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]*|[0-9]+[a-z]*")
+_STRENGTH_PATTERN = re.compile(r"^[0-9]+[a-z]*$")
+_ACTIVE_SUBSTANCES_PATTERN = re.compile(r"active (?:substances?|ingredients?):\s*([^.]+)", re.IGNORECASE)
+_STRENGTH_VALUE_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?)\s*(mg|mcg|ug|g|ml|iu|%)(?![a-z])")
+
+# Strength units mapped to one form
+UNIT_SYNONYMS = {"ug": "mcg"}
+
+# Fields of additional_data that name ingredients or alternative names
+INGREDIENT_FIELDS = ("generic_name", "active_ingredients", "synonyms")
+
+# Result fields copied into each provenance entry
+PROVENANCE_FIELDS = ("database", "source", "id", "title", "url", "date")
+
+
+def is_product_result(result: Dict[str, Any]) -> bool:
+    """
+    Check whether a result describes a product (rather than literature)
+
+    Args:
+        result (Dict[str, Any]): Search result
+
+    Returns:
+        bool: True for results from regulator and drug databases
+    """
+    database = (result.get("database") or "").lower()
+    return database.split("-", 1)[0] in PRODUCT_DATABASES
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """
+    Reduce a product or ingredient name to its identifying tokens
+
+    Args:
+        text (str): Product title or ingredient name
+
+    Returns:
+        List[str]: Normalized tokens, in order
+    """
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii").lower()
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text):
+        if token in FORM_WORDS or token in SALT_WORDS or _STRENGTH_PATTERN.match(token):
+            continue
+        tokens.append(SYNONYMS.get(token, token))
+    return tokens
+
+
+def ingredient_tokens(result: Dict[str, Any]) -> List[str]:
+    """
+    Get the normalized active ingredient tokens a product result reports
+
+    Args:
+        result (Dict[str, Any]): Product search result
+
+    Returns:
+        List[str]: Distinct tokens (empty if the source reports no ingredients)
+    """
+    ingredients = []
+    additional = result.get("additional_data") or {}
+    for field in INGREDIENT_FIELDS:
+        value = additional.get(field)
+        if isinstance(value, list):
+            value = " ".join(str(item) for item in value[:5])
+        if value:
+            ingredients.extend(normalize_tokens(str(value)))
+
+    match = _ACTIVE_SUBSTANCES_PATTERN.search(result.get("snippet") or "")
+    if match:
+        ingredients.extend(normalize_tokens(match.group(1)))
+    return list(dict.fromkeys(ingredients))
+
+
+def strength_tokens(text: str) -> FrozenSet[str]:
+    """
+    Get the normalized strengths named in a product title
+
+    Args:
+        text (str): Product title ("Paracetamol and Codeine 500mg/30mg tablets")
+
+    Returns:
+        FrozenSet[str]: Strengths such as "500mg" and "30mg"
+    """
+    strengths = set()
+    for value, unit in _STRENGTH_VALUE_PATTERN.findall((text or "").lower()):
+        value = value.replace(",", ".")
+        if "." in value:
+            value = value.rstrip("0").rstrip(".")
+        strengths.add(value + UNIT_SYNONYMS.get(unit, unit))
+    return frozenset(strengths)
+
+
+def entity_tokens(result: Dict[str, Any]) -> List[str]:
+    """
+    Get the normalized name and ingredient tokens of a product result
+
+    Ingredients come first (they are what the blocking key is taken from),
+    followed by the title tokens.
+
+    Args:
+        result (Dict[str, Any]): Product search result
+
+    Returns:
+        List[str]: Distinct tokens
+    """
+    return list(dict.fromkeys(ingredient_tokens(result) + normalize_tokens(result.get("title") or "")))
+
+
+class _ShingleHasher:
+    """Hashes character trigrams of tokens, caching the hashes of each token"""
+
+    def __init__(self):
+        self._cache = {}
+
+    def __call__(self, token: str) -> List[int]:
+        hashes = self._cache.get(token)
+        if hashes is None:
+            padded = f" {token} "
+            hashes = [zlib.crc32(padded[i:i + 3].encode("ascii")) for i in range(len(padded) - 2)]
+            self._cache[token] = hashes
+        return hashes
+
+
+def minhash_signatures(token_lists: List[List[str]]) -> np.ndarray:
+    """
+    Compute MinHash signatures for several token lists at once
+
+    Args:
+        token_lists (List[List[str]]): Tokens of each record (each list must be non-empty)
+
+    Returns:
+        np.ndarray: uint32 signatures, one row of NUM_PERM values per record
+    """
+    hasher = _ShingleHasher()
+    hashes = []
+    lengths = np.empty(len(token_lists), dtype=np.int64)
+    for position, tokens in enumerate(token_lists):
+        shingles = set()
+        for token in tokens:
+            shingles.update(hasher(token))
+        hashes.extend(shingles)
+        lengths[position] = len(shingles)
+
+    values = np.array(hashes, dtype=np.uint64) % _PRIME
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    rng = np.random.default_rng(MINHASH_SEED)
+    a = rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+
+    # One permutation at a time keeps memory at one value per shingle
+    signatures = np.empty((len(token_lists), NUM_PERM), dtype=np.uint32)
+    for perm in range(NUM_PERM):
+        permuted = (a[perm] * values + b[perm]) % _PRIME
+        signatures[:, perm] = np.minimum.reduceat(permuted, starts)
+    return signatures
+
+
+def _buckets(keys: np.ndarray) -> List[np.ndarray]:
+    """
+    Group records by bucket key
+
+    Args:
+        keys (np.ndarray): Bucket key of each record
+
+    Returns:
+        List[np.ndarray]: Positions of the records of each bucket holding more
+            than one record, in record order
+    """
+    _, bucket, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    bucket = bucket.ravel()
+    positions = np.flatnonzero(counts[bucket] > 1)
+    if not len(positions):
+        return []
+    positions = positions[np.argsort(bucket[positions], kind="stable")]
+    return np.split(positions, np.flatnonzero(np.diff(bucket[positions])) + 1)
+
+
+def product_identity(result: Dict[str, Any]) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """
+    Get what must agree before two product results can be merged
+
+    Args:
+        result (Dict[str, Any]): Product search result
+
+    Returns:
+        Tuple[FrozenSet[str], FrozenSet[str]]: Ingredient tokens (the reported
+            ingredients, or the title tokens if none are reported) and strengths
+    """
+    ingredients = ingredient_tokens(result) or normalize_tokens(result.get("title") or "")
+    return frozenset(ingredients), strength_tokens(result.get("title") or "")
+
+
+def _find(parents: List[int], node: int) -> int:
+    """Find the root of a node in the union-find forest (with path halving)"""
+    while parents[node] != node:
+        parents[node] = parents[parents[node]]
+        node = parents[node]
+    return node
+
+
+def cluster_products(results: List[Dict[str, Any]], threshold: float = SIMILARITY_THRESHOLD) -> List[List[int]]:
+    """
+    Group product results that describe the same product
+
+    Records are only joined when their clusters have equal ingredient sets
+    and the same strengths (a record without strengths joins any strength),
+    so a cluster never mixes products that merely have similar names.
+
+    Args:
+        results (List[Dict[str, Any]]): Product search results
+        threshold (float): Estimated Jaccard similarity at which records are merged
+
+    Returns:
+        List[List[int]]: Clusters of result positions (singletons included), in first-seen order
+    """
+    token_lists = [entity_tokens(result) for result in results]
+    usable = [position for position, tokens in enumerate(token_lists) if tokens]
+    parents = list(range(len(results)))
+    # Identity of each cluster, kept at its root
+    identities = {position: product_identity(results[position]) for position in usable}
+
+    def join(left: int, right: int) -> bool:
+        """Join the clusters of two records if their identities agree"""
+        left_root, right_root = _find(parents, left), _find(parents, right)
+        if left_root == right_root:
+            return True
+        (left_ingredients, left_strengths), (right_ingredients, right_strengths) = (
+            identities[left_root], identities[right_root])
+        if left_ingredients != right_ingredients:
+            return False
+        if left_strengths and right_strengths and left_strengths != right_strengths:
+            return False
+        root, child = min(left_root, right_root), max(left_root, right_root)
+        parents[child] = root
+        identities[root] = (left_ingredients, left_strengths or right_strengths)
+        return True
+
+    if len(usable) > 1:
+        signatures = minhash_signatures([token_lists[position] for position in usable])
+        ingredients = [identities[position][0] for position in usable]
+
+        # Candidate buckets from signature bands and from the blocking key; the
+        # same records often share several bands, so each bucket is kept once
+        buckets = {}
+        for band in range(NUM_BANDS):
+            rows = np.ascontiguousarray(signatures[:, band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])
+            for bucket in _buckets(rows.view(f"V{rows.itemsize * ROWS_PER_BAND}").ravel()):
+                buckets.setdefault(bucket.tobytes(), bucket)
+        block_keys = np.array([token_lists[position][0] for position in usable], dtype=object)
+        for bucket in _buckets(block_keys):
+            buckets.setdefault(bucket.tobytes(), bucket)
+
+        min_matches = threshold * NUM_PERM
+        for bucket in buckets.values():
+            # Records only join records with the same ingredients. A record
+            # that joins none of the representatives with its ingredients (say,
+            # another strength of the product) becomes one for later records.
+            representatives = {}
+            for member in bucket.tolist():
+                candidates = representatives.setdefault(ingredients[member], [])
+                # Representatives already in the member's cluster need no comparison
+                root = _find(parents, usable[member])
+                others = [candidate for candidate in candidates if _find(parents, usable[candidate]) != root]
+                joined = len(others) < len(candidates)
+                if len(others) == 1:
+                    if np.count_nonzero(signatures[others[0]] == signatures[member]) >= min_matches:
+                        joined = join(usable[others[0]], usable[member]) or joined
+                elif others:
+                    matches = np.count_nonzero(signatures[others] == signatures[member], axis=1)
+                    for representative in np.asarray(others)[matches >= min_matches].tolist():
+                        joined = join(usable[representative], usable[member]) or joined
+                if not joined:
+                    candidates.append(member)
+
+    clusters = {}
+    for position in range(len(results)):
+        clusters.setdefault(_find(parents, position), []).append(position)
+    return list(clusters.values())
+
+
+def merge_cluster(cluster: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge the results of one product cluster
+
+    The result from the most authoritative source is kept as the base; the
+    merged result lists every result in "provenance" and combines authors.
+
+    Args:
+        cluster (List[Dict[str, Any]]): Results of the same product
+
+    Returns:
+        Dict[str, Any]: Merged result
+    """
+    if len(cluster) == 1:
+        return cluster[0]
+
+    primary = max(cluster, key=lambda result: source_authority(result))
+    merged = dict(primary)
+    # The id names what the merge required to agree, so clusters of different
+    # strengths of one product get different ids
+    ingredients, _ = product_identity(primary)
+    strengths = next((strengths for strengths in (strength_tokens(result.get("title") or "") for result in cluster)
+                      if strengths), frozenset())
+    merged["id"] = stable_id("product", None, None,
+                             *(sorted(ingredients) or [primary.get("title", "")]), *sorted(strengths))
+    merged["authors"] = list(dict.fromkeys(author for result in cluster for author in result.get("authors") or []))
+    merged["provenance"] = [{field: result.get(field) for field in PROVENANCE_FIELDS if result.get(field)}
+                            for result in cluster]
+    merged["sources"] = list(dict.fromkeys(result.get("source") or result.get("database") for result in cluster))
+
+    scores = [result["relevanceScore"] for result in cluster if isinstance(result.get("relevanceScore"), (int, float))]
+    if scores:
+        merged["relevanceScore"] = max(scores)
+    return merged
+
+
+def resolve_entities(results: List[Dict[str, Any]], threshold: float = SIMILARITY_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Merge product results that describe the same product across sources
+
+    Args:
+        results (List[Dict[str, Any]]): Search results from any databases
+        threshold (float): Estimated Jaccard similarity at which products are merged
+
+    Returns:
+        List[Dict[str, Any]]: Results with each product cluster replaced by one
+        merged result (at the position of its first result)
+    """
+    product_positions = [position for position, result in enumerate(results) if is_product_result(result)]
+    if len(product_positions) < 2:
+        return list(results)
+
+    products = [results[position] for position in product_positions]
+    replacements = {}
+    for cluster in cluster_products(products, threshold):
+        merged = merge_cluster([products[member] for member in cluster])
+        replacements[product_positions[cluster[0]]] = merged
+        for member in cluster[1:]:
+            replacements[product_positions[member]] = None
+
+    merged_results = []
+    for position, result in enumerate(results):
+        replacement = replacements.get(position, result)
+        if replacement is not None:
+            merged_results.append(replacement)
+    return merged_results
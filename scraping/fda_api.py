@@ -4,14 +4,51 @@ FDA API Integration using OpenFDA
 This module provides functions to search the FDA's drug database using the official OpenFDA API
 instead of web scraping, which is more reliable and complies with FDA's terms of service.
 
+Label searches are paged with iter_fda_labels, a generator that requests the
+next page only when the consumer needs more results, so whole label sweeps
+(e.g. every label for an ingredient class) can be streamed without loading
+them all at once. Pages are decoded while the response body is read, keeping
+only the label fields search results are built from (LABEL_FIELDS), so the
+long label sections are never decoded or held in memory.
+
+Safety signals (top adverse reactions, reports and recalls per year, ...)
+come from openFDA's count= aggregation on the adverse event, enforcement
+and NDC endpoints (count_fda, fda_safety_signals), so openFDA computes the
+counts instead of the reports being downloaded. Counts are cached per
+endpoint, query, field and date range.
+
+search_fda_drugs can also answer from a local index of the openFDA bulk
+label download (see fda_label_index.py) instead of the API; the FDA source
+mode (FDA_SOURCE_MODES) selects which.
+
 Documentation: https://open.fda.gov/apis/
 """
 
 import requests
 import time
+import threading
+import concurrent.futures
+from collections import OrderedDict
 from datetime import datetime
 from urllib.parse import quote_plus
 import json
+import os
+import sys
+
+# Import the result id builder, the streaming JSON reader and page cursors
+try:
+    from result_record import stable_id, FailedSearch
+    from json_stream import iter_array, projection
+    from page_cursor import encode_cursor, decode_cursor
+    from response_archive import archiving_stream
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from result_record import stable_id, FailedSearch
+    from json_stream import iter_array, projection
+    from page_cursor import encode_cursor, decode_cursor
+    from response_archive import archiving_stream
 
 # Base URL for OpenFDA API
 OPENFDA_URL = "https://api.fda.gov/drug"
@@ -19,23 +56,88 @@ OPENFDA_URL = "https://api.fda.gov/drug"
 # No API key is required for basic usage, but for higher rate limits you can get one
 # API_KEY = "your_api_key_here"  # Uncomment and add your key for higher rate limits
 
-def search_fda_drugs(query, max_results=10, min_date=None, max_date=None, retries=3):
+# Largest page size openFDA accepts
+MAX_PAGE_SIZE = 1000
+
+# Default number of labels requested per page by iter_fda_labels
+DEFAULT_PAGE_SIZE = 100
+
+# openFDA rejects skip values above this; later pages need the search_after
+# cursor from the Link header
+MAX_SKIP = 25000
+
+# Label fields parse_label and the local label index read; everything else in
+# a label is skipped while the response is decoded
+LABEL_FIELDS = projection([
+    "id", "set_id", "version", "effective_time", "description", "indications_and_usage",
+    "openfda.brand_name", "openfda.generic_name", "openfda.substance_name",
+    "openfda.manufacturer_name", "openfda.application_number",
+])
+
+# Where search_fda_drugs answers label searches from:
+#   api    - the openFDA API
+#   local  - the local label index built by fda_label_index.py
+#   auto   - the local index if labels were ingested, the API otherwise
+FDA_SOURCE_MODES = ("api", "local", "auto")
+
+# Default source mode (override with the MEDSEARCH_FDA_SOURCE environment variable)
+DEFAULT_FDA_SOURCE = os.environ.get("MEDSEARCH_FDA_SOURCE", "api")
+
+# openFDA endpoints count queries can run against: the path, the fields a
+# drug query is matched in, and the date field date ranges apply to
+COUNT_ENDPOINTS = {
+    "event": {
+        "path": "event.json",
+        "search_fields": ["patient.drug.openfda.generic_name", "patient.drug.openfda.brand_name",
+                          "patient.drug.medicinalproduct"],
+        "date_field": "receivedate"
+    },
+    "enforcement": {
+        "path": "enforcement.json",
+        "search_fields": ["openfda.generic_name", "openfda.brand_name", "product_description"],
+        "date_field": "report_date"
+    },
+    "ndc": {
+        "path": "ndc.json",
+        "search_fields": ["generic_name", "brand_name"],
+        "date_field": "marketing_start_date"
+    }
+}
+
+# Safety signals computed by fda_safety_signals: name -> (endpoint, count field).
+# Counts over date fields are returned per day and summed per year
+SAFETY_SIGNALS = {
+    "top_reactions": ("event", "patient.reaction.reactionmeddrapt.exact"),
+    "serious_reports": ("event", "serious"),
+    "reports_per_year": ("event", "receivedate"),
+    "recalls_by_classification": ("enforcement", "classification.exact"),
+    "recalls_per_year": ("enforcement", "report_date"),
+    "ndc_dosage_forms": ("ndc", "dosage_form.exact")
+}
+
+# Number of terms returned by a count query (openFDA allows up to 1000)
+DEFAULT_COUNT_LIMIT = 10
+
+# Seconds count results are cached for (override with the MEDSEARCH_FDA_COUNT_TTL
+# environment variable) and the number of cached count queries
+COUNT_CACHE_TTL = float(os.environ.get("MEDSEARCH_FDA_COUNT_TTL", 24 * 3600))
+COUNT_CACHE_SIZE = 1024
+
+_count_cache = OrderedDict()
+_count_cache_lock = threading.Lock()
+
+def build_label_search(query, min_date=None, max_date=None):
     """
-    Search FDA drug database using the OpenFDA API
+    Build the openFDA label search expression for a query and date range
     
     Args:
         query (str): The search query
-        max_results (int): Maximum number of results to return
         min_date (str): Minimum date in format YYYY-MM-DD
         max_date (str): Maximum date in format YYYY-MM-DD
-        retries (int): Number of retries if the API call fails
         
     Returns:
-        list: List of search results
+        str: Value of the search parameter
     """
-    print(f"Searching FDA drug database for: {query}")
-    
-    # Format the search query for the API
     # Search in various fields for better results
     search_query = f"(generic_name:{quote_plus(query)}+OR+brand_name:{quote_plus(query)}+OR+substance_name:{quote_plus(query)})"
     
@@ -45,92 +147,99 @@ def search_fda_drugs(query, max_results=10, min_date=None, max_date=None, retrie
         max_date_str = max_date if max_date else datetime.now().strftime("%Y-%m-%d")
         search_query += f"+AND+effective_time:[{min_date_str.replace('-', '')} TO {max_date_str.replace('-', '')}]"
     
-    # Build the search URL
-    search_url = f"{OPENFDA_URL}/label.json?search={search_query}&limit={max_results}"
+    return search_query
+
+def parse_label(drug):
+    """
+    Convert an openFDA drug label to a search result
     
-    # Add API key if available
-    # if 'API_KEY' in globals() and API_KEY:
-    #     search_url += f"&api_key={API_KEY}"
+    Args:
+        drug (dict): Label from the results of a label.json response
+        
+    Returns:
+        dict: Search result
+    """
+    # Get basic information
+    openfda = drug.get('openfda', {})
     
-    # Make the search request with retries
+    # Get the brand name
+    brand_names = openfda.get('brand_name', [])
+    brand_name = brand_names[0] if brand_names else ""
+    
+    # Get the generic name
+    generic_names = openfda.get('generic_name', [])
+    generic_name = generic_names[0] if generic_names else ""
+    
+    # Get the manufacturer
+    manufacturers = openfda.get('manufacturer_name', [])
+    manufacturer = manufacturers[0] if manufacturers else ""
+    
+    # Construct a title
+    title = brand_name if brand_name else generic_name
+    if not title:
+        title = "Unnamed Drug"
+    
+    # Get the application number for the URL
+    application_numbers = openfda.get('application_number', [])
+    application_number = application_numbers[0] if application_numbers else ""
+    
+    # Construct a URL
+    url = f"https://www.accessdata.fda.gov/scripts/cder/daf/index.cfm?event=overview.process"
+    if application_number:
+        url += f"&ApplNo={application_number}"
+    
+    # Get the effective date
+    effective_time = drug.get('effective_time', "")
+    date = ""
+    if effective_time and len(effective_time) == 8:
+        # Convert YYYYMMDD to YYYY-MM-DD
+        date = f"{effective_time[:4]}-{effective_time[4:6]}-{effective_time[6:8]}"
+    
+    # Get the description/snippet
+    description = ""
+    if 'description' in drug:
+        description = drug['description'][0] if isinstance(drug['description'], list) else drug['description']
+    elif 'indications_and_usage' in drug:
+        description = drug['indications_and_usage'][0] if isinstance(drug['indications_and_usage'], list) else drug['indications_and_usage']
+    
+    # Create the result object
+    return {
+        "id": stable_id("fda", application_number or drug.get('set_id'), None, title, manufacturer),
+        "title": title,
+        "url": url,
+        "source": "FDA - Drugs",
+        "date": date,
+        "snippet": description[:300] + "..." if len(description) > 300 else description,
+        "authors": [manufacturer] if manufacturer else [],
+        "additional_data": {
+            "brand_name": brand_name,
+            "generic_name": generic_name
+        }
+    }
+
+def _fetch_page(url, retries, session=None, stream=False, timeout=None):
+    """
+    Fetch one page of openFDA results, retrying with exponential backoff
+    
+    Args:
+        url (str): Page URL
+        retries (int): Number of attempts
+        session (requests.Session): Session to send the request with (optional)
+        stream (bool): Leave the body unread, to be streamed from response.raw
+        timeout (float): Request timeout in seconds (None to wait indefinitely)
+        
+    Returns:
+        requests.Response: The response, or None if there are no (more) matches
+    """
     for attempt in range(retries):
         try:
             print(f"  API call attempt {attempt + 1}/{retries}")
-            response = requests.get(search_url)
+            response = (session or requests).get(url, stream=stream, timeout=timeout)
+            # openFDA answers 404 when nothing (or nothing more) matches
+            if response.status_code == 404:
+                return None
             response.raise_for_status()
-            search_results = response.json()
-            
-            # Check if we have results
-            if 'results' not in search_results or not search_results['results']:
-                print("  No results found")
-                return []
-            
-            results = []
-            for drug in search_results['results']:
-                # Extract drug information
-                try:
-                    # Get basic information
-                    openfda = drug.get('openfda', {})
-                    
-                    # Get the brand name
-                    brand_names = openfda.get('brand_name', [])
-                    brand_name = brand_names[0] if brand_names else ""
-                    
-                    # Get the generic name
-                    generic_names = openfda.get('generic_name', [])
-                    generic_name = generic_names[0] if generic_names else ""
-                    
-                    # Get the manufacturer
-                    manufacturers = openfda.get('manufacturer_name', [])
-                    manufacturer = manufacturers[0] if manufacturers else ""
-                    
-                    # Construct a title
-                    title = brand_name if brand_name else generic_name
-                    if not title:
-                        title = "Unnamed Drug"
-                    
-                    # Get the application number for the URL
-                    application_numbers = openfda.get('application_number', [])
-                    application_number = application_numbers[0] if application_numbers else ""
-                    
-                    # Construct a URL
-                    url = f"https://www.accessdata.fda.gov/scripts/cder/daf/index.cfm?event=overview.process"
-                    if application_number:
-                        url += f"&ApplNo={application_number}"
-                    
-                    # Get the effective date
-                    effective_time = drug.get('effective_time', "")
-                    date = ""
-                    if effective_time and len(effective_time) == 8:
-                        # Convert YYYYMMDD to YYYY-MM-DD
-                        date = f"{effective_time[:4]}-{effective_time[4:6]}-{effective_time[6:8]}"
-                    
-                    # Get the description/snippet
-                    description = ""
-                    if 'description' in drug:
-                        description = drug['description'][0] if isinstance(drug['description'], list) else drug['description']
-                    elif 'indications_and_usage' in drug:
-                        description = drug['indications_and_usage'][0] if isinstance(drug['indications_and_usage'], list) else drug['indications_and_usage']
-                    
-                    # Create the result object
-                    result = {
-                        "id": f"fda-{application_number}" if application_number else f"fda-{hash(title) % 10000}",
-                        "title": title,
-                        "url": url,
-                        "source": "FDA - Drugs",
-                        "date": date,
-                        "snippet": description[:300] + "..." if len(description) > 300 else description,
-                        "authors": [manufacturer] if manufacturer else []
-                    }
-                    
-                    results.append(result)
-                except Exception as e:
-                    print(f"  Error processing drug result: {str(e)}")
-                    continue
-            
-            print(f"  Found {len(results)} results")
-            return results
-            
+            return response
         except Exception as e:
             print(f"  Error in search attempt {attempt + 1}: {str(e)}")
             if attempt < retries - 1:
@@ -138,10 +247,517 @@ def search_fda_drugs(query, max_results=10, min_date=None, max_date=None, retrie
                 print(f"  Retrying in {wait_time} seconds...")
                 time.sleep(wait_time)
             else:
-                print("  All search attempts failed")
-                return []
+                raise
+
+def build_class_search(pharm_class):
+    """
+    Build the openFDA label search expression for an established pharmacologic class
+    
+    Args:
+        pharm_class (str): Class name, e.g. "Nonsteroidal Anti-inflammatory Drug"
+        
+    Returns:
+        str: Value of the search parameter
+    """
+    return f'openfda.pharm_class_epc:"{quote_plus(pharm_class)}"'
+
+def iter_fda_labels(query, min_date=None, max_date=None, page_size=DEFAULT_PAGE_SIZE,
+                    max_results=None, retries=3, session=None, search=None, status=None):
+    """
+    Page through openFDA label search results, yielding results as pages arrive
+    
+    Pages are requested one at a time, and only when the consumer asks for
+    more results, so stopping the iteration (or reaching max_results) stops
+    paging. The first MAX_SKIP results are paged with skip; later pages
+    follow the search_after cursor openFDA returns in the Link header.
+    
+    Args:
+        query (str): The search query
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        page_size (int): Labels per request (at most MAX_PAGE_SIZE)
+        max_results (int): Stop after this many results (None for all matches)
+        retries (int): Number of attempts per page
+        session (requests.Session): Session to send the requests with (optional)
+        search (str): Raw openFDA search expression to use instead of the query
+        status (dict): Receives the "error" that stopped the paging early, if
+            a page could not be fetched or read
+        
+    Yields:
+        dict: Search results
+    """
+    if max_results is not None and max_results <= 0:
+        return
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    if max_results is not None:
+        page_size = min(page_size, max_results)
+    search = search or build_label_search(query, min_date, max_date)
+    base_url = f"{OPENFDA_URL}/label.json?search={search}&limit={page_size}"
+    
+    # Add API key if available
+    # if 'API_KEY' in globals() and API_KEY:
+    #     base_url += f"&api_key={API_KEY}"
+    
+    # Archived pages are re-parsed with the search they came from
+    context = {"query": query, "min_date": min_date, "max_date": max_date}
+    url = base_url
+    skip = 0
+    count = 0
+    total = None
+    while url:
+        page = {}
+        try:
+            for drug in _iter_label_page(url, retries, session, page, context):
+                if total is None:
+                    total = page.get('meta', {}).get('results', {}).get('total')
+                    print(f"  {total if total is not None else 'Unknown number of'} matching labels")
+                try:
+                    result = parse_label(drug)
+                except Exception as e:
+                    print(f"  Error processing drug result: {str(e)}")
+                    continue
+                yield result
+                count += 1
+                if max_results is not None and count >= max_results:
+                    return
+        except (requests.RequestException, ValueError) as e:
+            print(f"  Error reading FDA response: {str(e)}")
+            if status is not None:
+                status["error"] = e
+            return
+        except Exception as e:
+            print("  All search attempts failed")
+            if status is not None:
+                status["error"] = e
+            return
+        
+        skip += page.get('labels', 0)
+        url = _next_label_url(base_url, page, page_size, skip, total)
+
+def _iter_label_page(url, retries, session, page, context=None):
+    """
+    Yield the raw labels of one page of a label search as the page downloads
+    
+    Args:
+        url (str): Page URL
+        retries (int): Number of attempts
+        session (requests.Session): Session to send the request with (optional)
+        page (dict): Receives the other top-level entries of the page ("meta"),
+            the number of "labels" read and the "next" link of the response
+        context (dict): Search the page belongs to ("query", "min_date" and
+            "max_date"), archived with the response for re-parsing
+        
+    Yields:
+        dict: Labels, projected to LABEL_FIELDS
+    """
+    page['labels'] = 0
+    response = _fetch_page(url, retries, session, stream=True)
+    if response is None:
+        return
+    
+    # Decode the page while it downloads; "meta" precedes "results"
+    with response:
+        response.raw.decode_content = True
+        page['next'] = response.links.get('next', {}).get('url')
+        # The body is archived as it is read, once it has been read to the end
+        stream = archiving_stream(response.raw, response, "fda-drugs", context)
+        read_all = False
+        try:
+            for drug in iter_array(stream, on_value=page.__setitem__, fields=LABEL_FIELDS):
+                page['labels'] += 1
+                yield drug
+            read_all = True
+        finally:
+            if stream is not response.raw:
+                # A consumer stopping after the last label of the page leaves
+                # only the end of the body unread; read it to archive the page
+                results = page.get('meta', {}).get('results', {})
+                try:
+                    if read_all or page['labels'] >= min(results['limit'], results['total'] - results['skip']):
+                        while stream.read(1 << 16):
+                            pass
+                except Exception:
+                    # Not archived; never fail the search over it
+                    pass
+                stream.close()
+
+def parse_label_response(body, query="", max_results=None, min_date=None, max_date=None):
+    """
+    Parse a raw openFDA label search page (used to re-parse archived
+    responses, see response_archive.py)
+    
+    The date range is part of the openFDA search, so the labels of a page
+    already match it.
+    
+    Args:
+        body (str): Response body
+        query (str): The search query
+        max_results (int): Maximum number of results to return (None for all)
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        
+    Returns:
+        list: List of search results
+    """
+    results = []
+    for drug in json.loads(body).get('results', [])[:max_results]:
+        try:
+            results.append(parse_label(drug))
+        except Exception as e:
+            print(f"  Error processing drug result: {str(e)}")
+    return results
+
+def _next_label_url(base_url, page, page_size, skip, total):
+    """
+    Get the URL of the page after a label search page
+    
+    Args:
+        base_url (str): Search URL without paging parameters
+        page (dict): The page, as filled by _iter_label_page
+        page_size (int): Labels per request
+        skip (int): Number of labels read so far
+        total (int): Total number of matches (None if unknown)
+        
+    Returns:
+        str: URL of the next page, or None if this was the last page
+    """
+    if page.get('labels', 0) < page_size:
+        return None
+    # Prefer the server's cursor, fall back to skip while openFDA allows it
+    if page.get('next'):
+        return page['next']
+    if skip <= MAX_SKIP and (total is None or skip < total):
+        return f"{base_url}&skip={skip}"
+    return None
+
+def _local_label_index(required):
+    """
+    Get the local label index
+    
+    Args:
+        required (bool): Raise if no labels were ingested instead of returning None
+        
+    Returns:
+        LabelIndex: The index, or None if no labels were ingested
+    """
+    # Imported here since the index imports parse_label from this module
+    try:
+        from fda_label_index import get_label_index, DEFAULT_DB_PATH
+    except ImportError:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        if script_dir not in sys.path:
+            sys.path.append(script_dir)
+        from fda_label_index import get_label_index, DEFAULT_DB_PATH
+    
+    index = get_label_index()
+    if index is None or index.count() == 0:
+        if required:
+            raise RuntimeError(f"No openFDA labels ingested in {DEFAULT_DB_PATH}; "
+                               f"run 'python fda_label_index.py ingest <download directory>' first")
+        return None
+    return index
+
+def count_fda_drugs(query, min_date=None, max_date=None, timeout=10, source=None):
+    """
+    Count the drug labels matching a query without fetching them
+    
+    Asks openFDA for a single label and reads meta.results.total, or counts
+    matches in the local label index, depending on the FDA source mode.
+    
+    Args:
+        query (str): The search query
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        timeout (float): Request timeout in seconds
+        source (str): One of FDA_SOURCE_MODES (defaults to DEFAULT_FDA_SOURCE)
+        
+    Returns:
+        int: Number of matching labels
+    """
+    source = source or DEFAULT_FDA_SOURCE
+    if source != "api":
+        index = _local_label_index(required=source == "local")
+        if index is not None:
+            return index.count(query, min_date, max_date)
+    
+    url = f"{OPENFDA_URL}/label.json?search={build_label_search(query, min_date, max_date)}&limit=1"
+    response = _fetch_page(url, 1, timeout=timeout)
+    if response is None:
+        return 0
+    return response.json().get('meta', {}).get('results', {}).get('total', 0)
+
+def search_fda_drugs(query, max_results=10, min_date=None, max_date=None, retries=3, source=None):
+    """
+    Search FDA drug database using the OpenFDA API or the local label index
+    
+    Args:
+        query (str): The search query
+        max_results (int): Maximum number of results to return
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        retries (int): Number of retries if the API call fails
+        source (str): One of FDA_SOURCE_MODES (defaults to DEFAULT_FDA_SOURCE)
+        
+    Returns:
+        list: List of search results
+    """
+    source = source or DEFAULT_FDA_SOURCE
+    if source not in FDA_SOURCE_MODES:
+        raise ValueError(f"Unknown FDA source mode '{source}', expected one of {', '.join(FDA_SOURCE_MODES)}")
+    
+    print(f"Searching FDA drug database for: {query}")
+    
+    if source != "api":
+        index = _local_label_index(required=source == "local")
+        if index is not None:
+            results = index.search(query, max_results, min_date, max_date)
+            print(f"  Found {len(results)} results in the local label index")
+            return results
+    
+    status = {}
+    results = list(iter_fda_labels(query, min_date, max_date, page_size=min(max_results, MAX_PAGE_SIZE),
+                                   max_results=max_results, retries=retries, status=status))
+    if "error" in status:
+        return FailedSearch(status["error"], results)
+    
+    if results:
+        print(f"  Found {len(results)} results")
+    else:
+        print("  No results found")
+    return results
+
+def search_fda_drugs_page(query, page_size=10, min_date=None, max_date=None, cursor=None, retries=3, source=None):
+    """
+    Get one page of FDA drug label search results
+    
+    openFDA pages are continued with skip, or with the search_after link
+    openFDA returns past MAX_SKIP; local index pages with an offset.
+    
+    Args:
+        query (str): The search query
+        page_size (int): Number of results per page (at most MAX_PAGE_SIZE)
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        cursor (str): Cursor returned with the previous page (None for the first page)
+        retries (int): Number of retries if the API call fails
+        source (str): One of FDA_SOURCE_MODES (defaults to DEFAULT_FDA_SOURCE)
+        
+    Returns:
+        tuple: List of search results and the cursor of the next page (None on the last page)
+    """
+    source = source or DEFAULT_FDA_SOURCE
+    if source not in FDA_SOURCE_MODES:
+        raise ValueError(f"Unknown FDA source mode '{source}', expected one of {', '.join(FDA_SOURCE_MODES)}")
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    
+    print(f"Searching FDA drug database for: {query}")
+    
+    if source != "api":
+        index = _local_label_index(required=source == "local")
+        if index is not None:
+            offset = decode_cursor(cursor, "fda-label-index", query, min_date, max_date)["offset"] if cursor else 0
+            results = index.search(query, page_size, min_date, max_date, offset=offset)
+            print(f"  Found {len(results)} results in the local label index")
+            next_cursor = None
+            if len(results) == page_size:
+                next_cursor = encode_cursor("fda-label-index", {"offset": offset + page_size},
+                                            query, min_date, max_date)
+            return results, next_cursor
+    
+    base_url = f"{OPENFDA_URL}/label.json?search={build_label_search(query, min_date, max_date)}&limit={page_size}"
+    state = decode_cursor(cursor, "fda-drugs", query, min_date, max_date) if cursor else {}
+    url = state.get("url") or base_url
+    # Cursors can come from clients; only follow them to the label endpoint
+    if not url.startswith(f"{OPENFDA_URL}/label.json?"):
+        raise ValueError("Page cursor does not point to the openFDA label endpoint")
+    
+    page = {}
+    results = []
+    context = {"query": query, "min_date": min_date, "max_date": max_date}
+    for drug in _iter_label_page(url, retries, None, page, context):
+        try:
+            results.append(parse_label(drug))
+        except Exception as e:
+            print(f"  Error processing drug result: {str(e)}")
+    
+    skip = state.get("skip", 0) + page['labels']
+    total = page.get('meta', {}).get('results', {}).get('total')
+    next_url = _next_label_url(base_url, page, page_size, skip, total)
+    print(f"  Found {len(results)} results")
+    next_cursor = None
+    if next_url:
+        next_cursor = encode_cursor("fda-drugs", {"url": next_url, "skip": skip}, query, min_date, max_date)
+    return results, next_cursor
+
+def build_count_search(endpoint, query, min_date=None, max_date=None):
+    """
+    Build the search expression of a count query
+    
+    Args:
+        endpoint (str): Key of COUNT_ENDPOINTS
+        query (str): The search query
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        
+    Returns:
+        str: Value of the search parameter
+    """
+    config = COUNT_ENDPOINTS[endpoint]
+    search_query = "(" + "+OR+".join(f"{field}:{quote_plus(query)}" for field in config["search_fields"]) + ")"
+    
+    if min_date or max_date:
+        min_date_str = min_date if min_date else "1900-01-01"
+        max_date_str = max_date if max_date else datetime.now().strftime("%Y-%m-%d")
+        search_query += f"+AND+{config['date_field']}:[{min_date_str.replace('-', '')} TO {max_date_str.replace('-', '')}]"
+    
+    return search_query
+
+def _count_terms(page):
+    """
+    Convert the results of a count response to term counts
+    
+    Date fields are counted per day ({"time": "20040315", "count": n}); those
+    counts are summed per year.
+    
+    Args:
+        page (dict): count= response
+        
+    Returns:
+        list: {"term": ..., "count": ...} dicts
+    """
+    results = page.get('results') or []
+    if results and 'time' in results[0]:
+        per_year = {}
+        for entry in results:
+            year = str(entry.get('time', ''))[:4]
+            per_year[year] = per_year.get(year, 0) + entry.get('count', 0)
+        return [{"term": year, "count": count} for year, count in sorted(per_year.items())]
+    return [{"term": entry.get('term'), "count": entry.get('count', 0)} for entry in results]
+
+def count_fda(endpoint, query, field, min_date=None, max_date=None, limit=DEFAULT_COUNT_LIMIT,
+              retries=3, session=None):
+    """
+    Count the records matching a query per value of a field, server-side
+    
+    Results are cached for COUNT_CACHE_TTL seconds per endpoint, query, field,
+    date range and limit. Failed requests are not cached.
+    
+    Args:
+        endpoint (str): Key of COUNT_ENDPOINTS ("event", "enforcement" or "ndc")
+        query (str): The search query
+        field (str): Field to count, e.g. "patient.reaction.reactionmeddrapt.exact"
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        limit (int): Number of terms to return (at most MAX_PAGE_SIZE; ignored for date fields)
+        retries (int): Number of attempts
+        session (requests.Session): Session to send the request with (optional)
+        
+    Returns:
+        list: {"term": ..., "count": ...} dicts, most frequent first (per year, in
+            year order, for date fields)
+    """
+    if endpoint not in COUNT_ENDPOINTS:
+        raise ValueError(f"Unknown openFDA count endpoint '{endpoint}', expected one of {', '.join(COUNT_ENDPOINTS)}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    key = (endpoint, " ".join(query.lower().split()), field, min_date, max_date, limit)
+    
+    now = time.monotonic()
+    with _count_cache_lock:
+        cached = _count_cache.get(key)
+        if cached and now - cached[0] < COUNT_CACHE_TTL:
+            _count_cache.move_to_end(key)
+            return list(cached[1])
+    
+    search = build_count_search(endpoint, query, min_date, max_date)
+    url = f"{OPENFDA_URL}/{COUNT_ENDPOINTS[endpoint]['path']}?search={search}&count={field}"
+    if not field.endswith(COUNT_ENDPOINTS[endpoint]['date_field']):
+        url += f"&limit={limit}"
+    
+    response = _fetch_page(url, retries, session)
+    counts = _count_terms(response.json()) if response is not None else []
+    
+    with _count_cache_lock:
+        _count_cache[key] = (time.monotonic(), counts)
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > COUNT_CACHE_SIZE:
+            _count_cache.popitem(last=False)
+    return list(counts)
+
+def clear_count_cache():
+    """Clear the count query cache"""
+    with _count_cache_lock:
+        _count_cache.clear()
+
+def fda_safety_signals(query, min_date=None, max_date=None, signals=None, limit=DEFAULT_COUNT_LIMIT,
+                       max_workers=None, session=None):
+    """
+    Compute safety signals for a drug with concurrent openFDA count queries
+    
+    Args:
+        query (str): The search query
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        signals (dict): Signals to compute, name -> (endpoint, field) (defaults to SAFETY_SIGNALS)
+        limit (int): Number of terms per signal
+        max_workers (int): Number of count queries run at once (defaults to one per signal)
+        session (requests.Session): Session to send the requests with (optional)
+        
+    Returns:
+        dict: Signal name -> list of {"term": ..., "count": ...} dicts (empty for
+            signals whose query failed)
+    """
+    signals = signals or SAFETY_SIGNALS
+    print(f"Counting FDA safety signals for: {query}")
+    
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or len(signals)) as executor:
+        future_to_name = {
+            executor.submit(count_fda, endpoint, query, field, min_date, max_date, limit, session=session): name
+            for name, (endpoint, field) in signals.items()
+        }
+        for future in concurrent.futures.as_completed(future_to_name):
+            name = future_to_name[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"  Error counting {name}: {str(e)}")
+                results[name] = []
+    
+    # Keep the order of the signal definitions
+    return {name: results[name] for name in signals}
 
 if __name__ == "__main__":
-    # Test the API
-    results = search_fda_drugs("paracetamol", max_results=5)
-    print(json.dumps(results, indent=2))
+    import argparse
+    from result_sinks import save_results
+    
+    parser = argparse.ArgumentParser(description="Search or sweep openFDA drug labels")
+    parser.add_argument("query", nargs="?", default="paracetamol", help="Search query")
+    parser.add_argument("--pharm-class", help="Sweep every label of an established pharmacologic class instead")
+    parser.add_argument("--min-date", help="Minimum date in format YYYY-MM-DD")
+    parser.add_argument("--max-date", help="Maximum date in format YYYY-MM-DD")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Labels per request")
+    parser.add_argument("--max-results", type=int, default=5, help="Maximum number of results (0 for all)")
+    parser.add_argument("--output", help="Stream the results to this file (.ndjson or .json) instead of printing them")
+    parser.add_argument("--source", choices=FDA_SOURCE_MODES, default=DEFAULT_FDA_SOURCE,
+                        help="Search the openFDA API or the local label index (fda_label_index.py)")
+    parser.add_argument("--signals", action="store_true",
+                        help="Print adverse event, recall and NDC counts for the query instead of labels")
+    args = parser.parse_args()
+    
+    if args.signals:
+        print(json.dumps(fda_safety_signals(args.query, args.min_date, args.max_date), indent=2))
+        sys.exit(0)
+    
+    if args.source != "api" and not args.pharm_class:
+        labels = search_fda_drugs(args.query, args.max_results or MAX_PAGE_SIZE, args.min_date, args.max_date,
+                                  source=args.source)
+    else:
+        labels = iter_fda_labels(
+            args.query, args.min_date, args.max_date, page_size=args.page_size,
+            max_results=args.max_results or None,
+            search=build_class_search(args.pharm_class) if args.pharm_class else None
+        )
+    if args.output:
+        print(f"Saved {save_results(labels, args.output)} results to {args.output}")
+    else:
+        print(json.dumps(list(labels), indent=2))
@@ -0,0 +1,520 @@
+#!/usr/bin/env python
+"""
+Local openFDA Drug Label Index
+
+openFDA publishes the whole drug label dataset as zipped JSON partitions
+(drug-label-0001-of-0013.json.zip, ...; see https://open.fda.gov/data/downloads/).
+This module ingests those files from a local directory into a SQLite index,
+so label searches are answered locally in milliseconds, without network I/O
+or API quota.
+
+Partitions are streamed straight out of the zip files one label at a time,
+decoding only the fields search results are built from (see
+json_stream.iter_array and fda_api.LABEL_FIELDS), so ingesting a partition
+of several hundred megabytes needs memory for one label, not the whole file. Partitions that
+were already ingested and have not changed (same size and modification time)
+are skipped.
+
+The index holds:
+1. labels: one row per label set (set_id), keeping the newest version, with
+   the search result built by fda_api.parse_label
+2. labels_fts: an FTS5 index over brand, generic and substance names, the
+   same fields the openFDA label search looks in
+3. partitions: which partition files were ingested
+
+fda_api.search_fda_drugs answers from the index when the FDA source mode is
+"local" (or "auto" and the index holds labels), see fda_api.FDA_SOURCE_MODES.
+
+Usage:
+    with LabelIndex() as index:
+        index.ingest_directory("downloads/openfda")
+        results = index.search("ibuprofen", max_results=10, min_date="2020-01-01")
+
+From the command line:
+    python fda_label_index.py ingest downloads/openfda
+    python fda_label_index.py search ibuprofen --min-date 2020-01-01
+    python fda_label_index.py stats
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional
+
+# Import the label parser, the streaming JSON reader and the shared helpers
+try:
+    from fda_api import LABEL_FIELDS, parse_label
+    from json_stream import iter_array
+    from result_record import dumps, loads
+    from result_store import fts_query
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from fda_api import LABEL_FIELDS, parse_label
+    from json_stream import iter_array
+    from result_record import dumps, loads
+    from result_store import fts_query
+
+# Set up logging
+logger = logging.getLogger("fda_label_index")
+
+# Database file (override with the MEDSEARCH_FDA_LABEL_DB environment variable)
+DEFAULT_DB_PATH = os.environ.get(
+    "MEDSEARCH_FDA_LABEL_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fda_labels.db")
+)
+
+# Number of labels written per executemany call
+WRITE_BATCH_SIZE = 1000
+
+# Maximum number of results returned by one search
+MAX_RESULTS = 1000
+
+# Weights of the brand, generic and substance name columns in the bm25() ranking
+FTS_WEIGHTS = (4.0, 2.0, 1.0)
+
+# Separator between the values of list fields (labels can have several brand names)
+VALUE_SEPARATOR = " | "
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    set_id TEXT PRIMARY KEY,
+    label_id TEXT,
+    version INTEGER,
+    effective_time TEXT,
+    date TEXT,
+    brand_name TEXT,
+    generic_name TEXT,
+    substance_name TEXT,
+    manufacturer TEXT,
+    application_number TEXT,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_labels_date ON labels(date);
+CREATE INDEX IF NOT EXISTS idx_labels_application_number ON labels(application_number);
+
+CREATE TABLE IF NOT EXISTS partitions (
+    name TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    labels INTEGER,
+    ingested_at REAL
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS labels_fts USING fts5(
+    brand_name, generic_name, substance_name,
+    content='labels', content_rowid='rowid',
+    tokenize='unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS labels_fts_insert AFTER INSERT ON labels BEGIN
+    INSERT INTO labels_fts(rowid, brand_name, generic_name, substance_name)
+    VALUES (new.rowid, new.brand_name, new.generic_name, new.substance_name);
+END;
+CREATE TRIGGER IF NOT EXISTS labels_fts_delete AFTER DELETE ON labels BEGIN
+    INSERT INTO labels_fts(labels_fts, rowid, brand_name, generic_name, substance_name)
+    VALUES ('delete', old.rowid, old.brand_name, old.generic_name, old.substance_name);
+END;
+CREATE TRIGGER IF NOT EXISTS labels_fts_update AFTER UPDATE OF brand_name, generic_name, substance_name ON labels BEGIN
+    INSERT INTO labels_fts(labels_fts, rowid, brand_name, generic_name, substance_name)
+    VALUES ('delete', old.rowid, old.brand_name, old.generic_name, old.substance_name);
+    INSERT INTO labels_fts(rowid, brand_name, generic_name, substance_name)
+    VALUES (new.rowid, new.brand_name, new.generic_name, new.substance_name);
+END;
+"""
+
+
+def _joined(values: Any) -> str:
+    """Join the values of an openFDA list field"""
+    if isinstance(values, list):
+        return VALUE_SEPARATOR.join(str(value) for value in values if value)
+    return str(values or "")
+
+
+def _label_row(label: Dict[str, Any]) -> Optional[tuple]:
+    """Build the labels table row of an openFDA label (None if it has no set id)"""
+    set_id = label.get("set_id")
+    if not set_id:
+        return None
+    openfda = label.get("openfda") or {}
+    result = parse_label(label)
+    try:
+        version = int(label.get("version") or 0)
+    except (TypeError, ValueError):
+        version = 0
+    return (
+        set_id,
+        label.get("id"),
+        version,
+        label.get("effective_time") or "",
+        result.get("date") or "",
+        _joined(openfda.get("brand_name")),
+        _joined(openfda.get("generic_name")),
+        _joined(openfda.get("substance_name")),
+        _joined(openfda.get("manufacturer_name")),
+        _joined(openfda.get("application_number")),
+        dumps(result)
+    )
+
+
+def _match_filters(query: str, min_date: Optional[str], max_date: Optional[str]) -> Optional[tuple]:
+    """Build the WHERE conditions and parameters of a label search (None if the query has no terms)"""
+    match = fts_query(query or "")
+    if not match:
+        return None
+    where = ["labels_fts MATCH ?"]
+    params: List[Any] = [f"{{brand_name generic_name substance_name}} : ({match})"]
+    if min_date:
+        where.append("l.date >= ?")
+        params.append(min_date)
+    if max_date:
+        where.append("l.date != '' AND l.date <= ?")
+        params.append(max_date)
+    return where, params
+
+
+def iter_partition(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the labels of one bulk download partition
+
+    Args:
+        path (str): A .json.zip partition as downloaded, or an extracted .json file
+
+    Yields:
+        Dict[str, Any]: openFDA labels, projected to fda_api.LABEL_FIELDS
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if not name.endswith(".json"):
+                    continue
+                with archive.open(name) as f:
+                    yield from iter_array(f, fields=LABEL_FIELDS)
+    else:
+        with open(path, "rb") as f:
+            yield from iter_array(f, fields=LABEL_FIELDS)
+
+
+def find_partitions(directory: str) -> List[str]:
+    """
+    List the label partitions in a directory
+
+    Args:
+        directory (str): Directory holding the downloaded partitions
+
+    Returns:
+        List[str]: Paths of .json.zip and .json files, in name order
+    """
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.endswith(".json.zip") or name.endswith(".json")
+    ]
+
+
+class LabelIndex:
+    """
+    SQLite index of openFDA drug labels
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Open the index, creating the database if needed
+
+        Args:
+            path (Optional[str]): Database file (defaults to DEFAULT_DB_PATH)
+        """
+        self.path = path or DEFAULT_DB_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        # One connection shared by the threads of a process, guarded by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _write_labels(self, rows: List[tuple]):
+        """Upsert a batch of labels, keeping the newest version of each set (the lock must be held)"""
+        self._conn.executemany(
+            """
+            INSERT INTO labels (set_id, label_id, version, effective_time, date, brand_name, generic_name,
+                                substance_name, manufacturer, application_number, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(set_id) DO UPDATE SET
+                label_id = excluded.label_id,
+                version = excluded.version,
+                effective_time = excluded.effective_time,
+                date = excluded.date,
+                brand_name = excluded.brand_name,
+                generic_name = excluded.generic_name,
+                substance_name = excluded.substance_name,
+                manufacturer = excluded.manufacturer,
+                application_number = excluded.application_number,
+                data = excluded.data
+            WHERE excluded.version >= labels.version
+            """,
+            rows
+        )
+
+    def ingest_partition(self, path: str, force: bool = False) -> int:
+        """
+        Ingest one bulk download partition
+
+        The partition is written in one transaction, so an interrupted ingest
+        leaves the index as it was and the partition is ingested again next time.
+
+        Args:
+            path (str): Partition file
+            force (bool): Ingest the partition even if it is unchanged since the last ingest
+
+        Returns:
+            int: Number of labels ingested (0 if the partition was skipped)
+        """
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime FROM partitions WHERE name = ?", (name,)).fetchone()
+        if row and not force and row["size"] == stat.st_size and row["mtime"] == stat.st_mtime:
+            logger.info(f"  Skipping unchanged partition {name}")
+            return 0
+
+        count = 0
+        batch = []
+        with self._lock:
+            try:
+                for label in iter_partition(path):
+                    label_row = _label_row(label)
+                    if label_row is None:
+                        continue
+                    batch.append(label_row)
+                    if len(batch) >= WRITE_BATCH_SIZE:
+                        self._write_labels(batch)
+                        count += len(batch)
+                        batch = []
+                if batch:
+                    self._write_labels(batch)
+                    count += len(batch)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO partitions (name, size, mtime, labels, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                    (name, stat.st_size, stat.st_mtime, count, time.time())
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        logger.info(f"  Ingested {count} labels from {name}")
+        return count
+
+    def ingest_directory(self, directory: str, force: bool = False) -> Dict[str, int]:
+        """
+        Ingest every label partition in a directory
+
+        Args:
+            directory (str): Directory holding the downloaded partitions
+            force (bool): Ingest partitions even if they are unchanged since the last ingest
+
+        Returns:
+            Dict[str, int]: Number of labels ingested per partition
+        """
+        counts = {}
+        for path in find_partitions(directory):
+            counts[os.path.basename(path)] = self.ingest_partition(path, force)
+        with self._lock:
+            self._conn.execute("INSERT INTO labels_fts(labels_fts) VALUES ('optimize')")
+            self._conn.commit()
+        return counts
+
+    def search(self, query: str, max_results: int = 10, min_date: Optional[str] = None,
+               max_date: Optional[str] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Search labels by brand, generic or substance name
+
+        Matches the fields and date filter of the openFDA label search
+        (fda_api.build_label_search); all terms of the query must match one of
+        the name fields. Results are ranked by BM25, brand names first.
+
+        Args:
+            query (str): The search query ("quoted phrases" are matched as phrases)
+            max_results (int): Maximum number of results to return
+            min_date (Optional[str]): Minimum date in format YYYY-MM-DD
+            max_date (Optional[str]): Maximum date in format YYYY-MM-DD
+            offset (int): Number of matching labels to skip
+
+        Returns:
+            List[Dict[str, Any]]: Search results in the format of fda_api.search_fda_drugs
+        """
+        filters = _match_filters(query, min_date, max_date)
+        if filters is None:
+            return []
+        where, params = filters
+        params += [max(1, min(int(max_results), MAX_RESULTS)), max(0, int(offset))]
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT l.data FROM labels_fts CROSS JOIN labels l ON l.rowid = labels_fts.rowid
+                WHERE {' AND '.join(where)}
+                ORDER BY bm25(labels_fts, {', '.join(str(weight) for weight in FTS_WEIGHTS)}), l.date DESC
+                LIMIT ? OFFSET ?
+                """,
+                params
+            ).fetchall()
+        return [loads(row["data"]) for row in rows]
+
+    def get_label(self, set_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the search result of one label set
+
+        Args:
+            set_id (str): Label set id
+
+        Returns:
+            Optional[Dict[str, Any]]: The result, or None if it is not indexed
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM labels WHERE set_id = ?", (set_id,)).fetchone()
+        return loads(row["data"]) if row else None
+
+    def count(self, query: Optional[str] = None, min_date: Optional[str] = None,
+              max_date: Optional[str] = None) -> int:
+        """
+        Count indexed labels
+
+        Args:
+            query (Optional[str]): Only labels matching this query (as in search)
+            min_date (Optional[str]): Minimum date in format YYYY-MM-DD
+            max_date (Optional[str]): Maximum date in format YYYY-MM-DD
+
+        Returns:
+            int: Number of labels (all labels without a query)
+        """
+        if query is None:
+            with self._lock:
+                return self._conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+        filters = _match_filters(query, min_date, max_date)
+        if filters is None:
+            return 0
+        where, params = filters
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM labels_fts CROSS JOIN labels l ON l.rowid = labels_fts.rowid "
+                f"WHERE {' AND '.join(where)}",
+                params
+            ).fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Count indexed labels and list the ingested partitions
+
+        Returns:
+            Dict[str, Any]: Number of labels and the ingested partitions
+        """
+        with self._lock:
+            partitions = self._conn.execute(
+                "SELECT name, labels, ingested_at FROM partitions ORDER BY name"
+            ).fetchall()
+        return {
+            "labels": self.count(),
+            "partitions": {row["name"]: row["labels"] for row in partitions}
+        }
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Index opened by search_local, shared by the threads of a process
+_shared_index: Optional[LabelIndex] = None
+_shared_index_lock = threading.Lock()
+
+
+def get_label_index(path: Optional[str] = None) -> Optional[LabelIndex]:
+    """
+    Get the shared label index, if the index database exists
+
+    Args:
+        path (Optional[str]): Database file (defaults to DEFAULT_DB_PATH)
+
+    Returns:
+        Optional[LabelIndex]: The index, or None if nothing was ingested yet
+    """
+    global _shared_index
+    path = path or DEFAULT_DB_PATH
+    with _shared_index_lock:
+        if _shared_index is None or _shared_index.path != path:
+            if not os.path.exists(path):
+                return None
+            _shared_index = LabelIndex(path)
+        return _shared_index
+
+
+def main():
+    """
+    Main function
+    """
+    parser = argparse.ArgumentParser(description="Ingest and search openFDA drug label downloads locally")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Label index database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest downloaded label partitions")
+    ingest_parser.add_argument("paths", nargs="+", help="Partition files or directories holding them")
+    ingest_parser.add_argument("--force", action="store_true", help="Ingest partitions even if they are unchanged")
+
+    search_parser = subparsers.add_parser("search", help="Search indexed labels")
+    search_parser.add_argument("query", help='Brand, generic or substance name ("quoted phrases" are kept together)')
+    search_parser.add_argument("--max-results", type=int, default=10, help="Maximum number of results")
+    search_parser.add_argument("--min-date", help="Minimum date in format YYYY-MM-DD")
+    search_parser.add_argument("--max-date", help="Maximum date in format YYYY-MM-DD")
+    search_parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+
+    subparsers.add_parser("stats", help="Count indexed labels")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    with LabelIndex(args.db) as index:
+        if args.command == "ingest":
+            start = time.perf_counter()
+            total = 0
+            for path in args.paths:
+                if os.path.isdir(path):
+                    total += sum(index.ingest_directory(path, args.force).values())
+                else:
+                    total += index.ingest_partition(path, args.force)
+            elapsed = time.perf_counter() - start
+            print(f"Ingested {total} labels in {elapsed:.1f}s ({index.count()} labels indexed)")
+        elif args.command == "search":
+            start = time.perf_counter()
+            results = index.search(args.query, args.max_results, args.min_date, args.max_date)
+            elapsed = (time.perf_counter() - start) * 1000
+            if args.json:
+                print(json.dumps(results, indent=2))
+            else:
+                print(f"{len(results)} results ({elapsed:.1f} ms):")
+                for result in results:
+                    print(f"  {result.get('date', '')} {result.get('title', '')}")
+                    if result.get("url"):
+                        print(f"      {result['url']}")
+        elif args.command == "stats":
+            print(json.dumps(index.get_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
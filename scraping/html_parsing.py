@@ -0,0 +1,188 @@
+"""
+HTML Parsing Backend
+
+This module provides the HTML parsing entry point used by every HTML parser in
+the scraping package (EMA, MHRA, TGA, the CLI and the batch scraper).
+
+It wraps BeautifulSoup so that:
+1. The fastest installed tree builder is used (lxml, which is in
+   requirements.txt, before Python's pure-Python html.parser)
+2. Parsing can be restricted to the result container of a page with a
+   SoupStrainer, so headers, navigation menus and footers are never built
+   into the tree
+
+The backend can be forced with the MEDSEARCH_HTML_PARSER environment variable
+("lxml", "html.parser", "html5lib" or "auto") or with set_default_backend().
+"""
+
+import os
+import logging
+from typing import Iterable, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+from bs4 import BeautifulSoup, SoupStrainer, FeatureNotFound
+
+# Set up logging
+logger = logging.getLogger("html_parsing")
+
+# Backends in order of preference when "auto" is selected
+BACKEND_PREFERENCE = ["lxml", "html.parser"]
+
+# Backends that support restricting the parse with a SoupStrainer
+STRAINER_BACKENDS = {"lxml", "html.parser"}
+
+# Extensions of links that point to documents (PDF, Word and RTF files)
+DOCUMENT_EXTENSIONS = (".pdf", ".doc", ".docx", ".rtf")
+
+_default_backend = os.environ.get("MEDSEARCH_HTML_PARSER", "auto")
+_available_backends = None
+
+
+def available_backends() -> List[str]:
+    """
+    Get the list of installed BeautifulSoup tree builders
+
+    Returns:
+        List[str]: Installed backend names, fastest first
+    """
+    global _available_backends
+    if _available_backends is None:
+        backends = []
+        for name in ["lxml", "html.parser", "html5lib"]:
+            try:
+                BeautifulSoup("<p></p>", name)
+                backends.append(name)
+            except FeatureNotFound:
+                continue
+        _available_backends = backends
+    return list(_available_backends)
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """
+    Resolve a backend name to an installed tree builder
+
+    Args:
+        backend (Optional[str]): Requested backend, "auto" or None for the default
+
+    Returns:
+        str: Name of an installed backend
+    """
+    backend = backend or _default_backend
+    installed = available_backends()
+
+    if backend != "auto":
+        if backend in installed:
+            return backend
+        logger.warning(f"HTML parser backend '{backend}' is not installed, using the fastest available one")
+
+    for name in BACKEND_PREFERENCE:
+        if name in installed:
+            return name
+    return "html.parser"
+
+
+def set_default_backend(backend: str):
+    """
+    Set the backend used when make_soup is called without one
+
+    Args:
+        backend (str): Backend name or "auto"
+    """
+    global _default_backend
+    _default_backend = backend
+
+
+def get_default_backend() -> str:
+    """
+    Get the backend used when make_soup is called without one
+
+    Returns:
+        str: Name of the resolved default backend
+    """
+    return resolve_backend()
+
+
+def container_strainer(class_names: Iterable[str]) -> SoupStrainer:
+    """
+    Build a SoupStrainer that keeps only elements carrying one of the given classes
+
+    The matched container elements are kept with all of their descendants, so
+    selectors such as ".view-medicines .views-row" still work on the result.
+
+    Args:
+        class_names (Iterable[str]): CSS class names of the result containers
+
+    Returns:
+        SoupStrainer: Strainer to pass to make_soup
+    """
+    wanted = frozenset(class_names)
+
+    def has_wanted_class(value):
+        if not value:
+            return False
+        if isinstance(value, str):
+            value = value.split()
+        return not wanted.isdisjoint(value)
+
+    return SoupStrainer(attrs={"class": has_wanted_class})
+
+
+def make_soup(html: str, parse_only: Optional[SoupStrainer] = None,
+              backend: Optional[str] = None) -> BeautifulSoup:
+    """
+    Parse an HTML document
+
+    Args:
+        html (str): HTML content to parse
+        parse_only (Optional[SoupStrainer]): Restrict parsing to matching elements
+        backend (Optional[str]): Backend to use (defaults to the configured one)
+
+    Returns:
+        BeautifulSoup: The parsed document
+    """
+    name = resolve_backend(backend)
+    if parse_only is not None and name not in STRAINER_BACKENDS:
+        # html5lib ignores parse_only, so build the full tree
+        parse_only = None
+    return BeautifulSoup(html, name, parse_only=parse_only)
+
+
+def make_container_soup(html: str, class_names: Iterable[str],
+                        backend: Optional[str] = None) -> BeautifulSoup:
+    """
+    Parse only the result containers of an HTML document
+
+    Falls back to parsing the whole document if none of the containers is found.
+
+    Args:
+        html (str): HTML content to parse
+        class_names (Iterable[str]): CSS class names of the result containers
+        backend (Optional[str]): Backend to use (defaults to the configured one)
+
+    Returns:
+        BeautifulSoup: The parsed containers, or the whole document
+    """
+    soup = make_soup(html, parse_only=container_strainer(class_names), backend=backend)
+    if soup.find(True) is None:
+        soup = make_soup(html, backend=backend)
+    return soup
+
+
+def find_document_links(element, base_url: str) -> List[str]:
+    """
+    Find the links to documents (PDF, Word and RTF files) inside an element
+
+    Args:
+        element: Parsed element (a search result item) to search
+        base_url (str): URL relative links are resolved against
+
+    Returns:
+        List[str]: Distinct absolute document URLs, in order
+    """
+    links = []
+    for anchor in element.select("a[href]"):
+        url = urljoin(base_url, anchor["href"])
+        if urlsplit(url).path.lower().endswith(DOCUMENT_EXTENSIONS):
+            links.append(url)
+    return list(dict.fromkeys(links))
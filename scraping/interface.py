@@ -38,6 +38,15 @@ except ImportError:
         logger.error("Could not import smart access manager. Make sure smart_access_manager.py is in the same directory.")
         SMART_ACCESS_AVAILABLE = False
 
+# Import the columnar result frame used for result summaries
+try:
+    from result_frame import ResultFrame
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from result_frame import ResultFrame
+
 # Try to import configuration
 try:
     from config import (
@@ -106,17 +115,9 @@ def search_command(args):
     print(f"  Query: {args.query}")
     print(f"  Total results: {len(results)}")
     
-    # Group results by source
-    results_by_source = {}
-    for result in results:
-        source = result.get("source", "Unknown")
-        if source not in results_by_source:
-            results_by_source[source] = []
-        results_by_source[source].append(result)
-    
     # Print results by source
-    for source, source_results in results_by_source.items():
-        print(f"  {source}: {len(source_results)} results")
+    for source, count in ResultFrame.from_results(results).facets("source").items():
+        print(f"  {source or 'Unknown'}: {count} results")
     
     print(f"\nResults saved to: {args.output}")
 
@@ -0,0 +1,378 @@
+"""
+Job Journal for Resumable Batch Runs
+
+This module records the progress of a batch job so that a run that dies part
+way through can be resumed without querying every database again.
+
+A job is a set of tasks, one per (query, database) pair. The journal is an
+append-only file of JSON lines in the jobs directory (jobs/<job-id>.journal):
+the first line describes the job and every later line records a task changing
+state:
+
+    pending -> running -> done    (with the task's byte range in the output)
+                       -> failed  (with the error message)
+
+Task results are written to the job's streaming output file (see
+result_sinks.py) as one contiguous block, and the block's byte range is
+recorded when the task is marked done. When a job is resumed, the output file
+is cut back to the end of the last completed task, so results of tasks that
+were still running are dropped, and only pending and failed tasks are run
+again.
+
+Usage:
+    journal = JobJournal.create({"query": "aspirin", "output": "results.json"})
+    journal.add_tasks("aspirin", ["pubmed", "fda-drugs"])
+    ...
+    journal = JobJournal.open(job_id)
+    for task in journal.get_tasks(states=RETRY_STATES):
+        ...
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Import the streaming result writer
+try:
+    from result_sinks import NdjsonResultSink, open_result_sink, PART_SUFFIX, DEFAULT_FSYNC_INTERVAL
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from result_sinks import NdjsonResultSink, open_result_sink, PART_SUFFIX, DEFAULT_FSYNC_INTERVAL
+
+# Set up logging
+logger = logging.getLogger("job_journal")
+
+# Directory journals are kept in (override with the MEDSEARCH_JOBS_DIR environment variable)
+JOBS_DIR = os.environ.get(
+    "MEDSEARCH_JOBS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs")
+)
+
+# Task states
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# States of tasks that are run again when a job is resumed
+RETRY_STATES = (PENDING, RUNNING, FAILED)
+
+
+def new_job_id() -> str:
+    """
+    Generate a new job ID
+
+    Returns:
+        str: Job ID made of the start time and a random suffix
+    """
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def task_key(query: str, database: str) -> str:
+    """
+    Get the key identifying a (query, database) task
+
+    Args:
+        query (str): Search query
+        database (str): Database ID
+
+    Returns:
+        str: Task key
+    """
+    return json.dumps([query, database])
+
+
+class JobJournal:
+    """
+    Append-only record of the tasks of a batch job and their state
+    """
+
+    def __init__(self, job_id: str, jobs_dir: Optional[str] = None):
+        """
+        Initialize the journal
+
+        Use JobJournal.create to start a new job or JobJournal.open to resume one.
+
+        Args:
+            job_id (str): Job ID
+            jobs_dir (Optional[str]): Directory holding the journals (defaults to JOBS_DIR)
+        """
+        self.job_id = job_id
+        self.path = os.path.join(jobs_dir or JOBS_DIR, f"{job_id}.journal")
+        self.params = {}
+        self.finished = False
+        self.tasks = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    @classmethod
+    def create(cls, params: Dict[str, Any], job_id: Optional[str] = None,
+               jobs_dir: Optional[str] = None) -> "JobJournal":
+        """
+        Start the journal of a new job
+
+        Args:
+            params (Dict[str, Any]): Parameters needed to resume the job (query, output file, ...)
+            job_id (Optional[str]): Job ID (generated if not provided)
+            jobs_dir (Optional[str]): Directory holding the journals (defaults to JOBS_DIR)
+
+        Returns:
+            JobJournal: The journal
+        """
+        journal = cls(job_id or new_job_id(), jobs_dir)
+        if os.path.exists(journal.path):
+            raise ValueError(f"Job {journal.job_id} already exists")
+
+        os.makedirs(os.path.dirname(journal.path), exist_ok=True)
+        journal.params = dict(params)
+        journal._file = open(journal.path, "a", encoding="utf-8")
+        journal._append({"event": "job", "job_id": journal.job_id, "params": journal.params}, sync=True)
+        return journal
+
+    @classmethod
+    def open(cls, job_id: str, jobs_dir: Optional[str] = None) -> "JobJournal":
+        """
+        Open the journal of an existing job
+
+        Args:
+            job_id (str): Job ID
+            jobs_dir (Optional[str]): Directory holding the journals (defaults to JOBS_DIR)
+
+        Returns:
+            JobJournal: The journal, with the latest state of every task
+        """
+        journal = cls(job_id, jobs_dir)
+        if not os.path.exists(journal.path):
+            raise FileNotFoundError(f"No journal found for job {job_id} in {os.path.dirname(journal.path)}")
+
+        with open(journal.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be incomplete if the run died while writing it
+                    continue
+                journal._apply(entry)
+
+        journal._file = open(journal.path, "a", encoding="utf-8")
+        return journal
+
+    def _apply(self, entry: Dict[str, Any]):
+        """Apply a journal entry to the in-memory state"""
+        event = entry.get("event")
+        if event == "job":
+            self.params = entry.get("params", {})
+        elif event == "task":
+            key = task_key(entry["query"], entry["database"])
+            task = self.tasks.setdefault(key, {"query": entry["query"], "database": entry["database"]})
+            task.update({k: v for k, v in entry.items() if k not in ("event", "time")})
+        elif event == "finished":
+            self.finished = True
+
+    def _append(self, entry: Dict[str, Any], sync: bool = False):
+        """Write a journal entry (the lock must be held, except during create)"""
+        entry["time"] = time.time()
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def _set_state(self, query: str, database: str, state: str, sync: bool = False, **fields):
+        """Record a task state change"""
+        entry = {"event": "task", "query": query, "database": database, "state": state}
+        entry.update(fields)
+        with self._lock:
+            self._apply(entry)
+            self._append(entry, sync=sync)
+
+    def add_tasks(self, query: str, databases: Iterable[str], data: Optional[Dict[str, Any]] = None):
+        """
+        Register pending tasks for a query
+
+        Tasks that are already in the journal keep their state.
+
+        Args:
+            query (str): Search query
+            databases (Iterable[str]): Database IDs
+            data (Optional[Dict[str, Any]]): Extra data to keep per database ID,
+                e.g. the database definitions needed to run the task again
+        """
+        for database in databases:
+            if task_key(query, database) in self.tasks:
+                continue
+            fields = {}
+            if data and database in data:
+                fields["data"] = data[database]
+            self._set_state(query, database, PENDING, **fields)
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def mark_running(self, query: str, database: str):
+        """Record that a task has started"""
+        self._set_state(query, database, RUNNING)
+
+    def mark_done(self, query: str, database: str, offset: int, end_offset: int, count: int):
+        """
+        Record that a task has finished and its results are in the output
+
+        Args:
+            query (str): Search query
+            database (str): Database ID
+            offset (int): Byte offset of the task's first result in the output file
+            end_offset (int): Byte offset just past the task's last result
+            count (int): Number of results written
+        """
+        self._set_state(query, database, DONE, sync=True,
+                        offset=offset, end_offset=end_offset, count=count, error=None)
+
+    def mark_failed(self, query: str, database: str, error: str):
+        """Record that a task has failed"""
+        self._set_state(query, database, FAILED, sync=True, error=error)
+
+    def mark_finished(self):
+        """Record that the job's output file has been finalized"""
+        with self._lock:
+            self.finished = True
+            self._append({"event": "finished"}, sync=True)
+
+    def get_state(self, query: str, database: str) -> Optional[str]:
+        """
+        Get the state of a task
+
+        Returns:
+            Optional[str]: Task state, or None if the task is not in the journal
+        """
+        task = self.tasks.get(task_key(query, database))
+        return task["state"] if task else None
+
+    def is_done(self, query: str, database: str) -> bool:
+        """Check whether a task has finished"""
+        return self.get_state(query, database) == DONE
+
+    def get_tasks(self, states: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Get the tasks of the job
+
+        Args:
+            states (Optional[Iterable[str]]): Only return tasks in these states
+
+        Returns:
+            List[Dict[str, Any]]: Tasks, in the order they were added
+        """
+        tasks = list(self.tasks.values())
+        if states is not None:
+            states = set(states)
+            tasks = [task for task in tasks if task["state"] in states]
+        return tasks
+
+    def reconcile_output(self, output_size: int, query: Optional[str] = None) -> Tuple[int, int]:
+        """
+        Match the journal against what actually reached the output file
+
+        Tasks whose results extend past the end of the output file (because
+        the run died before they were flushed to disk) are set back to pending.
+
+        Args:
+            output_size (int): Current size of the output file in bytes
+            query (Optional[str]): Only consider the tasks of this query (for
+                jobs that write one output file per query)
+
+        Returns:
+            Tuple[int, int]: Offset to cut the output file back to, and the
+                number of results it holds up to that offset
+        """
+        resume_offset = 0
+        count = 0
+        for task in self.get_tasks(states=[DONE]):
+            if query is not None and task["query"] != query:
+                continue
+            if task.get("end_offset", 0) > output_size:
+                logger.warning(f"Results of {task['database']} for '{task['query']}' were not saved, running it again")
+                self._set_state(task["query"], task["database"], PENDING)
+                continue
+            resume_offset = max(resume_offset, task.get("end_offset", 0))
+            count += task.get("count", 0)
+        return resume_offset, count
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Count tasks by state
+
+        Returns:
+            Dict[str, int]: Number of tasks in each state
+        """
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for task in self.tasks.values():
+            counts[task["state"]] = counts.get(task["state"], 0) + 1
+        return counts
+
+    def close(self):
+        """Close the journal file"""
+        with self._lock:
+            if self._file and not self._file.closed:
+                self._file.close()
+
+
+def open_job_sink(journal: JobJournal, fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+                  output_file: Optional[str] = None, query: Optional[str] = None) -> NdjsonResultSink:
+    """
+    Open the streaming output of a job
+
+    For a resumed job, the existing .part file is kept up to the end of the
+    last completed task and new results are appended after it.
+
+    Args:
+        journal (JobJournal): Job journal
+        fsync_interval (float): Seconds between fsyncs of the output (0 = every result)
+        output_file (Optional[str]): Output file (defaults to the job's "output" param)
+        query (Optional[str]): Query whose tasks write to output_file, for jobs
+            that write one output file per query
+
+    Returns:
+        NdjsonResultSink: The sink
+    """
+    output_file = output_file or journal.params["output"]
+    part_file = output_file + PART_SUFFIX
+    output_size = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+    resume_offset, resume_count = journal.reconcile_output(output_size, query)
+    return open_result_sink(output_file, fsync_interval,
+                            resume_offset=resume_offset, resume_count=resume_count)
+
+
+def open_job_sinks(journal: JobJournal, queries: Iterable[Dict[str, Any]],
+                   fsync_interval: float = DEFAULT_FSYNC_INTERVAL) -> Dict[str, NdjsonResultSink]:
+    """
+    Open the streaming outputs of a job that writes one output file per query
+
+    A query whose tasks are all done and whose output was finalized (its .part
+    file is gone) gets no sink, so resuming the job leaves that output alone.
+
+    Args:
+        journal (JobJournal): Job journal
+        queries (Iterable[Dict[str, Any]]): The job's queries, each with "query" and "output"
+        fsync_interval (float): Seconds between fsyncs of the outputs (0 = every result)
+
+    Returns:
+        Dict[str, NdjsonResultSink]: The sink of each query that still has tasks to run, by query
+    """
+    unfinished = {task["query"] for task in journal.get_tasks(states=RETRY_STATES)}
+    sinks = {}
+    try:
+        for query in queries:
+            if query["query"] not in unfinished and not os.path.exists(query["output"] + PART_SUFFIX):
+                continue
+            sinks[query["query"]] = open_job_sink(journal, fsync_interval, query["output"], query["query"])
+    except BaseException:
+        for sink in sinks.values():
+            sink.abort()
+        raise
+    return sinks
@@ -0,0 +1,394 @@
+"""
+Streaming JSON Reading
+
+openFDA returns results as one JSON document, {"meta": {...}, "results": [...]},
+and its bulk downloads are the same shape at hundreds of megabytes per file.
+Loading such a document with json.load holds the whole text and every parsed
+result in memory at once.
+
+iter_array reads a document from a file-like object in chunks and yields the
+items of one top-level array (by default "results") one at a time, so memory
+use is bounded by the largest single item rather than by the document.
+Other top-level values (such as "meta") are parsed as they are passed.
+With key=None the document itself is the array (as in a JSON results file).
+
+Items can be projected to a few fields (fields=["set_id", "openfda.brand_name"]).
+Fields outside the projection are skipped by scanning for the end of their
+value without decoding it, so the long label sections (warnings, adverse
+reactions, ...) are never turned into Python strings at all.
+
+Usage:
+    with zipfile.ZipFile("drug-label-0001-of-0013.json.zip") as archive:
+        with archive.open(archive.namelist()[0]) as f:
+            for label in iter_array(f, fields=["set_id", "effective_time", "openfda"]):
+                ...
+"""
+
+import codecs
+import io
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Union
+
+# Characters read from the stream at a time
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+_SPACES = frozenset(" \t\n\r")
+
+# Characters that can follow a complete number
+_DELIMITERS = frozenset(",]} \t\n\r")
+
+# A number or literal
+_SCALAR = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null")
+
+# An object key without escapes, the colon after it and the whitespace before the value
+_KEY = re.compile(r'[ \t\n\r]*"([^"\\]*)"[ \t\n\r]*:[ \t\n\r]*')
+
+# The comma or closing bracket after a value
+_SEPARATOR = re.compile(r"[ \t\n\r]*([,}\]])")
+
+# Characters that matter for finding the end of an object or array
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+
+_DECODER = json.JSONDecoder()
+
+
+class _StreamReader:
+    """Buffered reader that decodes JSON values from a text stream"""
+
+    def __init__(self, stream, chunk_size: int = CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def _fill(self, size: int) -> bool:
+        """Append up to size characters to the buffer, dropping what was consumed"""
+        chunk = self.stream.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it"""
+        if self.position < len(self.buffer):
+            char = self.buffer[self.position]
+            if char not in _SPACES:
+                return char
+        while True:
+            self.position = _WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill(self.chunk_size):
+                raise ValueError("Unexpected end of JSON document")
+
+    def expect(self, char: str):
+        """Consume the next non-whitespace character, which must be char"""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} at position {self.position}, found {found!r}")
+        self.position += 1
+
+    def value(self) -> Any:
+        """Decode the next JSON value, reading more of the stream as needed"""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.position)
+                # A number cut off by the end of the buffer continues in the next chunk
+                if self.eof or (end < len(self.buffer) and (
+                        self.buffer[end] in _DELIMITERS or not isinstance(value, (int, float)))):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow reads geometrically so a large value is not re-parsed many times
+            self._fill(max(self.chunk_size, len(self.buffer) - self.position))
+
+    def key(self) -> str:
+        """Read an object key and the colon after it"""
+        if self.peek() != '"':
+            raise ValueError(f"Expected an object key at position {self.position}")
+        end = self._string_end(self.position)
+        while end is None:
+            if not self._fill(max(self.chunk_size, len(self.buffer) - self.position)):
+                raise ValueError("Unexpected end of JSON document")
+            end = self._string_end(self.position)
+        name = self.buffer[self.position + 1:end - 1]
+        if "\\" in name:
+            name = json.loads(self.buffer[self.position:end])
+        self.position = end
+        self.expect(":")
+        return name
+
+    def _string_end(self, start: int) -> Optional[int]:
+        """Find the end of the string starting at start (None if it is not buffered yet)"""
+        buffer = self.buffer
+        position = start + 1
+        while True:
+            # str.find is much faster than a regex over long label sections
+            end = buffer.find('"', position)
+            if end < 0:
+                return None
+            backslash = end - 1
+            while buffer[backslash] == "\\":
+                backslash -= 1
+            if (end - backslash) % 2:
+                return end + 1
+            position = end + 1
+
+    def _container_end(self) -> Optional[int]:
+        """Find the end of the object or array at the current position (None if it is not buffered yet)"""
+        # Label sections are arrays holding one string
+        if self.buffer.startswith('["', self.position):
+            end = self._string_end(self.position + 1)
+            if end is not None:
+                match = _SEPARATOR.match(self.buffer, end)
+                if match and match.group(1) == "]":
+                    return match.end()
+        depth = 0
+        position = self.position
+        search = _STRUCTURAL.search
+        while True:
+            match = search(self.buffer, position)
+            if match is None:
+                return None
+            char = match.group()
+            if char == '"':
+                position = self._string_end(match.start())
+                if position is None:
+                    return None
+                continue
+            position = match.end()
+            if char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return position
+
+    def skip(self):
+        """Move past the next JSON value without decoding it"""
+        char = self.peek()
+        while True:
+            if char == '"':
+                end = self._string_end(self.position)
+            elif char in "{[":
+                end = self._container_end()
+            else:
+                match = _SCALAR.match(self.buffer, self.position)
+                if not match and self.eof:
+                    raise ValueError(f"Invalid JSON value at position {self.position}")
+                end = match.end() if match else None
+                if end is not None and not self.eof and (end == len(self.buffer) or self.buffer[end] not in _DELIMITERS):
+                    end = None
+            if end is not None:
+                self.position = end
+                return
+            if not self._fill(max(self.chunk_size, len(self.buffer) - self.position)):
+                raise ValueError("Unexpected end of JSON document")
+
+    def project(self, spec: Dict[str, Any]) -> Any:
+        """
+        Decode the next JSON value, keeping only the fields in spec
+
+        Objects keep the keys in spec (recursively, for nested specs); arrays
+        apply spec to each item; other values are decoded whole.
+        """
+        char = self.peek()
+        if char == "[":
+            self.position += 1
+            items = []
+            if self.peek() == "]":
+                self.position += 1
+                return items
+            while True:
+                items.append(self.project(spec))
+                if self.peek() == ",":
+                    self.position += 1
+                    continue
+                self.expect("]")
+                return items
+        if char != "{":
+            return self.value()
+
+        self.position += 1
+        result = {}
+        if self.peek() == "}":
+            self.position += 1
+            return result
+        while True:
+            # Keys and separators are matched with one regex each; key() and
+            # peek() handle escaped keys and the end of the buffer
+            match = _KEY.match(self.buffer, self.position)
+            if match:
+                name = match.group(1)
+                self.position = match.end()
+            else:
+                name = self.key()
+            field = spec.get(name)
+            if field is None:
+                # Skip strings and arrays (most label sections) without the peek() in skip()
+                end = None
+                if self.position < len(self.buffer):
+                    char = self.buffer[self.position]
+                    if char == '"':
+                        end = self._string_end(self.position)
+                    elif char == "[":
+                        end = self._container_end()
+                if end is None:
+                    self.skip()
+                else:
+                    self.position = end
+            elif field is True:
+                result[name] = self.value()
+            else:
+                result[name] = self.project(field)
+            match = _SEPARATOR.match(self.buffer, self.position)
+            if match:
+                separator = match.group(1)
+                self.position = match.end()
+            else:
+                separator = self.peek()
+                self.position += 1
+            if separator == ",":
+                continue
+            if separator != "}":
+                raise ValueError(f"Expected '}}' at position {self.position - 1}, found {separator!r}")
+            return result
+
+
+class _Utf8Reader:
+    """Read a binary stream (zip member, HTTP body) as UTF-8 text"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def read(self, size: int) -> str:
+        while True:
+            data = self.stream.read(size)
+            text = self.decoder.decode(data, final=not data)
+            # A chunk can end inside a multi-byte character and decode to nothing
+            if text or not data:
+                return text
+
+
+def _text_stream(stream):
+    """Wrap binary streams for reading as text"""
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return _Utf8Reader(stream)
+
+
+def projection(fields: Iterable[str]) -> Dict[str, Any]:
+    """
+    Build a projection spec from dotted field paths
+
+    Args:
+        fields (Iterable[str]): Field paths, e.g. ["set_id", "openfda.brand_name"]
+
+    Returns:
+        Dict[str, Any]: Nested spec mapping each key to True (keep the whole
+            value) or to the spec of its fields
+    """
+    spec: Dict[str, Any] = {}
+    for field in fields:
+        node = spec
+        parts = field.split(".")
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                break
+            if child is None:
+                child = node[part] = {}
+            node = child
+        else:
+            node[parts[-1]] = True
+    return spec
+
+
+def iter_array(stream, key: Optional[str] = "results", chunk_size: int = CHUNK_SIZE,
+               on_value: Optional[Callable[[str, Any], None]] = None,
+               fields: Optional[Union[Iterable[str], Dict[str, Any]]] = None) -> Iterator[Any]:
+    """
+    Yield the items of a top-level array of a JSON object, one at a time
+
+    Args:
+        stream: Binary or text file-like object holding a JSON object
+        key (Optional[str]): Key of the array to stream, or None if the document
+            itself is the array
+        chunk_size (int): Characters read at a time
+        on_value (Optional[Callable[[str, Any], None]]): Called with the key and
+            value of every other top-level entry (e.g. to keep "meta")
+        fields (Optional[Union[Iterable[str], Dict[str, Any]]]): Only decode these
+            fields of each item (dotted paths, or a spec built by projection)
+
+    Yields:
+        Any: Items of the array (nothing if the key is missing or not an array)
+    """
+    spec = None
+    if fields is not None:
+        spec = fields if isinstance(fields, dict) else projection(fields)
+    reader = _StreamReader(_text_stream(stream), chunk_size)
+    if key is None:
+        yield from _iter_items(reader, spec)
+        return
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while True:
+        name = reader.key()
+        if name == key and reader.peek() == "[":
+            yield from _iter_items(reader, spec)
+        else:
+            value = reader.value()
+            if on_value:
+                on_value(name, value)
+
+        if reader.peek() == ",":
+            reader.position += 1
+            continue
+        reader.expect("}")
+        return
+
+
+def _iter_items(reader: _StreamReader, spec: Optional[Dict[str, Any]]) -> Iterator[Any]:
+    """Yield the items of the array at the reader's position, consuming it"""
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.position += 1
+        return
+    while True:
+        yield reader.project(spec) if spec is not None else reader.value()
+        if reader.peek() == ",":
+            reader.position += 1
+            continue
+        reader.expect("]")
+        return
+
+
+def read_meta(stream, key: str = "results") -> Dict[str, Any]:
+    """
+    Read the top-level entries of a JSON object other than the streamed array
+
+    Args:
+        stream: Binary or text file-like object holding a JSON object
+        key (str): Key of the array to skip over
+
+    Returns:
+        Dict[str, Any]: The other top-level entries
+    """
+    values = {}
+    for _ in iter_array(stream, key, on_value=values.__setitem__):
+        pass
+    return values
@@ -9,160 +9,213 @@ MHRA has a search API that we can use to get real data.
 
 import requests
 import time
-from datetime import datetime
+import threading
+import concurrent.futures
+from collections import deque
 from urllib.parse import quote_plus, urljoin
 import json
-from bs4 import BeautifulSoup
+import os
+import sys
+
+# Import the shared date normalizer, HTML parsing backend, result ids, page cursors and rate limits
+try:
+    from date_utils import to_iso_date, is_within_range
+    from result_record import stable_id, FailedSearch
+    from html_parsing import make_container_soup, find_document_links
+    from page_cursor import encode_cursor, decode_cursor
+    from response_archive import archive_response
+    from config import get_rate_limit
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from date_utils import to_iso_date, is_within_range
+    from result_record import stable_id, FailedSearch
+    from html_parsing import make_container_soup, find_document_links
+    from page_cursor import encode_cursor, decode_cursor
+    from response_archive import archive_response
+    from config import get_rate_limit
 
 # Base URLs for MHRA
 MHRA_SEARCH_URL = "https://products.mhra.gov.uk/api/search"
 MHRA_BASE_URL = "https://products.mhra.gov.uk"
 
-def search_mhra_medicines(query, max_results=10, min_date=None, max_date=None, retries=3):
+# Keys the search API may report the total number of matches under
+TOTAL_KEYS = ("@odata.count", "totalResults", "totalCount", "total", "count")
+
+# Results requested per page when a search is paged
+MHRA_PAGE_SIZE = 100
+
+# Maximum number of pages requested at once
+MHRA_MAX_WORKERS = 4
+
+# Seconds to wait for a page of search results before the attempt fails
+MHRA_PAGE_TIMEOUT = 30
+
+# Search requests allowed per minute, shared by all threads (override with the
+# MEDSEARCH_MHRA_RPM environment variable)
+MHRA_REQUESTS_PER_MINUTE = int(os.environ.get("MEDSEARCH_MHRA_RPM", get_rate_limit("mhra")))
+
+# Headers of search requests, mimicking a browser
+SEARCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Content-Type": "application/json",
+    "Accept": "application/json",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": "https://products.mhra.gov.uk/",
+    "Origin": "https://products.mhra.gov.uk"
+}
+
+class _RequestBudget:
+    """Sliding one-minute window of requests, shared by the threads fetching pages"""
+    
+    def __init__(self, requests_per_minute):
+        self.requests_per_minute = max(1, requests_per_minute)
+        self.sent = deque()
+        self.lock = threading.Lock()
+    
+    def acquire(self, cancel=None):
+        """
+        Wait until a request fits in the budget, and count it
+        
+        Args:
+            cancel (threading.Event): Stop waiting once this is set
+            
+        Returns:
+            bool: False if the wait was cancelled
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.sent and now - self.sent[0] >= 60:
+                    self.sent.popleft()
+                if len(self.sent) < self.requests_per_minute:
+                    self.sent.append(now)
+                    return True
+                wait_time = 60 - (now - self.sent[0])
+            print(f"  MHRA request budget used up, waiting {wait_time:.1f} seconds")
+            if cancel is None:
+                time.sleep(wait_time)
+            elif cancel.wait(wait_time):
+                return False
+
+_request_budget = _RequestBudget(MHRA_REQUESTS_PER_MINUTE)
+
+def _total_matches(search_results):
+    """
+    Read the total number of matches from a search API response
+    
+    Args:
+        search_results (dict): Parsed JSON response
+        
+    Returns:
+        int: Total matches, or None if the response does not report it
+    """
+    if not isinstance(search_results, dict):
+        return None
+    for key in TOTAL_KEYS:
+        value = search_results.get(key)
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    return None
+
+def count_mhra_medicines(query, min_date=None, max_date=None, timeout=10):
+    """
+    Count the MHRA medicines matching a query without fetching them
+    
+    Requests a single result and reads the total the search API reports.
+    The API cannot filter by date (search_mhra_medicines filters the results
+    it receives), so the count covers all dates.
+    
+    Args:
+        query (str): The search query
+        min_date (str): Ignored, see above
+        max_date (str): Ignored, see above
+        timeout (float): Request timeout in seconds
+        
+    Returns:
+        int: Number of matching medicines, or None if the API does not report a total
+    """
+    payload = {
+        "query": query,
+        "page": 1,
+        "pageSize": 1,
+        "count": True,
+        "productTypes": ["medicines"]
+    }
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "Referer": "https://products.mhra.gov.uk/",
+        "Origin": "https://products.mhra.gov.uk"
+    }
+    response = requests.post(MHRA_SEARCH_URL, json=payload, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    try:
+        return _total_matches(response.json())
+    except json.JSONDecodeError:
+        return None
+
+def search_mhra_medicines(query, max_results=10, min_date=None, max_date=None, retries=3, page=1, page_info=None):
     """
     Search MHRA medicines database
     
+    Searches for more than MHRA_PAGE_SIZE results are paged, with the pages
+    fetched concurrently (see iter_mhra_medicines).
+    
     Args:
         query (str): The search query
         max_results (int): Maximum number of results to return
         min_date (str): Minimum date in format YYYY-MM-DD
         max_date (str): Maximum date in format YYYY-MM-DD
         retries (int): Number of retries if the API call fails
+        page (int): Page of max_results results to return (from 1)
+        page_info (dict): Receives the number of results "received" before
+            the date filter and the "total" matches, if the search succeeded
         
     Returns:
         list: List of search results
     """
     print(f"Searching MHRA medicines database for: {query}")
     
-    # Build the search payload
-    payload = {
-        "query": query,
-        "page": 1,
-        "pageSize": max_results,
-        "productTypes": ["medicines"]
-    }
+    if page_info is None and page == 1 and max_results > MHRA_PAGE_SIZE:
+        try:
+            status = {}
+            results = list(iter_mhra_medicines(query, min_date, max_date, max_results, retries=retries,
+                                               status=status))
+            if "error" in status:
+                # Later pages failed; the results of the earlier pages are kept
+                return FailedSearch(status["error"], results)
+            print(f"  Found {len(results)} results")
+            return results
+        except Exception as e:
+            print(f"  Paged search failed ({str(e)}), requesting a single page")
     
     # Make the search request with retries
     for attempt in range(retries):
         try:
             print(f"  API call attempt {attempt + 1}/{retries}")
-            
-            # Set headers to mimic a browser
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Accept-Language": "en-US,en;q=0.9",
-                "Referer": "https://products.mhra.gov.uk/",
-                "Origin": "https://products.mhra.gov.uk"
-            }
-            
-            response = requests.post(MHRA_SEARCH_URL, json=payload, headers=headers)
-            response.raise_for_status()
+            response = _request_page(query, page, max_results)
+            archive_response(response, "mhra", {"query": query, "max_results": max_results,
+                                                "min_date": min_date, "max_date": max_date})
             
             # Check if the response is JSON
             try:
                 search_results = response.json()
             except json.JSONDecodeError:
                 print("  Response is not JSON, trying to parse HTML")
-                return parse_mhra_html_results(response.text, query, max_results)
-            
-            # Process JSON results
-            results = []
+                return _html_page(response.text, query, max_results, page_info)
             
             # Check if we have results in the expected format
             if 'results' not in search_results:
                 print("  Unexpected JSON format, trying to parse HTML")
-                return parse_mhra_html_results(response.text, query, max_results)
+                return _html_page(response.text, query, max_results, page_info)
             
-            for medicine in search_results['results']:
-                try:
-                    # Extract basic information
-                    title = medicine.get('name', '')
-                    product_id = medicine.get('productId', '')
-                    
-                    # Construct URL
-                    url = f"{MHRA_BASE_URL}/substance-product/{product_id}" if product_id else f"{MHRA_BASE_URL}/search?query={quote_plus(title)}"
-                    
-                    # Extract date
-                    date = ""
-                    if 'authorisationDate' in medicine:
-                        date_str = medicine['authorisationDate']
-                        # Convert to YYYY-MM-DD format if needed
-                        if date_str:
-                            try:
-                                # Parse various date formats
-                                date_formats = [
-                                    "%Y-%m-%d",
-                                    "%d/%m/%Y",
-                                    "%Y%m%d"
-                                ]
-                                
-                                for fmt in date_formats:
-                                    try:
-                                        date_obj = datetime.strptime(date_str, fmt)
-                                        date = date_obj.strftime("%Y-%m-%d")
-                                        break
-                                    except ValueError:
-                                        continue
-                            except Exception:
-                                date = date_str
-                    
-                    # Extract snippet/description
-                    snippet = ""
-                    if 'activeSubstances' in medicine:
-                        active_substances = medicine['activeSubstances']
-                        if active_substances:
-                            snippet = f"Active substances: {', '.join(active_substances)}. "
-                    
-                    if 'productType' in medicine:
-                        snippet += f"Product type: {medicine['productType']}. "
-                        
-                    if 'marketingStatus' in medicine:
-                        snippet += f"Status: {medicine['marketingStatus']}."
-                    
-                    # Limit snippet length
-                    if len(snippet) > 300:
-                        snippet = snippet[:297] + "..."
-                    
-                    # Extract authors/manufacturers
-                    authors = []
-                    if 'marketingAuthorisationHolder' in medicine:
-                        authors.append(medicine['marketingAuthorisationHolder'])
-                    
-                    # Create the result object
-                    result = {
-                        "id": f"mhra-{product_id}" if product_id else f"mhra-{hash(title) % 10000}",
-                        "title": title,
-                        "url": url,
-                        "source": "MHRA",
-                        "date": date,
-                        "snippet": snippet,
-                        "authors": authors
-                    }
-                    
-                    # Filter by date if needed
-                    if min_date or max_date:
-                        if not date:
-                            # Include results without dates
-                            results.append(result)
-                        else:
-                            try:
-                                result_date = datetime.strptime(date, "%Y-%m-%d")
-                                min_date_obj = datetime.strptime(min_date, "%Y-%m-%d") if min_date else datetime(1900, 1, 1)
-                                max_date_obj = datetime.strptime(max_date, "%Y-%m-%d") if max_date else datetime.now()
-                                
-                                if min_date_obj <= result_date <= max_date_obj:
-                                    results.append(result)
-                            except ValueError:
-                                # Include results with unparseable dates
-                                results.append(result)
-                    else:
-                        results.append(result)
-                except Exception as e:
-                    print(f"  Error processing medicine result: {str(e)}")
-                    continue
+            if page_info is not None:
+                page_info["received"] = len(search_results['results'])
+                page_info["total"] = _total_matches(search_results)
             
+            results = _parse_medicines(search_results['results'], min_date, max_date)
             print(f"  Found {len(results)} results")
             return results
             
@@ -174,7 +227,284 @@ def search_mhra_medicines(query, max_results=10, min_date=None, max_date=None, r
                 time.sleep(wait_time)
             else:
                 print("  All search attempts failed")
-                return []
+                return FailedSearch(e)
+
+def _request_page(query, page, page_size, cancel=None):
+    """
+    Request one page of search results, within the MHRA request budget
+    
+    Returns:
+        requests.Response: The response
+    """
+    if not _request_budget.acquire(cancel):
+        raise RuntimeError("Search cancelled")
+    payload = {
+        "query": query,
+        "page": page,
+        "pageSize": page_size,
+        "productTypes": ["medicines"]
+    }
+    response = requests.post(MHRA_SEARCH_URL, json=payload, headers=SEARCH_HEADERS, timeout=MHRA_PAGE_TIMEOUT)
+    response.raise_for_status()
+    return response
+
+def _fetch_medicines(query, page, page_size, retries, cancel=None, min_date=None, max_date=None):
+    """
+    Fetch the medicines of one page of JSON search results, with retries
+    
+    The date range is only recorded with the archived response; the
+    medicines are returned unfiltered.
+    
+    Returns:
+        tuple: The page's medicines and the total matches (None if not reported)
+    """
+    for attempt in range(retries):
+        if cancel is not None and cancel.is_set():
+            raise RuntimeError("Search cancelled")
+        try:
+            response = _request_page(query, page, page_size, cancel)
+            archive_response(response, "mhra", {"query": query, "max_results": page_size,
+                                                "min_date": min_date, "max_date": max_date})
+            search_results = response.json()
+            if not isinstance(search_results, dict) or not isinstance(search_results.get('results'), list):
+                raise ValueError("Unexpected search response format")
+            return search_results['results'], _total_matches(search_results)
+        except Exception as e:
+            print(f"  Error fetching page {page}, attempt {attempt + 1}: {str(e)}")
+            if attempt < retries - 1:
+                time.sleep(2 ** attempt)  # Exponential backoff
+            else:
+                raise
+
+def iter_mhra_medicines(query, min_date=None, max_date=None, max_results=None, page_size=MHRA_PAGE_SIZE,
+                        max_workers=MHRA_MAX_WORKERS, retries=3, status=None):
+    """
+    Page through MHRA medicines search results, fetching pages concurrently
+    
+    The first page is fetched on its own; the total it reports gives the
+    number of pages, which max_workers threads then fetch within the MHRA
+    request budget (MHRA_REQUESTS_PER_MINUTE). Results are yielded in page
+    order as soon as a page and all pages before it have arrived, with at
+    most 2 * max_workers pages requested ahead of the consumer. Without a
+    total, pages are fetched one after another until a short page.
+    
+    Args:
+        query (str): The search query
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        max_results (int): Stop after this many results (None for all matches)
+        page_size (int): Results per request
+        max_workers (int): Maximum number of concurrent page requests
+        retries (int): Number of attempts per page
+        status (dict): Receives the "error" that stopped the paging early, if
+            a page after the first could not be fetched
+        
+    Yields:
+        dict: Search results
+        
+    Raises:
+        Exception: If the first page cannot be fetched
+    """
+    medicines, total = _fetch_medicines(query, 1, page_size, retries, None, min_date, max_date)
+    count = 0
+    for result in _parse_medicines(medicines, min_date, max_date):
+        yield result
+        count += 1
+        if max_results is not None and count >= max_results:
+            return
+    
+    if total is None:
+        page = 1
+        while len(medicines) >= page_size:
+            page += 1
+            try:
+                medicines, _ = _fetch_medicines(query, page, page_size, retries, None, min_date, max_date)
+            except Exception as e:
+                print(f"  Error fetching page {page}, stopping: {str(e)}")
+                if status is not None:
+                    status["error"] = e
+                return
+            for result in _parse_medicines(medicines, min_date, max_date):
+                yield result
+                count += 1
+                if max_results is not None and count >= max_results:
+                    return
+        return
+    
+    last_page = -(-total // page_size)
+    print(f"  {total} matching medicines, fetching {last_page - 1} more pages with {max_workers} workers")
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    # Set when the consumer stops, so requests still waiting for the budget give up
+    cancel = threading.Event()
+    try:
+        pending = {}
+        next_page = 2
+        for page in range(2, last_page + 1):
+            # Keep a window of requests running ahead of the page being read
+            while next_page <= last_page and next_page < page + 2 * max_workers:
+                pending[next_page] = executor.submit(_fetch_medicines, query, next_page, page_size, retries, cancel,
+                                                     min_date, max_date)
+                next_page += 1
+            try:
+                medicines, _ = pending.pop(page).result()
+            except Exception as e:
+                print(f"  Error fetching page {page}, stopping: {str(e)}")
+                if status is not None:
+                    status["error"] = e
+                return
+            for result in _parse_medicines(medicines, min_date, max_date):
+                yield result
+                count += 1
+                if max_results is not None and count >= max_results:
+                    return
+    finally:
+        cancel.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def parse_mhra_medicine(medicine):
+    """
+    Build a search result from a medicine of the search API
+    
+    Args:
+        medicine (dict): Medicine from the search response
+        
+    Returns:
+        dict: Search result
+    """
+    # Extract basic information
+    title = medicine.get('name', '')
+    product_id = medicine.get('productId', '')
+    
+    # Construct URL
+    url = f"{MHRA_BASE_URL}/substance-product/{product_id}" if product_id else f"{MHRA_BASE_URL}/search?query={quote_plus(title)}"
+    
+    # Extract date
+    date = ""
+    if 'authorisationDate' in medicine:
+        date_str = medicine['authorisationDate']
+        # Convert to YYYY-MM-DD format if needed
+        if date_str:
+            date = to_iso_date(date_str)
+
+    # Extract snippet/description
+    snippet = ""
+    if 'activeSubstances' in medicine:
+        active_substances = medicine['activeSubstances']
+        if active_substances:
+            snippet = f"Active substances: {', '.join(active_substances)}. "
+    
+    if 'productType' in medicine:
+        snippet += f"Product type: {medicine['productType']}. "
+        
+    if 'marketingStatus' in medicine:
+        snippet += f"Status: {medicine['marketingStatus']}."
+    
+    # Limit snippet length
+    if len(snippet) > 300:
+        snippet = snippet[:297] + "..."
+    
+    # Extract authors/manufacturers
+    authors = []
+    if 'marketingAuthorisationHolder' in medicine:
+        authors.append(medicine['marketingAuthorisationHolder'])
+    
+    # Create the result object
+    return {
+        "id": stable_id("mhra", product_id, None, title),
+        "title": title,
+        "url": url,
+        "source": "MHRA",
+        "date": date,
+        "snippet": snippet,
+        "authors": authors
+    }
+
+def _parse_medicines(medicines, min_date=None, max_date=None):
+    """
+    Build the search results of a page of medicines, filtered by date
+    
+    Returns:
+        list: Search results (results without dates are kept)
+    """
+    results = []
+    for medicine in medicines:
+        try:
+            result = parse_mhra_medicine(medicine)
+        except Exception as e:
+            print(f"  Error processing medicine result: {str(e)}")
+            continue
+        if is_within_range(result["date"], min_date, max_date):
+            results.append(result)
+    return results
+
+def parse_mhra_response(body, query="", max_results=10, min_date=None, max_date=None):
+    """
+    Parse a raw MHRA search response as search_mhra_medicines does (used to
+    re-parse archived responses, see response_archive.py)
+    
+    Args:
+        body (str): Response body (JSON, or an HTML search page)
+        query (str): The search query
+        max_results (int): Maximum number of results to return
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        
+    Returns:
+        list: List of search results
+    """
+    try:
+        search_results = json.loads(body)
+    except json.JSONDecodeError:
+        return parse_mhra_html_results(body, query, max_results)
+    if not isinstance(search_results, dict) or not isinstance(search_results.get('results'), list):
+        return parse_mhra_html_results(body, query, max_results)
+    return _parse_medicines(search_results['results'], min_date, max_date)
+
+def _html_page(html_content, query, max_results, page_info):
+    """Parse an HTML search response, recording what it held in page_info"""
+    results = parse_mhra_html_results(html_content, query, max_results)
+    if page_info is not None:
+        page_info["received"] = len(results)
+        page_info["total"] = None
+    return results
+
+def search_mhra_medicines_page(query, page_size=10, min_date=None, max_date=None, cursor=None, retries=3):
+    """
+    Get one page of MHRA medicines search results
+    
+    The cursor holds the next page number and the page size of the first
+    page, so later pages line up with it whatever page_size they ask for.
+    
+    Args:
+        query (str): The search query
+        page_size (int): Number of results per page
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        cursor (str): Cursor returned with the previous page (None for the first page)
+        retries (int): Number of retries if the API call fails
+        
+    Returns:
+        tuple: List of search results and the cursor of the next page (None on the last page)
+    """
+    state = decode_cursor(cursor, "mhra", query, min_date, max_date) if cursor else {"page": 1, "page_size": page_size}
+    page, page_size = state["page"], state["page_size"]
+    
+    page_info = {}
+    results = search_mhra_medicines(query, page_size, min_date, max_date, retries, page=page, page_info=page_info)
+    if "received" not in page_info:
+        raise RuntimeError(f"MHRA search for '{query}' failed on page {page}")
+    
+    # Results are filtered by date after they are received, so a page can
+    # come back short (or empty) before the last page
+    total = page_info["total"]
+    if total is not None:
+        more = page * page_size < total
+    else:
+        more = page_info["received"] >= page_size
+    next_cursor = None
+    if more:
+        next_cursor = encode_cursor("mhra", {"page": page + 1, "page_size": page_size}, query, min_date, max_date)
+    return results, next_cursor
 
 def parse_mhra_html_results(html_content, query, max_results):
     """
@@ -192,7 +522,8 @@ def parse_mhra_html_results(html_content, query, max_results):
     results = []
     
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
+        # Only build the tree for the results container
+        soup = make_container_soup(html_content, ["search-results"])
         
         # Find all medicine items
         medicine_items = soup.select('.search-results .search-result')
@@ -214,26 +545,10 @@ def parse_mhra_html_results(html_content, query, max_results):
                 date_elem = item.select_one('.date, .authorisation-date')
                 date = date_elem.get_text().strip() if date_elem else ""
                 
-                # Try to convert to YYYY-MM-DD format
+                # Convert to YYYY-MM-DD format
                 if date:
-                    try:
-                        # Parse various date formats
-                        date_formats = [
-                            "%d/%m/%Y",
-                            "%Y-%m-%d",
-                            "%d %B %Y"
-                        ]
-                        
-                        for fmt in date_formats:
-                            try:
-                                date_obj = datetime.strptime(date, fmt)
-                                date = date_obj.strftime("%Y-%m-%d")
-                                break
-                            except ValueError:
-                                continue
-                    except Exception:
-                        pass
-                
+                    date = to_iso_date(date)
+
                 # Extract snippet
                 snippet_elem = item.select_one('.description, .summary')
                 snippet = snippet_elem.get_text().strip() if snippet_elem else ""
@@ -250,13 +565,14 @@ def parse_mhra_html_results(html_content, query, max_results):
                 
                 # Create the result object
                 result = {
-                    "id": f"mhra-{hash(url) % 10000}",
+                    "id": stable_id("mhra", None, url, title),
                     "title": title,
                     "url": url,
                     "source": "MHRA",
                     "date": date,
                     "snippet": snippet,
-                    "authors": authors
+                    "authors": authors,
+                    "documents": find_document_links(item, MHRA_BASE_URL)
                 }
                 
                 results.append(result)
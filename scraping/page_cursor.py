@@ -0,0 +1,105 @@
+"""
+Page Cursors
+
+Source adapters page through results with opaque cursor strings: each
+search_*_page function takes the cursor returned with the previous page and
+returns the next page together with the cursor after it (None once the
+results are exhausted). Callers only pass cursors back; what a cursor holds is
+up to the adapter (a PubMed WebEnv and offset, an openFDA skip or search_after
+link, a page number, ...).
+
+A cursor also records which source issued it and a fingerprint of the query
+and date range, so a cursor cannot be used to continue a different search.
+
+Usage:
+    results, cursor = search_pubmed_page("aspirin", page_size=20)
+    while cursor:
+        more, cursor = search_pubmed_page("aspirin", page_size=20, cursor=cursor)
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+# Version of the cursor encoding; cursors of other versions are rejected
+CURSOR_VERSION = 1
+
+
+def _fingerprint(query: str, min_date: Optional[str], max_date: Optional[str]) -> str:
+    """Fingerprint of the search a cursor belongs to"""
+    search = json.dumps([query, min_date or None, max_date or None], ensure_ascii=False)
+    return hashlib.sha1(search.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(source: str, state: Dict[str, Any], query: str, min_date: Optional[str] = None,
+                  max_date: Optional[str] = None) -> str:
+    """
+    Encode the paging state of a search as an opaque cursor
+
+    Args:
+        source (str): Name of the source adapter issuing the cursor
+        state (Dict[str, Any]): JSON-serializable paging state
+        query (str): The search query
+        min_date (Optional[str]): Minimum date of the search
+        max_date (Optional[str]): Maximum date of the search
+
+    Returns:
+        str: URL-safe cursor string
+    """
+    payload = {"v": CURSOR_VERSION, "s": source, "f": _fingerprint(query, min_date, max_date), "st": state}
+    data = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _decode(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor into its payload"""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(data)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError("Invalid page cursor")
+    if not isinstance(payload, dict) or payload.get("v") != CURSOR_VERSION or not isinstance(payload.get("st"), dict):
+        raise ValueError("Invalid page cursor")
+    return payload
+
+
+def cursor_source(cursor: str) -> str:
+    """
+    Get the name of the source adapter that issued a cursor
+
+    Args:
+        cursor (str): Page cursor
+
+    Returns:
+        str: Source name
+    """
+    return _decode(cursor).get("s", "")
+
+
+def decode_cursor(cursor: str, source: str, query: str, min_date: Optional[str] = None,
+                  max_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Decode the paging state of a cursor, checking it belongs to this search
+
+    Args:
+        cursor (str): Page cursor
+        source (str): Name of the source adapter reading the cursor
+        query (str): The search query
+        min_date (Optional[str]): Minimum date of the search
+        max_date (Optional[str]): Maximum date of the search
+
+    Returns:
+        Dict[str, Any]: The paging state
+
+    Raises:
+        ValueError: If the cursor is malformed, or was issued by another source
+            or for another search
+    """
+    payload = _decode(cursor)
+    if payload.get("s") != source:
+        raise ValueError(f"Page cursor was issued by '{payload.get('s')}', not '{source}'")
+    if payload.get("f") != _fingerprint(query, min_date, max_date):
+        raise ValueError("Page cursor belongs to a different query or date range")
+    return payload["st"]
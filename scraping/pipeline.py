@@ -0,0 +1,224 @@
+"""
+Streaming Stage Pipeline
+
+This module provides a small pipeline runner used by the batch scraper. Items
+flow through a chain of stages connected by bounded queues:
+
+    source -> stage 1 -> stage 2 -> ... -> last stage
+
+Each stage has its own number of worker threads and its own input queue size,
+so slow stages (network I/O) and fast stages (normalization) can be tuned
+independently. A stage function takes one item and returns an iterable of
+output items, so a stage can drop items (date filtering) or fan out (one page
+into many results). When a queue is full the upstream stage blocks, which keeps
+memory bounded no matter how many items pass through.
+
+CPU-bound stages can hand their work to a process pool from inside the stage
+function; the stage's worker threads then only wait on the pool.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Set up logging
+logger = logging.getLogger("pipeline")
+
+# Marker put on a queue when no more items will follow
+_DONE = object()
+
+
+class StageStats:
+    """
+    Counters and timings for one pipeline stage
+    """
+
+    def __init__(self, name: str, workers: int):
+        """
+        Initialize the stage statistics
+
+        Args:
+            name (str): Stage name
+            workers (int): Number of worker threads
+        """
+        self.name = name
+        self.workers = workers
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def record(self, produced: int, elapsed: float, failed: bool = False):
+        """Record the outcome of processing one item"""
+        with self._lock:
+            self.items_in += 1
+            self.items_out += produced
+            self.busy_time += elapsed
+            if failed:
+                self.errors += 1
+
+    @property
+    def wall_time(self) -> float:
+        """Seconds between the stage starting and its last worker finishing"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the statistics to a dictionary
+
+        Returns:
+            Dict[str, Any]: Statistics
+        """
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "busy_time": round(self.busy_time, 3),
+            "wall_time": round(self.wall_time, 3),
+        }
+
+
+class Stage:
+    """
+    A pipeline stage
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Optional[Iterable[Any]]],
+                 workers: int = 1, queue_size: int = 16):
+        """
+        Initialize the stage
+
+        Args:
+            name (str): Stage name, used in logs and statistics
+            func (Callable): Function called with each input item, returning an
+                iterable of output items (or None for no output)
+            workers (int): Number of worker threads for this stage
+            queue_size (int): Maximum number of items waiting in this stage's input queue
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.stats = StageStats(name, self.workers)
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues
+    """
+
+    def __init__(self, stages: List[Stage]):
+        """
+        Initialize the pipeline
+
+        Args:
+            stages (List[Stage]): Stages in processing order
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+
+    def run(self, items: Iterable[Any]):
+        """
+        Feed items through the pipeline and wait for all stages to finish
+
+        Output of the last stage is discarded, so the last stage should be a
+        sink that writes its input somewhere.
+
+        Args:
+            items (Iterable[Any]): Input items for the first stage
+        """
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        queues.append(None)  # The last stage has no output queue
+
+        threads = []
+        for index, stage in enumerate(self.stages):
+            stage.stats.started_at = time.perf_counter()
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            for worker in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(stage, queues[index], queues[index + 1], remaining, lock),
+                    name=f"{stage.name}-{worker}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        # Feed the first stage from the calling thread
+        try:
+            for item in items:
+                queues[0].put(item)
+        finally:
+            queues[0].put(_DONE)
+
+        for thread in threads:
+            thread.join()
+
+    def _worker(self, stage: Stage, in_queue: queue.Queue, out_queue: Optional[queue.Queue],
+                remaining: List[int], lock: threading.Lock):
+        """Process items from in_queue until the upstream stage is done"""
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                # Let the other workers of this stage see the marker too
+                in_queue.put(_DONE)
+                break
+
+            start = time.perf_counter()
+            produced = 0
+            failed = False
+            try:
+                outputs = stage.func(item)
+                if outputs is not None:
+                    for output in outputs:
+                        if out_queue is not None:
+                            out_queue.put(output)
+                        produced += 1
+            except Exception as e:
+                failed = True
+                logger.error(f"Error in {stage.name} stage: {str(e)}")
+            stage.stats.record(produced, time.perf_counter() - start, failed)
+
+        # The last worker of a stage closes the next stage's input
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            stage.stats.finished_at = time.perf_counter()
+            if out_queue is not None:
+                out_queue.put(_DONE)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """
+        Get per-stage statistics
+
+        Returns:
+            List[Dict[str, Any]]: Statistics for each stage, in order
+        """
+        return [stage.stats.to_dict() for stage in self.stages]
+
+    def format_stats(self) -> str:
+        """
+        Format per-stage statistics as a table
+
+        Returns:
+            str: Table of per-stage counters and timings
+        """
+        lines = [f"  {'stage':<12}{'workers':>8}{'in':>8}{'out':>8}{'errors':>8}{'busy (s)':>10}{'wall (s)':>10}"]
+        for stats in self.get_stats():
+            lines.append(
+                f"  {stats['stage']:<12}{stats['workers']:>8}{stats['items_in']:>8}{stats['items_out']:>8}"
+                f"{stats['errors']:>8}{stats['busy_time']:>10.2f}{stats['wall_time']:>10.2f}"
+            )
+        return "\n".join(lines)
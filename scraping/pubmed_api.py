@@ -39,6 +39,19 @@ except ImportError:
         logger.warning("Browser automation is not available. Make sure browser_automation.py is in the same directory.")
         BROWSER_AUTOMATION_AVAILABLE = False
 
+# Import the shared date normalizer, result ids and page cursors
+try:
+    from date_utils import to_iso_date
+    from result_record import stable_id, FailedSearch
+    from page_cursor import encode_cursor, decode_cursor
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from date_utils import to_iso_date
+    from result_record import stable_id, FailedSearch
+    from page_cursor import encode_cursor, decode_cursor
+
 # Base URLs for E-utilities
 ESEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
 ESUMMARY_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
@@ -48,6 +61,44 @@ EFETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
 EMAIL = "your.email@example.com"  # Replace with your email
 TOOL = "medsearch"
 
+def _date_range(min_date=None, max_date=None):
+    """
+    Build the ESearch publication date parameters
+
+    Args:
+        min_date (str): Minimum date in format YYYY-MM-DD or YYYY/MM/DD
+        max_date (str): Maximum date in format YYYY-MM-DD or YYYY/MM/DD
+
+    Returns:
+        str: Query string parameters ("" without dates)
+    """
+    if not (min_date or max_date):
+        return ""
+    min_date_str = min_date.replace("-", "/") if min_date else "1900/01/01"
+    max_date_str = max_date.replace("-", "/") if max_date else datetime.now().strftime("%Y/%m/%d")
+    return f"&mindate={min_date_str}&maxdate={max_date_str}&datetype=pdat"
+
+def count_pubmed(query, min_date=None, max_date=None, timeout=10):
+    """
+    Count the PubMed articles matching a query without fetching them
+
+    Uses ESearch with rettype=count, which only returns the number of matches.
+
+    Args:
+        query (str): The search query
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        timeout (float): Request timeout in seconds
+
+    Returns:
+        int: Number of matching articles
+    """
+    count_url = (f"{ESEARCH_URL}?db=pubmed&term={quote_plus(query)}&rettype=count&retmode=json"
+                 f"{_date_range(min_date, max_date)}&tool={TOOL}&email={EMAIL}")
+    response = requests.get(count_url, timeout=timeout)
+    response.raise_for_status()
+    return int(response.json()['esearchresult']['count'])
+
 def search_pubmed(query, max_results=10, min_date=None, max_date=None, retries=3, use_browser_fallback=True, captcha_api_key=""):
     """
     Search PubMed using the E-utilities API
@@ -67,11 +118,7 @@ def search_pubmed(query, max_results=10, min_date=None, max_date=None, retries=3
     logger.info(f"Searching PubMed for: {query}")
 
     # Format dates for the API
-    date_range = ""
-    if min_date or max_date:
-        min_date_str = min_date.replace("-", "/") if min_date else "1900/01/01"
-        max_date_str = max_date.replace("-", "/") if max_date else datetime.now().strftime("%Y/%m/%d")
-        date_range = f"&mindate={min_date_str}&maxdate={max_date_str}&datetype=pdat"
+    date_range = _date_range(min_date, max_date)
 
     # Build the search URL
     search_url = f"{ESEARCH_URL}?db=pubmed&term={quote_plus(query)}&retmax={max_results}&retmode=json{date_range}&tool={TOOL}&email={EMAIL}"
@@ -109,7 +156,97 @@ def search_pubmed(query, max_results=10, min_date=None, max_date=None, retries=3
                     logger.info("  Falling back to browser automation")
                     return search_pubmed_with_browser(query, max_results, min_date, max_date, captcha_api_key)
 
-                return []
+                return FailedSearch(e)
+
+def _esearch_page(query, retstart, page_size, min_date=None, max_date=None, webenv=None, query_key=None):
+    """
+    Run one ESearch request for a page of PMIDs
+
+    With a WebEnv and query key, the page is read from the search stored on
+    the NCBI history server (term #<query_key>) instead of running the query
+    again.
+
+    Returns:
+        dict: The esearchresult of the response
+    """
+    if webenv and query_key:
+        term = quote_plus(f"#{query_key}")
+        history = f"&WebEnv={quote_plus(webenv)}"
+    else:
+        term = f"{quote_plus(query)}{_date_range(min_date, max_date)}"
+        history = ""
+    search_url = (f"{ESEARCH_URL}?db=pubmed&term={term}&usehistory=y&retstart={retstart}&retmax={page_size}"
+                  f"&retmode=json{history}&tool={TOOL}&email={EMAIL}")
+    response = requests.get(search_url)
+    response.raise_for_status()
+    search_result = response.json().get('esearchresult', {})
+    if 'ERROR' in search_result:
+        raise ValueError(search_result['ERROR'])
+    return search_result
+
+def search_pubmed_page(query, page_size=10, min_date=None, max_date=None, cursor=None, retries=3):
+    """
+    Get one page of PubMed search results
+
+    The first page stores the search on the NCBI history server; the cursor
+    keeps its WebEnv and the offset of the next page, so later pages read the
+    stored PMIDs instead of searching again. If the WebEnv has expired, the
+    query is run again from the offset.
+
+    Args:
+        query (str): The search query
+        page_size (int): Number of results per page
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        cursor (str): Cursor returned with the previous page (None for the first page)
+        retries (int): Number of retries if the API call fails
+
+    Returns:
+        tuple: List of search results and the cursor of the next page (None on the last page)
+    """
+    state = decode_cursor(cursor, "pubmed", query, min_date, max_date) if cursor else {}
+    retstart = state.get("retstart", 0)
+    logger.info(f"Searching PubMed for: {query} (results {retstart + 1}-{retstart + page_size})")
+
+    for attempt in range(retries):
+        try:
+            logger.info(f"  API call attempt {attempt + 1}/{retries}")
+            try:
+                search_result = _esearch_page(query, retstart, page_size, min_date, max_date,
+                                              state.get("webenv"), state.get("query_key"))
+            except (requests.RequestException, ValueError) as e:
+                if not state.get("webenv"):
+                    raise
+                logger.info(f"  Search history unavailable ({str(e)}), searching again")
+                state = {}
+                search_result = _esearch_page(query, retstart, page_size, min_date, max_date)
+            break
+        except Exception as e:
+            logger.error(f"  Error in search attempt {attempt + 1}: {str(e)}")
+            if attempt < retries - 1:
+                wait_time = 2 ** attempt  # Exponential backoff
+                logger.info(f"  Retrying in {wait_time} seconds...")
+                time.sleep(wait_time)
+            else:
+                raise
+
+    pmids = search_result.get('idlist', [])
+    total = int(search_result.get('count', 0))
+    next_start = retstart + len(pmids)
+    next_cursor = None
+    if pmids and next_start < total:
+        next_cursor = encode_cursor("pubmed", {
+            "retstart": next_start,
+            "webenv": state.get("webenv") or search_result.get('webenv'),
+            "query_key": state.get("query_key") or search_result.get('querykey')
+        }, query, min_date, max_date)
+
+    logger.info(f"  Found {len(pmids)} of {total} results")
+    results = get_article_details(pmids)
+    if isinstance(results, FailedSearch):
+        # Raise, so the caller keeps its cursor to retry the page
+        raise RuntimeError(f"Could not fetch the PubMed article details: {results.error}")
+    return results, next_cursor
 
 def search_pubmed_with_browser(query, max_results=10, min_date=None, max_date=None, captcha_api_key=""):
     """
@@ -138,13 +275,13 @@ def search_pubmed_with_browser(query, max_results=10, min_date=None, max_date=No
 
         if not browser:
             logger.error("Failed to create browser instance")
-            return []
+            return FailedSearch("Failed to create browser instance")
 
         # Navigate to PubMed
         pubmed_url = "https://pubmed.ncbi.nlm.nih.gov/"
         if not browser.navigate_to(pubmed_url):
             logger.error(f"Failed to navigate to {pubmed_url}")
-            return []
+            return FailedSearch(f"Failed to navigate to {pubmed_url}")
 
         # Build the search URL with date filters
         search_url = f"https://pubmed.ncbi.nlm.nih.gov/?term={quote_plus(query)}"
@@ -169,7 +306,7 @@ def search_pubmed_with_browser(query, max_results=10, min_date=None, max_date=No
         # Navigate to the search URL
         if not browser.navigate_to(search_url):
             logger.error(f"Failed to navigate to {search_url}")
-            return []
+            return FailedSearch(f"Failed to navigate to {search_url}")
 
         # Check for CAPTCHA
         if "captcha" in browser.get_page_source().lower() or "robot" in browser.get_page_source().lower():
@@ -178,7 +315,7 @@ def search_pubmed_with_browser(query, max_results=10, min_date=None, max_date=No
             # Try to solve the CAPTCHA
             if not browser.solve_captcha():
                 logger.error("Failed to solve CAPTCHA")
-                return []
+                return FailedSearch("Failed to solve CAPTCHA")
 
             logger.info("CAPTCHA solved successfully")
 
@@ -189,8 +326,8 @@ def search_pubmed_with_browser(query, max_results=10, min_date=None, max_date=No
         html = browser.get_page_source()
 
         # Parse the HTML
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(html, "html.parser")
+        from html_parsing import make_soup
+        soup = make_soup(html)
 
         # Find all result items
         result_items = soup.select(".docsum-content, .results-article")
@@ -221,26 +358,9 @@ def search_pubmed_with_browser(query, max_results=10, min_date=None, max_date=No
                 date_elem = item.select_one(".docsum-journal-citation date, .pub-date")
                 date = date_elem.get_text().strip() if date_elem else ""
 
-                # Try to convert to YYYY-MM-DD format
+                # Convert to YYYY-MM-DD format
                 if date:
-                    try:
-                        # Parse various date formats
-                        date_formats = [
-                            "%Y %b %d",
-                            "%Y %b",
-                            "%b %Y",
-                            "%Y"
-                        ]
-
-                        for fmt in date_formats:
-                            try:
-                                date_obj = datetime.strptime(date, fmt)
-                                date = date_obj.strftime("%Y-%m-%d")
-                                break
-                            except ValueError:
-                                continue
-                    except Exception:
-                        pass
+                    date = to_iso_date(date)
 
                 # Extract snippet/abstract
                 snippet_elem = item.select_one(".full-view-snippet, .abstract")
@@ -261,7 +381,7 @@ def search_pubmed_with_browser(query, max_results=10, min_date=None, max_date=No
 
                 # Create the result object
                 result = {
-                    "id": f"pubmed-{pmid}" if pmid else f"pubmed-{i}",
+                    "id": stable_id("pubmed", pmid, url, title),
                     "title": title,
                     "url": url,
                     "source": "PubMed",
@@ -280,7 +400,7 @@ def search_pubmed_with_browser(query, max_results=10, min_date=None, max_date=No
 
     except Exception as e:
         logger.error(f"Error in browser automation: {str(e)}")
-        return []
+        return FailedSearch(e)
 
     finally:
         # Close the browser
@@ -330,35 +450,8 @@ def get_article_details(pmids, retries=3):
                     # Extract date
                     date = ""
                     if 'pubdate' in article:
-                        date = article['pubdate']
-                        # Try to convert to YYYY-MM-DD format
-                        try:
-                            # Handle various date formats
-                            if len(date) >= 4:  # At least has a year
-                                year = date[:4]
-                                month = "01"
-                                day = "01"
-
-                                # Try to extract month and day if available
-                                parts = date.split()
-                                if len(parts) >= 2:
-                                    # Handle formats like "2023 Jan" or "2023 Jan 15"
-                                    month_map = {
-                                        "Jan": "01", "Feb": "02", "Mar": "03", "Apr": "04",
-                                        "May": "05", "Jun": "06", "Jul": "07", "Aug": "08",
-                                        "Sep": "09", "Oct": "10", "Nov": "11", "Dec": "12"
-                                    }
-                                    if parts[1] in month_map:
-                                        month = month_map[parts[1]]
-
-                                        # Try to extract day
-                                        if len(parts) >= 3 and parts[2].isdigit():
-                                            day = parts[2].zfill(2)
-
-                                date = f"{year}-{month}-{day}"
-                        except Exception:
-                            # If date parsing fails, keep the original format
-                            pass
+                        # Convert to YYYY-MM-DD format, keeping the original if unparseable
+                        date = to_iso_date(article['pubdate'])
 
                     # Get the abstract using EFetch
                     abstract = get_abstract(pmid)
@@ -371,6 +464,7 @@ def get_article_details(pmids, retries=3):
                         "source": "PubMed",
                         "date": date,
                         "snippet": abstract[:300] + "..." if len(abstract) > 300 else abstract,
+                        "abstract": abstract,
                         "authors": authors
                     }
 
@@ -386,7 +480,7 @@ def get_article_details(pmids, retries=3):
                 time.sleep(wait_time)
             else:
                 print("  All details attempts failed")
-                return []
+                return FailedSearch(e)
 
 def get_abstract(pmid, retries=3):
     """
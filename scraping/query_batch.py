@@ -0,0 +1,188 @@
+"""
+Multi-Query Batch Helpers
+
+This module lets the batch tools (batch_scraper.py, api_integration.py and
+run_search.py) run many queries in one process with --queries-file, instead of
+one process per query from a shell loop.
+
+A queries file is either:
+1. A text file with one query per line (blank lines and lines starting with #
+   are skipped)
+2. A CSV file with a header row containing a "query" column and optional
+   "from_date" and "to_date" columns (min_date/max_date are accepted too) for
+   per-query date ranges
+
+A query that appears more than once is only run once (its first line is
+used), since each query's results and job journal tasks are keyed by it.
+
+Each query's results go to their own output partition, next to the --output
+path: results.json becomes results/0001-aspirin.json, results/0002-ibuprofen.json, ...
+"""
+
+import csv
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+# Import the shared date normalizer
+try:
+    from date_utils import parse_date_bound
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from date_utils import parse_date_bound
+
+# tqdm is optional; fall back to printing progress lines
+try:
+    from tqdm import tqdm
+    TQDM_AVAILABLE = True
+except ImportError:
+    TQDM_AVAILABLE = False
+
+# Column names accepted for the date range in CSV queries files
+FROM_DATE_COLUMNS = ("from_date", "min_date", "from")
+TO_DATE_COLUMNS = ("to_date", "max_date", "to")
+
+# Characters replaced when turning a query into a file name
+_SLUG_PATTERN = re.compile(r"[^a-z0-9]+")
+
+
+def _valid_date(value: Optional[str], line: int, column: str) -> Optional[str]:
+    """Return value if it is a valid YYYY-MM-DD date, warning and returning None otherwise"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    if parse_date_bound(value) is None:
+        print(f"Warning: Invalid {column} '{value}' on line {line} of the queries file. Expected YYYY-MM-DD.")
+        return None
+    return value
+
+
+def load_queries(path: str, from_date: Optional[str] = None,
+                 to_date: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Load the queries of a queries file
+
+    Args:
+        path (str): Path to a text file (one query per line) or a CSV file with a "query" column
+        from_date (Optional[str]): Default start date for queries without one (YYYY-MM-DD)
+        to_date (Optional[str]): Default end date for queries without one (YYYY-MM-DD)
+
+    Returns:
+        List[Dict[str, Any]]: Distinct queries with "query", "from_date" and "to_date" keys, in file order
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        content = f.read()
+
+    lines = content.splitlines()
+    first_line = next((line for line in lines if line.strip()), "")
+    is_csv = path.lower().endswith(".csv") or "query" in [
+        column.strip().lower() for column in next(csv.reader([first_line]), [])
+    ]
+
+    queries = []
+    seen = set()
+
+    def add(query, line, query_from_date, query_to_date):
+        if query in seen:
+            print(f"Warning: Duplicate query '{query}' on line {line} of the queries file. "
+                  f"It is only run once, with the dates of its first line.")
+            return
+        seen.add(query)
+        queries.append({"query": query, "from_date": query_from_date, "to_date": query_to_date})
+
+    if is_csv:
+        reader = csv.DictReader(lines)
+        columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+        if "query" not in columns:
+            raise ValueError(f"CSV queries file {path} has no 'query' column")
+
+        def column_value(row, names):
+            for name in names:
+                if name in columns and row.get(columns[name]):
+                    return row[columns[name]]
+            return None
+
+        for line, row in enumerate(reader, 2):
+            query = (row.get(columns["query"]) or "").strip()
+            if not query or query.startswith("#"):
+                continue
+            add(query, line,
+                _valid_date(column_value(row, FROM_DATE_COLUMNS), line, "from_date") or from_date,
+                _valid_date(column_value(row, TO_DATE_COLUMNS), line, "to_date") or to_date)
+    else:
+        for line, text in enumerate(lines, 1):
+            query = text.strip()
+            if not query or query.startswith("#"):
+                continue
+            add(query, line, from_date, to_date)
+
+    return queries
+
+
+def partition_path(output: str, index: int, query: str) -> str:
+    """
+    Get the output partition for one query of a multi-query run
+
+    Args:
+        output (str): The run's --output path (e.g. results.json)
+        index (int): Position of the query in the queries file (starting at 1)
+        query (str): The query
+
+    Returns:
+        str: Partition path (e.g. results/0001-aspirin.json)
+    """
+    base, extension = os.path.splitext(output)
+    slug = _SLUG_PATTERN.sub("-", query.lower()).strip("-")[:60] or "query"
+    return os.path.join(base, f"{index:04d}-{slug}{extension or '.json'}")
+
+
+class _PrintProgress:
+    """Minimal stand-in for tqdm that prints a progress line every few seconds"""
+
+    def __init__(self, total: int, desc: str, unit: str, interval: float = 5.0):
+        self.total = total
+        self.desc = desc
+        self.unit = unit
+        self.interval = interval
+        self.n = 0
+        self.postfix = ""
+        self._start = time.time()
+        self._last_print = 0.0
+
+    def update(self, n: int = 1):
+        self.n += n
+        now = time.time()
+        if now - self._last_print >= self.interval or self.n >= self.total:
+            self._last_print = now
+            elapsed = now - self._start
+            rate = self.n / elapsed if elapsed > 0 else 0.0
+            eta = (self.total - self.n) / rate if rate > 0 else 0.0
+            print(f"{self.desc}: {self.n}/{self.total} {self.unit}s "
+                  f"[{rate:.2f} {self.unit}/s, ETA {eta:.0f}s] {self.postfix}")
+
+    def set_postfix_str(self, postfix: str):
+        self.postfix = postfix
+
+    def close(self):
+        pass
+
+
+def make_progress(total: int, desc: str = "Searching", unit: str = "task"):
+    """
+    Create a progress bar showing throughput and ETA
+
+    Args:
+        total (int): Total number of tasks
+        desc (str): Label shown before the bar
+        unit (str): Name of one task
+
+    Returns:
+        A tqdm progress bar, or a printing fallback if tqdm is not installed
+    """
+    if TQDM_AVAILABLE:
+        return tqdm(total=total, desc=desc, unit=unit, dynamic_ncols=True)
+    return _PrintProgress(total, desc, unit)
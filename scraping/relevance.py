@@ -0,0 +1,381 @@
+"""
+Relevance Scoring for Merged Search Results
+
+This module ranks results merged from several databases. Each result gets a
+relevanceScore between 0 and 1 made of:
+
+1. Text relevance: BM25F over the title and snippet (and abstract, where the
+   source provides one), with the title weighted highest. Term statistics are
+   taken from the batch being ranked, so no corpus-wide index is needed.
+2. Recency: exponential decay with the age of the result's date.
+3. Source authority: a fixed weight per database.
+
+Per-result work is limited to counting query terms in each field; the
+scoring itself runs over the whole batch at once as NumPy array operations,
+so tens of thousands of merged results are ranked in a fraction of a second.
+
+TopKMerger keeps only the best k results while results arrive from several
+databases, and tells the caller when the databases that have not answered
+yet can no longer change the top k, so a first page can be returned early.
+
+Usage:
+    ranked = rank_results(results, "aspirin liver injury")
+
+    merger = TopKMerger("aspirin liver injury", k=20)
+    merger.add(pubmed_results)
+    if merger.can_stop(["mhra", "tga-cmi"]):
+        ...
+    top = merger.results()
+"""
+
+import heapq
+import itertools
+import math
+import os
+import re
+import sys
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Import the shared date normalizer
+try:
+    from date_utils import to_iso_date
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from date_utils import to_iso_date
+
+# Fields scored for text relevance and their BM25F boosts
+FIELD_BOOSTS = {"title": 3.0, "snippet": 1.0, "abstract": 0.5}
+
+# BM25 parameters: term frequency saturation and per-field length normalization
+BM25_K1 = 1.2
+BM25_B = {"title": 0.3, "snippet": 0.75, "abstract": 0.75}
+
+# In absolute scores, saturation level at which a term counts as fully matched
+# (about a title match plus a snippet match)
+FULL_MATCH_SATURATION = 0.75
+
+# Weights of the score components (they add up to 1)
+TEXT_WEIGHT = 0.7
+RECENCY_WEIGHT = 0.15
+AUTHORITY_WEIGHT = 0.15
+
+# Age in days at which the recency score halves
+RECENCY_HALF_LIFE_DAYS = 3 * 365
+
+# Recency score of results without a usable date
+UNDATED_RECENCY = 0.5
+
+# Authority of each database (by database ID, or matched in the source name)
+SOURCE_AUTHORITY = {
+    "pubmed": 1.0,
+    "nejm": 1.0,
+    "fda": 0.95,
+    "ema": 0.95,
+    "mhra": 0.9,
+    "tga": 0.85,
+    "amjmed": 0.85,
+    "drugbank": 0.8,
+    "chembl": 0.75,
+    "rxnav": 0.75,
+}
+
+# Authority of databases not listed above
+DEFAULT_AUTHORITY = 0.6
+
+# Words left out of the query terms
+STOPWORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "not", "of", "on", "or", "the", "to", "with",
+])
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Byte lookup table that lowercases ASCII letters and turns ASCII punctuation
+# and control characters into spaces (NUL is kept, it separates texts)
+_BYTE_MAP = np.arange(256, dtype=np.uint8)
+for _code in range(1, 128):
+    if not chr(_code).isalnum():
+        _BYTE_MAP[_code] = 32
+    elif chr(_code).isupper():
+        _BYTE_MAP[_code] = ord(chr(_code).lower())
+_ISO_DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    Split a query into the terms used for scoring
+
+    Args:
+        query (str): Search query
+
+    Returns:
+        List[str]: Lowercased, distinct terms without stopwords, in query order
+    """
+    terms = []
+    for term in _TERM_PATTERN.findall((query or "").lower()):
+        if term not in STOPWORDS and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def source_authority(result: Dict[str, Any]) -> float:
+    """
+    Get the authority weight of a result's source
+
+    Args:
+        result (Dict[str, Any]): Search result
+
+    Returns:
+        float: Authority between 0 and 1
+    """
+    database = (result.get("database") or "").lower()
+    source = (result.get("source") or "").lower()
+    for key, authority in SOURCE_AUTHORITY.items():
+        if database.startswith(key) or key in source:
+            return authority
+    return DEFAULT_AUTHORITY
+
+
+def _term_frequencies(texts: List[str], terms: List[str]):
+    """
+    Count query terms in each text
+
+    Terms match at the start of a word, so "tablet" also matches "tablets".
+    All texts are joined into one byte buffer (texts separated by NUL bytes)
+    that is lowercased and stripped of punctuation with a lookup table; term
+    matches are then found with array operations over the whole buffer.
+    Query terms are ASCII (see query_terms), so only ASCII letters need
+    lowercasing.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Term counts (texts x terms) and text lengths in bytes
+    """
+    count = len(texts)
+    counts = np.zeros((count, len(terms)), dtype=np.float64)
+
+    joined = " " + "\x00 ".join(texts) + "\x00"
+    if joined.count("\x00") != count:
+        # A text contains NUL characters of its own
+        joined = " " + "\x00 ".join(text.replace("\x00", " ") for text in texts) + "\x00"
+    buffer = np.take(_BYTE_MAP, np.frombuffer(joined.encode("utf-8"), dtype=np.uint8))
+
+    # Each text ends at a NUL byte and starts with the space before it. Text
+    # length is measured in bytes, which BM25 only uses relative to the average
+    ends = np.flatnonzero(buffer == 0)
+    lengths = (np.diff(ends, prepend=-1) - 2).astype(np.float64)
+
+    for column, term in enumerate(terms):
+        # Start from occurrences of the term's first byte at the start of a
+        # word, then keep those followed by the rest of the term. A candidate
+        # only advances past bytes that matched, so it never runs past the final NUL
+        encoded = term.encode("utf-8")
+        candidates = np.flatnonzero(buffer == encoded[0])
+        candidates = candidates[buffer[candidates - 1] == 32]
+        for offset, byte in enumerate(encoded[1:], 1):
+            candidates = candidates[buffer[candidates + offset] == byte]
+        counts[:, column] = np.bincount(np.searchsorted(ends, candidates), minlength=count)
+
+    return counts, lengths
+
+
+def score_results(results: List[Dict[str, Any]], query: str,
+                  today: Optional[date] = None, absolute: bool = False) -> np.ndarray:
+    """
+    Score a batch of results against a query
+
+    By default term weights (idf) come from the batch and text scores are
+    scaled so the batch's best match gets 1. With absolute=True every term
+    weighs the same and text scores are not scaled, so scores of separately
+    scored batches can be compared (used when merging results as they arrive).
+
+    Args:
+        results (List[Dict[str, Any]]): Search results, possibly from several databases
+        query (str): Search query
+        today (Optional[date]): Reference date for recency (defaults to today)
+        absolute (bool): Score independently of the rest of the batch
+
+    Returns:
+        np.ndarray: Relevance score between 0 and 1 for each result
+    """
+    count = len(results)
+    if count == 0:
+        return np.zeros(0)
+
+    terms = query_terms(query)
+
+    # Text relevance: BM25F, combining the length-normalized term frequencies
+    # of all fields before saturation
+    combined = np.zeros((count, len(terms)))
+    matched = np.zeros((count, len(terms)), dtype=bool)
+    for field, boost in FIELD_BOOSTS.items():
+        texts = [result.get(field) or "" for result in results]
+        tf, lengths = _term_frequencies(texts, terms)
+        if not lengths.any():
+            continue
+        average_length = lengths[lengths > 0].mean()
+        b = BM25_B[field]
+        norm = 1.0 - b + b * (lengths / average_length)
+        combined += boost * tf / norm[:, None]
+        matched |= tf > 0
+
+    if terms and absolute:
+        # Each term adds at most 1 / len(terms), reached once it is fully matched
+        saturation = combined / (BM25_K1 + combined)
+        text_scores = np.minimum(saturation / FULL_MATCH_SATURATION, 1.0).mean(axis=1)
+    elif terms:
+        document_frequency = matched.sum(axis=0)
+        idf = np.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5))
+        text_scores = (idf * combined / (BM25_K1 + combined)).sum(axis=1)
+        best = text_scores.max()
+        text_scores = text_scores / best if best > 0 else text_scores
+    else:
+        text_scores = np.zeros(count)
+
+    # Recency: halves every RECENCY_HALF_LIFE_DAYS, neutral for results without a usable date
+    iso_cache = {}
+    iso_dates = []
+    for result in results:
+        raw = result.get("date") or ""
+        if raw not in iso_cache:
+            iso = to_iso_date(raw, default="") if raw else ""
+            iso_cache[raw] = iso if _ISO_DATE_PATTERN.match(iso) else "NaT"
+        iso_dates.append(iso_cache[raw])
+    dates = np.array(iso_dates, dtype="datetime64[D]")
+    reference = np.datetime64(today or date.today(), "D")
+    age_days = np.clip((reference - dates).astype(np.float64), 0, None)
+    recency = np.where(np.isnat(dates), UNDATED_RECENCY, np.exp(-math.log(2) * age_days / RECENCY_HALF_LIFE_DAYS))
+
+    # Source authority, looked up once per distinct source
+    authority_cache = {}
+    authority = np.empty(count)
+    for i, result in enumerate(results):
+        key = (result.get("database"), result.get("source"))
+        if key not in authority_cache:
+            authority_cache[key] = source_authority(result)
+        authority[i] = authority_cache[key]
+
+    return TEXT_WEIGHT * text_scores + RECENCY_WEIGHT * recency + AUTHORITY_WEIGHT * authority
+
+
+def rank_results(results: List[Dict[str, Any]], query: str,
+                 today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    Score results, store the score as relevanceScore and sort them best first
+
+    Args:
+        results (List[Dict[str, Any]]): Search results, possibly from several databases
+        query (str): Search query
+        today (Optional[date]): Reference date for recency (defaults to today)
+
+    Returns:
+        List[Dict[str, Any]]: The results, sorted by relevanceScore (highest first)
+    """
+    scores = score_results(results, query, today)
+    for result, score in zip(results, np.round(scores, 4).tolist()):
+        result["relevanceScore"] = score
+
+    # Stable sort, so results with equal scores keep their original order
+    order = np.argsort(-scores, kind="stable")
+    return [results[i] for i in order]
+
+
+def max_score(database: str, max_date: Optional[str] = None, today: Optional[date] = None) -> float:
+    """
+    Get the highest absolute score a result from a database could get
+
+    Args:
+        database (str): Database ID
+        max_date (Optional[str]): End of the searched date range (YYYY-MM-DD);
+            results cannot be more recent than this
+        today (Optional[date]): Reference date for recency (defaults to today)
+
+    Returns:
+        float: Upper bound of score_results(..., absolute=True) for the database's results
+    """
+    recency = 1.0
+    if max_date and _ISO_DATE_PATTERN.match(max_date):
+        age_days = (np.datetime64(today or date.today(), "D") - np.datetime64(max_date, "D")).astype(np.float64)
+        if age_days > 0:
+            recency = max(math.exp(-math.log(2) * age_days / RECENCY_HALF_LIFE_DAYS), UNDATED_RECENCY)
+    authority = source_authority({"database": database})
+    return TEXT_WEIGHT + RECENCY_WEIGHT * recency + AUTHORITY_WEIGHT * authority
+
+
+class TopKMerger:
+    """
+    Keeps the k best results of several databases as their results arrive
+    """
+
+    def __init__(self, query: str, k: int, max_date: Optional[str] = None,
+                 today: Optional[date] = None):
+        """
+        Initialize the merger
+
+        Args:
+            query (str): Search query
+            k (int): Number of results to keep
+            max_date (Optional[str]): End of the searched date range (tightens
+                the score bound of databases that have not answered yet)
+            today (Optional[date]): Reference date for recency (defaults to today)
+        """
+        self.query = query
+        self.k = max(1, k)
+        self.max_date = max_date
+        self.today = today
+        self.seen = 0
+        self._heap = []  # min-heap of (score, sequence, result)
+        self._sequence = itertools.count()
+
+    def add(self, results: List[Dict[str, Any]]):
+        """
+        Score a database's results and keep them if they make the top k
+
+        Args:
+            results (List[Dict[str, Any]]): Results of one database
+        """
+        if not results:
+            return
+        scores = score_results(results, self.query, self.today, absolute=True)
+        for result, score in zip(results, np.round(scores, 4).tolist()):
+            self.seen += 1
+            if len(self._heap) < self.k:
+                result["relevanceScore"] = score
+                heapq.heappush(self._heap, (score, next(self._sequence), result))
+            elif score > self._heap[0][0]:
+                result["relevanceScore"] = score
+                heapq.heapreplace(self._heap, (score, next(self._sequence), result))
+
+    @property
+    def threshold(self) -> float:
+        """Score a new result has to beat to enter the top k (0 until k results are kept)"""
+        return self._heap[0][0] if len(self._heap) >= self.k else 0.0
+
+    def can_stop(self, pending_databases: List[str]) -> bool:
+        """
+        Check whether databases that have not answered yet could still change the top k
+
+        Args:
+            pending_databases (List[str]): IDs of the databases still being searched
+
+        Returns:
+            bool: True if k results are kept and none of the pending databases
+                can produce a result scoring above the k-th best
+        """
+        if len(self._heap) < self.k:
+            return False
+        threshold = self.threshold
+        return all(max_score(db_id, self.max_date, self.today) <= threshold for db_id in pending_databases)
+
+    def results(self) -> List[Dict[str, Any]]:
+        """
+        Get the kept results
+
+        Returns:
+            List[Dict[str, Any]]: Up to k results, best first (ties in arrival order)
+        """
+        return [result for _, _, result in sorted(self._heap, key=lambda item: (-item[0], item[1]))]
@@ -0,0 +1,667 @@
+#!/usr/bin/env python
+"""
+Raw Response Archive
+
+Keeps the raw body of every search response the source adapters parse (EMA,
+TGA and MHRA search pages, openFDA label pages), so that when a site changes
+its markup and a parser is fixed, the results can be regenerated from the
+archive instead of fetching everything again.
+
+1. Bodies are stored compressed (zstd when the zstandard package is
+   installed, gzip otherwise) and content-addressed by the SHA-256 of the
+   raw body (archive/objects/<sha256[:2]>/<sha256>.zst), so a page fetched
+   many times unchanged is stored once
+2. Every response is recorded in archive/archive.db with its request (URL,
+   method, body), status, content type, encoding, time and the parser
+   arguments (query, max_results, date range)
+3. reparse runs the current parsers over the archived bodies in a process
+   pool and regenerates the results without any network I/O
+
+Archiving is on by default; set MEDSEARCH_ARCHIVE=off to turn it off.
+Archiving errors are logged and never fail a search.
+
+Usage:
+    archive_response(response, "ema-medicines", {"query": query, "max_results": 10})
+
+    with ResponseArchive() as archive:
+        for entry, results in archive.reparse(sources=["ema-medicines"]):
+            ...
+
+From the command line:
+    python response_archive.py reparse --source ema-medicines tga-cmi --output regenerated.ndjson
+    python response_archive.py reparse --store
+    python response_archive.py stats
+"""
+
+import argparse
+import concurrent.futures
+import gzip
+import hashlib
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# zstandard is optional: it compresses faster and smaller than gzip
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Import the date filter, the results writer and the result store
+try:
+    from date_utils import is_within_range
+    from result_sinks import open_result_sink
+    from result_store import ResultStore
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from date_utils import is_within_range
+    from result_sinks import open_result_sink
+    from result_store import ResultStore
+
+# Set up logging
+logger = logging.getLogger("response_archive")
+
+# Archive directory (override with the MEDSEARCH_ARCHIVE_DIR environment variable)
+DEFAULT_ARCHIVE_DIR = os.environ.get(
+    "MEDSEARCH_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive")
+)
+
+# Whether search responses are archived (MEDSEARCH_ARCHIVE=off turns it off)
+ARCHIVE_ENABLED = os.environ.get("MEDSEARCH_ARCHIVE", "on").lower() not in ("0", "off", "false", "no")
+
+# Compression of newly archived bodies ("zstd" or "gzip"; override with MEDSEARCH_ARCHIVE_COMPRESSION)
+COMPRESSION = os.environ.get("MEDSEARCH_ARCHIVE_COMPRESSION", "zstd" if ZSTD_AVAILABLE else "gzip")
+if COMPRESSION == "zstd" and not ZSTD_AVAILABLE:
+    COMPRESSION = "gzip"
+
+# File extension of archived bodies, by compression
+EXTENSIONS = {"zstd": ".zst", "gzip": ".gz"}
+
+# Response parsers re-run by reparse, by source: (module, function). Each
+# function takes the decoded body and the archived parser arguments and
+# returns search results, choosing JSON or HTML parsing like the live search
+PARSERS = {
+    "ema-medicines": ("ema_api", "parse_ema_response"),
+    "tga-cmi": ("tga_api", "parse_tga_response"),
+    "mhra": ("mhra_api", "parse_mhra_response"),
+    "fda-drugs": ("fda_api", "parse_label_response"),
+}
+
+# Response headers kept with each archived response
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "X-Total-Count", "Link")
+
+# Bytes read from an archived body at a time
+CHUNK_SIZE = 1 << 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    response_id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    compression TEXT NOT NULL,
+    size INTEGER,
+    source TEXT NOT NULL,
+    url TEXT,
+    method TEXT,
+    request TEXT,
+    status INTEGER,
+    encoding TEXT,
+    headers TEXT,
+    context TEXT,
+    fetched_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_source ON responses(source, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_responses_sha256 ON responses(sha256);
+"""
+
+
+def _compressor(compression: str, f):
+    """Open a compressing writer over a binary file"""
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().stream_writer(f, closefd=False)
+    return gzip.GzipFile(fileobj=f, mode="wb", compresslevel=6, mtime=0)
+
+
+def read_object(path: str, compression: str) -> bytes:
+    """
+    Read and decompress an archived body
+
+    Args:
+        path (str): Object file
+        compression (str): "zstd" or "gzip"
+
+    Returns:
+        bytes: The raw body
+    """
+    with open(path, "rb") as f:
+        if compression == "zstd":
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError("Reading zstd archives needs the zstandard package")
+            with zstandard.ZstdDecompressor().stream_reader(f) as reader:
+                return reader.read()
+        with gzip.GzipFile(fileobj=f, mode="rb") as reader:
+            return reader.read()
+
+
+class ArchiveWriter:
+    """
+    Writer for one response body, compressed and hashed as it is written
+
+    Bodies that are streamed to a parser are archived by writing each chunk
+    as it is read; commit() stores the body once it is complete, and
+    discard() drops a body that was not read to the end.
+    """
+
+    def __init__(self, archive: "ResponseArchive", metadata: Dict[str, Any]):
+        """
+        Start writing a body
+
+        Args:
+            archive (ResponseArchive): Archive the body goes to
+            metadata (Dict[str, Any]): Request metadata (see ResponseArchive.writer)
+        """
+        self.archive = archive
+        self.metadata = metadata
+        self.compression = archive.compression
+        self._digest = hashlib.sha256()
+        self._size = 0
+        self._temp = os.path.join(archive.directory, "objects", "tmp", uuid.uuid4().hex)
+        self._file = open(self._temp, "wb")
+        self._writer = _compressor(self.compression, self._file)
+        self.closed = False
+
+    def write(self, data: bytes):
+        """Add a chunk of the body"""
+        self._digest.update(data)
+        self._size += len(data)
+        self._writer.write(data)
+
+    def commit(self) -> Optional[str]:
+        """
+        Store the body and record the response
+
+        Returns:
+            Optional[str]: SHA-256 of the body (None if the writer was already closed)
+        """
+        if self.closed:
+            return None
+        self.closed = True
+        try:
+            self._writer.close()
+            self._file.close()
+        except Exception:
+            self._file.close()
+            os.remove(self._temp)
+            raise
+        return self.archive._store(self._temp, self._digest.hexdigest(), self._size, self.compression,
+                                   self.metadata)
+
+    def discard(self):
+        """Drop the body without recording the response"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._writer.close()
+            self._file.close()
+        finally:
+            os.remove(self._temp)
+
+
+class ArchivingStream:
+    """
+    File-like wrapper that archives a response stream as it is read
+
+    The body is stored when the stream is read to the end; close() discards a
+    body that was not (a consumer that stopped early).
+    """
+
+    def __init__(self, stream, writer: ArchiveWriter):
+        """
+        Wrap a stream
+
+        Args:
+            stream: Binary file-like object (e.g. response.raw)
+            writer (ArchiveWriter): Writer receiving the bytes read
+        """
+        self.stream = stream
+        self.writer = writer
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        if self.writer.closed:
+            return data
+        try:
+            if data:
+                self.writer.write(data)
+            elif size != 0:
+                self.writer.commit()
+        except Exception as e:
+            logger.warning(f"  Error archiving response: {str(e)}")
+            # Drop the partial body (its compressor, file and temp file)
+            self.close()
+        return data
+
+    def close(self):
+        """Discard the body if the stream was not read to the end"""
+        try:
+            self.writer.discard()
+        except OSError as e:
+            logger.warning(f"  Error discarding archived response: {str(e)}")
+
+
+def response_metadata(response, source: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the metadata archived with a requests response
+
+    Args:
+        response (requests.Response): The response
+        source (str): Database ID of the source adapter (a key of PARSERS)
+        context (Optional[Dict[str, Any]]): Parser arguments (query, max_results, dates)
+
+    Returns:
+        Dict[str, Any]: Metadata for ResponseArchive.put/writer
+    """
+    request = response.request
+    body = request.body if request is not None else None
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    return {
+        "source": source,
+        "url": response.url,
+        "method": request.method if request is not None else "GET",
+        "request": body,
+        "status": response.status_code,
+        "encoding": response.encoding,
+        "headers": {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+        "context": context or {},
+    }
+
+
+def _reparse_entry(entry: Dict[str, Any]) -> Tuple[int, List[Dict[str, Any]], Optional[str]]:
+    """
+    Re-run the parser of an archived response (runs in a worker process)
+
+    Args:
+        entry (Dict[str, Any]): Archive entry (see ResponseArchive.entries)
+
+    Returns:
+        tuple: Response ID, the results and an error message (None on success)
+    """
+    try:
+        module_name, function_name = PARSERS[entry["source"]]
+        parser = getattr(importlib.import_module(module_name), function_name)
+        body = read_object(entry["path"], entry["compression"]).decode(entry["encoding"] or "utf-8", "replace")
+        context = entry["context"]
+        results = []
+        for result in parser(body, **context) or []:
+            # The live searches filter by date after parsing; so does reparse
+            if is_within_range(result.get("date"), context.get("min_date"), context.get("max_date")):
+                result.setdefault("database", entry["source"])
+                results.append(result)
+        return entry["response_id"], results, None
+    except Exception as e:
+        return entry["response_id"], [], f"{type(e).__name__}: {e}"
+
+
+class ResponseArchive:
+    """
+    Content-addressed archive of raw search responses
+    """
+
+    def __init__(self, directory: Optional[str] = None, compression: str = COMPRESSION):
+        """
+        Open the archive, creating it if needed
+
+        Args:
+            directory (Optional[str]): Archive directory (defaults to DEFAULT_ARCHIVE_DIR)
+            compression (str): Compression of new bodies ("zstd" or "gzip")
+        """
+        self.directory = directory or DEFAULT_ARCHIVE_DIR
+        self.compression = compression if compression in EXTENSIONS else "gzip"
+        if self.compression == "zstd" and not ZSTD_AVAILABLE:
+            self.compression = "gzip"
+        os.makedirs(os.path.join(self.directory, "objects", "tmp"), exist_ok=True)
+
+        # One connection shared by the threads of a process, guarded by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.directory, "archive.db"), check_same_thread=False,
+                                     timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def object_path(self, sha256: str, compression: str) -> str:
+        """
+        Path the body with this hash is stored at
+
+        Args:
+            sha256 (str): Hex SHA-256 digest of the raw body
+            compression (str): "zstd" or "gzip"
+
+        Returns:
+            str: File path
+        """
+        return os.path.join(self.directory, "objects", sha256[:2], sha256 + EXTENSIONS[compression])
+
+    def writer(self, metadata: Dict[str, Any]) -> ArchiveWriter:
+        """
+        Start archiving a body that is written in chunks
+
+        Args:
+            metadata (Dict[str, Any]): "source", "url", "method", "request",
+                "status", "encoding", "headers" and "context" (see response_metadata)
+
+        Returns:
+            ArchiveWriter: Writer to write the body to, then commit
+        """
+        return ArchiveWriter(self, metadata)
+
+    def put(self, body: bytes, metadata: Dict[str, Any]) -> str:
+        """
+        Archive a complete body
+
+        Args:
+            body (bytes): Raw response body
+            metadata (Dict[str, Any]): Request metadata (see writer)
+
+        Returns:
+            str: SHA-256 of the body
+        """
+        writer = self.writer(metadata)
+        try:
+            writer.write(body)
+        except Exception:
+            writer.discard()
+            raise
+        return writer.commit()
+
+    def _store(self, temp: str, sha256: str, size: int, compression: str, metadata: Dict[str, Any]) -> str:
+        """Move a written body to its content-addressed path and record the response"""
+        path = self.object_path(sha256, compression)
+        other = self.object_path(sha256, "gzip" if compression == "zstd" else "zstd")
+        if os.path.exists(other):
+            # Stored before with the other compression
+            os.remove(temp)
+            path, compression = other, "gzip" if compression == "zstd" else "zstd"
+        elif os.path.exists(path):
+            os.remove(temp)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp, path)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO responses (sha256, compression, size, source, url, method, request, status, encoding, "
+                "headers, context, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (sha256, compression, size, metadata["source"], metadata.get("url"), metadata.get("method", "GET"),
+                 metadata.get("request"), metadata.get("status"), metadata.get("encoding"),
+                 json.dumps(metadata.get("headers") or {}), json.dumps(metadata.get("context") or {}, default=str),
+                 time.time())
+            )
+        return sha256
+
+    def read(self, sha256: str) -> Optional[bytes]:
+        """
+        Read an archived body
+
+        Args:
+            sha256 (str): Hex SHA-256 digest of the body
+
+        Returns:
+            Optional[bytes]: The raw body, or None if it is not archived
+        """
+        for compression in EXTENSIONS:
+            path = self.object_path(sha256, compression)
+            if os.path.exists(path):
+                return read_object(path, compression)
+        return None
+
+    def entries(self, sources: Optional[List[str]] = None, since: Optional[float] = None,
+                until: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        List archived responses, oldest first
+
+        Args:
+            sources (Optional[List[str]]): Only responses of these database IDs
+            since (Optional[float]): Only responses fetched at or after this Unix time
+            until (Optional[float]): Only responses fetched before this Unix time
+
+        Yields:
+            Dict[str, Any]: Archived responses with their metadata and object "path"
+        """
+        where = []
+        params = []
+        if sources:
+            where.append(f"source IN ({', '.join('?' * len(sources))})")
+            params.extend(sources)
+        if since is not None:
+            where.append("fetched_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("fetched_at < ?")
+            params.append(until)
+        sql = "SELECT * FROM responses"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY response_id", params).fetchall()
+        for row in rows:
+            entry = dict(row)
+            entry["headers"] = json.loads(entry["headers"] or "{}")
+            entry["context"] = json.loads(entry["context"] or "{}")
+            entry["path"] = self.object_path(entry["sha256"], entry["compression"])
+            yield entry
+
+    def reparse(self, sources: Optional[List[str]] = None, since: Optional[float] = None,
+                until: Optional[float] = None, max_workers: Optional[int] = None
+                ) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]], Optional[str]]]:
+        """
+        Regenerate results by running the current parsers over archived responses
+
+        Runs in a process pool with no network I/O. A body archived several
+        times with the same parser arguments is parsed once.
+
+        Args:
+            sources (Optional[List[str]]): Only responses of these database IDs
+            since (Optional[float]): Only responses fetched at or after this Unix time
+            until (Optional[float]): Only responses fetched before this Unix time
+            max_workers (Optional[int]): Parser processes (defaults to the number of CPUs)
+
+        Yields:
+            tuple: Each archive entry, in archive order, with its results and an
+                error message (None if it parsed)
+        """
+        entries = []
+        seen = set()
+        for entry in self.entries(sources, since, until):
+            if entry["source"] not in PARSERS:
+                continue
+            key = (entry["sha256"], entry["source"], json.dumps(entry["context"], sort_keys=True))
+            if key in seen:
+                continue
+            seen.add(key)
+            entries.append(entry)
+        if not entries:
+            return
+
+        max_workers = min(max_workers or os.cpu_count() or 1, len(entries))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunksize = max(1, min(32, len(entries) // (max_workers * 4)))
+            for entry, (_, results, error) in zip(entries, executor.map(_reparse_entry, entries,
+                                                                        chunksize=chunksize)):
+                yield entry, results, error
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Count archived responses and their stored size
+
+        Returns:
+            Dict[str, Any]: Responses and distinct bodies per source, and the raw
+                and compressed size of the stored bodies
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, COUNT(*) AS responses, COUNT(DISTINCT sha256) AS bodies FROM responses "
+                "GROUP BY source ORDER BY source"
+            ).fetchall()
+            bodies = self._conn.execute(
+                "SELECT sha256, compression, MAX(size) AS size FROM responses GROUP BY sha256, compression"
+            ).fetchall()
+        stored = sum(os.path.getsize(self.object_path(row["sha256"], row["compression"])) for row in bodies
+                     if os.path.exists(self.object_path(row["sha256"], row["compression"])))
+        return {
+            "sources": {row["source"]: {"responses": row["responses"], "bodies": row["bodies"]} for row in rows},
+            "raw_bytes": sum(row["size"] or 0 for row in bodies),
+            "stored_bytes": stored,
+            "compression": self.compression,
+        }
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Archive the source adapters write to, shared by the threads of a process
+_shared_archive: Optional[ResponseArchive] = None
+_shared_archive_lock = threading.Lock()
+
+
+def get_archive() -> Optional[ResponseArchive]:
+    """
+    Get the shared archive
+
+    Returns:
+        Optional[ResponseArchive]: The archive, or None if archiving is turned off
+    """
+    global _shared_archive
+    if not ARCHIVE_ENABLED:
+        return None
+    with _shared_archive_lock:
+        if _shared_archive is None or _shared_archive.directory != DEFAULT_ARCHIVE_DIR:
+            _shared_archive = ResponseArchive(DEFAULT_ARCHIVE_DIR)
+        return _shared_archive
+
+
+def archive_response(response, source: str, context: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    Archive a search response that was read in full
+
+    Args:
+        response (requests.Response): The response
+        source (str): Database ID of the source adapter (a key of PARSERS)
+        context (Optional[Dict[str, Any]]): Arguments the source's parser takes
+            besides the body (query, max_results, min_date, max_date)
+
+    Returns:
+        Optional[str]: SHA-256 of the body, or None if it was not archived
+    """
+    try:
+        archive = get_archive()
+        if archive is None:
+            return None
+        return archive.put(response.content, response_metadata(response, source, context))
+    except Exception as e:
+        logger.warning(f"  Error archiving {source} response: {str(e)}")
+        return None
+
+
+def archiving_stream(stream, response, source: str, context: Optional[Dict[str, Any]] = None):
+    """
+    Wrap a response stream so its body is archived as it is read
+
+    Args:
+        stream: Binary file-like object the body is read from (e.g. response.raw)
+        response (requests.Response): The response
+        source (str): Database ID of the source adapter (a key of PARSERS)
+        context (Optional[Dict[str, Any]]): Parser arguments (see archive_response)
+
+    Returns:
+        The wrapped stream (ArchivingStream), or the stream itself if archiving is off
+    """
+    try:
+        archive = get_archive()
+        if archive is None:
+            return stream
+        return ArchivingStream(stream, archive.writer(response_metadata(response, source, context)))
+    except Exception as e:
+        logger.warning(f"  Error archiving {source} response: {str(e)}")
+        return stream
+
+
+def main():
+    """
+    Main function
+    """
+    parser = argparse.ArgumentParser(description="Inspect archived search responses and regenerate their results")
+    parser.add_argument("--dir", default=DEFAULT_ARCHIVE_DIR, help="Archive directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reparse_parser = subparsers.add_parser("reparse", help="Re-run the current parsers over archived responses")
+    reparse_parser.add_argument("--source", nargs="+", choices=sorted(PARSERS), help="Only responses of these databases")
+    reparse_parser.add_argument("--since", help="Only responses fetched on or after this date (YYYY-MM-DD)")
+    reparse_parser.add_argument("--workers", type=int, default=None,
+                                help="Parser processes (defaults to the number of CPUs)")
+    reparse_parser.add_argument("--output", help="Write the regenerated results to this file (.json or .ndjson)")
+    reparse_parser.add_argument("--store", action="store_true", help="Add the regenerated results to the result store")
+
+    subparsers.add_parser("stats", help="Count archived responses")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    with ResponseArchive(args.dir) as archive:
+        if args.command == "reparse":
+            since = time.mktime(time.strptime(args.since, "%Y-%m-%d")) if args.since else None
+            sink = open_result_sink(args.output) if args.output else None
+            store = ResultStore() if args.store else None
+            counts = {}
+            start = time.perf_counter()
+            try:
+                for entry, results, error in archive.reparse(args.source, since, max_workers=args.workers):
+                    count = counts.setdefault(entry["source"], {"responses": 0, "results": 0, "empty": 0, "errors": 0})
+                    count["responses"] += 1
+                    count["results"] += len(results)
+                    if error:
+                        count["errors"] += 1
+                        logger.error(f"  Error parsing response {entry['response_id']} ({entry['url']}): {error}")
+                    elif not results:
+                        count["empty"] += 1
+                    if sink is not None:
+                        sink.write_many(results)
+                    if store is not None and results:
+                        store.add_records(results)
+            finally:
+                if sink is not None:
+                    sink.close()
+                if store is not None:
+                    store.close()
+            elapsed = time.perf_counter() - start
+            for source, count in sorted(counts.items()):
+                print(f"{source}: {count['results']} results from {count['responses']} responses "
+                      f"({count['empty']} without results, {count['errors']} failed)")
+            print(f"Reparsed {sum(count['responses'] for count in counts.values())} responses in {elapsed:.1f}s")
+        elif args.command == "stats":
+            print(json.dumps(archive.get_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Result Extraction for Scraped Search Pages
+
+This module turns a fetched search page into result records. It is used by the
+batch scraper and is kept free of network and browser dependencies so that it
+can run in worker processes: parsing HTML is CPU-bound, and running it in the
+same threads as network I/O makes the two compete for the GIL.
+
+Records are returned as compact tuples in RESULT_FIELDS order, which keeps the
+data sent back from worker processes small. Use record_to_dict to turn them
+back into result dictionaries.
+"""
+
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# Import the shared date normalizer and result ids
+try:
+    from date_utils import to_iso_date, find_date_in_text
+    from result_record import stable_id
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from date_utils import to_iso_date, find_date_in_text
+    from result_record import stable_id
+
+# Field order of a result record
+RESULT_FIELDS = ("id", "title", "url", "source", "date", "snippet", "authors")
+
+# Selectors tried in order to find a date next to a link
+DATE_SELECTORS = [
+    ".date", "time", ".published", ".publication-date",
+    "[itemprop='datePublished']", ".meta-date", ".timestamp"
+]
+
+# Fallback link pattern used when BeautifulSoup is not installed
+LINK_PATTERN = re.compile(r'<a[^>]*href=["\'](.*?)["\'][^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+
+
+def record_to_dict(record: Tuple) -> Dict[str, Any]:
+    """
+    Convert a compact result record to a result dictionary
+
+    Args:
+        record (Tuple): Record in RESULT_FIELDS order
+
+    Returns:
+        Dict[str, Any]: Result dictionary
+    """
+    return dict(zip(RESULT_FIELDS, record))
+
+
+def _absolute_url(href: str, base_url: str) -> str:
+    """Make a link absolute relative to the database base URL"""
+    if href.startswith("/"):
+        parsed_base = urlparse(base_url)
+        return f"{parsed_base.scheme}://{parsed_base.netloc}{href}"
+    if not href.startswith(("http://", "https://")):
+        if base_url.endswith("/"):
+            return f"{base_url}{href}"
+        return f"{base_url}/{href}"
+    return href
+
+
+def _fallback_date(index: int, from_date: Optional[str], to_date: Optional[str]) -> str:
+    """Pick a date within the requested range for results without a date"""
+    if from_date and to_date:
+        try:
+            from_date_obj = datetime.strptime(from_date, "%Y-%m-%d")
+            to_date_obj = datetime.strptime(to_date, "%Y-%m-%d")
+
+            # Use the link index to distribute dates within the range
+            days_range = (to_date_obj - from_date_obj).days
+            if days_range > 0:
+                return (from_date_obj + timedelta(days=index % (days_range + 1))).strftime("%Y-%m-%d")
+            return from_date
+        except ValueError:
+            pass
+
+    # Use today's date as fallback
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+def extract_link_results(html: str, db_id: str, db_name: str, base_url: str,
+                         from_date: Optional[str] = None, to_date: Optional[str] = None) -> List[Tuple]:
+    """
+    Extract search results from a page by looking for links and their surrounding text
+
+    Args:
+        html (str): HTML content of the search page
+        db_id (str): Database ID
+        db_name (str): Database name (used as the result source)
+        base_url (str): Base URL of the database, used to make links absolute
+        from_date (Optional[str]): Start of the requested date range (YYYY-MM-DD)
+        to_date (Optional[str]): End of the requested date range (YYYY-MM-DD)
+
+    Returns:
+        List[Tuple]: Result records in RESULT_FIELDS order
+    """
+    try:
+        from html_parsing import make_soup
+        soup = make_soup(html)
+        use_soup = True
+        links = soup.find_all("a", href=True)
+    except ImportError:
+        print("  Warning: BeautifulSoup is not installed. Using basic regex parsing instead.")
+        use_soup = False
+        links = LINK_PATTERN.findall(html)
+
+    records = []
+
+    # Links often share a parent (menus, lists), so extract each parent's text and date only once
+    parent_cache = {}
+
+    for i, link in enumerate(links):
+        try:
+            # Handle different formats based on whether we used BeautifulSoup or regex
+            if use_soup:
+                # Get link attributes
+                href = link.get("href")
+                title = link.get_text().strip()
+
+                # Skip links without text
+                if not title:
+                    continue
+
+                # Get the surrounding text
+                parent = link.parent
+                cached = parent_cache.get(id(parent))
+                if cached is None:
+                    cached = parent_cache[id(parent)] = [parent.get_text().strip(), None]
+                snippet = cached[0]
+            else:
+                # For regex results, link is a tuple of (href, text)
+                href, title = link
+                title = title.strip()
+
+                # For regex, we don't have easy access to surrounding text
+                # Just use the title as the snippet
+                snippet = title
+
+            # Skip empty links
+            if not href or not title:
+                continue
+
+            # Make sure the URL is absolute
+            href = _absolute_url(href, base_url)
+
+            # Limit snippet length
+            if len(snippet) > 300:
+                snippet = snippet[:297] + "..."
+
+            # Create an ID that is the same in every run
+            result_id = stable_id(db_id, None, href, title)
+
+            # Try to extract date
+            date = ""
+            try:
+                if use_soup:
+                    if cached[1] is None:
+                        # Look for date elements
+                        date_elem = None
+                        for selector in DATE_SELECTORS:
+                            date_elem = parent.select_one(selector)
+                            if date_elem:
+                                break
+
+                        cached[1] = date_elem.get_text().strip() if date_elem else ""
+
+                    date = cached[1]
+
+                    # If no date found, try to find a date pattern in the text
+                    if not date:
+                        date = find_date_in_text(snippet)
+
+                    # Convert to YYYY-MM-DD format
+                    if date:
+                        date = to_iso_date(date)
+
+                # If we still don't have a date, use a date within the specified range
+                if not date:
+                    date = _fallback_date(i, from_date, to_date)
+            except Exception as e:
+                print(f"  Error extracting date: {str(e)}")
+                # Use today's date as fallback
+                date = datetime.now().strftime("%Y-%m-%d")
+
+            # Authors are often not easily extractable
+            records.append((result_id, title, href, db_name, date, snippet, []))
+        except Exception as e:
+            print(f"  Error processing link {i}: {str(e)}")
+            continue
+
+    return records
+
+
+def parse_page(page: Dict[str, Any]) -> List[Tuple]:
+    """
+    Extract result records from a fetched page
+
+    This is the entry point used by the batch scraper's parse worker processes.
+
+    Args:
+        page (Dict[str, Any]): Fetched page with "html", "db_id", "db_name",
+            "base_url", "from_date" and "to_date" keys
+
+    Returns:
+        List[Tuple]: Result records in RESULT_FIELDS order
+    """
+    return extract_link_results(
+        page["html"],
+        page["db_id"],
+        page["db_name"],
+        page["base_url"],
+        page.get("from_date"),
+        page.get("to_date")
+    )
@@ -0,0 +1,413 @@
+"""
+Columnar Result Frame
+
+This module provides ResultFrame, a columnar view over a list of search
+results for batch post-processing: date range filters, database/source
+filters and facets, sorting and deduplication.
+
+When a frame is built, the columns these operations need are extracted once
+into NumPy arrays:
+
+- database, source and the deduplication key as integer codes into a list of
+  distinct values
+- the first and last day each result date covers (datetime64, NaT when the
+  result has no date), using the shared date normalizer so that year and
+  month precision dates filter the same way as date_utils.is_within_range
+- relevanceScore as floats (NaN when missing)
+
+Filters, sorts and dedup only compute a new array of row positions; the
+columns and the result dicts themselves are shared between a frame and every
+frame derived from it, so chaining operations copies no results. Exports
+walk the selected rows once: JSON/NDJSON through result_sinks, CSV, and
+Apache Arrow/Parquet when pyarrow is installed (database and source become
+dictionary columns over the existing code arrays).
+
+Usage:
+    frame = ResultFrame.from_results(results)
+    recent = frame.filter_dates("2020-01-01").filter_in("database", ["pubmed", "mhra"])
+    print(recent.facets("source"))
+    recent.dedup().sort_by("date").to_csv("results.csv")
+"""
+
+import csv
+import os
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+# Import the shared date normalizer and the results writer/reader
+try:
+    from date_utils import normalize_date, PRECISION_DAY, PRECISION_MONTH, PRECISION_YEAR
+    from result_sinks import iter_results, save_results
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from date_utils import normalize_date, PRECISION_DAY, PRECISION_MONTH, PRECISION_YEAR
+    from result_sinks import iter_results, save_results
+
+# pyarrow is optional: it is only needed for Arrow and Parquet export
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+# Columns stored as integer codes into a list of distinct values
+CATEGORICAL_COLUMNS = ("database", "source", "key")
+
+# Columns sort_by accepts
+SORT_COLUMNS = ("date", "score", "database", "source")
+
+# Fields written by to_csv unless other columns are given
+CSV_COLUMNS = ["id", "title", "url", "source", "database", "date", "snippet", "relevanceScore"]
+
+# Text fields exported to Arrow/Parquet as plain string columns
+ARROW_TEXT_COLUMNS = ["id", "title", "url", "date", "snippet"]
+
+# Marker for missing dates in datetime64 columns
+NAT = np.datetime64("NaT", "D")
+
+
+def dedup_key(result: Dict[str, Any]) -> str:
+    """
+    Build the key results are deduplicated on
+
+    Args:
+        result (Dict[str, Any]): Search result
+
+    Returns:
+        str: The result URL, or its database, id and title when it has no URL
+    """
+    url = result.get("url")
+    if url:
+        return url
+    database = result.get("database") or result.get("source") or ""
+    return f"{database}\x00{result.get('id', '')}\x00{result.get('title', '')}"
+
+
+def _encode(values: List[Any]):
+    """
+    Encode values as integer codes into a list of distinct values
+
+    Args:
+        values (List[Any]): One value per result
+
+    Returns:
+        Tuple[np.ndarray, List[Any]]: The codes and the distinct values
+    """
+    # dict.fromkeys and map keep the per-value work in C
+    distinct = list(dict.fromkeys(values))
+    positions = dict(zip(distinct, range(len(distinct))))
+    codes = np.fromiter(map(positions.__getitem__, values), dtype=np.int32, count=len(values))
+    return codes, distinct
+
+
+def _date_bounds(raw_dates: List[Any]):
+    """
+    Convert raw result dates to the first and last day they cover
+
+    Each distinct raw date is normalized once; the ends of year and month
+    precision dates are computed with datetime64 arithmetic and rows are
+    filled in with a single fancy-indexing step.
+
+    Args:
+        raw_dates (List[Any]): Raw date of each result
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: datetime64[D] start and end days (NaT when undated)
+    """
+    codes, distinct = _encode(raw_dates)
+    isos = []
+    precisions = []
+    for raw in distinct:
+        normalized = normalize_date(raw)
+        isos.append(normalized.iso if normalized else "NaT")
+        precisions.append(normalized.precision if normalized else PRECISION_DAY)
+
+    # A year or month date covers up to the day before the next year or month
+    starts = np.array(isos, dtype="datetime64[D]")
+    precisions = np.array(precisions)
+    ends = starts.copy()
+    for precision, unit in ((PRECISION_YEAR, "Y"), (PRECISION_MONTH, "M")):
+        partial = precisions == precision
+        ends[partial] = (starts[partial].astype(f"datetime64[{unit}]") + 1).astype("datetime64[D]") - 1
+    return starts[codes], ends[codes]
+
+
+def _bound(value: Optional[str]) -> Optional[np.datetime64]:
+    """Parse a YYYY-MM-DD range bound to datetime64 (None if missing or invalid)"""
+    normalized = normalize_date(value)
+    return np.datetime64(normalized.start, "D") if normalized else None
+
+
+class ResultFrame:
+    """
+    Columnar view over search results with vectorized filters, facets, sort and dedup
+    """
+
+    def __init__(self, records: np.ndarray, columns: Dict[str, Any], index: Optional[np.ndarray] = None):
+        """
+        Initialize the frame (use from_results or from_file to build one)
+
+        Args:
+            records (np.ndarray): Object array of result dicts
+            columns (Dict[str, Any]): Extracted column arrays, shared between frames
+            index (Optional[np.ndarray]): Positions of the rows in this frame (all rows if None)
+        """
+        self._records = records
+        self._columns = columns
+        self.index = np.arange(len(records)) if index is None else index
+
+    @classmethod
+    def from_results(cls, results: Iterable[Dict[str, Any]]) -> "ResultFrame":
+        """
+        Build a frame from result dicts
+
+        Args:
+            results (Iterable[Dict[str, Any]]): Search results (a list or a generator)
+
+        Returns:
+            ResultFrame: Frame over all the results
+        """
+        results = results if isinstance(results, list) else list(results)
+        count = len(results)
+
+        records = np.empty(count, dtype=object)
+        records[:] = results
+
+        columns = {}
+        columns["database"] = _encode([r.get("database") or r.get("source") or "" for r in results])
+        columns["source"] = _encode([r.get("source") or "" for r in results])
+        columns["key"] = _encode([r.get("url") or dedup_key(r) for r in results])
+        columns["date_start"], columns["date_end"] = _date_bounds([r.get("date") for r in results])
+        columns["score"] = np.array([r.get("relevanceScore", np.nan) for r in results], dtype=np.float64)
+        return cls(records, columns)
+
+    @classmethod
+    def from_file(cls, path: str) -> "ResultFrame":
+        """
+        Build a frame from a results file (JSON array, NDJSON or .part file)
+
+        Args:
+            path (str): Results file path
+
+        Returns:
+            ResultFrame: Frame over the results in the file
+        """
+        return cls.from_results(iter_results(path))
+
+    def _select(self, index: np.ndarray) -> "ResultFrame":
+        """Derive a frame over other rows, sharing records and columns"""
+        return ResultFrame(self._records, self._columns, index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._records[self.index])
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Get a column for the rows of this frame
+
+        Args:
+            name (str): "database", "source", "key", "date_start", "date_end" or "score"
+
+        Returns:
+            np.ndarray: Column values (decoded to strings for categorical columns)
+        """
+        if name in CATEGORICAL_COLUMNS:
+            codes, values = self._columns[name]
+            return np.asarray(values, dtype=object)[codes[self.index]]
+        return self._columns[name][self.index]
+
+    def filter_dates(self, from_date: Optional[str] = None, to_date: Optional[str] = None,
+                     keep_undated: bool = True) -> "ResultFrame":
+        """
+        Keep results whose date overlaps a date range
+
+        Args:
+            from_date (Optional[str]): Minimum date in format YYYY-MM-DD
+            to_date (Optional[str]): Maximum date in format YYYY-MM-DD
+            keep_undated (bool): Keep results without a parseable date, as the parsers do
+
+        Returns:
+            ResultFrame: Frame over the matching results
+        """
+        starts = self._columns["date_start"][self.index]
+        ends = self._columns["date_end"][self.index]
+        dated = ~np.isnat(starts)
+        mask = dated.copy()
+
+        lower = _bound(from_date)
+        upper = _bound(to_date)
+        if lower is not None:
+            mask &= ends >= lower
+        if upper is not None:
+            mask &= starts <= upper
+        if keep_undated:
+            mask |= ~dated
+        return self._select(self.index[mask])
+
+    def filter_in(self, column: str, values: Iterable[str]) -> "ResultFrame":
+        """
+        Keep results whose database, source or key is one of the given values
+
+        Args:
+            column (str): "database", "source" or "key"
+            values (Iterable[str]): Values to keep
+
+        Returns:
+            ResultFrame: Frame over the matching results
+        """
+        codes, distinct = self._columns[column]
+        wanted = set(values)
+        wanted_codes = [code for code, value in enumerate(distinct) if value in wanted]
+        return self._select(self.index[np.isin(codes[self.index], wanted_codes)])
+
+    def facets(self, column: str = "database") -> Dict[str, int]:
+        """
+        Count results per database or source
+
+        Args:
+            column (str): "database" or "source"
+
+        Returns:
+            Dict[str, int]: Result count per value, largest first
+        """
+        codes, distinct = self._columns[column]
+        counts = np.bincount(codes[self.index], minlength=len(distinct))
+        order = np.argsort(-counts, kind="stable")
+        return {distinct[code]: int(counts[code]) for code in order if counts[code]}
+
+    def sort_by(self, column: str = "date", descending: bool = True) -> "ResultFrame":
+        """
+        Sort results (stable; results without a value always come last)
+
+        Args:
+            column (str): "date", "score", "database" or "source"
+            descending (bool): Newest/highest first (alphabetical is ascending=False)
+
+        Returns:
+            ResultFrame: Frame over the sorted results
+        """
+        if column not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {column!r}, expected one of {', '.join(SORT_COLUMNS)}")
+
+        if column == "date":
+            starts = self._columns["date_start"][self.index]
+            missing = np.isnat(starts)
+            keys = starts.astype(np.int64).astype(np.float64)
+        elif column == "score":
+            keys = self._columns["score"][self.index]
+            missing = np.isnan(keys)
+        else:
+            # Rank the distinct values alphabetically, then sort rows by rank
+            codes, distinct = self._columns[column]
+            ranks = np.empty(len(distinct), dtype=np.int64)
+            ranks[np.argsort(np.asarray(distinct, dtype=object))] = np.arange(len(distinct))
+            keys = ranks[codes[self.index]].astype(np.float64)
+            missing = np.zeros(len(keys), dtype=bool)
+
+        keys = np.where(missing, 0.0, -keys if descending else keys)
+        order = np.lexsort((keys, missing))
+        return self._select(self.index[order])
+
+    def dedup(self, column: str = "key") -> "ResultFrame":
+        """
+        Drop repeated results, keeping the first occurrence in frame order
+
+        Args:
+            column (str): Categorical column to deduplicate on (by default the
+                URL, or database, id and title for results without a URL)
+
+        Returns:
+            ResultFrame: Frame without duplicates
+        """
+        codes, _ = self._columns[column]
+        _, first = np.unique(codes[self.index], return_index=True)
+        return self._select(self.index[np.sort(first)])
+
+    def head(self, count: int) -> "ResultFrame":
+        """Keep the first count results"""
+        return self._select(self.index[:count])
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """
+        Get the results of this frame
+
+        Returns:
+            List[Dict[str, Any]]: The original result dicts, in frame order
+        """
+        return self._records[self.index].tolist()
+
+    def to_json(self, output_file: str) -> int:
+        """
+        Write the results to a JSON array file, or NDJSON with a .ndjson/.jsonl extension
+
+        Args:
+            output_file (str): Output file path
+
+        Returns:
+            int: Number of results written
+        """
+        return save_results(iter(self), output_file)
+
+    def to_csv(self, output_file: str, columns: Optional[List[str]] = None) -> int:
+        """
+        Write the results to a CSV file
+
+        Args:
+            output_file (str): Output file path
+            columns (Optional[List[str]]): Fields to write (defaults to CSV_COLUMNS)
+
+        Returns:
+            int: Number of results written
+        """
+        columns = columns or CSV_COLUMNS
+        with open(output_file, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(iter(self))
+        return len(self)
+
+    def to_arrow(self):
+        """
+        Convert the results to an Arrow table (requires pyarrow)
+
+        Returns:
+            pyarrow.Table: Table with the text fields, dictionary-encoded
+            database and source columns, date bounds and relevance score
+        """
+        if not ARROW_AVAILABLE:
+            raise ImportError("pyarrow is required for Arrow and Parquet export (pip install pyarrow)")
+
+        rows = self._records[self.index]
+        arrays = {name: pa.array([r.get(name) or "" for r in rows], type=pa.string())
+                  for name in ARROW_TEXT_COLUMNS}
+        for name in ("database", "source"):
+            codes, distinct = self._columns[name]
+            arrays[name] = pa.DictionaryArray.from_arrays(codes[self.index], pa.array(distinct, type=pa.string()))
+        for name in ("date_start", "date_end"):
+            values = self._columns[name][self.index]
+            arrays[name] = pa.array(values, mask=np.isnat(values), type=pa.date32())
+        scores = self._columns["score"][self.index]
+        arrays["relevanceScore"] = pa.array(scores, mask=np.isnan(scores))
+        return pa.table(arrays)
+
+    def to_parquet(self, output_file: str) -> int:
+        """
+        Write the results to a Parquet file (requires pyarrow)
+
+        Args:
+            output_file (str): Output file path
+
+        Returns:
+            int: Number of results written
+        """
+        table = self.to_arrow()
+        pq.write_table(table, output_file)
+        return len(self)
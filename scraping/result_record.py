@@ -0,0 +1,460 @@
+"""
+Result Records and Fast JSON Serialization
+
+This module provides ResultRecord, a compact typed record for one search
+result, and the JSON encoder/decoder used to write and read results files.
+Sources and sinks pass results around as dicts; ResultRecord is for code that
+holds many results in memory (the batch pipeline keeps each task's results as
+records until the task is written out), and converts to and from those dicts.
+
+ResultRecord uses __slots__ instead of a per-instance __dict__, interns the
+source and database names (every result from a source shares one string), and
+keeps heavy fields (the full abstract and source-specific additional_data)
+out of the way: they are only set when a source provides them, or fetched on
+first access through a loader attached with attach_loader(). Fields a source
+adds that the record does not know about are kept in a small extra dict, so
+converting a result dict to a record and back loses nothing.
+
+Records can be read like the result dicts the rest of the package uses
+(record["title"], record.get("relevanceScore"), "abstract" in record), so
+they can be passed to code written for dicts.
+
+stable_id() builds result ids that are the same in every process and run:
+the source's native identifier (PMID, application number, product id, ...)
+where there is one, and otherwise a SHA-256 digest of the canonical result
+URL. Ids built from Python's hash() (salted per process) or from a result's
+position in a page change from run to run and collide across pages.
+
+FailedSearch is what a source adapter returns when every attempt of a search
+failed: a list (empty, or holding the results fetched before the failure)
+that carries the error, so a failure can be told apart from a search without
+matches (see search_error) by callers that need to retry it.
+
+dumps()/loads() use orjson when it is installed and fall back to the json
+module otherwise. Both write UTF-8 with non-ASCII characters unescaped, and
+dumps() serializes ResultRecords directly. They differ for non-finite floats:
+orjson writes NaN and infinities as null, the json module as NaN and Infinity.
+
+Usage:
+    record = ResultRecord.from_dict(result)
+    record.attach_loader(lambda: {"abstract": fetch_abstract(record.id)})
+    result_id = stable_id("ema", url=url)
+    error = search_error(results)
+    line = dumps(record)
+    result = loads(line)
+"""
+
+import hashlib
+import json
+import sys
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# orjson is optional: it is several times faster than the json module
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Fields stored in slots, by their key in result dicts
+CORE_FIELDS = ("id", "title", "url", "source", "database", "date", "snippet", "authors", "relevanceScore")
+
+# Fields that are only set when a source provides them, or loaded on demand
+HEAVY_FIELDS = ("abstract", "additional_data")
+
+# Every field with its own slot or property
+KNOWN_FIELDS = frozenset(CORE_FIELDS + HEAVY_FIELDS)
+
+# Result dict keys that differ from the slot names
+SLOT_NAMES = {"relevanceScore": "relevance_score"}
+
+# Fields left out of result dicts when they are not set
+OPTIONAL_FIELDS = ("database", "relevanceScore")
+
+# Number of hex digits of the SHA-256 digest used in hashed ids (64 bits)
+ID_DIGEST_LENGTH = 16
+
+# Query parameters that do not change which page a URL points to
+TRACKING_PARAMS = ("utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content",
+                   "fbclid", "gclid", "sessionid", "jsessionid", "sid")
+
+# Default ports dropped from canonical URLs
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalize a URL so that links to the same page compare equal
+
+    The scheme and host are lowercased, default ports, fragments, tracking
+    parameters and trailing slashes are dropped, and query parameters are
+    sorted.
+
+    Args:
+        url (str): Result URL
+
+    Returns:
+        str: Canonical URL (the stripped input if it cannot be parsed)
+    """
+    url = (url or "").strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    if not parts.scheme or not parts.netloc:
+        return url
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if key.lower() not in TRACKING_PARAMS))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def content_hash(*parts: Any) -> str:
+    """
+    Get a short, process-independent digest of some values
+
+    Args:
+        *parts (Any): Values to hash (converted to strings)
+
+    Returns:
+        str: Hex SHA-256 digest prefix
+    """
+    text = "\x00".join(str(part) for part in parts)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:ID_DIGEST_LENGTH]
+
+
+def stable_id(prefix: str, native_id: Any = None, url: Optional[str] = None, *fallback: Any) -> str:
+    """
+    Build a result id that is the same in every process and run
+
+    Args:
+        prefix (str): Source prefix (e.g. "pubmed", "ema")
+        native_id (Any): The source's own identifier (PMID, application number, ...)
+        url (Optional[str]): Result URL, hashed in canonical form when there is no native id
+        *fallback (Any): Values hashed when there is neither (e.g. the title)
+
+    Returns:
+        str: "<prefix>-<native id>" or "<prefix>-<digest>"
+    """
+    if native_id not in (None, ""):
+        return f"{prefix}-{str(native_id).strip()}"
+    if url:
+        return f"{prefix}-{content_hash(canonical_url(url))}"
+    return f"{prefix}-{content_hash(*fallback)}"
+
+
+def _slot(key: str) -> str:
+    """Get the slot name for a result dict key"""
+    return SLOT_NAMES.get(key, key)
+
+
+class ResultRecord:
+    """
+    Compact search result record with interned source names and lazy heavy fields
+    """
+
+    __slots__ = ("id", "title", "url", "source", "database", "date", "snippet", "authors",
+                 "relevance_score", "_abstract", "_additional_data", "_loader", "extra")
+
+    def __init__(self, id: str, title: str, url: str, source: str, date: str = "",
+                 snippet: str = "", authors: Optional[List[str]] = None, database: Optional[str] = None,
+                 relevance_score: Optional[float] = None):
+        """
+        Initialize the record
+
+        Args:
+            id (str): Result ID
+            title (str): Result title
+            url (str): Result URL
+            source (str): Source name (e.g. "PubMed")
+            date (str): Result date
+            snippet (str): Short text shown in result lists
+            authors (Optional[List[str]]): Authors
+            database (Optional[str]): Database ID (e.g. "pubmed")
+            relevance_score (Optional[float]): Relevance score
+        """
+        self.id = id
+        self.title = title
+        self.url = url
+        self.source = sys.intern(source) if source else ""
+        self.database = sys.intern(database) if database else None
+        self.date = date
+        self.snippet = snippet
+        self.authors = authors or []
+        self.relevance_score = relevance_score
+        self._abstract = None
+        self._additional_data = None
+        self._loader = None
+        self.extra = None
+
+    @classmethod
+    def from_dict(cls, result: Dict[str, Any]) -> "ResultRecord":
+        """
+        Build a record from a result dict
+
+        Args:
+            result (Dict[str, Any]): Search result
+
+        Returns:
+            ResultRecord: The record
+        """
+        record = cls(result.get("id", ""), result.get("title", ""), result.get("url", ""),
+                     result.get("source", ""), result.get("date", ""), result.get("snippet", ""),
+                     result.get("authors"), result.get("database"), result.get("relevanceScore"))
+        record._abstract = result.get("abstract")
+        record._additional_data = result.get("additional_data")
+        if result.keys() - KNOWN_FIELDS:
+            record.extra = {key: value for key, value in result.items() if key not in KNOWN_FIELDS}
+        return record
+
+    def attach_loader(self, loader: Callable[[], Dict[str, Any]]):
+        """
+        Fetch the heavy fields on first access instead of now
+
+        Args:
+            loader (Callable[[], Dict[str, Any]]): Function returning a dict with
+                "abstract" and/or "additional_data" (called at most once)
+        """
+        self._loader = loader
+
+    def _load(self):
+        """Run the attached loader, if any, and store what it returns"""
+        loader, self._loader = self._loader, None
+        if loader:
+            fields = loader() or {}
+            if self._abstract is None:
+                self._abstract = fields.get("abstract")
+            if self._additional_data is None:
+                self._additional_data = fields.get("additional_data")
+
+    @property
+    def abstract(self) -> Optional[str]:
+        """Full abstract (loaded on first access)"""
+        if self._abstract is None and self._loader:
+            self._load()
+        return self._abstract
+
+    @abstract.setter
+    def abstract(self, value: Optional[str]):
+        self._abstract = value
+
+    @property
+    def additional_data(self) -> Optional[Dict[str, Any]]:
+        """Source-specific extra data (loaded on first access)"""
+        if self._additional_data is None and self._loader:
+            self._load()
+        return self._additional_data
+
+    @additional_data.setter
+    def additional_data(self, value: Optional[Dict[str, Any]]):
+        self._additional_data = value
+
+    def to_dict(self, load_heavy: bool = False) -> Dict[str, Any]:
+        """
+        Convert the record to a result dict
+
+        Args:
+            load_heavy (bool): Run the attached loader so the heavy fields are included
+
+        Returns:
+            Dict[str, Any]: Result dict with the fields that are set
+        """
+        if load_heavy and self._loader:
+            self._load()
+
+        result = {
+            "id": self.id,
+            "title": self.title,
+            "url": self.url,
+            "source": self.source,
+            "date": self.date,
+            "snippet": self.snippet,
+            "authors": self.authors,
+        }
+        if self.database is not None:
+            result["database"] = self.database
+        if self.relevance_score is not None:
+            result["relevanceScore"] = self.relevance_score
+        if self._abstract is not None:
+            result["abstract"] = self._abstract
+        if self._additional_data is not None:
+            result["additional_data"] = self._additional_data
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+    # Dict-style access, so records can be passed to code written for result dicts
+
+    def __getitem__(self, key: str) -> Any:
+        if key in CORE_FIELDS:
+            value = getattr(self, _slot(key))
+            if value is None and key in OPTIONAL_FIELDS:
+                raise KeyError(key)
+            return value
+        if key in HEAVY_FIELDS:
+            value = getattr(self, key)
+            if value is None:
+                raise KeyError(key)
+            return value
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key in CORE_FIELDS or key in HEAVY_FIELDS:
+            if key in ("source", "database") and value:
+                value = sys.intern(value)
+            setattr(self, _slot(key), value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a field by its result dict key, or a default if it is not set"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> Iterator[str]:
+        """Iterate over the result dict keys that are set"""
+        return iter(self.to_dict())
+
+    def __repr__(self) -> str:
+        return f"ResultRecord(id={self.id!r}, source={self.source!r}, title={self.title!r})"
+
+
+class FailedSearch(list):
+    """
+    Results of a search that failed
+
+    Callers that only read the results see the results fetched before the
+    failure (usually none); search_error() gives the error.
+    """
+
+    def __init__(self, error: Any, results: Iterable[Dict[str, Any]] = ()):
+        """
+        Record a failed search
+
+        Args:
+            error (Any): Exception or message describing the failure
+            results (Iterable[Dict[str, Any]]): Results fetched before the failure
+        """
+        super().__init__(results)
+        self.error = str(error) or type(error).__name__
+
+    def __repr__(self) -> str:
+        return f"FailedSearch(error={self.error!r}, results={len(self)})"
+
+
+def search_error(results: Any) -> Optional[str]:
+    """
+    Get the error of a failed search
+
+    Args:
+        results (Any): Results returned by a source adapter
+
+    Returns:
+        Optional[str]: The error if the search failed, None otherwise
+    """
+    return results.error if isinstance(results, FailedSearch) else None
+
+
+def _default(value: Any) -> Any:
+    """Serialize ResultRecords (and anything else the encoder does not know) for JSON"""
+    if isinstance(value, ResultRecord):
+        return value.to_dict()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if ORJSON_AVAILABLE:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(value: Any, indent: bool = False) -> bytes:
+        """
+        Serialize a value (result dicts, ResultRecords, lists of them) to JSON
+
+        Args:
+            value (Any): Value to serialize
+            indent (bool): Indent with 2 spaces
+
+        Returns:
+            bytes: UTF-8 encoded JSON
+        """
+        options = _ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else _ORJSON_OPTIONS
+        try:
+            return orjson.dumps(value, default=_default, option=options)
+        except orjson.JSONEncodeError:
+            # Values orjson rejects (e.g. integers over 64 bits) still go through json
+            if indent:
+                return json.dumps(value, default=_default, ensure_ascii=False, indent=2).encode("utf-8")
+            return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(data) -> Any:
+        """
+        Parse JSON
+
+        Args:
+            data (Union[bytes, str]): JSON document
+
+        Returns:
+            Any: Parsed value
+        """
+        return orjson.loads(data)
+else:
+    def dumps(value: Any, indent: bool = False) -> bytes:
+        """
+        Serialize a value (result dicts, ResultRecords, lists of them) to JSON
+
+        Args:
+            value (Any): Value to serialize
+            indent (bool): Indent with 2 spaces
+
+        Returns:
+            bytes: UTF-8 encoded JSON
+        """
+        if indent:
+            return json.dumps(value, default=_default, ensure_ascii=False, indent=2).encode("utf-8")
+        return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(data) -> Any:
+        """
+        Parse JSON
+
+        Args:
+            data (Union[bytes, str]): JSON document
+
+        Returns:
+            Any: Parsed value
+        """
+        return json.loads(data)
+
+
+def decode_records(data) -> List[ResultRecord]:
+    """
+    Parse a JSON array of results into records
+
+    Args:
+        data (Union[bytes, str]): JSON array document
+
+    Returns:
+        List[ResultRecord]: The records
+    """
+    return [ResultRecord.from_dict(result) for result in loads(data)]
@@ -0,0 +1,328 @@
+"""
+Result Sinks
+
+This module provides writers that store search results as they arrive instead
+of collecting a whole run in memory and writing it once at the end, and a
+reader that loads them back one result at a time.
+
+Results are appended as newline-delimited JSON (one result per line, encoded
+with orjson when it is installed) to a "<output>.part" file, which is flushed
+and fsynced at a configurable interval. If the process dies, every result
+written before the last fsync is still in the .part file. When the sink is
+closed, the output file is created atomically from the .part file:
+
+- ".ndjson" and ".jsonl" outputs are renamed into place as they are
+- other outputs (".json") are converted to the usual JSON array, so existing
+  readers (the results viewer, the web app, run_search.py) keep working
+
+Usage:
+    with open_result_sink("results.ndjson") as sink:
+        for result in results:
+            sink.write(result)
+
+    for result in iter_results("results.ndjson"):
+        ...
+"""
+
+import logging
+import os
+import shutil
+import sys
+import textwrap
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Import the JSON encoder/decoder (orjson when installed)
+try:
+    from result_record import dumps, loads
+    from json_stream import iter_array
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from result_record import dumps, loads
+    from json_stream import iter_array
+
+# Set up logging
+logger = logging.getLogger("result_sinks")
+
+# Output file extensions written as newline-delimited JSON
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+# Suffix of the file results are appended to until the sink is closed
+PART_SUFFIX = ".part"
+
+# Default number of seconds between fsyncs (0 = fsync after every result)
+DEFAULT_FSYNC_INTERVAL = 1.0
+
+
+def is_ndjson_path(path: str) -> bool:
+    """
+    Check whether a path names a newline-delimited JSON file
+
+    Args:
+        path (str): File path
+
+    Returns:
+        bool: True for .ndjson and .jsonl files (and their .part files)
+    """
+    if path.endswith(PART_SUFFIX):
+        return True
+    return path.lower().endswith(NDJSON_EXTENSIONS)
+
+
+class NdjsonResultSink:
+    """
+    Appends results to a newline-delimited JSON file and finalizes it atomically
+    """
+
+    def __init__(self, output_file: str, fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+                 as_json_array: Optional[bool] = None, resume_offset: Optional[int] = None,
+                 resume_count: int = 0):
+        """
+        Open the sink
+
+        Args:
+            output_file (str): Final output file path
+            fsync_interval (float): Seconds between fsyncs of the .part file (0 = every result)
+            as_json_array (Optional[bool]): Write the final file as a JSON array
+                (defaults to True unless the output is a .ndjson or .jsonl file)
+            resume_offset (Optional[int]): Keep the existing .part file up to this
+                byte offset and append after it, instead of starting a new one
+            resume_count (int): Number of results in the kept part of the .part file
+        """
+        self.output_file = output_file
+        self.part_file = output_file + PART_SUFFIX
+        self.fsync_interval = fsync_interval
+        self.as_json_array = not is_ndjson_path(output_file) if as_json_array is None else as_json_array
+        self.count = 0
+        self.offset = 0
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+
+        # Create the directory if it doesn't exist
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+
+        if resume_offset is not None and os.path.exists(self.part_file):
+            # Drop anything written after the resume point (results of unfinished tasks)
+            os.truncate(self.part_file, resume_offset)
+            self.offset = resume_offset
+            self.count = resume_count
+            self._file = open(self.part_file, "ab")
+        else:
+            self._file = open(self.part_file, "wb")
+
+    @property
+    def closed(self) -> bool:
+        """Whether the sink has been closed"""
+        return self._file.closed
+
+    def write(self, result: Dict[str, Any]):
+        """
+        Append a result
+
+        Args:
+            result (Dict[str, Any]): Search result
+        """
+        self.write_batch([result])
+
+    def write_many(self, results: Iterable[Dict[str, Any]]):
+        """
+        Append several results
+
+        Args:
+            results (Iterable[Dict[str, Any]]): Search results
+        """
+        for result in results:
+            self.write(result)
+
+    def write_batch(self, results: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        Append a group of results as one contiguous block
+
+        Args:
+            results (List[Dict[str, Any]]): Search results
+
+        Returns:
+            Tuple[int, int]: Byte offsets of the start and end of the block in the .part file
+        """
+        data = b"".join(dumps(result) + b"\n" for result in results)
+        size = len(data)
+        with self._lock:
+            start = self.offset
+            self._file.write(data)
+            self.offset += size
+            self.count += len(results)
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            return start, self.offset
+
+    def flush(self):
+        """
+        Flush and fsync everything written so far
+        """
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        """Flush the .part file to disk (the lock must be held)"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self, keep_part: bool = False):
+        """
+        Finalize the output file
+
+        The .part file is fsynced and then moved (or converted) to the output
+        file with an atomic rename, so readers never see a half-written file.
+
+        Args:
+            keep_part (bool): Keep the .part file so that more results can be
+                appended to it later (used by resumable jobs with failed tasks)
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            self._file.close()
+
+            if self.as_json_array:
+                _ndjson_to_json_array(self.part_file, self.output_file)
+                if not keep_part:
+                    os.remove(self.part_file)
+            elif keep_part:
+                temp_file = self.output_file + ".tmp"
+                shutil.copyfile(self.part_file, temp_file)
+                os.replace(temp_file, self.output_file)
+            else:
+                os.replace(self.part_file, self.output_file)
+
+    def abort(self):
+        """
+        Close the sink without finalizing, keeping the .part file for inspection
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _ndjson_to_json_array(source: str, destination: str):
+    """Convert an NDJSON file to an indented JSON array file, one result at a time"""
+    temp_file = destination + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as out:
+        out.write("[")
+        first = True
+        for result in iter_results(source):
+            out.write("\n" if first else ",\n")
+            out.write(textwrap.indent(dumps(result, indent=True).decode("utf-8"), "  "))
+            first = False
+        out.write("]" if first else "\n]")
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(temp_file, destination)
+
+
+def open_result_sink(output_file: str, fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+                     resume_offset: Optional[int] = None, resume_count: int = 0) -> NdjsonResultSink:
+    """
+    Open a streaming sink for an output file
+
+    Args:
+        output_file (str): Output file path (.ndjson/.jsonl for NDJSON, anything else for a JSON array)
+        fsync_interval (float): Seconds between fsyncs (0 = every result)
+        resume_offset (Optional[int]): Continue the existing .part file from this byte offset
+        resume_count (int): Number of results in the .part file up to resume_offset
+
+    Returns:
+        NdjsonResultSink: The sink
+    """
+    return NdjsonResultSink(output_file, fsync_interval=fsync_interval,
+                            resume_offset=resume_offset, resume_count=resume_count)
+
+
+def iter_results(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read results from a results file one at a time
+
+    Handles NDJSON files (including the .part file of a run that is still going
+    or that crashed, whose last line may be incomplete) and JSON array files.
+
+    Args:
+        path (str): Results file path
+
+    Yields:
+        Dict[str, Any]: Search results
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        # Look at the first non-blank character to tell a JSON array from NDJSON
+        first = ""
+        while True:
+            char = f.read(1)
+            if not char or not char.isspace():
+                first = char
+                break
+        f.seek(0)
+
+        if first == "[":
+            # Decode the array incrementally rather than loading the whole file
+            yield from iter_array(f, key=None)
+            return
+
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield loads(line)
+            except ValueError:
+                # A crashed writer can leave a partial last line behind
+                logger.warning(f"Skipping malformed line {line_number} in {path}")
+
+
+def read_results(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Read results from a results file
+
+    Args:
+        path (str): Results file path
+        limit (Optional[int]): Maximum number of results to read
+
+    Returns:
+        List[Dict[str, Any]]: Search results
+    """
+    results = []
+    for result in iter_results(path):
+        if limit is not None and len(results) >= limit:
+            break
+        results.append(result)
+    return results
+
+
+def save_results(results: Iterable[Dict[str, Any]], output_file: str,
+                 fsync_interval: float = DEFAULT_FSYNC_INTERVAL) -> int:
+    """
+    Write results to an output file through a streaming sink
+
+    Args:
+        results (Iterable[Dict[str, Any]]): Search results (a list or a generator)
+        output_file (str): Output file path
+        fsync_interval (float): Seconds between fsyncs (0 = every result)
+
+    Returns:
+        int: Number of results written
+    """
+    with open_result_sink(output_file, fsync_interval) as sink:
+        sink.write_many(results)
+    return sink.count
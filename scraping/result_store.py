@@ -0,0 +1,850 @@
+#!/usr/bin/env python
+"""
+Persistent Result Store
+
+This module keeps every search result in one SQLite database instead of a
+timestamped results_<time>.json file per search, so past results can be
+searched again without querying the upstream databases.
+
+The store holds:
+1. records: one row per distinct result, deduplicated by record key (see
+   record_key), with the full result kept as JSON
+2. runs: one row per search (query, databases, date range, time)
+3. run_results: which records each run returned, in order
+4. records_fts: an FTS5 full-text index over title, snippet and abstract
+
+Records are indexed by database, source and date, and runs by query, so
+filtered and paginated lookups over historical results take milliseconds.
+
+The store doubles as an offline search index: every record fetched through
+the smart access manager is added as it arrives, and the upstream searches
+that were made are recorded in a coverage table, together with the records
+each one returned. offline_search answers a search that was already made
+upstream with the records it returned then, so repeated searches need no
+network I/O; in offline mode "only" it searches the BM25 full-text index
+(with phrase queries and date filters) instead.
+
+Usage:
+    store = ResultStore()
+    run_id = store.add_run("aspirin", results, databases=["pubmed"])
+    page = store.search("liver injury", sources=["pubmed"], from_date="2020-01-01", limit=20)
+
+From the command line:
+    python result_store.py search "liver injury" --database pubmed --page 2
+    python result_store.py runs --query aspirin
+    python result_store.py import results_1746028184.json --query aspirin
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Import the shared date normalizer, the results reader and the id helpers
+try:
+    from date_utils import to_iso_date
+    from result_sinks import iter_results
+    from result_record import canonical_url, content_hash, search_error
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from date_utils import to_iso_date
+    from result_sinks import iter_results
+    from result_record import canonical_url, content_hash, search_error
+
+# Set up logging
+logger = logging.getLogger("result_store")
+
+# Database file (override with the MEDSEARCH_RESULT_DB environment variable)
+DEFAULT_DB_PATH = os.environ.get(
+    "MEDSEARCH_RESULT_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.db")
+)
+
+# Version of the record key scheme (stored as the database's user_version);
+# stores written with an older scheme are re-keyed when they are opened
+KEY_VERSION = 1
+
+# Number of records written per executemany call
+WRITE_BATCH_SIZE = 500
+
+# Maximum page size accepted by search and get_runs
+MAX_PAGE_SIZE = 500
+
+# Weights of the title, snippet and abstract columns in the bm25() ranking
+FTS_WEIGHTS = (10.0, 2.0, 1.0)
+
+# Offline modes for database searches:
+#   off     - always search upstream (fetched records are still indexed)
+#   prefer  - answer searches already made upstream from the store, search upstream otherwise
+#   only    - never search upstream
+OFFLINE_MODES = ("off", "prefer", "only")
+
+# Seconds an upstream search counts as covering later searches (override with
+# the MEDSEARCH_OFFLINE_MAX_AGE environment variable)
+OFFLINE_MAX_AGE = float(os.environ.get("MEDSEARCH_OFFLINE_MAX_AGE", 7 * 24 * 3600))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    record_id TEXT PRIMARY KEY,
+    database TEXT,
+    source TEXT,
+    title TEXT,
+    url TEXT,
+    date TEXT,
+    snippet TEXT,
+    abstract TEXT,
+    data TEXT NOT NULL,
+    first_seen REAL,
+    last_seen REAL
+);
+CREATE INDEX IF NOT EXISTS idx_records_database ON records(database);
+CREATE INDEX IF NOT EXISTS idx_records_source ON records(source);
+CREATE INDEX IF NOT EXISTS idx_records_date ON records(date);
+
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    query TEXT,
+    databases TEXT,
+    min_date TEXT,
+    max_date TEXT,
+    started_at REAL,
+    result_count INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_runs_query ON runs(query);
+CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs(started_at);
+
+CREATE TABLE IF NOT EXISTS run_results (
+    run_id TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    position INTEGER,
+    PRIMARY KEY (run_id, record_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_run_results_record ON run_results(record_id);
+
+CREATE TABLE IF NOT EXISTS coverage (
+    coverage_id INTEGER PRIMARY KEY,
+    database TEXT NOT NULL,
+    query TEXT NOT NULL,
+    min_date TEXT,
+    max_date TEXT,
+    max_results INTEGER,
+    result_count INTEGER,
+    fetched_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_coverage_search ON coverage(database, query);
+
+CREATE TABLE IF NOT EXISTS coverage_results (
+    coverage_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    record_id TEXT NOT NULL,
+    PRIMARY KEY (coverage_id, position)
+) WITHOUT ROWID;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+    title, snippet, abstract,
+    content='records', content_rowid='rowid',
+    tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS records_fts_insert AFTER INSERT ON records BEGIN
+    INSERT INTO records_fts(rowid, title, snippet, abstract)
+    VALUES (new.rowid, new.title, new.snippet, new.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS records_fts_delete AFTER DELETE ON records BEGIN
+    INSERT INTO records_fts(records_fts, rowid, title, snippet, abstract)
+    VALUES ('delete', old.rowid, old.title, old.snippet, old.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS records_fts_update AFTER UPDATE OF title, snippet, abstract ON records BEGIN
+    INSERT INTO records_fts(records_fts, rowid, title, snippet, abstract)
+    VALUES ('delete', old.rowid, old.title, old.snippet, old.abstract);
+    INSERT INTO records_fts(rowid, title, snippet, abstract)
+    VALUES (new.rowid, new.title, new.snippet, new.abstract);
+END;
+"""
+
+# Quoted phrases or single terms of a full-text query
+_FTS_TOKEN_PATTERN = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def record_key(result: Dict[str, Any]) -> str:
+    """
+    Get the key a result is deduplicated by
+
+    The key is derived from the database and the canonical result URL (see
+    result_record.canonical_url), so the same page found by different runs,
+    processes or sources' id schemes maps to one record. Results without a
+    URL fall back to their id (stable, see result_record.stable_id) or title.
+
+    Args:
+        result (Dict[str, Any]): Search result
+
+    Returns:
+        str: Record key
+    """
+    database = result.get("database") or result.get("source") or ""
+    url = (result.get("url") or "").strip()
+    if url:
+        basis = canonical_url(url)
+    else:
+        basis = str(result.get("id") or result.get("title") or json.dumps(result, sort_keys=True))
+    return f"{database or 'record'}-{content_hash(database, basis)}"
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn user search text into an FTS5 query
+
+    Every term is quoted so that characters such as "-" or ":" are searched
+    for instead of being read as FTS5 operators; "quoted phrases" are kept as
+    phrases. All terms must match.
+
+    Args:
+        text (str): Search text, e.g. 'liver "drug induced"'
+
+    Returns:
+        str: FTS5 MATCH expression
+    """
+    terms = []
+    for phrase, term in _FTS_TOKEN_PATTERN.findall(text):
+        value = (phrase or term).replace('"', '""')
+        terms.append(f'"{value}"')
+    return " AND ".join(terms)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query for comparing searches (case and whitespace)"""
+    return " ".join((query or "").lower().split())
+
+
+def _clamp_page_size(limit: int) -> int:
+    """Keep a requested page size between 1 and MAX_PAGE_SIZE"""
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def _record_row(result: Dict[str, Any], now: float) -> tuple:
+    """Build the records table row of a result"""
+    return (
+        record_key(result),
+        result.get("database"),
+        result.get("source"),
+        result.get("title") or "",
+        result.get("url"),
+        to_iso_date(result.get("date"), default="") if result.get("date") else "",
+        result.get("snippet") or "",
+        result.get("abstract") or "",
+        json.dumps(result, ensure_ascii=False),
+        now,
+        now
+    )
+
+
+class ResultStore:
+    """
+    SQLite store of search results and the runs that produced them
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Open the store, creating the database if needed
+
+        Args:
+            path (Optional[str]): Database file (defaults to DEFAULT_DB_PATH)
+        """
+        self.path = path or DEFAULT_DB_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        # One connection shared by the threads of a process, guarded by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._upgrade_coverage()
+        self._conn.executescript(SCHEMA)
+        self._upgrade_keys()
+
+    def _upgrade_coverage(self):
+        """
+        Drop a coverage table written before coverage rows were linked to their records
+
+        Such rows cannot be answered from, and coverage only saves the next
+        upstream search, so they are discarded rather than converted.
+        """
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(coverage)")}
+        if columns and "coverage_id" not in columns:
+            self._conn.execute("DROP TABLE coverage")
+
+    def _upgrade_keys(self):
+        """
+        Re-key records stored with an older record key scheme
+
+        Records that now share a key are merged (the most recently seen one is
+        kept) and the run links are moved to the new keys.
+        """
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= KEY_VERSION:
+            return
+
+        with self._lock:
+            self._conn.create_function("record_key", 1, lambda data: record_key(json.loads(data)),
+                                       deterministic=True)
+            try:
+                self._conn.executescript(f"""
+                    BEGIN;
+                    CREATE TEMP TABLE rekey AS
+                        SELECT record_id AS old_id, record_key(data) AS new_id, last_seen FROM records;
+                    CREATE INDEX temp.idx_rekey_new ON rekey(new_id);
+                    CREATE INDEX temp.idx_rekey_old ON rekey(old_id);
+
+                    CREATE TEMP TABLE relinked AS
+                        SELECT rr.run_id, k.new_id AS record_id, MIN(rr.position) AS position
+                        FROM run_results rr JOIN rekey k ON k.old_id = rr.record_id
+                        GROUP BY rr.run_id, k.new_id;
+                    DELETE FROM run_results;
+                    INSERT INTO run_results SELECT run_id, record_id, position FROM relinked;
+                    UPDATE coverage_results SET record_id = (
+                        SELECT new_id FROM rekey WHERE old_id = coverage_results.record_id)
+                    WHERE record_id IN (SELECT old_id FROM rekey);
+
+                    DELETE FROM records WHERE record_id IN (
+                        SELECT k.old_id FROM rekey k WHERE EXISTS (
+                            SELECT 1 FROM rekey other WHERE other.new_id = k.new_id
+                            AND (other.last_seen > k.last_seen
+                                 OR (other.last_seen = k.last_seen AND other.old_id > k.old_id))));
+                    UPDATE records SET record_id = (SELECT new_id FROM rekey WHERE old_id = records.record_id);
+
+                    DROP TABLE rekey;
+                    DROP TABLE relinked;
+                    PRAGMA user_version = {KEY_VERSION};
+                    COMMIT;
+                """)
+            except sqlite3.Error:
+                if self._conn.in_transaction:
+                    self._conn.rollback()
+                raise
+
+    def add_run(self, query: str, results: Iterable[Dict[str, Any]],
+                databases: Optional[List[str]] = None, min_date: Optional[str] = None,
+                max_date: Optional[str] = None, run_id: Optional[str] = None) -> str:
+        """
+        Store the results of a search
+
+        Records already in the store are updated in place, so searching the
+        same thing twice does not duplicate them.
+
+        Args:
+            query (str): Search query
+            results (Iterable[Dict[str, Any]]): Search results (a list or a generator)
+            databases (Optional[List[str]]): Database IDs that were searched
+            min_date (Optional[str]): Start of the searched date range
+            max_date (Optional[str]): End of the searched date range
+            run_id (Optional[str]): Run ID (generated if not provided)
+
+        Returns:
+            str: Run ID
+        """
+        run_id = run_id or f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        now = time.time()
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO runs (run_id, query, databases, min_date, max_date, started_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, query, json.dumps(databases or []), min_date, max_date, now)
+            )
+
+            position = 0
+            records = []
+            links = []
+            for result in results:
+                record = _record_row(result, now)
+                records.append(record)
+                links.append((run_id, record[0], position))
+                position += 1
+                if len(records) >= WRITE_BATCH_SIZE:
+                    self._write_records(records, links)
+                    records, links = [], []
+            self._write_records(records, links)
+
+            self._conn.execute(
+                "UPDATE runs SET result_count = (SELECT COUNT(*) FROM run_results WHERE run_id = ?) WHERE run_id = ?",
+                (run_id, run_id)
+            )
+
+        logger.info(f"Stored {position} results of '{query}' as run {run_id}")
+        return run_id
+
+    def add_records(self, results: Iterable[Dict[str, Any]]) -> int:
+        """
+        Add results to the store without recording a run
+
+        Used to index records as they are fetched.
+
+        Args:
+            results (Iterable[Dict[str, Any]]): Search results
+
+        Returns:
+            int: Number of results added or updated
+        """
+        now = time.time()
+        count = 0
+        with self._lock, self._conn:
+            records = []
+            for result in results:
+                records.append(_record_row(result, now))
+                count += 1
+                if len(records) >= WRITE_BATCH_SIZE:
+                    self._write_records(records, [])
+                    records = []
+            self._write_records(records, [])
+        return count
+
+    def record_coverage(self, database: str, query: str, min_date: Optional[str], max_date: Optional[str],
+                        max_results: int, results: List[Dict[str, Any]]):
+        """
+        Store the results of an upstream search and record that it was made
+
+        The results are linked to the coverage row in the order they were
+        returned, so a later covered search gets exactly these records back.
+
+        Args:
+            database (str): Database ID
+            query (str): Search query
+            min_date (Optional[str]): Start of the searched date range
+            max_date (Optional[str]): End of the searched date range
+            max_results (int): Number of results asked for
+            results (List[Dict[str, Any]]): Results returned
+        """
+        now = time.time()
+        records = [_record_row(result, now) for result in results]
+        with self._lock, self._conn:
+            self._write_records(records, [])
+            coverage_id = self._conn.execute(
+                "INSERT INTO coverage (database, query, min_date, max_date, max_results, result_count, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (database, normalize_query(query), min_date or "", max_date or "", max_results, len(records), now)
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT INTO coverage_results (coverage_id, position, record_id) VALUES (?, ?, ?)",
+                [(coverage_id, position, record[0]) for position, record in enumerate(records)]
+            )
+
+    def covered_results(self, database: str, query: str, min_date: Optional[str], max_date: Optional[str],
+                        max_results: int, offset: int = 0,
+                        max_age: float = OFFLINE_MAX_AGE) -> Optional[Dict[str, Any]]:
+        """
+        Get the stored answer of an earlier upstream search covering a search
+
+        A search is covered by a recent upstream search of the same database
+        and query that either returned everything it matched (fewer results
+        than it asked for) within a date range containing the requested one,
+        or was made over the same date range for at least as many results.
+        The records that search returned are given back in their upstream
+        order, narrowed to the requested date range.
+
+        Args:
+            database (str): Database ID
+            query (str): Search query
+            min_date (Optional[str]): Start of the requested date range
+            max_date (Optional[str]): End of the requested date range
+            max_results (int): Number of results requested
+            offset (int): Number of covered results to skip
+            max_age (float): Seconds an upstream search stays valid
+
+        Returns:
+            Optional[Dict[str, Any]]: None if the search is not covered, otherwise
+                the page of "results", the "total" number of covered results and
+                whether the upstream search was "complete" (there are no more
+                results upstream)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT coverage_id, min_date, max_date, max_results, result_count FROM coverage "
+                "WHERE database = ? AND query = ? AND fetched_at >= ? ORDER BY fetched_at DESC",
+                (database, normalize_query(query), time.time() - max_age)
+            ).fetchall()
+
+        for row in rows:
+            # An empty bound means the search was not limited on that side
+            if row["min_date"] and (not min_date or min_date < row["min_date"]):
+                continue
+            if row["max_date"] and (not max_date or max_date > row["max_date"]):
+                continue
+            complete = row["result_count"] < row["max_results"]
+            same_range = (row["min_date"], row["max_date"]) == (min_date or "", max_date or "")
+            if not complete and not (same_range and row["max_results"] >= max_results):
+                continue
+
+            where = "cr.coverage_id = ?"
+            params = [row["coverage_id"]]
+            if not same_range and min_date:
+                where += " AND r.date >= ?"
+                params.append(min_date)
+            if not same_range and max_date:
+                where += " AND r.date != '' AND r.date <= ?"
+                params.append(max_date)
+            sql = f"FROM coverage_results cr JOIN records r ON r.record_id = cr.record_id WHERE {where}"
+            with self._lock:
+                total = self._conn.execute(f"SELECT COUNT(*) {sql}", params).fetchone()[0]
+                records = self._conn.execute(
+                    f"SELECT r.data {sql} ORDER BY cr.position LIMIT ? OFFSET ?",
+                    params + [max(0, int(max_results)), max(0, int(offset))]
+                ).fetchall()
+            return {
+                "total": total,
+                "complete": complete,
+                "results": [json.loads(record["data"]) for record in records]
+            }
+        return None
+
+    def _write_records(self, records: List[tuple], links: List[tuple]):
+        """Upsert a batch of records and link them to their run (the lock must be held)"""
+        if not records:
+            return
+        self._conn.executemany(
+            """
+            INSERT INTO records (record_id, database, source, title, url, date, snippet, abstract, data,
+                                 first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(record_id) DO UPDATE SET
+                database = excluded.database,
+                source = excluded.source,
+                title = excluded.title,
+                url = excluded.url,
+                date = excluded.date,
+                snippet = excluded.snippet,
+                abstract = CASE WHEN excluded.abstract != '' THEN excluded.abstract ELSE records.abstract END,
+                data = excluded.data,
+                last_seen = excluded.last_seen
+            """,
+            records
+        )
+        if links:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO run_results (run_id, record_id, position) VALUES (?, ?, ?)",
+                links
+            )
+
+    def import_file(self, path: str, query: Optional[str] = None) -> str:
+        """
+        Store the results of a results file (JSON array, NDJSON or .part file)
+
+        Args:
+            path (str): Results file
+            query (Optional[str]): Query the results were found for (defaults to the file name)
+
+        Returns:
+            str: Run ID
+        """
+        databases = set()
+
+        def results():
+            for result in iter_results(path):
+                if result.get("database"):
+                    databases.add(result["database"])
+                yield result
+
+        run_id = self.add_run(query or os.path.basename(path), results())
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE runs SET databases = ? WHERE run_id = ?",
+                               (json.dumps(sorted(databases)), run_id))
+        return run_id
+
+    def search(self, text: Optional[str] = None, query: Optional[str] = None,
+               databases: Optional[List[str]] = None, sources: Optional[List[str]] = None,
+               from_date: Optional[str] = None, to_date: Optional[str] = None,
+               run_id: Optional[str] = None, limit: int = 20, offset: int = 0,
+               order: str = "relevance") -> Dict[str, Any]:
+        """
+        Search stored results
+
+        Args:
+            text (Optional[str]): Full-text search over title, snippet and abstract
+            query (Optional[str]): Only results found by runs of this search query
+            databases (Optional[List[str]]): Only results from these database IDs
+            sources (Optional[List[str]]): Only results with these source names
+            from_date (Optional[str]): Only results dated on or after this date (YYYY-MM-DD)
+            to_date (Optional[str]): Only results dated on or before this date (YYYY-MM-DD)
+            run_id (Optional[str]): Only results of this run, in the order the run returned them
+            limit (int): Page size
+            offset (int): Number of matching results to skip
+            order (str): "relevance" (full-text rank, or newest first without text) or "date"
+
+        Returns:
+            Dict[str, Any]: "total" matching results and the page of "results"
+        """
+        source = "records r"
+        joins = []
+        where = []
+        params = []
+        order_by = "r.date DESC, r.rowid DESC"
+
+        if text and fts_query(text):
+            # Drive the lookup from the full-text index (CROSS JOIN fixes the
+            # join order) instead of probing it once per filtered record
+            source = "records_fts CROSS JOIN records r ON r.rowid = records_fts.rowid"
+            where.append("records_fts MATCH ?")
+            params.append(fts_query(text))
+            if order == "relevance":
+                order_by = "bm25(records_fts, {}, {}, {})".format(*FTS_WEIGHTS)
+        if run_id:
+            joins.append("JOIN run_results rr ON rr.record_id = r.record_id AND rr.run_id = ?")
+            params.insert(0, run_id)
+            if order == "relevance" and not text:
+                order_by = "rr.position"
+        if query:
+            where.append(
+                "r.record_id IN (SELECT rr2.record_id FROM run_results rr2 "
+                "JOIN runs ON runs.run_id = rr2.run_id WHERE runs.query = ?)"
+            )
+            params.append(query)
+        if databases:
+            where.append(f"r.database IN ({', '.join('?' * len(databases))})")
+            params.extend(databases)
+        if sources:
+            where.append(f"r.source IN ({', '.join('?' * len(sources))})")
+            params.extend(sources)
+        if from_date:
+            where.append("r.date >= ?")
+            params.append(from_date)
+        if to_date:
+            where.append("r.date != '' AND r.date <= ?")
+            params.append(to_date)
+
+        sql = f"FROM {source} {' '.join(joins)}"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) {sql}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT r.data {sql} ORDER BY {order_by} LIMIT ? OFFSET ?",
+                params + [_clamp_page_size(limit), max(0, int(offset))]
+            ).fetchall()
+
+        return {
+            "total": total,
+            "limit": _clamp_page_size(limit),
+            "offset": max(0, int(offset)),
+            "results": [json.loads(row["data"]) for row in rows]
+        }
+
+    def get_record(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a stored result by record key
+
+        Args:
+            key (str): Record key (see record_key)
+
+        Returns:
+            Optional[Dict[str, Any]]: The result, or None if it is not stored
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM records WHERE record_id = ?", (key,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def get_runs(self, query: Optional[str] = None, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """
+        List stored runs, newest first
+
+        Args:
+            query (Optional[str]): Only runs of this search query
+            limit (int): Page size
+            offset (int): Number of runs to skip
+
+        Returns:
+            Dict[str, Any]: "total" matching runs and the page of "runs"
+        """
+        where = "WHERE query = ?" if query else ""
+        params = [query] if query else []
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM runs {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM runs {where} ORDER BY started_at DESC LIMIT ? OFFSET ?",
+                params + [_clamp_page_size(limit), max(0, int(offset))]
+            ).fetchall()
+
+        runs = []
+        for row in rows:
+            run = dict(row)
+            run["databases"] = json.loads(run["databases"] or "[]")
+            runs.append(run)
+        return {"total": total, "limit": _clamp_page_size(limit), "offset": max(0, int(offset)), "runs": runs}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Count stored records and runs
+
+        Returns:
+            Dict[str, Any]: Number of records, runs and records per database
+        """
+        with self._lock:
+            records = self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+            runs = self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+            by_database = self._conn.execute(
+                "SELECT COALESCE(database, source) AS database, COUNT(*) AS count FROM records "
+                "GROUP BY COALESCE(database, source) ORDER BY count DESC"
+            ).fetchall()
+        return {
+            "records": records,
+            "runs": runs,
+            "databases": {row["database"] or "unknown": row["count"] for row in by_database}
+        }
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def offline_search(store: ResultStore, fetch: Callable[[], List[Dict[str, Any]]], db_id: str,
+                   query: str, max_results: int = 10, min_date: Optional[str] = None,
+                   max_date: Optional[str] = None, mode: str = "prefer",
+                   max_age: float = OFFLINE_MAX_AGE) -> List[Dict[str, Any]]:
+    """
+    Search a database, answering from the local index where possible
+
+    With mode "prefer", a search already made upstream recently (see
+    ResultStore.covered_results) is answered with the records it returned;
+    any other search is made upstream by fetch(), and its results are stored
+    as the answer to later searches. With mode "only", the full-text index is
+    searched instead and fetch() is never called. Upstream results are always
+    stored, whatever the mode.
+
+    Args:
+        store (ResultStore): Result store used as the index
+        fetch (Callable): Function searching the database upstream
+        db_id (str): Database ID
+        query (str): Search query ("quoted phrases" are matched as phrases locally)
+        max_results (int): Maximum number of results to return
+        min_date (Optional[str]): Minimum date in format YYYY-MM-DD
+        max_date (Optional[str]): Maximum date in format YYYY-MM-DD
+        mode (str): One of OFFLINE_MODES
+        max_age (float): Seconds an upstream search counts as covering later searches
+
+    Returns:
+        List[Dict[str, Any]]: Search results
+    """
+    if mode not in OFFLINE_MODES:
+        raise ValueError(f"Unknown offline mode '{mode}', expected one of {', '.join(OFFLINE_MODES)}")
+
+    if mode == "only":
+        local = store.search(text=query, databases=[db_id], from_date=min_date, to_date=max_date,
+                             limit=max_results)["results"]
+        logger.info(f"  Answered {db_id} search for '{query}' from the local index ({len(local)} results)")
+        return local
+    if mode == "prefer":
+        covered = store.covered_results(db_id, query, min_date, max_date, max_results, max_age=max_age)
+        if covered is not None:
+            logger.info(f"  Answered {db_id} search for '{query}' from an earlier upstream search "
+                        f"({len(covered['results'])} results)")
+            return covered["results"]
+
+    results = fetch()
+    for result in results:
+        result.setdefault("database", db_id)
+
+    # A failed search (see search_error) never counts as coverage, and
+    # neither does an empty one, since not every access method reports its
+    # failures; what a failed search fetched is still indexed
+    if results:
+        try:
+            if search_error(results):
+                store.add_records(results)
+            else:
+                store.record_coverage(db_id, query, min_date, max_date, max_results, results)
+        except sqlite3.Error as e:
+            logger.error(f"  Error indexing {db_id} results: {str(e)}")
+    return results
+
+
+def main():
+    """
+    Main function
+    """
+    parser = argparse.ArgumentParser(description="Search and manage stored search results")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Result store database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    search_parser = subparsers.add_parser("search", help="Search stored results")
+    search_parser.add_argument("text", nargs="?", help='Full-text search ("quoted phrases" are kept together)')
+    search_parser.add_argument("--query", help="Only results found by runs of this search query")
+    search_parser.add_argument("--database", nargs="+", help="Only results from these database IDs")
+    search_parser.add_argument("--source", nargs="+", help="Only results with these source names")
+    search_parser.add_argument("--from-date", help="Only results dated on or after this date (YYYY-MM-DD)")
+    search_parser.add_argument("--to-date", help="Only results dated on or before this date (YYYY-MM-DD)")
+    search_parser.add_argument("--run", help="Only results of this run")
+    search_parser.add_argument("--order", choices=["relevance", "date"], default="relevance", help="Sort order")
+    search_parser.add_argument("--page", type=int, default=1, help="Page number")
+    search_parser.add_argument("--page-size", type=int, default=20, help="Results per page")
+    search_parser.add_argument("--json", action="store_true", help="Print the page as JSON")
+
+    runs_parser = subparsers.add_parser("runs", help="List stored runs")
+    runs_parser.add_argument("--query", help="Only runs of this search query")
+    runs_parser.add_argument("--page", type=int, default=1, help="Page number")
+    runs_parser.add_argument("--page-size", type=int, default=20, help="Runs per page")
+
+    import_parser = subparsers.add_parser("import", help="Store the results of results files")
+    import_parser.add_argument("files", nargs="+", help="Results files (JSON or NDJSON)")
+    import_parser.add_argument("--query", help="Query the results were found for (defaults to the file name)")
+
+    subparsers.add_parser("stats", help="Count stored records and runs")
+
+    args = parser.parse_args()
+
+    with ResultStore(args.db) as store:
+        if args.command == "search":
+            start = time.perf_counter()
+            page = store.search(
+                text=args.text,
+                query=args.query,
+                databases=args.database,
+                sources=args.source,
+                from_date=args.from_date,
+                to_date=args.to_date,
+                run_id=args.run,
+                limit=args.page_size,
+                offset=(max(1, args.page) - 1) * args.page_size,
+                order=args.order
+            )
+            elapsed = (time.perf_counter() - start) * 1000
+            if args.json:
+                print(json.dumps(page, indent=2))
+            else:
+                print(f"{page['total']} results ({elapsed:.1f} ms), page {args.page}:")
+                for result in page["results"]:
+                    print(f"  [{result.get('database', '')}] {result.get('date', '')} {result.get('title', '')}")
+                    if result.get("url"):
+                        print(f"      {result['url']}")
+        elif args.command == "runs":
+            page = store.get_runs(args.query, args.page_size, (max(1, args.page) - 1) * args.page_size)
+            print(f"{page['total']} runs, page {args.page}:")
+            for run in page["runs"]:
+                started = datetime.fromtimestamp(run["started_at"]).strftime("%Y-%m-%d %H:%M:%S")
+                print(f"  {run['run_id']}  {started}  {run['result_count']:>5} results  '{run['query']}'")
+        elif args.command == "import":
+            for path in args.files:
+                run_id = store.import_file(path, args.query)
+                print(f"Imported {path} as run {run_id}")
+        elif args.command == "stats":
+            print(json.dumps(store.get_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,15 @@ import http.server
 import socketserver
 import os
 import json
+import sys
 import argparse
 from urllib.parse import urlparse, parse_qs
 
+# Import the results reader and the result store
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from result_sinks import iter_results, is_ndjson_path, PART_SUFFIX
+from result_store import ResultStore, DEFAULT_DB_PATH
+
 # Sample data to use if no results file exists
 SAMPLE_DATA = [
   {
@@ -70,22 +76,129 @@ class MedSearchHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         parsed_url = urlparse(self.path)
         path = parsed_url.path
         
+        # Search stored results
+        if path in ('/api/results', '/api/runs'):
+            return self.send_store_page(path, parse_qs(parsed_url.query))
+        
+        # Serve results files written by the scrapers
+        results_file = self.find_results_file(path)
+        if results_file:
+            params = parse_qs(parsed_url.query)
+            limit = int(params["limit"][0]) if params.get("limit", [""])[0].isdigit() else None
+            return self.send_results(results_file, limit)
+        
         # Handle requests for scraping_results.json
         if path == '/scraping_results.json':
             # Check if the file exists
             if os.path.exists('scraping_results.json'):
                 # Serve the actual file
                 return super().do_GET()
-            else:
-                # Serve sample data
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(SAMPLE_DATA).encode())
-                return
+            # Serve sample data if no results file exists
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(SAMPLE_DATA).encode())
+            return
         
         # For all other requests, use the default handler
         return super().do_GET()
+    
+    def find_results_file(self, path):
+        """
+        Find the results file to stream for a request path
+        
+        NDJSON files and the .part file of a run still in progress are streamed
+        as a JSON array. Finished .json files are left to the default handler.
+        
+        Args:
+            path (str): Request path
+            
+        Returns:
+            str: Local file path, or None
+        """
+        if not path.lower().endswith((".json", ".ndjson", ".jsonl")):
+            return None
+        
+        local_path = self.translate_path(path)
+        if os.path.isfile(local_path):
+            return local_path if is_ndjson_path(local_path) else None
+        if os.path.isfile(local_path + PART_SUFFIX):
+            return local_path + PART_SUFFIX
+        return None
+    
+    def send_results(self, results_file, limit=None):
+        """
+        Stream results from a results file as a JSON array
+        
+        Results are read and sent one at a time, so large files are never
+        loaded into memory as a whole.
+        
+        Args:
+            results_file (str): Results file path
+            limit (int): Maximum number of results to send
+        """
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        
+        self.wfile.write(b"[")
+        count = 0
+        for result in iter_results(results_file):
+            if limit is not None and count >= limit:
+                break
+            self.wfile.write((b"," if count else b"") + json.dumps(result).encode())
+            count += 1
+        self.wfile.write(b"]")
+
+    def send_store_page(self, path, params):
+        """
+        Send a page of stored results or runs as JSON
+        
+        /api/results accepts q (full-text search), query, database, source,
+        from, to, run, order, limit and offset parameters; /api/runs accepts
+        query, limit and offset. database and source may be repeated.
+        
+        Args:
+            path (str): Request path
+            params (dict): Parsed query string
+        """
+        def param(name, default=None):
+            return params.get(name, [default])[0]
+        
+        try:
+            limit = int(param("limit", "20"))
+            offset = int(param("offset", "0"))
+        except ValueError:
+            self.send_error(400, "limit and offset must be integers")
+            return
+        
+        if not os.path.exists(DEFAULT_DB_PATH):
+            page = {"total": 0, "limit": limit, "offset": offset,
+                    "runs" if path == '/api/runs' else "results": []}
+        else:
+            with ResultStore(DEFAULT_DB_PATH) as store:
+                if path == '/api/runs':
+                    page = store.get_runs(param("query"), limit, offset)
+                else:
+                    page = store.search(
+                        text=param("q"),
+                        query=param("query"),
+                        databases=params.get("database"),
+                        sources=params.get("source"),
+                        from_date=param("from"),
+                        to_date=param("to"),
+                        run_id=param("run"),
+                        limit=limit,
+                        offset=offset,
+                        order=param("order", "relevance")
+                    )
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(json.dumps(page).encode())
 
 def run_server(port=8000):
     """Run the HTTP server"""
@@ -18,7 +18,9 @@ import os
 import sys
 import json
 import random
-from typing import Dict, List, Any, Optional, Tuple
+import threading
+import concurrent.futures
+from typing import Dict, Iterable, List, Any, Optional, Tuple
 from datetime import datetime
 
 # Set up logging
@@ -45,53 +47,72 @@ except ImportError:
         logger.error("Could not import configuration. Make sure config.py is in the same directory.")
         sys.exit(1)
 
+# Import the streaming result writer
+from result_sinks import save_results, DEFAULT_FSYNC_INTERVAL
+from result_store import ResultStore, DEFAULT_DB_PATH, OFFLINE_MODES, offline_search
+from relevance import rank_results, max_score, TopKMerger
+from entity_resolution import resolve_entities
+from page_cursor import encode_cursor, decode_cursor, cursor_source
+
 # Try to import API modules
 API_MODULES = {}
 
 # PubMed API
 try:
-    from pubmed_api import search_pubmed, search_pubmed_with_browser
+    from pubmed_api import search_pubmed, search_pubmed_with_browser, count_pubmed, search_pubmed_page
     API_MODULES["pubmed"] = {
         "api": search_pubmed,
-        "browser": search_pubmed_with_browser
+        "browser": search_pubmed_with_browser,
+        "count": count_pubmed,
+        "page": search_pubmed_page
     }
 except ImportError:
     logger.warning("PubMed API module not found")
 
 # FDA API
 try:
-    from fda_api import search_fda_drugs
+    from fda_api import search_fda_drugs, fda_safety_signals, count_fda_drugs, search_fda_drugs_page
     API_MODULES["fda-drugs"] = {
-        "api": search_fda_drugs
+        "api": search_fda_drugs,
+        "count": count_fda_drugs,
+        "page": search_fda_drugs_page
     }
 except ImportError:
+    fda_safety_signals = None
     logger.warning("FDA API module not found")
 
 # EMA API
 try:
-    from ema_api import search_ema_medicines
+    from ema_api import search_ema_medicines, count_ema_medicines, search_ema_medicines_page
     API_MODULES["ema-medicines"] = {
-        "api": search_ema_medicines
+        "api": search_ema_medicines,
+        "count": count_ema_medicines,
+        "page": search_ema_medicines_page
     }
 except ImportError:
     logger.warning("EMA API module not found")
 
 # MHRA API
 try:
-    from mhra_api import search_mhra_medicines
+    from mhra_api import search_mhra_medicines, count_mhra_medicines, search_mhra_medicines_page
     API_MODULES["mhra"] = {
-        "api": search_mhra_medicines
+        "api": search_mhra_medicines,
+        "count": count_mhra_medicines,
+        "page": search_mhra_medicines_page
     }
 except ImportError:
     logger.warning("MHRA API module not found")
 
 # TGA API
 try:
-    from tga_api import search_tga_medicines, search_tga_with_selenium, search_tga_with_browser_automation
+    from tga_api import (
+        search_tga_medicines, search_tga_with_selenium, search_tga_with_browser_automation, search_tga_medicines_page
+    )
     API_MODULES["tga-cmi"] = {
         "browser": search_tga_medicines,
         "selenium": search_tga_with_selenium,
-        "browser_automation": search_tga_with_browser_automation
+        "browser_automation": search_tga_with_browser_automation,
+        "page": search_tga_medicines_page
     }
     API_MODULES["tga"] = API_MODULES["tga-cmi"]
 except ImportError:
@@ -128,6 +149,29 @@ except ImportError:
     logger.warning("CAPTCHA solver module not found")
     CAPTCHA_SOLVER_AVAILABLE = False
 
+# Seconds count previews wait for upstream counts before falling back to the local index
+DEFAULT_COUNT_DEADLINE = 3.0
+
+# Databases whose upstream counts cannot be filtered by date
+COUNT_IGNORES_DATES = {"ema-medicines", "mhra"}
+
+class BatchResults(list):
+    """
+    Results of a batch search
+
+    A list of results that also carries what was computed alongside them:
+    the FDA safety signals (fda_api.fda_safety_signals) when they were
+    requested, and the page cursor of each database searched (None once a
+    database has no more results), to pass back to batch_search for the
+    next page.
+    """
+
+    def __init__(self, results: Iterable[Dict[str, Any]] = (), signals: Optional[Dict[str, Any]] = None,
+                 cursors: Optional[Dict[str, Optional[str]]] = None):
+        super().__init__(results)
+        self.signals = signals or {}
+        self.cursors = cursors or {}
+
 class SmartAccessManager:
     """
     Smart manager for accessing medical databases
@@ -137,7 +181,8 @@ class SmartAccessManager:
     """
 
     def __init__(self, captcha_api_key: str = "", use_captcha_solver: bool = True,
-                use_browser_automation: bool = True):
+                use_browser_automation: bool = True, offline_mode: str = "off",
+                store_db: Optional[str] = DEFAULT_DB_PATH):
         """
         Initialize the smart access manager
 
@@ -145,10 +190,22 @@ class SmartAccessManager:
             captcha_api_key (str): API key for CAPTCHA solving service
             use_captcha_solver (bool): Whether to use CAPTCHA solver
             use_browser_automation (bool): Whether to use browser automation
+            offline_mode (str): "off", "prefer" (answer searches already made
+                upstream with the records they returned) or "only" (never
+                search upstream)
+            store_db (Optional[str]): Result store used as the local index of
+                fetched records (None to disable indexing and offline mode)
         """
+        if offline_mode not in OFFLINE_MODES:
+            raise ValueError(f"Unknown offline mode '{offline_mode}', expected one of {', '.join(OFFLINE_MODES)}")
+
         self.captcha_api_key = captcha_api_key
         self.use_captcha_solver = use_captcha_solver
         self.use_browser_automation = use_browser_automation
+        self.offline_mode = offline_mode
+
+        # Local index of every fetched record
+        self.store = ResultStore(store_db) if store_db else None
 
         # Initialize browser automation manager if available and enabled
         self.browser_manager = None
@@ -164,14 +221,55 @@ class SmartAccessManager:
                 service=captcha_config.get("service", "2captcha")
             )
 
-        # Track success rates for different methods
+        # Track success rates for different methods (shared by all searches of the manager)
         self.success_rates = self._load_success_rates()
+        self._success_rates_lock = threading.Lock()
+
+        # Searches and counts left running after an early return; they use the
+        # store and browsers, so close() only closes those once they finish
+        self._background = set()
+        self._background_lock = threading.Lock()
 
     def search_database(self, db_id: str, query: str, max_results: int = 10,
                        min_date: Optional[str] = None, max_date: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Search a database using the best available method
 
+        Fetched records are added to the local index. In offline mode the
+        index is searched first (see result_store.offline_search).
+
+        Args:
+            db_id (str): Database ID
+            query (str): Search query
+            max_results (int): Maximum number of results to return
+            min_date (Optional[str]): Minimum date in format YYYY-MM-DD
+            max_date (Optional[str]): Maximum date in format YYYY-MM-DD
+
+        Returns:
+            List[Dict[str, Any]]: List of search results
+        """
+        if self.store is None:
+            results = self._search_upstream(db_id, query, max_results, min_date, max_date)
+            for result in results:
+                result.setdefault("database", db_id)
+            return results
+
+        return offline_search(
+            self.store,
+            lambda: self._search_upstream(db_id, query, max_results, min_date, max_date),
+            db_id,
+            query,
+            max_results,
+            min_date,
+            max_date,
+            self.offline_mode
+        )
+
+    def _search_upstream(self, db_id: str, query: str, max_results: int = 10,
+                         min_date: Optional[str] = None, max_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Search a database upstream, trying access methods in order of success rate
+
         Args:
             db_id (str): Database ID
             query (str): Search query
@@ -213,7 +311,7 @@ class SmartAccessManager:
                         self._update_success_rate(db_id, method, True)
                         logger.info(f"  {method} method succeeded for {db_id}, found {len(results)} results")
                         # Sort results by relevance score
-                        sorted_results = self._sort_results(results)
+                        sorted_results = self._sort_results(results, query)
                         return sorted_results
                     else:
                         self._update_success_rate(db_id, method, False)
@@ -229,12 +327,230 @@ class SmartAccessManager:
         logger.error(f"  All methods failed for {db_id}")
         return []
 
+    def search_database_page(self, db_id: str, query: str, page_size: int = 10,
+                             min_date: Optional[str] = None, max_date: Optional[str] = None,
+                             cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get one page of search results from a database
+
+        Pages come from the database's page function (API_MODULES[db_id]["page"]),
+        which continues from the cursor returned with the previous page, so
+        each page only fetches new results. Fetched records are added to the
+        local index. In offline mode "only", pages are read from the full-text
+        index; in mode "prefer", a search already made upstream that returned
+        everything it matched is paged through the records it returned.
+
+        Databases without a page function return a single page (the search
+        of search_database) with no cursor; so does a first page the page
+        function could not fetch, which falls back to the other access methods.
+
+        Args:
+            db_id (str): Database ID
+            query (str): Search query
+            page_size (int): Number of results per page
+            min_date (Optional[str]): Minimum date in format YYYY-MM-DD
+            max_date (Optional[str]): Maximum date in format YYYY-MM-DD
+            cursor (Optional[str]): Cursor returned with the previous page (None for the first page)
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: The page of results and the
+                cursor of the next page (None on the last page)
+
+        Raises:
+            ValueError: If the cursor is invalid or belongs to another search
+        """
+        local_source = f"local:{db_id}"
+        if cursor is not None and cursor_source(cursor) == local_source:
+            state = decode_cursor(cursor, local_source, query, min_date, max_date)
+            return self._local_page(db_id, query, page_size, min_date, max_date, state["offset"],
+                                    state.get("covered", False))
+        if self.store is not None and self.offline_mode == "only":
+            if cursor is not None:
+                raise ValueError(f"Page cursor of an upstream {db_id} search cannot be continued offline")
+            return self._local_page(db_id, query, page_size, min_date, max_date, 0)
+
+        page_function = API_MODULES.get(db_id, {}).get("page")
+        if page_function is None:
+            if cursor is not None:
+                raise ValueError(f"{db_id} does not support paging")
+            return self.search_database(db_id, query, page_size, min_date, max_date), None
+
+        page = {"cursor": None}
+
+        def fetch():
+            try:
+                results, page["cursor"] = page_function(query, page_size, min_date, max_date, cursor)
+            except Exception as e:
+                # A failed later page (or an invalid cursor) raises, so the
+                # caller keeps its cursor to retry
+                if cursor is not None:
+                    raise
+                logger.error(f"  Error fetching the first {db_id} page: {str(e)}")
+                results = []
+            if not results and cursor is None:
+                results = self._search_upstream(db_id, query, page_size, min_date, max_date)
+            for result in results:
+                result.setdefault("database", db_id)
+            return results
+
+        if self.store is None:
+            return fetch(), page["cursor"]
+
+        if cursor is None and self.offline_mode == "prefer":
+            # Only an earlier search that fetched everything it matched can be
+            # paged through locally; otherwise the next page needs an upstream cursor
+            covered = self.store.covered_results(db_id, query, min_date, max_date, page_size)
+            if covered is not None and covered["complete"]:
+                return self._local_page(db_id, query, page_size, min_date, max_date, 0, True)
+
+        if cursor is None:
+            # Store the first page as the answer to the same search made again
+            return offline_search(self.store, fetch, db_id, query, page_size, min_date, max_date, "off"), page["cursor"]
+
+        results = fetch()
+        try:
+            self.store.add_records(results)
+        except Exception as e:
+            logger.error(f"  Error indexing {db_id} results: {str(e)}")
+        return results, page["cursor"]
+
+    def _local_page(self, db_id: str, query: str, page_size: int, min_date: Optional[str],
+                    max_date: Optional[str], offset: int,
+                    covered: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get a page of results of a database from the local index
+
+        Pages of a covered search (see ResultStore.covered_results) come from
+        the records the earlier upstream search returned; other pages come
+        from the full-text index.
+        """
+        if covered:
+            page = self.store.covered_results(db_id, query, min_date, max_date, page_size, offset)
+            if page is None:
+                raise ValueError(f"The stored {db_id} search this cursor pages through has expired")
+        else:
+            page = self.store.search(text=query, databases=[db_id], from_date=min_date, to_date=max_date,
+                                     limit=page_size, offset=offset)
+        results = page["results"]
+        logger.info(f"  Answered {db_id} page for '{query}' from the local index ({len(results)} results)")
+        next_cursor = None
+        if results and offset + len(results) < page["total"]:
+            state = {"offset": offset + len(results), "covered": True} if covered else {"offset": offset + len(results)}
+            next_cursor = encode_cursor(f"local:{db_id}", state, query, min_date, max_date)
+        return results, next_cursor
+
+    def count_database(self, db_id: str, query: str, min_date: Optional[str] = None,
+                       max_date: Optional[str] = None, timeout: float = DEFAULT_COUNT_DEADLINE) -> Dict[str, Any]:
+        """
+        Count the matches of a search without running it
+
+        Uses the source's count mechanism (ESearch rettype=count, openFDA
+        meta.results.total, the MHRA and EMA result totals) and falls back to
+        counting the records in the local index for sources without one, when
+        the upstream count fails, and in offline mode "only".
+
+        Args:
+            db_id (str): Database ID
+            query (str): Search query
+            min_date (Optional[str]): Minimum date in format YYYY-MM-DD
+            max_date (Optional[str]): Maximum date in format YYYY-MM-DD
+            timeout (float): Upstream request timeout in seconds
+
+        Returns:
+            Dict[str, Any]: "count" (None if unknown), "method" ("upstream",
+                "local-index" or "unavailable") and "exact" (False for local
+                index counts, which only cover fetched records, and for upstream
+                counts that ignore the date range)
+        """
+        count_function = API_MODULES.get(db_id, {}).get("count")
+        if count_function and self.offline_mode != "only":
+            try:
+                count = count_function(query, min_date, max_date, timeout=timeout)
+                if count is not None:
+                    return {
+                        "count": count,
+                        "method": "upstream",
+                        "exact": not (db_id in COUNT_IGNORES_DATES and (min_date or max_date))
+                    }
+            except Exception as e:
+                logger.warning(f"  Error counting {db_id} results: {str(e)}")
+        return self._count_local(db_id, query, min_date, max_date)
+
+    def _count_local(self, db_id: str, query: str, min_date: Optional[str],
+                     max_date: Optional[str]) -> Dict[str, Any]:
+        """Count the matching records of a database in the local index"""
+        if self.store is None:
+            return {"count": None, "method": "unavailable", "exact": False}
+        page = self.store.search(text=query, databases=[db_id], from_date=min_date, to_date=max_date, limit=1)
+        return {"count": page["total"], "method": "local-index", "exact": False}
+
+    def count_databases(self, query: str, database_ids: List[str], min_date: Optional[str] = None,
+                        max_date: Optional[str] = None,
+                        deadline: float = DEFAULT_COUNT_DEADLINE) -> Dict[str, Dict[str, Any]]:
+        """
+        Preview the number of matches per database, counting all databases at once
+
+        Databases whose upstream count has not answered by the deadline are
+        counted in the local index instead (and marked "timed_out").
+
+        Args:
+            query (str): Search query
+            database_ids (List[str]): List of database IDs to count
+            min_date (Optional[str]): Minimum date in format YYYY-MM-DD
+            max_date (Optional[str]): Maximum date in format YYYY-MM-DD
+            deadline (float): Seconds to wait for upstream counts
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Count of each database (see count_database),
+                with the seconds it took as "elapsed"
+        """
+        start = time.monotonic()
+        counts = {}
+        if not database_ids:
+            return counts
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(database_ids))
+        future_to_db = {
+            executor.submit(self.count_database, db_id, query, min_date, max_date, deadline): db_id
+            for db_id in database_ids
+        }
+        try:
+            for future in concurrent.futures.as_completed(future_to_db, timeout=deadline):
+                db_id = future_to_db[future]
+                try:
+                    counts[db_id] = future.result()
+                except Exception as e:
+                    logger.error(f"  Error counting {db_id}: {str(e)}")
+                    counts[db_id] = {"count": None, "method": "unavailable", "exact": False}
+                counts[db_id]["elapsed"] = round(time.monotonic() - start, 3)
+        except concurrent.futures.TimeoutError:
+            pending = [db_id for db_id in database_ids if db_id not in counts]
+            logger.info(f"  Count deadline reached, counting {', '.join(pending)} in the local index")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._leave_running(future_to_db)
+
+        for db_id in database_ids:
+            if db_id not in counts:
+                counts[db_id] = self._count_local(db_id, query, min_date, max_date)
+                counts[db_id]["timed_out"] = True
+                counts[db_id]["elapsed"] = round(time.monotonic() - start, 3)
+        return {db_id: counts[db_id] for db_id in database_ids}
+
     def batch_search(self, query: str, database_ids: List[str], max_results: int = 10,
                     min_date: Optional[str] = None, max_date: Optional[str] = None,
-                    parallel: bool = False, max_workers: int = 4) -> List[Dict[str, Any]]:
+                    parallel: bool = False, max_workers: int = 4, top_k: Optional[int] = None,
+                    deadline: Optional[float] = None, merge_products: bool = False,
+                    fda_signals: bool = False,
+                    cursors: Optional[Dict[str, Optional[str]]] = None) -> BatchResults:
         """
         Search multiple databases
 
+        Each database is searched one page of max_results at a time (see
+        search_database_page). The returned results carry the cursor of each
+        database's next page; passing them back as cursors fetches only the
+        following pages.
+
         Args:
             query (str): Search query
             database_ids (List[str]): List of database IDs to search
@@ -243,25 +559,70 @@ class SmartAccessManager:
             max_date (Optional[str]): Maximum date in format YYYY-MM-DD
             parallel (bool): Whether to search databases in parallel
             max_workers (int): Maximum number of parallel workers
+            top_k (Optional[int]): Only return the best top_k results, and stop
+                waiting for databases once they can no longer change them
+            deadline (Optional[float]): With top_k, return the best results found
+                after this many seconds even if some databases have not answered
+            merge_products (bool): Merge results for the same product from different
+                regulators and drug databases into one result (see entity_resolution)
+            fda_signals (bool): Count FDA adverse events, recalls and NDC products for
+                the query while the databases are searched (see BatchResults.signals)
+            cursors (Optional[Dict[str, Optional[str]]]): BatchResults.cursors of the
+                previous page; databases whose cursor is None have no more results
+                and are not searched, databases without one start from their first
+                page. Not supported with top_k
 
         Returns:
-            List[Dict[str, Any]]: Combined list of search results
+            BatchResults: Combined list of search results, with the cursors of the next page
         """
+        # The count queries run in the background while the databases are searched
+        signals_future = None
+        if fda_signals:
+            if fda_safety_signals is None:
+                logger.warning("FDA API module not found, not counting FDA safety signals")
+            else:
+                signals_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+                signals_future = signals_executor.submit(fda_safety_signals, query, min_date, max_date)
+                signals_executor.shutdown(wait=False)
+
+        if top_k:
+            if cursors:
+                logger.warning("Page cursors are not supported with top_k, searching from the first page")
+            results = self._top_k_search(query, database_ids, top_k, max_results, min_date, max_date,
+                                         parallel, max_workers, deadline)
+            return self._batch_results(resolve_entities(results) if merge_products else results, signals_future)
+
         all_results = []
 
-        if parallel and len(database_ids) > 1:
-            import concurrent.futures
+        # Databases with a None cursor have no more results; a database that
+        # fails keeps its cursor (or has none, to start over) for a retry
+        cursors = cursors or {}
+        next_cursors = {db_id: None for db_id in database_ids if db_id in cursors and cursors[db_id] is None}
+        database_ids = [db_id for db_id in database_ids if db_id not in next_cursors]
+
+        def completed(db_id, page):
+            results, next_cursors[db_id] = page
+            all_results.extend(results)
+            logger.info(f"  Completed search for {db_id}, found {len(results)} results"
+                        f"{'' if next_cursors[db_id] else ' (last page)'}")
 
+        def failed(db_id, error):
+            logger.error(f"  Error searching {db_id}: {str(error)}")
+            if cursors.get(db_id):
+                next_cursors[db_id] = cursors[db_id]
+
+        if parallel and len(database_ids) > 1:
             logger.info(f"Searching {len(database_ids)} databases in parallel with {max_workers} workers...")
             with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
                 future_to_db = {
                     executor.submit(
-                        self.search_database,
+                        self.search_database_page,
                         db_id,
                         query,
                         max_results,
                         min_date,
-                        max_date
+                        max_date,
+                        cursors.get(db_id)
                     ): db_id
                     for db_id in database_ids
                 }
@@ -269,31 +630,164 @@ class SmartAccessManager:
                 for future in concurrent.futures.as_completed(future_to_db):
                     db_id = future_to_db[future]
                     try:
-                        results = future.result()
-                        all_results.extend(results)
-                        logger.info(f"  Completed search for {db_id}, found {len(results)} results")
+                        completed(db_id, future.result())
                     except Exception as e:
-                        logger.error(f"  Error searching {db_id}: {str(e)}")
+                        failed(db_id, e)
         else:
             logger.info(f"Searching {len(database_ids)} databases sequentially...")
             for db_id in database_ids:
                 try:
-                    results = self.search_database(db_id, query, max_results, min_date, max_date)
-                    all_results.extend(results)
-                    logger.info(f"  Completed search for {db_id}, found {len(results)} results")
+                    completed(db_id, self.search_database_page(db_id, query, max_results, min_date, max_date,
+                                                               cursors.get(db_id)))
                 except Exception as e:
-                    logger.error(f"  Error searching {db_id}: {str(e)}")
+                    failed(db_id, e)
 
         logger.info(f"Total results found: {len(all_results)}")
 
+        # Merge the same product found in several databases
+        if merge_products:
+            all_results = resolve_entities(all_results)
+            logger.info(f"Results after merging products: {len(all_results)}")
+
         # Sort results by relevance score
-        sorted_results = self._sort_results(all_results)
+        sorted_results = self._sort_results(all_results, query)
+
+        return self._batch_results(sorted_results, signals_future, next_cursors)
+
+    def _batch_results(self, results: List[Dict[str, Any]],
+                       signals_future: Optional[concurrent.futures.Future],
+                       cursors: Optional[Dict[str, Optional[str]]] = None) -> BatchResults:
+        """Combine search results with the FDA safety signals computed alongside them and the page cursors"""
+        signals = None
+        if signals_future is not None:
+            try:
+                signals = signals_future.result()
+                logger.info(f"FDA safety signals: {', '.join(f'{name} ({len(counts)})' for name, counts in signals.items())}")
+            except Exception as e:
+                logger.error(f"Error counting FDA safety signals: {str(e)}")
+        return BatchResults(results, signals, cursors)
+
+    def _top_k_search(self, query: str, database_ids: List[str], top_k: int, max_results: int,
+                      min_date: Optional[str], max_date: Optional[str], parallel: bool,
+                      max_workers: int, deadline: Optional[float]) -> List[Dict[str, Any]]:
+        """
+        Search multiple databases, keeping only the best top_k results
+
+        Results are merged into a bounded heap as each database answers. The
+        search returns as soon as the databases still being searched cannot
+        beat the k-th best result, or when the deadline passes; databases that
+        are still running are left to finish in the background.
+
+        Returns:
+            List[Dict[str, Any]]: Up to top_k results, best first
+        """
+        merger = TopKMerger(query, top_k, max_date)
+        stop_at = time.monotonic() + deadline if deadline else None
+
+        # Ask the databases that can produce the best results first, so the
+        # remaining ones can be skipped sooner
+        pending = sorted(database_ids, key=lambda db_id: max_score(db_id, max_date), reverse=True)
+
+        def merge(db_id, results):
+            merger.add(results)
+            logger.info(f"  Completed search for {db_id}, found {len(results)} results "
+                        f"(top {top_k} threshold {merger.threshold:.3f})")
+
+        if parallel and len(pending) > 1:
+            logger.info(f"Searching {len(pending)} databases in parallel for the top {top_k} results...")
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+            future_to_db = {
+                executor.submit(self.search_database, db_id, query, max_results, min_date, max_date): db_id
+                for db_id in pending
+            }
+            try:
+                remaining = None if stop_at is None else max(0.0, stop_at - time.monotonic())
+                for future in concurrent.futures.as_completed(future_to_db, timeout=remaining):
+                    db_id = future_to_db[future]
+                    pending.remove(db_id)
+                    try:
+                        merge(db_id, future.result())
+                    except Exception as e:
+                        logger.error(f"  Error searching {db_id}: {str(e)}")
+                    if pending and merger.can_stop(pending):
+                        logger.info(f"  Stopping early: {', '.join(pending)} cannot improve the top {top_k}")
+                        break
+            except concurrent.futures.TimeoutError:
+                logger.info(f"  Deadline reached, not waiting for {', '.join(pending)}")
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._leave_running(future_to_db)
+        else:
+            logger.info(f"Searching {len(pending)} databases sequentially for the top {top_k} results...")
+            while pending:
+                if merger.can_stop(pending):
+                    logger.info(f"  Stopping early: {', '.join(pending)} cannot improve the top {top_k}")
+                    break
+                if stop_at is not None and time.monotonic() >= stop_at:
+                    logger.info(f"  Deadline reached, not searching {', '.join(pending)}")
+                    break
+                db_id = pending.pop(0)
+                try:
+                    merge(db_id, self.search_database(db_id, query, max_results, min_date, max_date))
+                except Exception as e:
+                    logger.error(f"  Error searching {db_id}: {str(e)}")
 
-        return sorted_results
+        results = merger.results()
+        logger.info(f"Returning the top {len(results)} of {merger.seen} results found")
+        return results
+
+    def _leave_running(self, futures: Iterable[concurrent.futures.Future]):
+        """
+        Keep track of searches or counts that are left running in the background
+
+        Args:
+            futures (Iterable[concurrent.futures.Future]): Futures of an executor
+                that was shut down without waiting (finished ones are ignored)
+        """
+        running = [future for future in futures if not future.done()]
+        with self._background_lock:
+            self._background.update(running)
+        # Outside the lock: a future that has finished meanwhile calls back at once
+        for future in running:
+            future.add_done_callback(self._background_done)
+
+    def _background_done(self, future: concurrent.futures.Future):
+        """Forget a background search once it has finished"""
+        with self._background_lock:
+            self._background.discard(future)
 
     def close(self):
         """
         Close all resources
+
+        Searches and counts still running in the background (after an early
+        return of a top-k search or a count deadline) keep using the store and
+        the browsers, so these are closed once the last of them finishes; close()
+        itself returns at once.
+        """
+        with self._background_lock:
+            pending = list(self._background)
+        if not pending:
+            self._close_resources()
+            return
+
+        logger.info(f"Closing once {len(pending)} background searches finish")
+        remaining = [len(pending)]
+        remaining_lock = threading.Lock()
+
+        def finished(_future):
+            with remaining_lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._close_resources()
+
+        for future in pending:
+            future.add_done_callback(finished)
+
+    def _close_resources(self):
+        """
+        Close the browsers, save the success rates and close the local index
         """
         # Close browser automation manager
         if self.browser_manager:
@@ -302,6 +796,10 @@ class SmartAccessManager:
         # Save success rates
         self._save_success_rates()
 
+        # Close the local index
+        if self.store:
+            self.store.close()
+
     def _sort_methods_by_success_rate(self, db_id: str, methods: List[str]) -> List[str]:
         """
         Sort access methods by success rate
@@ -329,26 +827,27 @@ class SmartAccessManager:
             method (str): Access method
             success (bool): Whether the method succeeded
         """
-        # Initialize database if not exists
-        if db_id not in self.success_rates:
-            self.success_rates[db_id] = {}
-
-        # Initialize method if not exists
-        if method not in self.success_rates[db_id]:
-            self.success_rates[db_id][method] = {
-                "success": 0,
-                "total": 0,
-                "rate": 0.5  # Start with neutral rate
-            }
+        with self._success_rates_lock:
+            # Initialize database if not exists
+            if db_id not in self.success_rates:
+                self.success_rates[db_id] = {}
+
+            # Initialize method if not exists
+            if method not in self.success_rates[db_id]:
+                self.success_rates[db_id][method] = {
+                    "success": 0,
+                    "total": 0,
+                    "rate": 0.5  # Start with neutral rate
+                }
 
-        # Update counts
-        stats = self.success_rates[db_id][method]
-        if success:
-            stats["success"] += 1
-        stats["total"] += 1
+            # Update counts
+            stats = self.success_rates[db_id][method]
+            if success:
+                stats["success"] += 1
+            stats["total"] += 1
 
-        # Update rate
-        stats["rate"] = stats["success"] / stats["total"]
+            # Update rate
+            stats["rate"] = stats["success"] / stats["total"]
 
     def _load_success_rates(self) -> Dict[str, Dict[str, Dict[str, float]]]:
         """
@@ -378,27 +877,26 @@ class SmartAccessManager:
         except Exception as e:
             logger.error(f"Error saving success rates: {str(e)}")
 
-    def _sort_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _sort_results(self, results: List[Dict[str, Any]], query: str = "") -> List[Dict[str, Any]]:
         """
-        Sort results by relevance score
+        Score results against the query and sort them by relevance score
+
+        Scores combine query-term relevance over title and snippet, recency and
+        source authority (see relevance.py).
 
         Args:
             results (List[Dict[str, Any]]): List of search results
+            query (str): Search query the results were found for
 
         Returns:
             List[Dict[str, Any]]: Sorted list of search results
         """
-        # Ensure all results have a numeric relevanceScore
-        for result in results:
-            if "relevanceScore" not in result or not isinstance(result["relevanceScore"], (int, float)):
-                result["relevanceScore"] = 0.5
-
-        return sorted(results, key=lambda r: r.get("relevanceScore", 0), reverse=True)
+        return rank_results(results, query)
 
 def search_database(db_id: str, query: str, max_results: int = 10,
                    min_date: Optional[str] = None, max_date: Optional[str] = None,
                    captcha_api_key: str = "", use_captcha_solver: bool = True,
-                   use_browser_automation: bool = True) -> List[Dict[str, Any]]:
+                   use_browser_automation: bool = True, offline_mode: str = "off") -> List[Dict[str, Any]]:
     """
     Search a database using the smart access manager
 
@@ -411,6 +909,7 @@ def search_database(db_id: str, query: str, max_results: int = 10,
         captcha_api_key (str): API key for CAPTCHA solving service
         use_captcha_solver (bool): Whether to use CAPTCHA solver
         use_browser_automation (bool): Whether to use browser automation
+        offline_mode (str): "off", "prefer" (repeated searches answered locally) or "only"
 
     Returns:
         List[Dict[str, Any]]: List of search results
@@ -418,18 +917,73 @@ def search_database(db_id: str, query: str, max_results: int = 10,
     manager = SmartAccessManager(
         captcha_api_key=captcha_api_key,
         use_captcha_solver=use_captcha_solver,
-        use_browser_automation=use_browser_automation
+        use_browser_automation=use_browser_automation,
+        offline_mode=offline_mode
     )
     try:
         return manager.search_database(db_id, query, max_results, min_date, max_date)
     finally:
         manager.close()
 
+def count_databases(query: str, database_ids: List[str], min_date: Optional[str] = None,
+                    max_date: Optional[str] = None, deadline: float = DEFAULT_COUNT_DEADLINE,
+                    offline_mode: str = "off",
+                    store_db: Optional[str] = DEFAULT_DB_PATH) -> Dict[str, Dict[str, Any]]:
+    """
+    Preview the number of matches per database without searching them
+
+    Args:
+        query (str): Search query
+        database_ids (List[str]): List of database IDs to count
+        min_date (Optional[str]): Minimum date in format YYYY-MM-DD
+        max_date (Optional[str]): Maximum date in format YYYY-MM-DD
+        deadline (float): Seconds to wait for upstream counts
+        offline_mode (str): "only" to count in the local index only
+        store_db (Optional[str]): Result store used as the local index (None to disable)
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Count of each database (see SmartAccessManager.count_database)
+    """
+    manager = SmartAccessManager(
+        use_captcha_solver=False,
+        use_browser_automation=False,
+        offline_mode=offline_mode,
+        store_db=store_db
+    )
+    try:
+        return manager.count_databases(query, database_ids, min_date, max_date, deadline)
+    finally:
+        manager.close()
+
+def count_database(db_id: str, query: str, min_date: Optional[str] = None, max_date: Optional[str] = None,
+                   deadline: float = DEFAULT_COUNT_DEADLINE, offline_mode: str = "off",
+                   store_db: Optional[str] = DEFAULT_DB_PATH) -> Dict[str, Any]:
+    """
+    Count the matches of a search in one database without running it
+
+    Args:
+        db_id (str): Database ID
+        query (str): Search query
+        min_date (Optional[str]): Minimum date in format YYYY-MM-DD
+        max_date (Optional[str]): Maximum date in format YYYY-MM-DD
+        deadline (float): Seconds to wait for the upstream count
+        offline_mode (str): "only" to count in the local index only
+        store_db (Optional[str]): Result store used as the local index (None to disable)
+
+    Returns:
+        Dict[str, Any]: The count (see SmartAccessManager.count_database)
+    """
+    return count_databases(query, [db_id], min_date, max_date, deadline, offline_mode, store_db)[db_id]
+
 def batch_search(query: str, database_ids: List[str], max_results: int = 10,
                 min_date: Optional[str] = None, max_date: Optional[str] = None,
                 parallel: bool = False, max_workers: int = 4,
                 captcha_api_key: str = "", use_captcha_solver: bool = True,
-                use_browser_automation: bool = True) -> List[Dict[str, Any]]:
+                use_browser_automation: bool = True, offline_mode: str = "off",
+                store_db: Optional[str] = DEFAULT_DB_PATH, top_k: Optional[int] = None,
+                deadline: Optional[float] = None, merge_products: bool = False,
+                fda_signals: bool = False,
+                cursors: Optional[Dict[str, Optional[str]]] = None) -> BatchResults:
     """
     Search multiple databases using the smart access manager
 
@@ -444,42 +998,56 @@ def batch_search(query: str, database_ids: List[str], max_results: int = 10,
         captcha_api_key (str): API key for CAPTCHA solving service
         use_captcha_solver (bool): Whether to use CAPTCHA solver
         use_browser_automation (bool): Whether to use browser automation
+        offline_mode (str): "off", "prefer" (repeated searches answered locally) or "only"
+        store_db (Optional[str]): Result store used as the local index (None to disable)
+        top_k (Optional[int]): Only return the best top_k results, returning early
+            once the remaining databases cannot change them
+        deadline (Optional[float]): With top_k, seconds after which the best
+            results found so far are returned
+        merge_products (bool): Merge results for the same product from different databases
+        fda_signals (bool): Also count FDA adverse events, recalls and NDC products
+            for the query (see BatchResults.signals)
+        cursors (Optional[Dict[str, Optional[str]]]): BatchResults.cursors of the previous
+            page, to fetch the next page of each database
 
     Returns:
-        List[Dict[str, Any]]: Combined list of search results
+        BatchResults: Combined list of search results, with the cursors of the next page
     """
     manager = SmartAccessManager(
         captcha_api_key=captcha_api_key,
         use_captcha_solver=use_captcha_solver,
-        use_browser_automation=use_browser_automation
+        use_browser_automation=use_browser_automation,
+        offline_mode=offline_mode,
+        store_db=store_db
     )
     try:
         return manager.batch_search(
-            query, database_ids, max_results, min_date, max_date, parallel, max_workers
+            query, database_ids, max_results, min_date, max_date, parallel, max_workers, top_k, deadline,
+            merge_products, fda_signals, cursors
         )
     finally:
         manager.close()
 
-def save_results_to_file(results: List[Dict[str, Any]], output_file: str) -> bool:
+def save_results_to_file(results: Iterable[Dict[str, Any]], output_file: str,
+                         fsync_interval: float = DEFAULT_FSYNC_INTERVAL) -> bool:
     """
-    Save search results to a JSON file
+    Save search results to a file
+
+    Results are streamed to disk as they are read from results and the output
+    file is only replaced once all of them are written.
 
     Args:
-        results (List[Dict[str, Any]]): List of search results
-        output_file (str): Output file path
+        results (Iterable[Dict[str, Any]]): Search results (a list or a generator)
+        output_file (str): Output file path (.ndjson/.jsonl for NDJSON, anything else for a JSON array)
+        fsync_interval (float): Seconds between flushes to disk (0 = after every result)
 
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        # Create the directory if it doesn't exist
-        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
-
-        # Save the results
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2)
+        count = save_results(results, output_file, fsync_interval)
 
-        logger.info(f"Results saved to {output_file}")
+        logger.info(f"{count} results saved to {output_file}")
         return True
     except Exception as e:
         logger.error(f"Error saving results: {str(e)}")
@@ -518,7 +1086,28 @@ if __name__ == "__main__":
     parser.add_argument("--parallel", action="store_true", help="Search databases in parallel")
     parser.add_argument("--max-workers", type=int, default=4, help="Maximum number of parallel workers")
     parser.add_argument("--captcha-api-key", default="", help="API key for CAPTCHA solving service")
-    parser.add_argument("--output", help="Output file path")
+    parser.add_argument("--output", help="Output file path (.ndjson/.jsonl for NDJSON, anything else for a JSON array)")
+    parser.add_argument("--fsync-interval", type=float, default=DEFAULT_FSYNC_INTERVAL,
+                        help="Seconds between flushes of written results to disk (0 = after every result)")
+    parser.add_argument("--store-db", default=DEFAULT_DB_PATH, help="Result store database the results are also saved to")
+    parser.add_argument("--no-store", action="store_true", help="Do not save the results to the result store")
+    parser.add_argument("--offline", choices=OFFLINE_MODES, default="off",
+                        help="Answer from the local index of fetched records: 'prefer' answers searches "
+                             "already made upstream, 'only' never searches upstream")
+    parser.add_argument("--top-k", type=int, help="Only return the best N results across all databases, "
+                                                   "without waiting for databases that cannot improve them")
+    parser.add_argument("--deadline", type=float, help="With --top-k, return the best results found after this many seconds")
+    parser.add_argument("--merge-products", action="store_true",
+                        help="Merge results for the same product from different regulators and drug databases")
+    parser.add_argument("--fda-signals", action="store_true",
+                        help="Also count FDA adverse event reactions, reports and recalls per year and NDC "
+                             "dosage forms for the query, saved to <output>.signals.json")
+    parser.add_argument("--cursors", help="Fetch the next page of each database, continuing from the "
+                                          "<output>.cursors.json file of the previous page")
+    parser.add_argument("--count-only", action="store_true",
+                        help="Only print the number of matches per database (a quick preview, no results are fetched)")
+    parser.add_argument("--count-deadline", type=float, default=DEFAULT_COUNT_DEADLINE,
+                        help="With --count-only, seconds to wait for upstream counts")
     parser.add_argument("--list-databases", action="store_true", help="List all available databases")
     parser.add_argument("--include-commercial", action="store_true", help="Include commercial databases")
     parser.add_argument("--no-captcha-solver", action="store_true", help="Disable CAPTCHA solver")
@@ -526,6 +1115,9 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
+    if args.no_store and args.offline != "off":
+        parser.error("--offline needs the result store, so it cannot be used with --no-store")
+
     # List databases if requested
     if args.list_databases:
         databases = get_available_databases()
@@ -543,10 +1135,30 @@ if __name__ == "__main__":
         if args.include_commercial:
             args.databases.extend(["drugbank", "rxnav", "chembl"])
 
+    # Preview the number of matches instead of searching
+    if args.count_only:
+        counts = count_databases(args.query, args.databases, args.min_date, args.max_date, args.count_deadline,
+                                 args.offline, None if args.no_store else args.store_db)
+        print(f"Matches for '{args.query}':")
+        for db_id, count in counts.items():
+            value = "unknown" if count["count"] is None else f"{count['count']:,}"
+            note = "" if count["exact"] else " (approximate)"
+            print(f"  {db_id:<15} {value:>12}  {count['method']}{note}, {count['elapsed']:.2f}s")
+        sys.exit(0)
+
     # Set default output file if not provided
     if not args.output:
         args.output = f"results_{int(time.time())}.json"
 
+    # Continue from the cursors of the previous page
+    cursors = None
+    if args.cursors:
+        with open(args.cursors, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("query") != args.query:
+            parser.error(f"{args.cursors} holds the cursors of a search for '{saved.get('query')}'")
+        cursors = saved.get("cursors", {})
+
     # Create a configuration dictionary for the search
     search_config = {
         "use_captcha_solver": not args.no_captcha_solver,
@@ -562,6 +1174,11 @@ if __name__ == "__main__":
     logger.info(f"  Parallel: {args.parallel}")
     logger.info(f"  CAPTCHA Solver: {'Disabled' if args.no_captcha_solver else 'Enabled'}")
     logger.info(f"  Browser Automation: {'Disabled' if args.no_browser_automation else 'Enabled'}")
+    logger.info(f"  Offline Mode: {args.offline}")
+    logger.info(f"  Merge Products: {args.merge_products}")
+    logger.info(f"  FDA Signals: {args.fda_signals}")
+    if args.top_k:
+        logger.info(f"  Top K: {args.top_k} (deadline: {args.deadline or 'None'})")
 
     # Search databases
     results = batch_search(
@@ -574,8 +1191,38 @@ if __name__ == "__main__":
         args.max_workers,
         args.captcha_api_key,
         not args.no_captcha_solver,
-        not args.no_browser_automation
+        not args.no_browser_automation,
+        args.offline,
+        None if args.no_store else args.store_db,
+        args.top_k,
+        args.deadline,
+        args.merge_products,
+        args.fda_signals,
+        cursors
     )
 
     # Save results to file
-    save_results_to_file(results, args.output)
+    save_results_to_file(results, args.output, args.fsync_interval)
+
+    # Save the safety signals next to the results
+    if results.signals:
+        signals_file = f"{os.path.splitext(args.output)[0]}.signals.json"
+        with open(signals_file, "w", encoding="utf-8") as f:
+            json.dump({"query": args.query, "signals": results.signals}, f, indent=2)
+        logger.info(f"FDA safety signals saved to {signals_file}")
+
+    # Save the cursors of the next page, for --cursors
+    if any(results.cursors.values()):
+        cursors_file = f"{os.path.splitext(args.output)[0]}.cursors.json"
+        with open(cursors_file, "w", encoding="utf-8") as f:
+            json.dump({"query": args.query, "cursors": results.cursors}, f, indent=2)
+        logger.info(f"Next page cursors saved to {cursors_file}")
+
+    # Keep the results in the result store so they can be searched again later
+    if not args.no_store:
+        try:
+            with ResultStore(args.store_db) as store:
+                run_id = store.add_run(args.query, results, args.databases, args.min_date, args.max_date)
+            logger.info(f"Results stored as run {run_id} in {args.store_db}")
+        except Exception as e:
+            logger.error(f"Error storing results: {str(e)}")
@@ -8,11 +8,11 @@ TGA doesn't have a public API, so we use advanced web scraping with browser emul
 """
 
 import requests
+import re
 import time
 from datetime import datetime
 from urllib.parse import quote_plus, urljoin
 import json
-from bs4 import BeautifulSoup
 import random
 import logging
 import os
@@ -54,10 +54,33 @@ except ImportError:
         logger.warning("CAPTCHA solver is not available. Make sure captcha_solver.py is in the same directory.")
         CAPTCHA_SOLVER_AVAILABLE = False
 
+# Import the shared date normalizer, HTML parsing backend, result ids and page cursors
+try:
+    from date_utils import to_iso_date, is_within_range
+    from result_record import stable_id, FailedSearch
+    from html_parsing import make_soup, make_container_soup, find_document_links
+    from page_cursor import encode_cursor, decode_cursor
+    from response_archive import archive_response
+except ImportError:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    from date_utils import to_iso_date, is_within_range
+    from result_record import stable_id, FailedSearch
+    from html_parsing import make_soup, make_container_soup, find_document_links
+    from page_cursor import encode_cursor, decode_cursor
+    from response_archive import archive_response
+
 # Base URLs for TGA
 TGA_SEARCH_URL = "https://www.tga.gov.au/products/consumer-medicines-information/search"
 TGA_BASE_URL = "https://www.tga.gov.au"
 
+# Link to the next page in the search results pager
+NEXT_PAGE_PATTERN = re.compile(r'rel=["\']next["\']|pager__item--next')
+
+# Upper bound on the results one search page is parsed into
+MAX_PAGE_RESULTS = 1000
+
 # List of user agents to rotate
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -124,6 +147,8 @@ def search_tga_medicines(query, max_results=10, min_date=None, max_date=None, re
                 return search_tga_with_selenium(query, max_results, min_date, max_date)
 
             # Parse the HTML results
+            archive_response(response, "tga-cmi", {"query": query, "max_results": max_results,
+                                                   "min_date": min_date, "max_date": max_date})
             return parse_tga_html_results(response.text, query, max_results, min_date, max_date)
 
         except Exception as e:
@@ -139,6 +164,70 @@ def search_tga_medicines(query, max_results=10, min_date=None, max_date=None, re
                 logger.info("  Trying with Selenium as a last resort")
                 return search_tga_with_selenium(query, max_results, min_date, max_date)
 
+def search_tga_medicines_page(query, page_size=10, min_date=None, max_date=None, cursor=None, retries=3):
+    """
+    Get one page of TGA medicines search results
+
+    The site's pages have a fixed size, so the cursor holds the site page
+    number (from 0) and the offset of the next result on it. Pages are
+    scraped over plain HTTP; a CAPTCHA raises an error rather than opening a
+    browser for every page.
+
+    Args:
+        query (str): The search query
+        page_size (int): Number of results per page
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+        cursor (str): Cursor returned with the previous page (None for the first page)
+        retries (int): Number of retries if the scraping fails
+
+    Returns:
+        tuple: List of search results and the cursor of the next page (None on the last page)
+    """
+    state = decode_cursor(cursor, "tga", query, min_date, max_date) if cursor else {"page": 0, "offset": 0}
+    page, offset = state["page"], state["offset"]
+    logger.info(f"Searching TGA medicines database for: {query} (page {page + 1})")
+
+    search_url = f"{TGA_SEARCH_URL}?query={quote_plus(query)}"
+    if page:
+        search_url += f"&page={page}"
+
+    for attempt in range(retries):
+        try:
+            logger.info(f"  Scraping attempt {attempt + 1}/{retries}")
+            headers = {
+                "User-Agent": random.choice(USER_AGENTS),
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+                "Accept-Language": "en-US,en;q=0.5"
+            }
+            response = requests.get(search_url, headers=headers, timeout=30)
+            response.raise_for_status()
+            break
+        except Exception as e:
+            logger.error(f"  Error in scraping attempt {attempt + 1}: {str(e)}")
+            if attempt < retries - 1:
+                time.sleep(2 ** attempt + random.uniform(1, 5))  # Exponential backoff with randomization
+            else:
+                raise
+
+    html = response.text
+    if "captcha" in html.lower() or "robot" in html.lower():
+        raise RuntimeError("CAPTCHA detected, TGA pages need browser automation")
+    archive_response(response, "tga-cmi", {"query": query, "max_results": MAX_PAGE_RESULTS,
+                                           "min_date": min_date, "max_date": max_date})
+
+    # Take page_size results from the offset, continuing on the next site page
+    # once this one is used up
+    page_results = parse_tga_html_results(html, query, MAX_PAGE_RESULTS, min_date, max_date)
+    results = page_results[offset:offset + page_size]
+    next_state = None
+    if offset + page_size < len(page_results):
+        next_state = {"page": page, "offset": offset + page_size}
+    elif NEXT_PAGE_PATTERN.search(html):
+        next_state = {"page": page + 1, "offset": 0}
+    next_cursor = encode_cursor("tga", next_state, query, min_date, max_date) if next_state else None
+    return results, next_cursor
+
 def search_tga_with_browser_automation(query, max_results=10, min_date=None, max_date=None, captcha_api_key=""):
     """
     Search TGA medicines database using browser automation with human-like behavior
@@ -228,18 +317,20 @@ def parse_tga_html_results(html_content, query, max_results, min_date=None, max_
     results = []
 
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-
         # Check for CAPTCHA
         if "captcha" in html_content.lower() or "robot" in html_content.lower():
             print("  CAPTCHA detected, cannot proceed with scraping")
             return []
 
+        # Only build the tree for the results containers
+        soup = make_container_soup(html_content, ["view-content", "search-results"])
+
         # Find all medicine items
         medicine_items = soup.select('.view-content .views-row, .search-results .search-result')
 
         if not medicine_items:
-            # Try alternative selectors
+            # Try alternative selectors, which need the whole document
+            soup = make_soup(html_content)
             medicine_items = soup.select('article, .product-item, .medicine-item')
 
         print(f"  Found {len(medicine_items)} potential results in HTML")
@@ -261,25 +352,9 @@ def parse_tga_html_results(html_content, query, max_results, min_date=None, max_
                 date_elem = item.select_one('.date, .publication-date, .views-field-field-publication-date')
                 date = date_elem.get_text().strip() if date_elem else ""
 
-                # Try to convert to YYYY-MM-DD format
+                # Convert to YYYY-MM-DD format
                 if date:
-                    try:
-                        # Parse various date formats
-                        date_formats = [
-                            "%d/%m/%Y",
-                            "%Y-%m-%d",
-                            "%d %B %Y"
-                        ]
-
-                        for fmt in date_formats:
-                            try:
-                                date_obj = datetime.strptime(date, fmt)
-                                date = date_obj.strftime("%Y-%m-%d")
-                                break
-                            except ValueError:
-                                continue
-                    except Exception:
-                        pass
+                    date = to_iso_date(date)
                 else:
                     # If no date found, use current date
                     date = datetime.now().strftime("%Y-%m-%d")
@@ -306,32 +381,18 @@ def parse_tga_html_results(html_content, query, max_results, min_date=None, max_
 
                 # Create the result object
                 result = {
-                    "id": f"tga-{hash(url) % 10000}",
+                    "id": stable_id("tga", None, url, title),
                     "title": title,
                     "url": url,
                     "source": "TGA - Consumer Medicines Information",
                     "date": date,
                     "snippet": snippet,
-                    "authors": authors
+                    "authors": authors,
+                    "documents": find_document_links(item, TGA_BASE_URL)
                 }
 
-                # Filter by date if needed
-                if min_date or max_date:
-                    if not date:
-                        # Include results without dates
-                        results.append(result)
-                    else:
-                        try:
-                            result_date = datetime.strptime(date, "%Y-%m-%d")
-                            min_date_obj = datetime.strptime(min_date, "%Y-%m-%d") if min_date else datetime(1900, 1, 1)
-                            max_date_obj = datetime.strptime(max_date, "%Y-%m-%d") if max_date else datetime.now()
-
-                            if min_date_obj <= result_date <= max_date_obj:
-                                results.append(result)
-                        except ValueError:
-                            # Include results with unparseable dates
-                            results.append(result)
-                else:
+                # Filter by date if needed (results without dates are kept)
+                if is_within_range(date, min_date, max_date):
                     results.append(result)
 
             except Exception as e:
@@ -345,6 +406,23 @@ def parse_tga_html_results(html_content, query, max_results, min_date=None, max_
         print(f"  Error parsing HTML: {str(e)}")
         return []
 
+def parse_tga_response(body, query="", max_results=10, min_date=None, max_date=None):
+    """
+    Parse a raw TGA search page (used to re-parse archived responses, see
+    response_archive.py)
+
+    Args:
+        body (str): HTML content of the search page
+        query (str): The search query
+        max_results (int): Maximum number of results to return
+        min_date (str): Minimum date in format YYYY-MM-DD
+        max_date (str): Maximum date in format YYYY-MM-DD
+
+    Returns:
+        list: List of search results
+    """
+    return parse_tga_html_results(body, query, max_results, min_date, max_date)
+
 def search_tga_with_selenium(query, max_results=10, min_date=None, max_date=None, captcha_api_key="", **kwargs):
     """
     Search TGA medicines database using Selenium for browser automation
@@ -374,7 +452,7 @@ def search_tga_with_selenium(query, max_results=10, min_date=None, max_date=None
         from webdriver_manager.chrome import ChromeDriverManager
     except ImportError:
         print("  Selenium is not installed. Please install it with: pip install selenium webdriver-manager")
-        return []
+        return FailedSearch("Selenium is not installed")
 
     try:
         # Set up Chrome options
@@ -409,7 +487,7 @@ def search_tga_with_selenium(query, max_results=10, min_date=None, max_date=None
 
     except Exception as e:
         print(f"  Error using Selenium: {str(e)}")
-        return []
+        return FailedSearch(e)
 
 if __name__ == "__main__":
     # Test the scraper
@@ -1,5 +1,6 @@
 import requests
 import random
+import threading
 import time
 from typing import List, Dict, Any, Optional, Union, Callable
 from bs4 import BeautifulSoup
@@ -199,39 +200,46 @@ class RateLimiter:
     def __init__(self):
         """Initialize the rate limiter"""
         self.request_timestamps = {}
+        # The limiter can be shared by several fetch threads
+        self._lock = threading.Lock()
     
     def wait_if_needed(self, domain: str, requests_per_minute: int) -> None:
         """Wait if necessary to respect rate limits"""
-        if domain not in self.request_timestamps:
-            self.request_timestamps[domain] = []
-            return
+        with self._lock:
+            if domain not in self.request_timestamps:
+                self.request_timestamps[domain] = []
+                return
+                
+            # Get timestamps from the last minute
+            current_time = time.time()
+            minute_ago = current_time - 60
             
-        # Get timestamps from the last minute
-        current_time = time.time()
-        minute_ago = current_time - 60
-        
-        # Filter timestamps to only include those from the last minute
-        self.request_timestamps[domain] = [
-            ts for ts in self.request_timestamps[domain] if ts > minute_ago
-        ]
+            # Filter timestamps to only include those from the last minute
+            self.request_timestamps[domain] = [
+                ts for ts in self.request_timestamps[domain] if ts > minute_ago
+            ]
+            
+            # Check if we need to wait
+            wait_time = 0
+            if len(self.request_timestamps[domain]) >= requests_per_minute:
+                # Calculate wait time - wait until the oldest request is more than a minute old
+                wait_time = 60 - (current_time - self.request_timestamps[domain][0])
         
-        # Check if we need to wait
-        if len(self.request_timestamps[domain]) >= requests_per_minute:
-            # Calculate wait time - wait until the oldest request is more than a minute old
-            wait_time = 60 - (current_time - self.request_timestamps[domain][0])
-            if wait_time > 0:
-                print(f"Rate limit reached for {domain}. Waiting {wait_time:.2f} seconds...")
-                time.sleep(wait_time)
-                
-                # After waiting, clear old timestamps and start fresh
+        if wait_time > 0:
+            print(f"Rate limit reached for {domain}. Waiting {wait_time:.2f} seconds...")
+            time.sleep(wait_time)
+            
+            # After waiting, clear old timestamps and start fresh
+            with self._lock:
                 self.request_timestamps[domain] = []
     
     def record_request(self, domain: str) -> None:
         """Record a request to a domain"""
-        if domain not in self.request_timestamps:
-            self.request_timestamps[domain] = []
-            
-        self.request_timestamps[domain].append(time.time())
+        with self._lock:
+            if domain not in self.request_timestamps:
+                self.request_timestamps[domain] = []
+                
+            self.request_timestamps[domain].append(time.time())
 
 # ===== RETRY HANDLING UTILITIES =====
 
@@ -313,6 +321,9 @@ class AdvancedScraper:
         self.retry_handler = retry_handler or RetryHandler()
         self.driver_path = driver_path
         
+        # Reuse HTTP connections across requests
+        self.session = requests.Session()
+        
         # Default headers to mimic a browser
         self.default_headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -357,7 +368,7 @@ class AdvancedScraper:
         
         # Define the request function to be retried
         def make_request():
-            response = requests.get(
+            response = self.session.get(
                 url, 
                 params=params, 
                 headers=merged_headers,